@@ -0,0 +1,229 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import signal
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Añadir el directorio raíz al sys.path para encontrar utils/
+ROOT_DIR = Path(__file__).resolve().parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from utils.config import load_config
+from utils.database_manager import DatabaseManager
+from utils.job_queue import CANCELADO, COMPLETADO, ERROR, JobQueue
+
+# Los logs van a stderr; stdout queda para el progreso en JSON (una línea por evento)
+logging.basicConfig(level=logging.INFO, stream=sys.stderr,
+                    format='%(asctime)s - %(levelname)s - %(processName)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FINISHED = (COMPLETADO, ERROR, CANCELADO)
+
+
+def emit(event: str, **data):
+    """Escribe un evento de progreso como una línea JSON en stdout."""
+    print(json.dumps({"event": event, "ts": datetime.now().isoformat(timespec="seconds"), **data}, ensure_ascii=False),
+          flush=True)
+
+
+def proyecto_desde_publicacion(pub: Dict) -> Dict:
+    """Convierte una fila de Publicaciones en un proyecto del lote (igual que el panel de publicaciones)."""
+    manual = pub.get("script_type") == "manual"
+    return {
+        "titulo": pub["titulo"],
+        "contexto": pub.get("contexto") or "",
+        "script_type": "✍️ Usar guión manual" if manual else "🤖 Generar con IA",
+        "guion_manual": pub.get("guion") if manual else None,
+        "cms_publicacion_id": pub["id"],
+        "cms_canal": pub.get("nombre_canal")
+    }
+
+
+def project_info_existente(pub: Dict) -> Optional[str]:
+    """project_info.json de la publicación si ya se empezó a generar (ruta_proyecto)."""
+    ruta = pub.get("ruta_proyecto")
+    if not ruta:
+        return None
+    path = Path(ruta) / "project_info.json"
+    return str(path) if path.exists() else None
+
+
+def cargar_config_lote(path: Optional[str], job_queue: JobQueue) -> Optional[Dict]:
+    """
+    Configuración del lote: fichero JSON o, si no se indica, la del último lote encolado desde la interfaz.
+
+    Returns:
+        Optional[Dict]: {"batch_config": ..., "historical_config": ...}
+    """
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if "batch_config" in data:
+            return {"batch_config": data["batch_config"], "historical_config": data.get("historical_config") or {}}
+        return {"batch_config": data, "historical_config": {}}
+    return job_queue.last_lote_config()
+
+
+def seleccionar_publicaciones(db: DatabaseManager, args) -> List[Dict]:
+    """Publicaciones a generar; con --resume se añaden las interrumpidas que tienen proyecto en disco."""
+    publicaciones = db.get_publicaciones_por_estado(args.status, canal=args.canal, ids=args.ids, limit=args.limit)
+    if args.resume:
+        vistas = {pub["id"] for pub in publicaciones}
+        for pub in db.get_publicaciones_por_estado(['Generando', 'Error', 'En Batch'], canal=args.canal, ids=args.ids):
+            if pub["id"] not in vistas and project_info_existente(pub):
+                publicaciones.append(pub)
+        if args.limit:
+            publicaciones = publicaciones[:args.limit]
+    return publicaciones
+
+
+def encolar(publicaciones: List[Dict], lote_config: Dict, job_queue: JobQueue, db: DatabaseManager,
+            resume: bool) -> Dict[int, Dict]:
+    """
+    Encola las publicaciones que no tengan ya un trabajo activo.
+
+    Returns:
+        Dict[int, Dict]: {trabajo_id: publicación}
+    """
+    lote_id = "cli_" + datetime.now().strftime("%Y%m%d_%H%M%S")
+    activas = job_queue.active_publicaciones()
+    trabajos = {}
+    for pub in publicaciones:
+        if pub["id"] in activas:
+            emit("skipped", publicacion=pub["id"], titulo=pub["titulo"], job=activas[pub["id"]],
+                 mensaje="Ya tiene un trabajo pendiente o en curso")
+            continue
+        project_info_path = project_info_existente(pub) if resume else None
+        trabajo_id = job_queue.enqueue(
+            pub["titulo"],
+            {"proyecto": proyecto_desde_publicacion(pub), **lote_config},
+            lote_id=lote_id,
+            project_info_path=project_info_path
+        )
+        if trabajo_id is None:
+            emit("error", publicacion=pub["id"], titulo=pub["titulo"], mensaje="No se pudo encolar")
+            continue
+        db.update_publicacion_status(pub["id"], 'En Batch', pub.get("ruta_proyecto"))
+        trabajos[trabajo_id] = pub
+        emit("enqueued", job=trabajo_id, publicacion=pub["id"], titulo=pub["titulo"], lote=lote_id,
+             reanudado=project_info_path is not None)
+    return trabajos
+
+
+def seguir_trabajos(trabajos: Dict[int, Dict], job_queue: JobQueue, processes: List, poll: float) -> Dict[str, int]:
+    """Emite los eventos de los trabajos hasta que terminen todos. Devuelve el recuento por estado final."""
+    last_event = 0
+    pendientes = set(trabajos)
+    finales: Dict[int, str] = {}
+    while pendientes:
+        for evento in job_queue.events_after(list(trabajos), last_event):
+            last_event = evento["id"]
+            emit("progress", job=evento["trabajo_id"], publicacion=trabajos[evento["trabajo_id"]]["id"],
+                 etapa=evento["etapa"], progreso=evento["progreso"], mensaje=evento["mensaje"])
+        for trabajo_id in list(pendientes):
+            job = job_queue.get_job(trabajo_id)
+            if job and job["estado"] in FINISHED:
+                pendientes.discard(trabajo_id)
+                finales[trabajo_id] = job["estado"]
+                emit("finished", job=trabajo_id, publicacion=trabajos[trabajo_id]["id"], titulo=job["titulo"],
+                     estado=job["estado"], error=job.get("error"),
+                     video=(job.get("resultado") or {}).get("video_path"))
+        if pendientes and processes and not any(p.is_alive() for p in processes):
+            # Los workers terminaron sin acabar el lote (interrumpidos); los trabajos siguen en la cola
+            logger.warning(f"Los workers terminaron con {len(pendientes)} trabajos sin finalizar")
+            break
+        if pendientes:
+            time.sleep(poll)
+
+    resumen = {COMPLETADO: 0, ERROR: 0, CANCELADO: 0, "sin_finalizar": len(pendientes)}
+    for estado in finales.values():
+        resumen[estado] += 1
+    return resumen
+
+
+def batch_cli():
+    parser = argparse.ArgumentParser(
+        description="Genera en lote, sin interfaz, las publicaciones del CMS (progreso en JSON por stdout)")
+    parser.add_argument("--status", action="append",
+                        help="Estado de las publicaciones a generar (repetible; por defecto 'Pendiente')")
+    parser.add_argument("--canal", help="Nombre o ID del canal")
+    parser.add_argument("--ids", type=int, nargs="+", help="IDs de publicaciones concretas")
+    parser.add_argument("--limit", type=int, help="Máximo de publicaciones")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reanudar también las publicaciones interrumpidas que tienen proyecto en disco")
+    parser.add_argument("--workers", type=int,
+                        help="Procesos worker (por defecto video_generation.batch_processing.max_parallel_videos; 0 = solo encolar)")
+    parser.add_argument("--batch-config",
+                        help="JSON con la configuración del lote (por defecto la del último lote de la interfaz)")
+    parser.add_argument("--save-batch-config", help="Guardar la configuración usada en este fichero JSON")
+    parser.add_argument("--poll", type=float, default=2.0, help="Segundos entre consultas de progreso")
+    parser.add_argument("--dry-run", action="store_true", help="Listar las publicaciones sin encolarlas")
+    args = parser.parse_args()
+    args.status = args.status or ['Pendiente']
+
+    # Importación diferida: job_worker configura el logging de los procesos worker
+    from job_worker import _run_worker
+
+    app_config = load_config()
+    db = DatabaseManager()
+    job_queue = JobQueue()
+
+    publicaciones = seleccionar_publicaciones(db, args)
+    for pub in publicaciones:
+        emit("selected", publicacion=pub["id"], titulo=pub["titulo"], canal=pub.get("nombre_canal"),
+             status=pub["status"], reanudable=project_info_existente(pub) is not None)
+    if args.dry_run or not publicaciones:
+        emit("summary", seleccionadas=len(publicaciones), encoladas=0)
+        return 0
+
+    lote_config = cargar_config_lote(args.batch_config, job_queue)
+    if not lote_config:
+        logger.error("No hay configuración de lote: indica --batch-config o encola antes un lote desde la interfaz")
+        return 2
+    if args.save_batch_config:
+        with open(args.save_batch_config, "w", encoding="utf-8") as f:
+            json.dump(lote_config, f, ensure_ascii=False, indent=2)
+
+    trabajos = encolar(publicaciones, lote_config, job_queue, db, args.resume)
+    if not trabajos:
+        emit("summary", seleccionadas=len(publicaciones), encoladas=0)
+        return 0
+
+    workers = args.workers
+    if workers is None:
+        workers = app_config.get("video_generation", {}).get("batch_processing", {}).get("max_parallel_videos", 1)
+    workers = min(max(0, int(workers)), len(trabajos))
+    processes = []
+    if workers:
+        logger.info(f"Iniciando {workers} procesos worker para {len(trabajos)} trabajos")
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=_run_worker, args=(True,), name=f"worker-{i + 1}") for i in range(workers)]
+        for process in processes:
+            process.start()
+
+        def forward(signum, _frame):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()  # SIGTERM: cada worker para al terminar su etapa
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, lambda *_: None)  # Ctrl+C ya llega a los hijos del mismo grupo
+    else:
+        # Solo encolar: los trabajos los procesa un job_worker.py ya en marcha
+        logger.info(f"{len(trabajos)} trabajos encolados; se siguen hasta que los procese un worker")
+
+    resumen = seguir_trabajos(trabajos, job_queue, processes, args.poll)
+    for process in processes:
+        process.join()
+    emit("summary", seleccionadas=len(publicaciones), encoladas=len(trabajos), **resumen)
+    return 0 if resumen[COMPLETADO] == len(trabajos) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(batch_cli())
@@ -0,0 +1,289 @@
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Configuración básica de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Etapas de process_single_video, identificadas por el estado que guarda al terminar cada una
+STAGES = {
+    "script_ok": "guion",
+    "audio_ok": "audio",
+    "transcription_ok": "transcripcion",
+    "scenes_ok": "escenas_prompts",
+    "images_ok": "imagenes",
+    "base_video_ok": "video_base",
+    "post_audio_ok": "post_audio",
+    "post_effects_ok": "post_efectos",
+    "post_subtitles_ok": "subtitulos",
+    "completado": "render_final",
+}
+
+# Combinaciones de efectos a medir (nombre -> secuencia de (efecto, parámetros))
+EFFECT_PRESETS = {
+    "sin_efectos": [],
+    "zoom": [("zoom_in", {"duration": 3.0, "zoom_factor": 1.3}), ("zoom_out", {"duration": 3.0, "zoom_factor": 1.3})],
+    "paneos": [("pan_left", {}), ("pan_right", {}), ("pan_up", {}), ("pan_down", {})],
+    "kenburns": [("kenburns", {"zoom_start": 1.0, "zoom_end": 1.2})],
+    "shake": [("shake", {"intensity": 5}), ("shake_zoom_combo", {}), ("shake_kenburns_combo", {})],
+}
+TRANSITIONS = ["none", "dissolve"]
+FPS = 24
+
+DEFAULT_BASELINE = Path("benchmarks") / "pipeline_baseline.json"
+
+
+def _available_overlays():
+    try:
+        from utils.overlays import OverlayManager
+        return OverlayManager().get_available_overlays()
+    except Exception as e:
+        logging.warning(f"No se pudieron listar los overlays: {e}")
+        return []
+
+
+def build_cases(minutes_list, matrix):
+    """
+    Casos a ejecutar: duración del guion x efectos x transición x overlay.
+    'quick' usa una combinación ligera y otra pesada por duración; 'full' el producto completo.
+    """
+    overlays = [None] + _available_overlays()
+    if matrix == "quick":
+        combos = [("sin_efectos", "none", None), ("kenburns", "dissolve", overlays[1] if len(overlays) > 1 else None)]
+    else:
+        combos = list(itertools.product(EFFECT_PRESETS, TRANSITIONS, overlays))
+    cases = []
+    for minutes in minutes_list:
+        for effects, transition, overlay in combos:
+            case_id = f"{minutes:g}min_{effects}_{transition}_{Path(overlay).stem if overlay else 'sin_overlay'}"
+            cases.append({"id": case_id, "minutes": minutes, "effects": effects,
+                          "transition": transition, "overlay": overlay})
+    return cases
+
+
+def _image_prompt_template():
+    prompts_file = Path(__file__).resolve().parent / "prompts" / "imagenes_prompts.json"
+    try:
+        with open(prompts_file, "r", encoding="utf-8") as f:
+            return next((p for p in json.load(f) if p.get("nombre") == "Escenas Fotorrealistas"), None)
+    except Exception:
+        return None
+
+
+def build_full_config(case, scenes, words_per_minute):
+    """Configuración de process_single_video con todos los proveedores simulados."""
+    from utils.fake_providers import synthetic_script
+
+    title = "Benchmark del pipeline"
+    scenes_config = {"segmentation_mode": "Por Párrafos (Híbrido)", "use_auto_duration": True}
+    if scenes:
+        scenes_config["max_scene_duration"] = max(case["minutes"] * 60.0 / scenes, 2.0)
+    return {
+        "titulo": title,
+        "contexto": "Ejecución sintética para medir el rendimiento del pipeline",
+        "script": {"mode": "Proporcionar Manualmente",
+                   "manual_script": synthetic_script(case["minutes"], words_per_minute, title=title)},
+        "audio": {"tts_provider": "fake", "bg_music_selection": ""},
+        "scenes_config": scenes_config,
+        "image": {
+            "img_provider": "fake",
+            "img_model": "fake/procedural",
+            "img_prompt_providers_priority": ["fake"],
+            "prompt_obj": _image_prompt_template(),
+            "aspect_ratio": "16:9",
+            "output_format": "webp",
+            "fresh_images": True,  # Medir la generación, no la reutilización
+        },
+        "video": {
+            "transition_type": case["transition"],
+            "transition_duration": 1.0,
+            "fade_in": 1.0,
+            "fade_out": 1.0,
+            "effects": EFFECT_PRESETS[case["effects"]],
+            "overlays": [(case["overlay"], 0.3, 0, None)] if case["overlay"] else [],
+        },
+        "subtitles": {"enable": True, "max_words": 7},
+        "generate_optimized_content": False,
+    }
+
+
+def run_case(case, options):
+    """
+    Ejecuta un caso en un proceso nuevo (para medir su pico de memoria) y
+    devuelve tiempos por etapa, fps de render, memoria y tamaño de salida.
+    """
+    from utils.config import load_config
+    from utils.fake_providers import reset_fake_providers
+    from utils.pipeline_metrics import process_peak_rss_mb
+    from utils.service_container import ServiceContainer
+    from utils.video_processing import VideoProcessor
+
+    app_config = load_config()
+    fake_config = app_config.get("fake_providers", {}) or {}
+    if options["no_latency"]:
+        fake_config = {**fake_config, **{name: {**(fake_config.get(name) or {}), "latency_seconds": 0.0, "jitter_seconds": 0.0}
+                                         for name in ("llm", "image", "tts", "transcription")}}
+    words_per_minute = (fake_config.get("tts") or {}).get("words_per_minute", 150)
+    providers = reset_fake_providers(fake_config)
+
+    marks = [("inicio", time.perf_counter())]
+
+    class BenchmarkVideoProcessor(VideoProcessor):
+        """VideoProcessor con marcas de tiempo por etapa."""
+
+        def _save_project_info(self, folder, project_info):
+            status = project_info.get("status")
+            if status in STAGES and status != marks[-1][0]:
+                marks.append((status, time.perf_counter()))
+            super()._save_project_info(folder, project_info)
+
+    # Transcripción simulada y sin caché
+    transcription_config = {**(app_config.get("transcription") or {}), "service_type": "fake", "cache": {"enabled": False}}
+    services = ServiceContainer({**app_config, "transcription": transcription_config})
+    processor = BenchmarkVideoProcessor(services=services)
+    processor.projects_path = Path(options["workdir"]) / "projects"
+    processor.projects_path.mkdir(parents=True, exist_ok=True)
+    processor.ai_service.llm_cache = None
+    processor.ai_service.image_store = None
+
+    full_config = build_full_config(case, options["scenes"], words_per_minute)
+    marks[0] = ("inicio", time.perf_counter())  # Sin contar la inicialización de servicios
+    final_path = processor.process_single_video(full_config)
+    total = time.perf_counter() - marks[0][1]
+
+    stages = {}
+    for (_, previous), (status, current) in zip(marks, marks[1:]):
+        stages[STAGES[status]] = round(current - previous, 3)
+
+    result = {
+        "id": case["id"],
+        "case": case,
+        "ok": bool(final_path and Path(final_path).exists()),
+        "total_seconds": round(total, 3),
+        "stages": stages,
+        "peak_rss_mb": process_peak_rss_mb(),
+        "output_mb": round(Path(final_path).stat().st_size / 1e6, 2) if final_path and Path(final_path).exists() else None,
+        "video_seconds": round(case["minutes"] * 60.0, 1),
+        "providers": providers.stats(),
+    }
+    render_seconds = stages.get("render_final")
+    result["render_fps"] = round(result["video_seconds"] * FPS / render_seconds, 1) if render_seconds else None
+    return result
+
+
+# Métricas comparadas con la línea base: (clave, True si más alto es peor)
+COMPARED_METRICS = [("total_seconds", True), ("peak_rss_mb", True), ("output_mb", True), ("render_fps", False)]
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Devuelve las regresiones respecto a la línea base: métricas que empeoran
+    más que la tolerancia relativa (tiempos por etapa incluidos).
+    """
+    baseline_by_id = {r["id"]: r for r in baseline.get("resultados", [])}
+    regressions = []
+    for result in results:
+        base = baseline_by_id.get(result["id"])
+        if not base or not result["ok"]:
+            continue
+        metrics = [(key, higher_is_worse, result.get(key), base.get(key)) for key, higher_is_worse in COMPARED_METRICS]
+        metrics += [(f"etapa:{stage}", True, seconds, base.get("stages", {}).get(stage))
+                    for stage, seconds in result["stages"].items()]
+        for key, higher_is_worse, current, previous in metrics:
+            if current is None or not previous:
+                continue
+            change = (current - previous) / previous
+            if (change if higher_is_worse else -change) > tolerance:
+                regressions.append({"id": result["id"], "metrica": key, "base": previous,
+                                    "actual": current, "cambio": round(change, 3)})
+    return regressions
+
+
+def benchmark_pipeline():
+    """
+    Ejecuta process_single_video de principio a fin con proveedores simulados
+    (utils/fake_providers.py) sobre guiones sintéticos y combinaciones de
+    efectos/transiciones/overlays, y compara el resultado con una línea base.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo del pipeline de video (sin red)")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10, 45], help="Duraciones del guion sintético")
+    parser.add_argument("--scenes", type=int, help="Número aproximado de escenas (por defecto, según max_scene_duration)")
+    parser.add_argument("--matrix", choices=["quick", "full"], default="quick",
+                        help="quick: sin efectos y una combinación pesada; full: todas las combinaciones")
+    parser.add_argument("--no-latency", action="store_true", help="Anular la latencia simulada de los proveedores")
+    parser.add_argument("--workdir", default=None, help="Directorio para los proyectos generados")
+    parser.add_argument("--output", help="Guardar los resultados en un JSON")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="JSON de línea base con el que comparar")
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar estos resultados como nueva línea base")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Empeoramiento relativo tolerado (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    run_name = datetime.now().strftime("%Y%m%d_%H%M%S")
+    options = {
+        "scenes": args.scenes,
+        "no_latency": args.no_latency,
+        "workdir": args.workdir or str(Path("benchmarks") / f"run_{run_name}"),
+    }
+    cases = build_cases(args.minutes, args.matrix)
+    logging.info(f"{len(cases)} casos a ejecutar (matriz '{args.matrix}') en {options['workdir']}")
+
+    resultados = []
+    for n, case in enumerate(cases, start=1):
+        logging.info(f"[{n}/{len(cases)}] {case['id']}...")
+        # Un proceso por caso: el pico de memoria no arrastra el de casos anteriores
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            try:
+                resultados.append(executor.submit(run_case, case, options).result())
+            except Exception as e:
+                logging.error(f"Caso {case['id']} fallido: {e}", exc_info=True)
+                resultados.append({"id": case["id"], "case": case, "ok": False, "error": str(e), "stages": {}})
+
+    print(f"\n{'caso':<48}{'ok':>4}{'total s':>10}{'render fps':>12}{'RSS MB':>9}{'MB':>8}")
+    for r in resultados:
+        print(f"{r['id']:<48}{'sí' if r['ok'] else 'no':>4}{str(r.get('total_seconds')):>10}"
+              f"{str(r.get('render_fps')):>12}{str(r.get('peak_rss_mb')):>9}{str(r.get('output_mb')):>8}")
+
+    report = {
+        "fecha": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "matriz": args.matrix,
+        "resultados": resultados,
+    }
+
+    regressions = []
+    baseline_path = Path(args.baseline)
+    if baseline_path.exists() and not args.save_baseline:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            regressions = compare_with_baseline(resultados, json.load(f), args.tolerance)
+        report["regresiones"] = regressions
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} regresiones respecto a {baseline_path} (tolerancia {args.tolerance:.0%}):")
+            for reg in regressions:
+                print(f"  {reg['id']:<48}{reg['metrica']:<26}{reg['base']:>10} -> {reg['actual']:<10} ({reg['cambio']:+.1%})")
+        else:
+            print(f"\n✅ Sin regresiones respecto a {baseline_path} (tolerancia {args.tolerance:.0%})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        logging.info(f"Resultados guardados en {args.output}")
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        logging.info(f"Línea base guardada en {baseline_path}")
+
+    sys.exit(1 if regressions or not all(r["ok"] for r in resultados) else 0)
+
+
+if __name__ == "__main__":
+    benchmark_pipeline()
@@ -0,0 +1,89 @@
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+from utils.config import load_config
+from utils.transcription_services import TranscriptionService, get_whisper_model_registry
+
+# Configuración básica de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _resumen(nombre, segments, metadata, elapsed):
+    audio_duration = metadata.get("audio_duration") or (segments[-1]["end"] if segments else 0.0)
+    return {
+        "modo": nombre,
+        "segundos": round(elapsed, 2),
+        "x_tiempo_real": round(audio_duration / elapsed, 2) if elapsed > 0 else None,
+        "palabras": sum(len(seg["words"]) for seg in segments),
+        "segmentos": len(segments),
+        "fragmentos": metadata.get("num_chunks", 1),
+        "workers": metadata.get("workers", 1),
+    }
+
+
+def benchmark_transcription():
+    """
+    Compara el rendimiento de la transcripción local en una sola pasada frente a
+    la transcripción por fragmentos en paralelo sobre el mismo audio.
+    El modelo se calienta antes para no medir la carga de los pesos.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark de transcripción: una pasada vs. fragmentos en paralelo")
+    parser.add_argument("audio", help="Ruta al archivo de audio")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4], help="Workers a probar en modo fragmentos")
+    parser.add_argument("--max-chunk-seconds", type=float, default=120.0)
+    parser.add_argument("--skip-single", action="store_true", help="No ejecutar la pasada única (audios muy largos)")
+    parser.add_argument("--output", help="Guardar los resultados en un JSON")
+    args = parser.parse_args()
+
+    audio_path = Path(args.audio)
+    if not audio_path.exists():
+        logging.error(f"No se encontró el archivo de audio: {audio_path}")
+        return
+
+    local_config = load_config().get("transcription", {}).get("local", {})
+    model_size = local_config.get("model_size", "medium")
+    device = local_config.get("device", "cpu")
+    compute_type = local_config.get("compute_type", "int8")
+    language = local_config.get("default_language", "es")
+    max_workers = max(args.workers)
+
+    # num_workers fija cuántas llamadas concurrentes admite el modelo compartido
+    service = TranscriptionService(model_size, device, compute_type,
+                                   cpu_threads=local_config.get("cpu_threads", 0), num_workers=max_workers)
+    get_whisper_model_registry().warmup(model_size, device, compute_type, **service.model_kwargs)
+
+    resultados = []
+    if not args.skip_single:
+        logging.info("Transcripción en una sola pasada...")
+        start = time.time()
+        segments, metadata = service.transcribe_audio(str(audio_path), language=language)
+        resultados.append(_resumen("una_pasada", segments, metadata, time.time() - start))
+
+    for workers in args.workers:
+        logging.info(f"Transcripción por fragmentos con {workers} workers...")
+        start = time.time()
+        segments, metadata = service.transcribe_audio_chunked(
+            str(audio_path), language=language,
+            max_chunk_seconds=args.max_chunk_seconds, max_workers=workers
+        )
+        resultados.append(_resumen(f"fragmentos_{workers}w", segments, metadata, time.time() - start))
+
+    # El speedup se mide contra la pasada única; sin ella (--skip-single) no hay referencia
+    base = next((r["segundos"] for r in resultados if r["modo"] == "una_pasada"), None)
+    print(f"\n{'modo':<16}{'seg':>10}{'x RT':>8}{'speedup':>9}{'palabras':>10}{'frags':>7}")
+    for r in resultados:
+        speedup = round(base / r["segundos"], 2) if base and r["segundos"] else None
+        r["speedup"] = speedup
+        print(f"{r['modo']:<16}{r['segundos']:>10}{str(r['x_tiempo_real']):>8}{str(speedup):>9}{r['palabras']:>10}{r['fragmentos']:>7}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"audio": str(audio_path), "modelo": model_size, "resultados": resultados}, f, indent=2, ensure_ascii=False)
+        logging.info(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    benchmark_transcription()
@@ -0,0 +1,255 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+# Añadir el directorio raíz al sys.path para encontrar utils/
+ROOT_DIR = Path(__file__).resolve().parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from utils.batch_executor import BatchExecutor, preparar_config_proyecto, resultado_proyecto
+from utils.config import load_config
+from utils.job_queue import JobQueue
+from utils.pipeline_scheduler import STAGE_STATUS, STAGES, next_stage_index
+
+# Configuración básica de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(processName)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Segundos mínimos entre eventos de progreso intermedios (los de fin de etapa se registran siempre)
+EVENT_INTERVAL = 2.0
+
+
+class JobWorker:
+    """
+    Ejecuta los trabajos de la cola persistente (utils/job_queue.py) fuera de Streamlit.
+
+    Cada trabajo es una llamada completa a process_single_video; el estado queda en
+    project_info.json, así que al reanudarlo tras un reinicio continúa desde la última
+    etapa terminada. Al pedir la parada se pausa al terminar el guion, el audio o las
+    imágenes.
+    """
+
+    def __init__(self, app_config: Dict, queue: Optional[JobQueue] = None):
+        queue_config = app_config.get("video_generation", {}).get("batch_processing", {}).get("job_queue", {})
+        self.app_config = app_config
+        self.queue = queue or JobQueue()
+        self.worker_id = JobQueue.new_worker_id()
+        self.poll_interval = queue_config.get("poll_interval_seconds", 5)
+        self.heartbeat_seconds = queue_config.get("heartbeat_seconds", 15)
+        self.stale_after = queue_config.get("stale_after_seconds", 120)
+        self.max_attempts = queue_config.get("max_attempts", 3)
+        self.executor = BatchExecutor()
+        self._stop = threading.Event()
+        self._exited = threading.Event()  # El latido sigue mientras se termina la etapa en curso
+        self._current_job: Optional[int] = None
+        # Proyecto del trabajo en curso y su carpeta, para cerrar su publicación si el trabajo falla inesperadamente
+        self._current_proyecto: Optional[Dict] = None
+        self._current_project_dir: Optional[str] = None
+
+    def stop(self, *_):
+        """Pide al worker que pare al terminar la etapa en curso (el trabajo vuelve a la cola)."""
+        if not self._stop.is_set():
+            logger.info(f"[{self.worker_id}] Deteniendo al terminar la etapa en curso...")
+        self._stop.set()
+
+    def run(self, once: bool = False):
+        """
+        Bucle principal: recupera trabajos interrumpidos, toma el siguiente y lo procesa.
+
+        Args:
+            once: Terminar cuando la cola quede vacía
+        """
+        logger.info(f"[{self.worker_id}] Worker iniciado")
+        heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat.start()
+        idle = True
+        try:
+            while not self._stop.is_set():
+                self.queue.requeue_stale(self.stale_after, self.max_attempts)
+                job = self.queue.claim(self.worker_id)
+                if job is None:
+                    if not idle:
+                        self._release_models()
+                        idle = True
+                    if once:
+                        break
+                    self._stop.wait(self.poll_interval)
+                    continue
+                idle = False
+                self._current_job = job["id"]
+                try:
+                    self.process(job)
+                except Exception as e:
+                    logger.error(f"[{self.worker_id}] Error inesperado en el trabajo {job['id']}: {e}", exc_info=True)
+                    resultado = None
+                    if self._current_proyecto:
+                        # Igual que un fallo de etapa: la publicación pasa a 'Error' conservando la carpeta
+                        resultado = self.executor.mark_finished(self._current_proyecto, {
+                            "titulo": self._current_proyecto.get("titulo", job["titulo"]), "estado": "error",
+                            "error": str(e), "proyecto_dir": self._current_project_dir
+                        })
+                    self.queue.fail(job["id"], str(e), resultado)
+                finally:
+                    self._current_job = None
+                    self._current_proyecto = None
+                    self._current_project_dir = None
+        finally:
+            self._stop.set()
+            self._exited.set()
+            self.queue.remove_worker(self.worker_id)
+            logger.info(f"[{self.worker_id}] Worker detenido")
+
+    def process(self, job: Dict):
+        """Procesa un trabajo desde su primera etapa pendiente."""
+        from utils.service_container import get_service_container
+        from utils.video_processing import VideoProcessor
+
+        job_id = job["id"]
+        payload = job["payload"]
+        last_event = [0.0]
+
+        def report(progress: float, message: str, etapa: Optional[str] = None, force: bool = False):
+            now = time.monotonic()
+            if force or now - last_event[0] >= EVENT_INTERVAL:
+                last_event[0] = now
+                self.queue.add_event(job_id, round(progress, 3), message, etapa)
+
+        logger.info(f"[{self.worker_id}] Trabajo {job_id}: '{job['titulo']}' (intento {job['intentos']})")
+        proyecto = payload.get("proyecto")
+        self._current_proyecto = proyecto
+        if job.get("project_info_path"):
+            self._current_project_dir = str(Path(job["project_info_path"]).parent)
+        full_config = payload.get("full_config") or preparar_config_proyecto(
+            proyecto, payload["batch_config"], lambda p, m: report(0.0, m), payload.get("historical_config")
+        )
+        proyecto = proyecto or {"titulo": full_config.get("titulo", job["titulo"]), "contexto": full_config.get("contexto", "")}
+        self._current_proyecto = proyecto
+        processor = VideoProcessor(config=payload.get("batch_config") or self.app_config,
+                                   services=get_service_container(self.app_config))
+
+        project_info = self._load_project_info(job.get("project_info_path"))
+        if project_info is None:
+            project_info = processor._setup_single_project(full_config)
+            self.queue.set_project(job_id, str(Path(project_info["base_path"]) / "project_info.json"))
+        self._current_project_dir = project_info["base_path"]
+        self.executor.mark_started(proyecto, project_info["base_path"])
+        start = next_stage_index(project_info.get("status"))
+        if start:
+            report(start / len(STAGES), f"Reanudando desde '{STAGES[start].name if start < len(STAGES) else 'fin'}'", force=True)
+        if self._stop.is_set():
+            self.queue.release(job_id, "Pausado antes de empezar")
+            return
+        current = [min(start, len(STAGES) - 1)]
+
+        def stage_done(status: str) -> bool:
+            # Fin de una etapa del planificador: se registra y se decide si pausar ahí
+            index = next_stage_index(status)
+            report(index / len(STAGES), f"✅ {STAGES[index - 1].name}", STAGES[index - 1].name, force=True)
+            current[0] = min(index, len(STAGES) - 1)
+            return self._stop.is_set()
+
+        # Una sola llamada por trabajo: la transcripción, los prompts y las imágenes se solapan
+        # dentro de ella; la reanudación la resuelven project_info.json y las huellas de etapa
+        report(current[0] / len(STAGES), f"Etapa '{STAGES[current[0]].name}'...", STAGES[current[0]].name, force=True)
+        video_path = processor.process_single_video(
+            full_config,
+            existing_project_info=project_info,
+            progress_callback=lambda p, m: report(current[0] / len(STAGES), str(m), STAGES[current[0]].name),
+            should_pause=stage_done
+        )
+        status = project_info.get("status")
+        if status != "completado":
+            if self._stop.is_set() and status in STAGE_STATUS.values():
+                self.queue.release(job_id, f"Pausado antes de '{STAGES[next_stage_index(status)].name}'")
+                return
+            stage = STAGES[current[0]]
+            error = project_info.get("error_message") or f"La etapa '{stage.name}' terminó con estado '{status}'"
+            report(current[0] / len(STAGES), f"❌ {stage.name}: {error}", stage.name, force=True)
+            resultado = self.executor.mark_finished(proyecto, {"titulo": proyecto["titulo"], "estado": "error", "error": error,
+                                                               "proyecto_dir": project_info["base_path"]})
+            self.queue.fail(job_id, error, resultado)
+            return
+        report(1.0, f"✅ {STAGES[-1].name}", STAGES[-1].name, force=True)
+
+        video_path = video_path or project_info.get("subtitled_video_path") or project_info.get("final_video_path")
+        resultado = self.executor.mark_finished(proyecto, resultado_proyecto(proyecto, full_config, video_path,
+                                                                            project_info["base_path"]))
+        if resultado["estado"] == "completado":
+            self.queue.complete(job_id, resultado)
+        else:
+            self.queue.fail(job_id, resultado.get("error", "Error desconocido"), resultado)
+
+    @staticmethod
+    def _load_project_info(path: Optional[str]) -> Optional[Dict]:
+        if not path or not Path(path).exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _heartbeat_loop(self):
+        while not self._exited.is_set():
+            self.queue.worker_heartbeat(self.worker_id, self._current_job)
+            if self._current_job:
+                self.queue.heartbeat(self._current_job)
+            self._exited.wait(self.heartbeat_seconds)
+
+    def _release_models(self):
+        """Libera el modelo Whisper al quedar la cola vacía (transcription.local.evict_after_batch)."""
+        if not self.app_config.get("transcription", {}).get("local", {}).get("evict_after_batch", True):
+            return
+        try:
+            from utils.transcription_services import get_whisper_model_registry
+            get_whisper_model_registry().evict_idle()
+        except Exception as e:
+            logger.debug(f"No se pudo liberar el modelo de transcripción: {e}")
+
+
+def _run_worker(once: bool):
+    """Punto de entrada de cada proceso worker."""
+    worker = JobWorker(load_config())
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(once=once)
+
+
+def job_worker():
+    parser = argparse.ArgumentParser(description="Worker de la cola persistente de trabajos de video")
+    parser.add_argument("--workers", type=int,
+                        help="Procesos worker (por defecto video_generation.batch_processing.max_parallel_videos)")
+    parser.add_argument("--once", action="store_true", help="Terminar cuando la cola quede vacía")
+    args = parser.parse_args()
+
+    app_config = load_config()
+    workers = args.workers or app_config.get("video_generation", {}).get("batch_processing", {}).get("max_parallel_videos", 1)
+    workers = max(1, int(workers))
+    if workers == 1:
+        _run_worker(args.once)
+        return
+
+    logger.info(f"Iniciando {workers} procesos worker")
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_run_worker, args=(args.once,), name=f"worker-{i + 1}") for i in range(workers)]
+    for process in processes:
+        process.start()
+
+    def forward(signum, _frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()  # SIGTERM: cada worker para al terminar su etapa
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, lambda *_: None)  # Ctrl+C ya llega a los hijos del mismo grupo
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    job_worker()
@@ -1,5 +1,7 @@
 import streamlit as st
 import os
+import sys
+import time
 import uuid
 from pathlib import Path
 from datetime import datetime
@@ -16,6 +18,7 @@ try:
     from pages.efectos_ui import show_effects_ui
     from pages.overlays_ui import show_overlays_ui
     from utils.subtitle_utils import get_available_fonts
+    from utils.batch_executor import BatchExecutor
     import edge_tts
 except ImportError as e:
     st.error(f"Error importando dependencias: {e}")
@@ -343,7 +346,20 @@ def show_batch_processor():
                     st.error(f"❌ **Error anterior:** {project_info['error']}")
                 
                 # Botón de re-procesamiento
-                if st.button(f"🚀 Reanudar Procesamiento", type="primary", use_container_width=True):
+                queue_enabled = app_config.get("video_generation", {}).get("batch_processing", {}).get("job_queue", {}).get("enabled", True)
+                if queue_enabled and st.button(f"🚀 Reanudar Procesamiento", type="primary", use_container_width=True):
+                    # Se reanuda en el worker de la cola desde la última etapa terminada
+                    from utils.job_queue import JobQueue
+                    trabajo_id = JobQueue().enqueue(
+                        project_info.get("titulo", selected_project_id),
+                        {"full_config": get_full_config_from_ui(app_config)},
+                        project_info_path=str(project_info_path)
+                    )
+                    if trabajo_id:
+                        st.success(f"📥 Reanudación encolada (trabajo #{trabajo_id}). Sigue su progreso en la cola de trabajos.")
+                    else:
+                        st.error("❌ No se pudo encolar la reanudación.")
+                elif not queue_enabled and st.button(f"🚀 Reanudar Procesamiento", type="primary", use_container_width=True):
                     with st.spinner(f"🔄 Reanudando el procesamiento para {selected_project_id}..."):
                         try:
                             # Importar el procesador de video
@@ -1073,7 +1089,6 @@ def show_batch_processor():
         projects_dir.mkdir(exist_ok=True)
         update_progress(0.05, "📁 Preparando estructura de carpetas...")
         
-        resultados = []
         total_projects = len(st.session_state.batch_projects)
         
         # Recopilar configuración completa
@@ -1105,244 +1120,224 @@ def show_batch_processor():
             **optimization_config
         }
         
-        # Procesar cada proyecto
-        for i, proyecto in enumerate(st.session_state.batch_projects):
-            current_progress = (i / total_projects) * 0.9
-            update_progress(current_progress, f"🔄 Procesando {i+1}/{total_projects}: {proyecto['titulo']}")
-            
-            try:
-                resultado = procesar_proyecto_individual(
-                    proyecto=proyecto,
-                    batch_config=batch_config,
-                    progress_callback=lambda prog, msg: update_progress(
-                        current_progress + (prog * 0.9 / total_projects),
-                        f"🔄 {proyecto['titulo']}: {msg}"
-                    )
-                )
-                
-                resultados.append(resultado)
-                
-            except Exception as e:
-                st.error(f"❌ Error procesando '{proyecto['titulo']}': {str(e)}")
-                resultados.append({
-                    "titulo": proyecto["titulo"],
-                    "estado": "error",
-                    "error": str(e)
-                })
+        queue_config = app_config.get("video_generation", {}).get("batch_processing", {}).get("job_queue", {})
+        if queue_config.get("enabled", True):
+            # Encolar en la cola persistente: los ejecuta job_worker.py, fuera de esta sesión de Streamlit
+            encolados = encolar_lote(
+                st.session_state.batch_projects,
+                batch_config,
+                st.session_state.get("batch_historical_config", {})
+            )
+            progress_container.empty()
+            status_container.empty()
+            st.success(f"📥 {encolados} proyecto(s) encolados. Puedes cerrar o refrescar la página: el progreso se muestra en la cola de trabajos.")
+            st.session_state.batch_projects = []
+        else:
+            # Hasta max_parallel_videos proyectos a la vez, cada uno en su propio proceso
+            # (o, en modo 'stages', sus etapas repartidas entre un pool de red y otro de CPU)
+            executor = BatchExecutor.from_config(app_config)
         
-        # Progreso final
-        update_progress(1.0, "🎉 ¡Procesamiento completado!")
+            # Cargar una sola vez el modelo Whisper compartido (solo sirve si los proyectos se procesan en este proceso)
+            transcription_config = {}
+            if executor.in_process or total_projects == 1:
+                transcription_config = preparar_modelo_transcripcion(update_progress)
+            else:
+                update_progress(0.05, f"⚡ Procesando hasta {min(executor.max_workers, total_projects)} proyectos en paralelo...")
+        
+            resultados = executor.run(
+                st.session_state.batch_projects,
+                batch_config,
+                progress_callback=lambda prog, msg: update_progress(0.05 + prog * 0.9, msg),
+                historical_config=st.session_state.get("batch_historical_config", {})
+            )
         
-        # Mostrar resultados
-        mostrar_resultados_batch(resultados)
+            for resultado in resultados:
+                if resultado["estado"] != "completado":
+                    st.error(f"❌ Error procesando '{resultado['titulo']}': {resultado.get('error', 'error desconocido')}")
         
-        # Limpiar automáticamente proyectos completados del CMS de la cola
-        proyectos_completados_cms = [r for r in resultados if r.get("cms_updated", False) and r["estado"] == "completado"]
-        if proyectos_completados_cms:
-            st.session_state.batch_projects = [
-                p for p in st.session_state.batch_projects 
-                if not (p.get("cms_publicacion_id") in [r.get("cms_publicacion_id") for r in proyectos_completados_cms])
-            ]
-            st.info(f"🧹 Limpieza automática: {len(proyectos_completados_cms)} proyecto(s) del CMS eliminados de la cola")
+            # Liberar la RAM del modelo Whisper ahora que no hay lote en curso
+            if transcription_config:
+                liberar_modelo_transcripcion(transcription_config)
         
-        # Limpiar progreso
-        progress_container.empty()
-        status_container.empty()
+            # Progreso final
+            update_progress(1.0, "🎉 ¡Procesamiento completado!")
+        
+            # Mostrar resultados
+            mostrar_resultados_batch(resultados)
+        
+            # Limpiar automáticamente proyectos completados del CMS de la cola
+            proyectos_completados_cms = [r for r in resultados if r.get("cms_updated", False) and r["estado"] == "completado"]
+            if proyectos_completados_cms:
+                st.session_state.batch_projects = [
+                    p for p in st.session_state.batch_projects 
+                    if not (p.get("cms_publicacion_id") in [r.get("cms_publicacion_id") for r in proyectos_completados_cms])
+                ]
+                st.info(f"🧹 Limpieza automática: {len(proyectos_completados_cms)} proyecto(s) del CMS eliminados de la cola")
+        
+            # Limpiar progreso
+            progress_container.empty()
+            status_container.empty()
+    
+    # ===== COLA DE TRABAJOS (persistente, la ejecuta job_worker.py) =====
+    st.markdown("---")
+    mostrar_cola_trabajos(app_config)
 
 
-def procesar_proyecto_individual(proyecto, batch_config, progress_callback):
+def encolar_lote(proyectos, batch_config, historical_config):
     """
-    Procesa un proyecto individual del batch con todas las configuraciones reutilizadas.
+    Encola los proyectos del lote en la cola persistente (utils/job_queue.py).
+    
+    Returns:
+        int: Número de trabajos encolados
     """
+    from utils.job_queue import JobQueue
+    
+    job_queue = JobQueue()
+    lote_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    encolados = 0
+    for proyecto in proyectos:
+        trabajo_id = job_queue.enqueue(
+            proyecto["titulo"],
+            {"proyecto": proyecto, "batch_config": batch_config, "historical_config": historical_config},
+            lote_id=lote_id
+        )
+        if trabajo_id is None:
+            st.error(f"❌ No se pudo encolar '{proyecto['titulo']}'")
+            continue
+        encolados += 1
+        if "cms_publicacion_id" in proyecto:
+            from utils.database_manager import DatabaseManager
+            DatabaseManager().update_publicacion_status(proyecto["cms_publicacion_id"], 'En Batch')
+    return encolados
+
+
+def mostrar_cola_trabajos(app_config):
+    """
+    Muestra la cola persistente de trabajos: estado del worker, progreso y acciones.
+    """
+    import pandas as pd
+    from utils.job_queue import JobQueue, PENDIENTE, EN_CURSO, ERROR, CANCELADO
+    
+    st.header("📥 Cola de Trabajos")
+    queue_config = app_config.get("video_generation", {}).get("batch_processing", {}).get("job_queue", {})
+    job_queue = JobQueue()
+    
+    workers = job_queue.active_workers(queue_config.get("stale_after_seconds", 120))
+    counts = job_queue.counts()
+    
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("⚙️ Workers activos", len(workers))
+    col2.metric("⏳ Pendientes", counts.get(PENDIENTE, 0))
+    col3.metric("🔄 En curso", counts.get(EN_CURSO, 0))
+    col4.metric("✅ Completados", counts.get("completado", 0))
+    col5.metric("❌ Con error", counts.get(ERROR, 0))
+    
+    if not workers:
+        if counts.get(PENDIENTE, 0) or counts.get(EN_CURSO, 0):
+            st.warning("⚠️ No hay ningún worker activo: los trabajos no avanzarán hasta que se inicie uno.")
+        st.code("python job_worker.py", language="bash")
+        if st.button("▶️ Iniciar worker en segundo plano"):
+            import subprocess
+            project_root = Path(__file__).resolve().parent.parent
+            log_path = project_root / "job_worker.log"
+            with open(log_path, "a", encoding="utf-8") as log_file:
+                subprocess.Popen(
+                    [sys.executable, str(project_root / "job_worker.py")],
+                    cwd=str(project_root), stdout=log_file, stderr=subprocess.STDOUT,
+                    start_new_session=True  # Sobrevive a reinicios de Streamlit
+                )
+            st.success(f"✅ Worker iniciado (log en {log_path.name})")
+    
+    trabajos = job_queue.list_jobs(limit=50)
+    if not trabajos:
+        st.info("📭 La cola está vacía.")
+        return
+    
+    estado_icono = {PENDIENTE: "⏳", EN_CURSO: "🔄", "completado": "✅", ERROR: "❌", CANCELADO: "🚫"}
+    st.dataframe(pd.DataFrame([{
+        "ID": t["id"],
+        "Proyecto": t["titulo"],
+        "Estado": f"{estado_icono.get(t['estado'], '')} {t['estado']}",
+        "Etapa": t["etapa"] or "",
+        "Progreso": f"{(t['progreso'] or 0) * 100:.0f}%",
+        "Mensaje": (t["error"] or t["mensaje"] or "")[:120],
+        "Intentos": t["intentos"],
+        "Creado": t["fecha_creacion"]
+    } for t in trabajos]), use_container_width=True, hide_index=True)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        trabajo_id = st.selectbox("Trabajo", [t["id"] for t in trabajos],
+                                  format_func=lambda i: f"#{i} {next(t['titulo'] for t in trabajos if t['id'] == i)}")
+    with col2:
+        if st.button("🔁 Reintentar", help="Reanuda desde la última etapa terminada"):
+            if job_queue.retry(trabajo_id):
+                st.rerun()
+            st.warning("Solo se pueden reintentar trabajos con error o cancelados.")
+        if st.button("🚫 Cancelar", help="Solo trabajos pendientes"):
+            if job_queue.cancel(trabajo_id):
+                st.rerun()
+            st.warning("Solo se pueden cancelar trabajos pendientes.")
+    with col3:
+        if st.button("🧹 Limpiar terminados"):
+            job_queue.delete_finished()
+            st.rerun()
+    with col4:
+        auto_refresh = st.checkbox("🔄 Actualizar cada 10 s", key="job_queue_auto_refresh")
+        st.button("🔄 Actualizar ahora")
+    
+    with st.expander(f"📜 Eventos del trabajo #{trabajo_id}"):
+        for evento in job_queue.get_events(trabajo_id, limit=30):
+            st.text(f"{evento['fecha']}  [{evento['etapa'] or '-'}] {(evento['progreso'] or 0) * 100:5.1f}%  {evento['mensaje']}")
+    
+    if auto_refresh and counts.get(EN_CURSO, 0) + counts.get(PENDIENTE, 0) > 0:
+        time.sleep(10)
+        st.rerun()
+
+
+def preparar_modelo_transcripcion(progress_callback):
+    """
+    Calienta el modelo Whisper del registro compartido antes del lote para que
+    ningún proyecto pague la carga de los pesos. Solo aplica a transcripción local.
+    """
+    transcription_config = load_config().get("transcription", {})
+    local_config = transcription_config.get("local", {})
+    if transcription_config.get("service_type", "local") != "local" or not local_config.get("warmup_on_batch", True):
+        return transcription_config
+    
     try:
-        from utils.video_processing import VideoProcessor
-        
-        progress_callback(0.05, "Preparando procesador de video")
-        
-        # 🏛️ PROCESAMIENTO ESPECIAL PARA PROMPT HISTÓRICO
-        image_config = batch_config["image"].copy()
-        
-        # Verificar si se está usando el prompt histórico
-        prompt_obj = batch_config["image"].get("prompt_obj", {})
-        if prompt_obj and prompt_obj.get("nombre") == "Escenas Fotorrealistas Históricamente Precisas":
-            progress_callback(0.07, "🏛️ Analizando contexto histórico...")
-            
-            # Obtener configuración histórica del session_state
-            historical_config = st.session_state.get("batch_historical_config", {})
-            
-            if historical_config.get("mode") == "manual":
-                # Usar configuración manual
-                periodo_historico = historical_config.get("periodo_historico", "")
-                ubicacion = historical_config.get("ubicacion", "")
-                contexto_cultural = historical_config.get("contexto_cultural", "")
-                
-                progress_callback(0.08, "✍️ Usando configuración histórica manual")
-                
-            elif historical_config.get("mode") == "auto":
-                # Extraer automáticamente con IA
-                try:
-                    from utils.ai_services import extract_historical_context
-                    
-                    ai_provider = historical_config.get("ai_provider", "gemini")
-                    default_gemini_model = app_config.get('ai', {}).get('default_models', {}).get('gemini', 'models/gemini-1.5-flash-latest')
-                    ai_model = historical_config.get("ai_model", default_gemini_model)
-                    
-                    progress_callback(0.08, f"🤖 Extrayendo contexto histórico con {ai_provider}...")
-                    
-                    historical_data = extract_historical_context(
-                        titulo=proyecto["titulo"],
-                        contexto=proyecto["contexto"],
-                        provider=ai_provider,
-                        model=ai_model
-                    )
-                    
-                    periodo_historico = historical_data.get("periodo_historico", "")
-                    ubicacion = historical_data.get("ubicacion", "")
-                    contexto_cultural = historical_data.get("contexto_cultural", "")
-                    
-                    progress_callback(0.09, "✅ Contexto histórico extraído exitosamente")
-                    
-                except Exception as e:
-                    progress_callback(0.09, f"⚠️ Error extrayendo contexto histórico: {str(e)}")
-                    # Usar valores por defecto si falla
-                    periodo_historico = "Información no especificada"
-                    ubicacion = "Información no especificada"
-                    contexto_cultural = "Información no especificada"
-            else:
-                # Fallback si no hay configuración
-                periodo_historico = "Información no especificada"
-                ubicacion = "Información no especificada"
-                contexto_cultural = "Información no especificada"
-            
-            # Actualizar la configuración de imagen con las variables históricas
-            image_config["prompt_obj"] = prompt_obj  # Mantener el prompt original
-            image_config["historical_context"] = {
-                "periodo_historico": periodo_historico,
-                "ubicacion": ubicacion,
-                "contexto_cultural": contexto_cultural,
-                "extraction_mode": historical_config.get("mode", "fallback")
-            }
-            
-            # Añadir las variables históricas a las variables disponibles para el prompt
-            image_config["historical_variables"] = {
-                "periodo_historico": periodo_historico,
-                "ubicacion": ubicacion,
-                "contexto_cultural": contexto_cultural
-            }
+        from utils.transcription_services import get_whisper_model_registry, local_model_options
+        progress_callback(0.05, "🧠 Cargando modelo de transcripción compartido...")
+        # Los mismos argumentos que usará el servicio de los proyectos (misma clave en el registro)
+        get_whisper_model_registry().warmup(**local_model_options(local_config))
+    except Exception as e:
+        st.warning(f"⚠️ No se pudo precargar el modelo de transcripción: {e}")
+    return transcription_config
 
-        # Preparar configuración completa para el procesador
-        full_config = {
-            "titulo": proyecto["titulo"],
-            "contexto": proyecto["contexto"],
-            "script": {
-                "mode": "Proporcionar Manualmente" if proyecto.get("script_type") == "✍️ Usar guión manual" else "Generar con IA",
-                "manual_script": proyecto.get("guion_manual"),
-                **batch_config["script"]
-            },
-            "image": image_config,  # Usar la configuración de imagen actualizada
-            "scenes_config": batch_config["scenes_config"],
-            "video": batch_config["video"],
-            "audio": batch_config["audio"],
-            "subtitles": batch_config["subtitles"],
-            # Añadir configuración de optimización
-            "generate_optimized_content": batch_config.get("generate_optimized_content", False),
-            "use_same_style": batch_config.get("use_same_style", False),
-            "generate_series_tags": batch_config.get("generate_series_tags", False)
-        }
-        
-        progress_callback(0.1, "Iniciando procesamiento con VideoProcessor...")
-        
-        # Usar el VideoProcessor del generador individual
-        processor = VideoProcessor(config=batch_config)
-        result_path = processor.process_single_video(full_config)
-        
-        progress_callback(1.0, "¡Completado!")
-        
-        # Obtener directorio del proyecto desde el result_path
-        if result_path:
-            proyecto_dir = Path(result_path).parent.parent  # video/file.mp4 -> project_dir
-            
-            # Guardar metadata del proyecto
-            metadata = {
-                "titulo": proyecto["titulo"],
-                "contexto": proyecto["contexto"],
-                "script_type": proyecto.get("script_type"),
-                "fecha_procesado": datetime.now().isoformat(),
-                "config_used": full_config,
-                "cms_info": {
-                    "publicacion_id": proyecto.get("cms_publicacion_id"),
-                    "canal": proyecto.get("cms_canal")
-                } if "cms_publicacion_id" in proyecto else None
-            }
-            
-            metadata_path = proyecto_dir / "batch_metadata.json"
-            with open(metadata_path, "w", encoding="utf-8") as f:
-                json.dump(metadata, f, indent=2, ensure_ascii=False)
-            
-            # Actualizar estado en CMS si el proyecto viene del CMS
-            cms_updated = False
-            if "cms_publicacion_id" in proyecto:
-                try:
-                    # Importar y usar DatabaseManager para actualizar estado
-                    import sys
-                    project_root = Path(__file__).resolve().parent.parent
-                    if str(project_root) not in sys.path:
-                        sys.path.append(str(project_root))
-                    
-                    from utils.database_manager import DatabaseManager
-                    db_manager = DatabaseManager()
-                    db_manager.update_publicacion_status(
-                        proyecto["cms_publicacion_id"], 
-                        'Generado', 
-                        str(proyecto_dir)
-                    )
-                    cms_updated = True
-                    print(f"✅ CMS actualizado: Publicación {proyecto['cms_publicacion_id']} → 'Generado'")
-                    
-                    # También actualizar el metadata con el resultado
-                    metadata["cms_update_result"] = "success"
-                    metadata["cms_update_timestamp"] = datetime.now().isoformat()
-                    
-                except Exception as e:
-                    # Si falla la actualización del CMS, continuar pero registrar el error
-                    print(f"❌ Error actualizando CMS: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    
-                    # Guardar error en metadata
-                    metadata["cms_update_result"] = "error"
-                    metadata["cms_update_error"] = str(e)
-                    metadata["cms_update_timestamp"] = datetime.now().isoformat()
-                    
-                # Re-escribir metadata con información de CMS
-                try:
-                    with open(metadata_path, "w", encoding="utf-8") as f:
-                        json.dump(metadata, f, indent=2, ensure_ascii=False)
-                except Exception as e:
-                    print(f"Warning: No se pudo actualizar metadata: {e}")
-            
-            return {
-                "titulo": proyecto["titulo"],
-                "estado": "completado",
-                "video_path": str(result_path) if result_path else None,
-                "proyecto_dir": str(proyecto_dir),
-                "metadata": metadata,
-                "cms_updated": cms_updated,
-                "cms_publicacion_id": proyecto.get("cms_publicacion_id")
-            }
-        else:
-            return {
-                "titulo": proyecto["titulo"],
-                "estado": "error",
-                "error": "No se generó video final"
-            }
-        
+
+def liberar_modelo_transcripcion(transcription_config):
+    """Libera los modelos Whisper inactivos al terminar el lote si así está configurado."""
+    if not transcription_config.get("local", {}).get("evict_after_batch", True):
+        return
+    try:
+        from utils.transcription_services import get_whisper_model_registry
+        get_whisper_model_registry().evict_idle()
     except Exception as e:
-        return {
-            "titulo": proyecto["titulo"],
-            "estado": "error",
-            "error": str(e)
-        }
+        st.warning(f"⚠️ No se pudo liberar el modelo de transcripción: {e}")
+
+
+def procesar_proyecto_individual(proyecto, batch_config, progress_callback):
+    """
+    Procesa un proyecto individual del batch con todas las configuraciones reutilizadas
+    (en este proceso, actualizando el CMS al terminar).
+    """
+    executor = BatchExecutor(max_workers=1)
+    return executor.run(
+        [proyecto],
+        batch_config,
+        progress_callback=progress_callback,
+        historical_config=st.session_state.get("batch_historical_config", {})
+    )[0]
 
 
 def mostrar_resultados_batch(resultados):
@@ -504,31 +504,68 @@ def render_metrics_dashboard():
     
     st.subheader("📊 Dashboard de Métricas V2")
     
-    if 'v2_generated_videos' not in st.session_state or not st.session_state.v2_generated_videos:
-        st.info("📈 Genera algunos videos con V2 para ver métricas detalladas")
-        return
-    
-    videos = st.session_state.v2_generated_videos
-    
-    # Métricas generales
+    # Métricas generales (tabla MetricasEtapas, registrada por process_single_video)
     st.subheader("📈 Métricas Generales")
     
-    col1, col2, col3, col4 = st.columns(4)
+    from utils.database_manager import DatabaseManager
+    resumen = DatabaseManager().get_resumen_metricas()
+    proyectos = resumen["proyectos"]
     
-    with col1:
-        st.metric("🎬 Videos Generados", len(videos))
-    
-    with col2:
-        avg_duration = sum(v['results']['audio']['duration'] for v in videos) / len(videos)
-        st.metric("⏱️ Duración Promedio", f"{avg_duration:.1f}s")
+    if not proyectos:
+        st.info("📈 Aún no hay proyectos medidos. Las métricas se registran al generar cada video.")
+    else:
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("🎬 Proyectos Medidos", len(proyectos))
+        
+        with col2:
+            avg_wall = sum(p['wall_total'] or 0 for p in proyectos) / len(proyectos)
+            st.metric("⏱️ Tiempo Medio por Video", f"{avg_wall / 60:.1f} min")
+        
+        with col3:
+            fps_values = [p['render_fps'] for p in proyectos if p['render_fps']]
+            avg_fps = sum(fps_values) / len(fps_values) if fps_values else 0
+            st.metric("🎞️ FPS Medio de Render", f"{avg_fps:.1f}")
+        
+        with col4:
+            avg_calls = sum(p['llamadas_api'] or 0 for p in proyectos) / len(proyectos)
+            st.metric("🌐 Llamadas API por Video", f"{avg_calls:.1f}")
+        
+        import pandas as pd
+        
+        st.write("**⏱️ Por etapa:**")
+        etapas_df = pd.DataFrame([{
+            "Etapa": e['etapa'],
+            "Proyectos": e['proyectos'],
+            "Reloj medio (s)": round(e['wall_medio'] or 0, 1),
+            "Reloj máx. (s)": round(e['wall_max'] or 0, 1),
+            "CPU media (s)": round(e['cpu_medio'] or 0, 1),
+            "RSS máx. (MB)": e['rss_max_mb'],
+            "Escritura media (MB)": round((e['bytes_escritos_medio'] or 0) / (1024 * 1024), 1),
+            "Llamadas API": e['llamadas_api'] or 0,
+            "FPS render": round(e['render_fps_medio'], 1) if e['render_fps_medio'] else None
+        } for e in resumen["etapas"]])
+        st.dataframe(etapas_df, use_container_width=True, hide_index=True)
+        
+        st.write("**🎬 Últimos proyectos:**")
+        proyectos_df = pd.DataFrame([{
+            "Proyecto": p['titulo'] or p['proyecto_id'],
+            "Estado": p['estado_final'],
+            "Fecha": p['fecha'],
+            "Total (min)": round((p['wall_total'] or 0) / 60, 1),
+            "CPU (min)": round((p['cpu_total'] or 0) / 60, 1),
+            "RSS máx. (MB)": p['rss_max_mb'],
+            "Llamadas API": p['llamadas_api'] or 0,
+            "FPS render": p['render_fps']
+        } for p in proyectos[:20]])
+        st.dataframe(proyectos_df, use_container_width=True, hide_index=True)
     
-    with col3:
-        avg_scenes = sum(v['results']['scenes']['total_scenes'] for v in videos) / len(videos)
-        st.metric("🎬 Escenas Promedio", f"{avg_scenes:.1f}")
+    if 'v2_generated_videos' not in st.session_state or not st.session_state.v2_generated_videos:
+        st.info("📈 Genera algunos videos con V2 para ver métricas detalladas")
+        return
     
-    with col4:
-        avg_sync = sum(v['results']['final']['sync_score'] for v in videos) / len(videos)
-        st.metric("🎯 Sync Promedio", f"{avg_sync*100:.1f}%")
+    videos = st.session_state.v2_generated_videos
     
     # Lista de videos generados
     st.subheader("📋 Videos Generados")
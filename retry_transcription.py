@@ -3,6 +3,7 @@ import os
 import logging
 from pathlib import Path
 from utils.transcription_services import get_transcription_service
+from utils.transcription_cache import get_transcription_cache
 from utils.ai_services import AIServices
 
 # Configuración básica de logging
@@ -46,13 +47,23 @@ def retry_transcription_for_project():
         logging.info("Servicio de transcripción de Replicate inicializado.")
 
         # --- Ejecutar transcripción ---
-        logging.info("Iniciando la llamada a la API de Replicate. Esto puede tardar varios minutos para un audio de 47 minutos...")
+        logging.info("Iniciando la transcripción por fragmentos en Replicate. Esto puede tardar varios minutos para un audio de 47 minutos...")
         
-        segments, metadata = transcription_service.transcribe_audio(
-            audio_path=str(audio_path),
-            language="es",
-            timestamp="chunk" # 'chunk' es más robusto para archivos largos
-        )
+        # Si este audio ya se transcribió (en este u otro proyecto), reutilizar el resultado
+        cache = get_transcription_cache()
+        engine, model_name = transcription_service.cache_descriptor()
+        cached = cache.get(str(audio_path), engine, model_name, "es", word_timestamps=False)
+        if cached:
+            logging.info("Transcripción encontrada en la caché; no se llama a Replicate.")
+            segments, metadata = cached
+        else:
+            # Fragmentos en silencios enviados en paralelo: si uno falla solo se reintenta ese
+            segments, metadata = transcription_service.transcribe_audio_chunked(
+                audio_path=str(audio_path),
+                language="es",
+                timestamp="chunk" # 'chunk' es más robusto para archivos largos
+            )
+            cache.put(str(audio_path), engine, model_name, "es", segments, metadata, word_timestamps=False)
 
         if not segments:
             logging.error("La transcripción no devolvió segmentos. La API pudo haber fallado o el audio está en silencio.")
@@ -0,0 +1,176 @@
+# tests/test_replicate_transcription.py
+"""
+Transcripción por fragmentos de ReplicateTranscriptionService contra un
+servidor HTTP local que imita la API de predicciones de Replicate (base_url).
+
+El corte del audio con FFmpeg se sustituye por fragmentos escritos a mano: lo
+que se prueba es el cliente (subidas en paralelo, sondeo, reintento de un
+fragmento fallido y fusión de tiempos).
+
+Ejecutar desde la raíz del repositorio: python -m pytest tests
+"""
+
+import base64
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import utils.audio_chunking as audio_chunking
+from utils.transcription_services import ReplicateTranscriptionService
+
+# 25 s de audio con silencios en 9-11 s y 19-21 s: con fragmentos de 10 s se corta en 10 y 20
+AUDIO_DURATION = 25.0
+SILENCES = [(9.0, 11.0), (19.0, 21.0)]
+CHUNK_OFFSETS = [0.0, 10.0, 20.0]
+
+
+class ReplicateStandIn:
+    """Estado del servidor: predicciones creadas y fragmentos que fallan la primera vez."""
+
+    def __init__(self, fail_once=(), upload_delay=0.2):
+        self.fail_once = set(fail_once)
+        self.upload_delay = upload_delay
+        self.predictions = {}
+        self.creates = []
+        self.active_uploads = 0
+        self.max_active_uploads = 0
+        self.lock = threading.Lock()
+
+    def create(self, body):
+        audio = body["input"]["audio"]
+        chunk = base64.b64decode(audio.split(",", 1)[1]).decode("utf-8")
+        with self.lock:
+            self.active_uploads += 1
+            self.max_active_uploads = max(self.max_active_uploads, self.active_uploads)
+        time.sleep(self.upload_delay)  # La subida del fragmento
+        with self.lock:
+            self.active_uploads -= 1
+            failed = chunk in self.fail_once
+            self.fail_once.discard(chunk)
+            self.creates.append(chunk)
+            prediction_id = uuid.uuid4().hex
+            self.predictions[prediction_id] = {"chunk": chunk, "failed": failed, "polls": 0}
+        return self.prediction_json(prediction_id, "starting")
+
+    def get(self, prediction_id):
+        with self.lock:
+            state = self.predictions[prediction_id]
+            state["polls"] += 1
+            if state["polls"] < 2:
+                return self.prediction_json(prediction_id, "processing")
+        if state["failed"]:
+            return self.prediction_json(prediction_id, "failed", error="CUDA out of memory")
+        index = int(state["chunk"].split("-")[1])
+        output = {
+            "text": f"fragmento {index}",
+            "chunks": [
+                {"timestamp": [0.5, 2.0], "text": f"inicio {index}"},
+                {"timestamp": [3.0, 8.25], "text": f"final {index}"},
+            ],
+        }
+        return self.prediction_json(prediction_id, "succeeded", output=output)
+
+    @staticmethod
+    def prediction_json(prediction_id, status, output=None, error=None):
+        return {
+            "id": prediction_id, "model": "vaibhavs10/incredibly-fast-whisper", "version": "test",
+            "status": status, "input": {}, "output": output, "logs": "", "error": error, "metrics": {},
+            "created_at": "2024-01-01T00:00:00Z", "started_at": None, "completed_at": None,
+            "urls": {"get": f"/v1/predictions/{prediction_id}", "cancel": f"/v1/predictions/{prediction_id}/cancel"},
+        }
+
+
+@pytest.fixture
+def stand_in():
+    state = ReplicateStandIn(fail_once={"chunk-1"})
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, payload, code=200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/v1/predictions":
+                self._send(state.create(body), 201)
+            elif self.path.endswith("/cancel"):
+                self._send(state.prediction_json(self.path.split("/")[3], "canceled"))
+            else:
+                self._send({"detail": "Not found"}, 404)
+
+        def do_GET(self):
+            prediction_id = self.path.rstrip("/").split("/")[-1]
+            if prediction_id in state.predictions:
+                self._send(state.get(prediction_id))
+            else:
+                self._send({"detail": "Not found"}, 404)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def audio_file(tmp_path, monkeypatch):
+    audio_path = tmp_path / "narracion.mp3"
+    audio_path.write_bytes(b"audio")
+
+    def fake_cut(path, chunks, output_dir, **kwargs):
+        paths = []
+        for index, _ in enumerate(chunks):
+            chunk_path = tmp_path / f"chunk_{index:03d}.mp3"
+            chunk_path.write_text(f"chunk-{index}", encoding="utf-8")
+            paths.append(str(chunk_path))
+        return paths
+
+    # El servicio exporta el token al entorno: monkeypatch lo restaura al terminar
+    monkeypatch.setenv("REPLICATE_API_TOKEN", "test-token")
+    monkeypatch.setattr(audio_chunking, "detect_silences_ffmpeg", lambda path: (SILENCES, AUDIO_DURATION))
+    monkeypatch.setattr(audio_chunking, "cut_audio_chunks", fake_cut)
+    return str(audio_path)
+
+
+def test_chunked_retries_failed_chunk_and_merges_offsets(stand_in, audio_file):
+    service = ReplicateTranscriptionService(api_token="test-token", base_url=stand_in.base_url)
+
+    segments, metadata = service.transcribe_audio_chunked(
+        audio_file, max_chunk_seconds=10, max_concurrency=3, max_retries=2,
+        poll_interval=0.05, retry_backoff_seconds=0.1, timeout_seconds=30
+    )
+
+    assert metadata["num_chunks"] == 3
+    assert metadata["retries"] == 1
+    assert sorted(stand_in.creates) == ["chunk-0", "chunk-1", "chunk-1", "chunk-2"]
+    # Las subidas de los tres fragmentos se solapan en lugar de ir una tras otra
+    assert stand_in.max_active_uploads > 1
+
+    assert [seg["text"] for seg in segments] == [f"{kind} {i}" for i in range(3) for kind in ("inicio", "final")]
+    expected = [(offset + start, offset + end) for offset in CHUNK_OFFSETS for start, end in ((0.5, 2.0), (3.0, 8.25))]
+    assert [(seg["start"], seg["end"]) for seg in segments] == pytest.approx(expected)
+
+
+def test_chunked_gives_up_after_max_retries(stand_in, audio_file):
+    stand_in.fail_once = {"chunk-2"}
+    service = ReplicateTranscriptionService(api_token="test-token", base_url=stand_in.base_url)
+
+    with pytest.raises(RuntimeError, match="Fallaron 1 fragmentos"):
+        service.transcribe_audio_chunked(
+            audio_file, max_chunk_seconds=10, max_concurrency=2, max_retries=0,
+            poll_interval=0.05, retry_backoff_seconds=0.1, timeout_seconds=30
+        )
@@ -1,6 +1,8 @@
 # utils/ai_services.py
 import os
+import asyncio
 import requests
+import httpx
 import google.generativeai as genai
 import openai
 import ollama
@@ -10,8 +12,17 @@ import replicate
 import time
 import logging
 import json
+import threading
+import weakref
 from typing import Union, Optional, Dict, List # Mover imports de typing al principio
 
+from utils.llm_cache import get_llm_cache
+from utils.http_downloads import get_http_downloader
+from utils.image_store import ImageStore, get_image_store
+from utils.fake_providers import FAKE_PROVIDER, get_fake_providers
+from utils.pipeline_metrics import record_api_call
+from utils.rate_limiter import get_rate_limiter
+
 # Cargar variables de entorno desde .env
 try:
     from dotenv import load_dotenv
@@ -134,6 +145,19 @@ class AIServices:
         self.openai_client = None
         self.ollama_client = None
         self.replicate_client = None
+        # Caché de respuestas de texto compartida por todas las instancias (ai.llm_cache)
+        self.llm_cache = get_llm_cache(ai_config.get("llm_cache"))
+        # Sesión HTTP compartida (keep-alive) para descargar las imágenes generadas
+        self.http_downloader = get_http_downloader(ai_config.get("http"))
+        # Almacén de imágenes por prompt/parámetros compartido entre proyectos (ai.image_store)
+        self.image_store = get_image_store(ai_config.get("image_store"))
+        # API asíncrona: clientes por bucle de eventos y timeout por petición
+        async_config = ai_config.get("async", {}) or {}
+        self.request_timeout = async_config.get("request_timeout", 180)
+        self.max_http_connections = async_config.get("max_http_connections", 100)
+        # Clientes por bucle: la instancia se comparte entre hilos (utils/service_container.py)
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._async_lock = threading.Lock()
         
         if self.gemini_key:
             try:
@@ -175,152 +199,222 @@ class AIServices:
              logger.warning("REPLICATE_API_KEY no encontrada.")
 
     # --- Método Principal para Generar Contenido (Texto) ---
-    def generate_content(self, provider: str, model: str, system_prompt: str, user_prompt: str, **kwargs) -> str:
-        """Genera contenido de texto usando el proveedor y modelo especificados."""
+    def generate_content(self, provider: str, model: str, system_prompt: str, user_prompt: str, use_cache: bool = True, **kwargs) -> str:
+        """
+        Genera contenido de texto usando el proveedor y modelo especificados.
+        
+        Las respuestas se consultan y guardan en la caché de LLM (ai.llm_cache);
+        use_cache=False fuerza una llamada nueva (p.ej. para regenerar un guion).
+        """
         provider = provider.lower()
+        cache = self.llm_cache if use_cache else None
+        if cache:
+            cached = cache.get(provider, model, system_prompt, user_prompt, kwargs)
+            if cached is not None:
+                return cached
+        
         logger.info(f"Generando contenido con {provider} (Modelo: {model})...")
+        record_api_call("llm", provider)
+        # Solo las llamadas reales esperan turno en el limitador (no los aciertos de caché)
+        get_rate_limiter().acquire(provider, model)
         
         if provider == "gemini":
-            return self._generate_gemini_script(system_prompt, user_prompt, model)
+            result = self._generate_gemini_script(system_prompt, user_prompt, model)
         elif provider == "openai":
-            return self._generate_openai_script(system_prompt, user_prompt, model)
+            result = self._generate_openai_script(system_prompt, user_prompt, model)
         elif provider == "ollama":
-            return self._generate_ollama_script(system_prompt, user_prompt, model)
+            result = self._generate_ollama_script(system_prompt, user_prompt, model)
+        elif provider == FAKE_PROVIDER:
+            result = get_fake_providers().llm.generate(system_prompt, user_prompt, model)
         else:
             error_msg = f"[ERROR] Proveedor de contenido '{provider}' no soportado."
             logger.error(error_msg)
             return error_msg
+        
+        if cache:
+            cache.put(provider, model, system_prompt, user_prompt, result, kwargs)
+        return result
 
     # --- Método Principal para Generar Imágenes ---
-    def generate_image(self, prompt: str, model: str, provider: str = "replicate", **kwargs) -> Union[str, bytes]:
+    def generate_image(self, prompt: str, model: str, provider: str = "replicate", use_image_store: bool = True, **kwargs) -> Union[str, bytes]:
         """
         Genera una imagen usando el proveedor y modelo especificados.
         Actualmente enfocado en Replicate.
+        
+        Si ya se generó una imagen con el mismo modelo, prompt y parámetros se
+        sirve desde el almacén de imágenes (ai.image_store); use_image_store=False
+        fuerza una variación nueva.
         """
         provider = provider.lower()
+        store = self.image_store if use_image_store else None
+        if store:
+            reused = self._image_from_store(store, prompt, model, kwargs)
+            if reused is not None:
+                return reused
+        
         logger.info(f"Generando imagen con {provider} (Modelo: {model})...")
+        record_api_call("image", provider)
+        # Solo las llamadas reales esperan turno en el limitador (no las imágenes del almacén)
+        get_rate_limiter().acquire(provider, model)
         
         if provider == "replicate":
-            return self._generate_image_with_replicate(prompt=prompt, model_id=model, **kwargs)
+            result = self._generate_image_with_replicate(prompt=prompt, model_id=model, **kwargs)
+        elif provider == FAKE_PROVIDER:
+            result = get_fake_providers().images.generate(prompt, **kwargs)
         else:
             error_msg = f"[ERROR] Proveedor de imágenes '{provider}' no soportado."
             logger.error(error_msg)
             raise ValueError(error_msg)
+        
+        if store and kwargs.get("output_path"):
+            store.put(self._image_store_key(prompt, model, kwargs), kwargs["output_path"], kwargs.get("output_format", "webp"))
+        return result
+
+    @staticmethod
+    def _image_store_key(prompt: str, model: str, kwargs: Dict) -> str:
+        """Clave del almacén con los mismos valores por defecto que _replicate_image_input."""
+        return ImageStore.make_key(
+            model, prompt,
+            aspect_ratio=kwargs.get("aspect_ratio", "16:9"),
+            megapixels=kwargs.get("megapixels", "1"),
+            output_format=kwargs.get("output_format", "webp"),
+            output_quality=kwargs.get("output_quality", 85),
+            seed=kwargs.get("seed")
+        )
+
+    def _image_from_store(self, store, prompt: str, model: str, kwargs: Dict) -> Optional[Union[str, bytes]]:
+        """Imagen almacenada para la petición: enlazada en output_path, o sus bytes si no hay ruta."""
+        key = self._image_store_key(prompt, model, kwargs)
+        output_format = kwargs.get("output_format", "webp")
+        output_path = kwargs.get("output_path")
+        if output_path:
+            return output_path if store.link_into(key, output_path, output_format) else None
+        stored_path = store.lookup(key, output_format)
+        return Path(stored_path).read_bytes() if stored_path else None
 
     # --- Métodos Privados de Generación (por proveedor) ---
+    # Construcción de la petición, lectura de la respuesta, reintentos y mensajes de
+    # error son comunes a la API síncrona y a la asíncrona; solo cambia la llamada.
+
+    GEMINI_MAX_RETRIES = 3
+    GEMINI_BASE_DELAY = 1.0  # segundos
+
+    @staticmethod
+    def _chat_messages(system_prompt: str, user_prompt: str) -> List[Dict]:
+        messages = []
+        if system_prompt: messages.append({"role": "system", "content": system_prompt})
+        if user_prompt: messages.append({"role": "user", "content": user_prompt})
+        return messages
+
+    @staticmethod
+    def _gemini_prompt(system_prompt: str, user_prompt: str) -> str:
+        return f"{system_prompt}\n\n---\n\n{user_prompt}" if system_prompt else user_prompt
+
+    @staticmethod
+    def _gemini_text(response) -> str:
+        if not response.parts:
+            feedback = getattr(response, 'prompt_feedback', None)
+            block_reason = getattr(feedback, 'block_reason', 'Desconocido') if feedback else 'Desconocido'
+            return f"[ERROR] Respuesta Gemini vacía o bloqueada. Razón: {block_reason}."
+        return response.text
+
+    @staticmethod
+    def _is_rate_limit(error: Exception) -> bool:
+        error_msg = str(error).lower()
+        return "rate limit" in error_msg or "quota" in error_msg or "429" in error_msg
+
+    def _gemini_retry_delay(self, attempt: int, error: Exception, model: str) -> Optional[float]:
+        """Segundos de espera antes del siguiente intento con Gemini, o None si no quedan intentos."""
+        if self._is_rate_limit(error):
+            if attempt < self.GEMINI_MAX_RETRIES - 1:
+                delay = self.GEMINI_BASE_DELAY * (2 ** attempt) + 2  # Delay extra para rate limits
+                logger.warning(f"Rate limit detectado en Gemini, reintentando en {delay}s... (intento {attempt + 1}/{self.GEMINI_MAX_RETRIES})")
+                return delay
+            logger.error(f"Rate limit persistente en Gemini después de {self.GEMINI_MAX_RETRIES} intentos")
+            return None
+        logger.error(f"Error llamando a Gemini ({model}) en intento {attempt + 1}: {error}", exc_info=True)
+        if attempt < self.GEMINI_MAX_RETRIES - 1:
+            return self.GEMINI_BASE_DELAY * (2 ** attempt)  # 1s, 2s
+        return None
+
+    def _gemini_error(self, error: Exception, model: str) -> str:
+        if self._is_rate_limit(error):
+            return "[ERROR] Rate limit de Gemini excedido. Intenta más tarde o usa otro proveedor."
+        return f"[ERROR] Error al llamar a Gemini ({model}): {error}"
+
+    @staticmethod
+    def _openai_text(response, model: str) -> str:
+        if response.choices:
+            return response.choices[0].message.content.strip()
+        logger.warning(f"Respuesta de OpenAI sin choices para modelo {model}. Respuesta: {response}")
+        return "[ERROR] OpenAI no devolvió ninguna opción (posible filtro de contenido)."
+
+    @staticmethod
+    def _openai_error(error: Exception, model: str) -> str:
+        if isinstance(error, openai.AuthenticationError):
+            logger.error("Error de autenticación con OpenAI. Verifica la API Key.")
+            return "[ERROR] Clave de API de OpenAI inválida."
+        if isinstance(error, openai.NotFoundError):
+            logger.error(f"Modelo OpenAI no encontrado: {model}")
+            return f"[ERROR] Modelo de OpenAI no encontrado: {model}"
+        if isinstance(error, openai.RateLimitError):
+            logger.warning("Límite de tasa de OpenAI excedido.")
+            return "[ERROR] Límite de tasa de OpenAI excedido. Espera y vuelve a intentarlo."
+        logger.error(f"Error llamando a OpenAI ({model}): {error}", exc_info=True)
+        return f"[ERROR] Error al llamar a OpenAI ({model}): {error}"
+
+    def _ollama_error(self, error: Exception, model: str) -> str:
+        if isinstance(error, (requests.exceptions.ConnectionError, httpx.ConnectError)):
+            logger.error(f"No se pudo conectar a Ollama en {self.ollama_host}. ¿Servicio en ejecución?")
+            return f"[ERROR] No se pudo conectar a Ollama en {self.ollama_host}."
+        if isinstance(error, ollama.ResponseError):
+            if "model not found" in str(error).lower():
+                logger.error(f"Modelo Ollama no encontrado: {model}. Ejecuta 'ollama pull {model}'")
+                return f"[ERROR] Modelo Ollama no encontrado: {model}."
+            logger.error(f"Error en respuesta de Ollama ({model}): {error.error} (Status: {error.status_code})", exc_info=True)
+            return f"[ERROR] Error en la respuesta de Ollama ({model})."
+        logger.error(f"Error llamando a Ollama ({model}): {error}", exc_info=True)
+        return f"[ERROR] Error al llamar a Ollama ({model}): {error}"
 
     def _generate_gemini_script(self, system_prompt: str, user_prompt: str, model: str) -> str:
         if not self.gemini_key:
             return "[ERROR] Clave API Gemini no configurada."
-        
-        # Sistema de retry con backoff exponencial para rate limits
-        max_retries = 3
-        base_delay = 1.0  # segundos
-        
-        for attempt in range(max_retries):
+        full_prompt = self._gemini_prompt(system_prompt, user_prompt)
+        for attempt in range(self.GEMINI_MAX_RETRIES):
             try:
-                modelo = genai.GenerativeModel(model_name=model)
-                full_prompt = f"{system_prompt}\n\n---\n\n{user_prompt}" if system_prompt else user_prompt
-                
-                # Añadir delay progresivo para evitar rate limits
-                if attempt > 0:
-                    delay = base_delay * (2 ** (attempt - 1))  # 1s, 2s, 4s
-                    logger.info(f"Gemini retry {attempt + 1}/{max_retries}, esperando {delay}s...")
-                    time.sleep(delay)
-                
-                response = modelo.generate_content(full_prompt)
-                
-                if not response.parts:
-                    feedback = getattr(response, 'prompt_feedback', None)
-                    block_reason = getattr(feedback, 'block_reason', 'Desconocido') if feedback else 'Desconocido'
-                    return f"[ERROR] Respuesta Gemini vacía o bloqueada. Razón: {block_reason}."
-                
-                logger.info(f"Gemini éxito en intento {attempt + 1}")
-                return response.text
-                
+                response = genai.GenerativeModel(model_name=model).generate_content(full_prompt)
+                return self._gemini_text(response)
             except Exception as e:
-                error_msg = str(e).lower()
-                
-                # Detectar rate limits específicos
-                if "rate limit" in error_msg or "quota" in error_msg or "429" in error_msg:
-                    if attempt < max_retries - 1:
-                        delay = base_delay * (2 ** attempt) + 2  # Delay extra para rate limits
-                        logger.warning(f"Rate limit detectado en Gemini, reintentando en {delay}s... (intento {attempt + 1}/{max_retries})")
-                        time.sleep(delay)
-                        continue
-                    else:
-                        logger.error(f"Rate limit persistente en Gemini después de {max_retries} intentos")
-                        return f"[ERROR] Rate limit de Gemini excedido. Intenta más tarde o usa otro proveedor."
-                
-                # Otros errores - no reintentar
-                logger.error(f"Error llamando a Gemini ({model}) en intento {attempt + 1}: {e}", exc_info=True)
-                if attempt == max_retries - 1:
-                    return f"[ERROR] Error al llamar a Gemini ({model}): {e}"
+                delay = self._gemini_retry_delay(attempt, e, model)
+                if delay is None:
+                    return self._gemini_error(e, model)
+                time.sleep(delay)
 
     def _generate_openai_script(self, system_prompt: str, user_prompt: str, model: str) -> str:
         if not self.openai_client:
             return "[ERROR] Cliente OpenAI no inicializado."
+        messages = self._chat_messages(system_prompt, user_prompt)
+        if not messages: return "[ERROR] Se necesita system_prompt o user_prompt."
         try:
-            messages = []
-            if system_prompt: messages.append({"role": "system", "content": system_prompt})
-            if user_prompt: messages.append({"role": "user", "content": user_prompt})
-            if not messages: return "[ERROR] Se necesita system_prompt o user_prompt."
-
-            response = self.openai_client.chat.completions.create(
-                model=model,
-                messages=messages
-            )
-            if response.choices:
-                return response.choices[0].message.content.strip()
-            else:
-                logger.warning(f"Respuesta de OpenAI sin choices para modelo {model}. Respuesta: {response}")
-                return "[ERROR] OpenAI no devolvió ninguna opción (posible filtro de contenido)."
-                
-        except openai.AuthenticationError:
-            logger.error("Error de autenticación con OpenAI. Verifica la API Key.")
-            return "[ERROR] Clave de API de OpenAI inválida."
-        except openai.NotFoundError:
-             logger.error(f"Modelo OpenAI no encontrado: {model}")
-             return f"[ERROR] Modelo de OpenAI no encontrado: {model}"
-        except openai.RateLimitError:
-             logger.warning("Límite de tasa de OpenAI excedido.")
-             return "[ERROR] Límite de tasa de OpenAI excedido. Espera y vuelve a intentarlo."
+            response = self.openai_client.chat.completions.create(model=model, messages=messages)
+            return self._openai_text(response, model)
         except Exception as e:
-             logger.error(f"Error llamando a OpenAI ({model}): {e}", exc_info=True)
-             return f"[ERROR] Error al llamar a OpenAI ({model}): {e}"
+            return self._openai_error(e, model)
 
     def _generate_ollama_script(self, system_prompt: str, user_prompt: str, model: str) -> str:
         if not self.ollama_client:
             return f"[ERROR] Cliente Ollama no disponible o no conectado a {self.ollama_host}."
+        messages = self._chat_messages(system_prompt, user_prompt)
+        if not messages: return "[ERROR] Se necesita system_prompt o user_prompt."
         try:
-            messages = []
-            if system_prompt: messages.append({'role': 'system', 'content': system_prompt})
-            if user_prompt: messages.append({'role': 'user', 'content': user_prompt})
-            if not messages: return "[ERROR] Se necesita system_prompt o user_prompt."
-
             response = self.ollama_client.chat(model=model, messages=messages)
             return response['message']['content'].strip()
-
-        except requests.exceptions.ConnectionError:
-            logger.error(f"No se pudo conectar a Ollama en {self.ollama_host}. ¿Servicio en ejecución?")
-            return f"[ERROR] No se pudo conectar a Ollama en {self.ollama_host}."
-        except ollama.ResponseError as e:
-             if "model not found" in str(e).lower():
-                  logger.error(f"Modelo Ollama no encontrado: {model}. Ejecuta 'ollama pull {model}'")
-                  return f"[ERROR] Modelo Ollama no encontrado: {model}."
-             logger.error(f"Error en respuesta de Ollama ({model}): {e.error} (Status: {e.status_code})", exc_info=True)
-             return f"[ERROR] Error en la respuesta de Ollama ({model})."
         except Exception as e:
-             logger.error(f"Error llamando a Ollama ({model}): {e}", exc_info=True)
-             return f"[ERROR] Error al llamar a Ollama ({model}): {e}"
+            return self._ollama_error(e, model)
 
-    def _generate_image_with_replicate(self, prompt: str, model_id: str, aspect_ratio: str ="16:9", output_format: str="webp", output_quality: int=85, megapixels: str="1", num_outputs: int=1, output_path: Optional[str]=None, **kwargs) -> Union[str, bytes]:
-        """Genera una imagen usando Replicate y el modelo especificado."""
-        if not self.replicate_client:
-             raise ValueError("Cliente Replicate no inicializado (falta API Token?).")
-        
-        logger.debug(f"Iniciando Replicate para modelo: {model_id}")
-        
+    @staticmethod
+    def _replicate_image_input(prompt: str, aspect_ratio: str = "16:9", output_format: str = "webp", output_quality: int = 85, megapixels: str = "1", num_outputs: int = 1, **kwargs) -> Dict:
+        """Parámetros de entrada de Replicate para los modelos de imagen."""
         input_params = {
             "prompt": prompt,
             "aspect_ratio": aspect_ratio,
@@ -331,40 +425,231 @@ class AIServices:
             "go_fast": kwargs.get("go_fast", True), 
             "num_inference_steps": kwargs.get("num_inference_steps", 4), 
         }
-        input_params = {k: v for k, v in input_params.items() if v is not None}
-
+        return {k: v for k, v in input_params.items() if v is not None}
+
+    @staticmethod
+    def _replicate_output_url(output) -> str:
+        """Extrae la URL de la imagen de la salida de Replicate."""
+        if not output:
+            raise ValueError("Salida vacía de Replicate.")
+        # Replicate retorna una lista de URLs si num_outputs > 1, o una URL si num_outputs = 1
+        if isinstance(output, list) and len(output) > 0:
+            return str(output[0])
+        elif isinstance(output, str):
+            return output
+        raise ValueError(f"Formato de salida inesperado de Replicate: {type(output)}")
+
+    def _generate_image_with_replicate(self, prompt: str, model_id: str, output_path: Optional[str]=None, **kwargs) -> Union[str, bytes]:
+        """Genera una imagen usando Replicate y el modelo especificado."""
+        if not self.replicate_client:
+             raise ValueError("Cliente Replicate no inicializado (falta API Token?).")
+        
+        logger.debug(f"Iniciando Replicate para modelo: {model_id}")
+        input_params = self._replicate_image_input(prompt, **kwargs)
         logger.debug(f"Input para Replicate ({model_id}): {input_params}")
         try:
             output = self.replicate_client.run(model_id, input=input_params)
-            if not output:
-                raise ValueError("Salida vacía de Replicate.")
-            
-            # Replicate retorna una lista de URLs si num_outputs > 1, o una URL si num_outputs = 1
-            if isinstance(output, list) and len(output) > 0:
-                image_url = output[0]
-            elif isinstance(output, str):
-                image_url = output
-            else:
-                raise ValueError(f"Formato de salida inesperado de Replicate: {type(output)}")
-
+            image_url = self._replicate_output_url(output)
             logger.debug(f"URL de imagen generada: {image_url}")
             
-            # Descargar la imagen
-            response = requests.get(image_url, timeout=60)
-            response.raise_for_status()
-            
+            # Descargar la imagen (en streaming a un temporal si hay ruta de salida)
             if output_path:
-                with open(output_path, 'wb') as f:
-                    f.write(response.content)
+                self.http_downloader.download_to_file(image_url, output_path)
                 logger.info(f"Imagen guardada en: {output_path}")
                 return output_path
             else:
-                return response.content
+                return self.http_downloader.download_bytes(image_url)
 
         except Exception as e:
             logger.error(f"Error en Replicate ({model_id}): {e}", exc_info=True)
             raise
 
+    # --- API asíncrona ---
+    # Mismo contrato que los métodos síncronos (los errores de texto se devuelven
+    # como "[ERROR] ..." y los de imagen se lanzan), pero con clientes asíncronos
+    # de cada SDK y conexiones HTTP reutilizadas, para lanzar muchas peticiones
+    # desde un único bucle de eventos. La cancelación se propaga sin capturarse.
+
+    def _async_client(self, name: str):
+        """
+        Devuelve el cliente asíncrono indicado ('openai', 'ollama' o 'http') para
+        el bucle de eventos actual. Los clientes httpx quedan ligados al bucle en
+        el que se crean, así que cada bucle (p.ej. uno por hilo) tiene los suyos.
+        """
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            clients = self._async_clients.setdefault(loop, {})
+        client = clients.get(name)
+        if client is None:
+            if name == "openai":
+                client = openai.AsyncOpenAI(api_key=self.openai_key)
+            elif name == "ollama":
+                client = ollama.AsyncClient(host=self.ollama_host)
+            elif name == "http":
+                client = httpx.AsyncClient(
+                    timeout=60,
+                    follow_redirects=True,
+                    limits=httpx.Limits(max_connections=self.max_http_connections,
+                                        max_keepalive_connections=min(self.max_http_connections, 20))
+                )
+            else:
+                raise ValueError(f"Cliente asíncrono desconocido: {name}")
+            clients[name] = client
+        return client
+
+    async def aclose(self):
+        """Cierra los clientes asíncronos abiertos en el bucle actual."""
+        with self._async_lock:
+            clients = self._async_clients.pop(asyncio.get_running_loop(), {})
+        for name, client in clients.items():
+            try:
+                if name == "ollama" and not hasattr(client, "close"):
+                    client = client._client  # Versiones de ollama sin close(): su cliente httpx
+                await (getattr(client, "aclose", None) or client.close)()
+            except Exception as e:
+                logger.debug(f"Error cerrando cliente asíncrono {name}: {e}")
+
+    async def agenerate_content(self, provider: str, model: str, system_prompt: str, user_prompt: str, use_cache: bool = True, timeout: Optional[float] = None, **kwargs) -> str:
+        """
+        Versión asíncrona de generate_content.
+        
+        Args:
+            timeout: Segundos máximos para la petición (por defecto ai.async.request_timeout)
+        """
+        provider = provider.lower()
+        cache = self.llm_cache if use_cache else None
+        if cache:
+            cached = await asyncio.to_thread(cache.get, provider, model, system_prompt, user_prompt, kwargs)
+            if cached is not None:
+                return cached
+        
+        logger.info(f"Generando contenido (async) con {provider} (Modelo: {model})...")
+        record_api_call("llm", provider)
+        await asyncio.to_thread(get_rate_limiter().acquire, provider, model)
+        if provider == "gemini":
+            request = self._agenerate_gemini_script(system_prompt, user_prompt, model)
+        elif provider == "openai":
+            request = self._agenerate_openai_script(system_prompt, user_prompt, model)
+        elif provider == "ollama":
+            request = self._agenerate_ollama_script(system_prompt, user_prompt, model)
+        elif provider == FAKE_PROVIDER:
+            request = get_fake_providers().llm.agenerate(system_prompt, user_prompt, model)
+        else:
+            error_msg = f"[ERROR] Proveedor de contenido '{provider}' no soportado."
+            logger.error(error_msg)
+            return error_msg
+        
+        timeout = timeout or self.request_timeout
+        try:
+            result = await asyncio.wait_for(request, timeout) if timeout else await request
+        except asyncio.TimeoutError:
+            logger.error(f"Tiempo de espera agotado ({timeout}s) con {provider} ({model})")
+            return f"[ERROR] Tiempo de espera agotado ({timeout}s) llamando a {provider} ({model})."
+        
+        if cache:
+            await asyncio.to_thread(cache.put, provider, model, system_prompt, user_prompt, result, kwargs)
+        return result
+
+    async def agenerate_image(self, prompt: str, model: str, provider: str = "replicate", timeout: Optional[float] = None, use_image_store: bool = True, **kwargs) -> Union[str, bytes]:
+        """
+        Versión asíncrona de generate_image.
+        
+        Args:
+            timeout: Segundos máximos para generar y descargar la imagen (por defecto ai.async.request_timeout)
+        """
+        provider = provider.lower()
+        store = self.image_store if use_image_store else None
+        if store:
+            reused = await asyncio.to_thread(self._image_from_store, store, prompt, model, kwargs)
+            if reused is not None:
+                return reused
+        logger.info(f"Generando imagen (async) con {provider} (Modelo: {model})...")
+        record_api_call("image", provider)
+        await asyncio.to_thread(get_rate_limiter().acquire, provider, model)
+        
+        if provider == "replicate":
+            request = self._agenerate_image_with_replicate(prompt=prompt, model_id=model, **kwargs)
+        elif provider == FAKE_PROVIDER:
+            request = get_fake_providers().images.agenerate(prompt, **kwargs)
+        else:
+            error_msg = f"[ERROR] Proveedor de imágenes '{provider}' no soportado."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        
+        timeout = timeout or self.request_timeout
+        result = await asyncio.wait_for(request, timeout) if timeout else await request
+        if store and kwargs.get("output_path"):
+            await asyncio.to_thread(store.put, self._image_store_key(prompt, model, kwargs),
+                                    kwargs["output_path"], kwargs.get("output_format", "webp"))
+        return result
+
+    async def _agenerate_gemini_script(self, system_prompt: str, user_prompt: str, model: str) -> str:
+        if not self.gemini_key:
+            return "[ERROR] Clave API Gemini no configurada."
+        full_prompt = self._gemini_prompt(system_prompt, user_prompt)
+        for attempt in range(self.GEMINI_MAX_RETRIES):
+            try:
+                modelo = genai.GenerativeModel(model_name=model)
+                if hasattr(modelo, "generate_content_async"):
+                    response = await modelo.generate_content_async(full_prompt)
+                else:
+                    response = await asyncio.to_thread(modelo.generate_content, full_prompt)
+                return self._gemini_text(response)
+            except Exception as e:
+                delay = self._gemini_retry_delay(attempt, e, model)
+                if delay is None:
+                    return self._gemini_error(e, model)
+                await asyncio.sleep(delay)
+
+    async def _agenerate_openai_script(self, system_prompt: str, user_prompt: str, model: str) -> str:
+        if not self.openai_client:
+            return "[ERROR] Cliente OpenAI no inicializado."
+        messages = self._chat_messages(system_prompt, user_prompt)
+        if not messages: return "[ERROR] Se necesita system_prompt o user_prompt."
+        try:
+            response = await self._async_client("openai").chat.completions.create(model=model, messages=messages)
+            return self._openai_text(response, model)
+        except Exception as e:
+            return self._openai_error(e, model)
+
+    async def _agenerate_ollama_script(self, system_prompt: str, user_prompt: str, model: str) -> str:
+        if not self.ollama_client:
+            return f"[ERROR] Cliente Ollama no disponible o no conectado a {self.ollama_host}."
+        messages = self._chat_messages(system_prompt, user_prompt)
+        if not messages: return "[ERROR] Se necesita system_prompt o user_prompt."
+        try:
+            response = await self._async_client("ollama").chat(model=model, messages=messages)
+            return response['message']['content'].strip()
+        except Exception as e:
+            return self._ollama_error(e, model)
+
+    async def _agenerate_image_with_replicate(self, prompt: str, model_id: str, output_path: Optional[str] = None, **kwargs) -> Union[str, bytes]:
+        if not self.replicate_client:
+             raise ValueError("Cliente Replicate no inicializado (falta API Token?).")
+        
+        input_params = self._replicate_image_input(prompt, **kwargs)
+        logger.debug(f"Input para Replicate async ({model_id}): {input_params}")
+        try:
+            if hasattr(self.replicate_client, "async_run"):
+                output = await self.replicate_client.async_run(model_id, input=input_params)
+            else:
+                output = await asyncio.to_thread(self.replicate_client.run, model_id, input=input_params)
+            image_url = self._replicate_output_url(output)
+            
+            # Descarga con el pool de conexiones compartido
+            if output_path:
+                await self.http_downloader.adownload_to_file(self._async_client("http"), image_url, output_path)
+                logger.info(f"Imagen guardada en: {output_path}")
+                return output_path
+            response = await self._async_client("http").get(image_url)
+            response.raise_for_status()
+            return response.content
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error en Replicate async ({model_id}): {e}", exc_info=True)
+            raise
+
 # --- Funciones de Listado de Modelos --- 
 
 def list_gemini_models(api_key=None):
@@ -0,0 +1,162 @@
+# utils/audio_chunking.py
+"""
+División de audios largos en fragmentos cortados en silencios.
+
+Se usa para transcribir narraciones largas en paralelo: cada fragmento se
+transcribe por separado y los tiempos se desplazan después con el inicio del
+fragmento. Cortar en silencios evita partir palabras por la mitad.
+"""
+
+import logging
+import re
+import subprocess
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+from utils.script_alignment import SAMPLE_RATE, FRAME_SECONDS, detect_speech_frames
+
+logger = logging.getLogger(__name__)
+
+
+def detect_speech_intervals(samples: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                            min_silence_ms: int = 500) -> List[Tuple[float, float]]:
+    """
+    Devuelve los tramos de voz (inicio, fin) en segundos.
+    Usa el VAD Silero de faster-whisper si está disponible; si no, el VAD por energía.
+    """
+    try:
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        timestamps = get_speech_timestamps(samples, VadOptions(min_silence_duration_ms=min_silence_ms))
+        return [(ts["start"] / sample_rate, ts["end"] / sample_rate) for ts in timestamps]
+    except ImportError:
+        logger.debug("VAD de faster-whisper no disponible, usando detección por energía")
+
+    mask = detect_speech_frames(samples, sample_rate)
+    intervals = []
+    run_start = None
+    for idx, is_speech in enumerate(mask):
+        if is_speech and run_start is None:
+            run_start = idx
+        elif not is_speech and run_start is not None:
+            intervals.append((run_start * FRAME_SECONDS, idx * FRAME_SECONDS))
+            run_start = None
+    if run_start is not None:
+        intervals.append((run_start * FRAME_SECONDS, len(mask) * FRAME_SECONDS))
+    return intervals
+
+
+def plan_chunks_at_silences(speech_intervals: List[Tuple[float, float]], total_duration: float,
+                            max_chunk_seconds: float = 120.0) -> List[Tuple[float, float]]:
+    """
+    Agrupa los tramos de voz en fragmentos de como mucho max_chunk_seconds,
+    cortando en el punto medio del silencio entre dos tramos.
+
+    Un tramo de voz continuo más largo que el máximo se corta a la fuerza, igual
+    que el final sin voz (silencio o música tras el último tramo) y el audio
+    entero si no se detectó voz.
+
+    Args:
+        speech_intervals: Tramos de voz (inicio, fin) ordenados, en segundos
+        total_duration: Duración total del audio en segundos
+        max_chunk_seconds: Duración máxima de cada fragmento
+
+    Returns:
+        List[Tuple[float, float]]: Fragmentos (inicio, fin) que cubren todo el audio
+    """
+    if total_duration <= max_chunk_seconds:
+        return [(0.0, total_duration)]
+
+    chunks = []
+    chunk_start = 0.0
+    previous_end = None
+    for speech_start, speech_end in speech_intervals:
+        if previous_end is not None and speech_end - chunk_start > max_chunk_seconds:
+            cut = (previous_end + speech_start) / 2
+            if cut > chunk_start:
+                chunks.append((chunk_start, cut))
+                chunk_start = cut
+        # Tramo de voz sin silencios más largo que el máximo: corte forzado
+        while speech_end - chunk_start > max_chunk_seconds:
+            cut = chunk_start + max_chunk_seconds
+            chunks.append((chunk_start, cut))
+            chunk_start = cut
+        previous_end = speech_end
+
+    # Tras el último tramo de voz solo queda silencio o música: se corta a la fuerza también
+    while total_duration - chunk_start > max_chunk_seconds:
+        cut = chunk_start + max_chunk_seconds
+        chunks.append((chunk_start, cut))
+        chunk_start = cut
+    chunks.append((chunk_start, total_duration))
+    return [(round(s, 3), round(e, 3)) for s, e in chunks if e - s > 0.01]
+
+
+def detect_silences_ffmpeg(audio_path: str, noise_db: float = -35.0,
+                           min_silence: float = 0.5) -> Tuple[List[Tuple[float, float]], float]:
+    """
+    Detecta silencios con el filtro silencedetect de FFmpeg sin decodificar el
+    audio en Python (útil cuando solo se necesita cortar el archivo).
+
+    Returns:
+        Tuple[List[Tuple[float, float]], float]: Silencios (inicio, fin) y duración total
+    """
+    cmd = [
+        'ffmpeg', '-nostdin', '-hide_banner', '-i', str(audio_path),
+        '-af', f'silencedetect=noise={noise_db}dB:d={min_silence}',
+        '-f', 'null', '-'
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    log = result.stderr
+
+    duration_match = re.search(r'Duration:\s*(\d+):(\d+):([\d.]+)', log)
+    total_duration = 0.0
+    if duration_match:
+        hours, minutes, seconds = duration_match.groups()
+        total_duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    starts = [float(v) for v in re.findall(r'silence_start:\s*(-?[\d.]+)', log)]
+    ends = [float(v) for v in re.findall(r'silence_end:\s*([\d.]+)', log)]
+    silences = []
+    for idx, start in enumerate(starts):
+        end = ends[idx] if idx < len(ends) else total_duration
+        silences.append((max(start, 0.0), end))
+    return silences, total_duration
+
+
+def speech_intervals_from_silences(silences: List[Tuple[float, float]], total_duration: float) -> List[Tuple[float, float]]:
+    """Convierte una lista de silencios en los tramos de voz complementarios."""
+    intervals = []
+    cursor = 0.0
+    for silence_start, silence_end in silences:
+        if silence_start > cursor:
+            intervals.append((cursor, silence_start))
+        cursor = max(cursor, silence_end)
+    if cursor < total_duration:
+        intervals.append((cursor, total_duration))
+    return intervals
+
+
+def cut_audio_chunks(audio_path: str, chunks: List[Tuple[float, float]], output_dir: str,
+                     sample_rate: int = SAMPLE_RATE, bitrate: str = "48k") -> List[str]:
+    """
+    Corta el audio en los fragmentos indicados con FFmpeg. Se recodifica a mono
+    a baja tasa (suficiente para ASR) para que la subida sea pequeña y los cortes exactos.
+
+    Returns:
+        List[str]: Rutas a los fragmentos, en el mismo orden que chunks
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for idx, (chunk_start, chunk_end) in enumerate(chunks):
+        chunk_path = output_dir / f"chunk_{idx:03d}.mp3"
+        cmd = [
+            'ffmpeg', '-nostdin', '-y', '-hide_banner', '-loglevel', 'error',
+            '-ss', f"{chunk_start:.3f}", '-to', f"{chunk_end:.3f}", '-i', str(audio_path),
+            '-ac', '1', '-ar', str(sample_rate), '-b:a', bitrate, str(chunk_path)
+        ]
+        subprocess.run(cmd, capture_output=True, check=True)
+        paths.append(str(chunk_path))
+    return paths
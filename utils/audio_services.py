@@ -1,5 +1,6 @@
 import asyncio
 import edge_tts
+import inspect
 import os
 from pathlib import Path
 import tempfile
@@ -7,6 +8,9 @@ import logging
 from typing import Optional, Dict, List, Any
 import json
 from utils.config import load_config
+from utils.transcription_utils import restore_script_wording, build_segments_from_words, save_transcription_json
+from utils.fake_providers import FAKE_PROVIDER, get_fake_providers
+from utils.pipeline_metrics import record_api_call
 
 # Fish Audio imports
 try:
@@ -288,15 +292,41 @@ def get_fish_audio_tracker() -> FishAudioUsageTracker:
 
 # ===== EDGE TTS FUNCTIONS =====
 
-async def _generate_audio_chunk(text: str, voice: str, rate: str = "+0%", volume: str = "+0%", pitch: str = "+0Hz", output_file: str = None) -> str:
-    """Genera un archivo de audio para un chunk de texto usando Edge TTS."""
-    communicate = edge_tts.Communicate(text, voice, rate=rate, volume=volume, pitch=pitch)
+def _create_edge_communicate(text: str, voice: str, rate: str, volume: str, pitch: str, word_boundaries: bool) -> "edge_tts.Communicate":
+    """Crea el Communicate de Edge TTS pidiendo eventos WordBoundary si la versión lo permite."""
+    if word_boundaries and "boundary" in inspect.signature(edge_tts.Communicate.__init__).parameters:
+        # edge-tts >= 7 emite SentenceBoundary por defecto
+        return edge_tts.Communicate(text, voice, rate=rate, volume=volume, pitch=pitch, boundary="WordBoundary")
+    return edge_tts.Communicate(text, voice, rate=rate, volume=volume, pitch=pitch)
+
+async def _generate_audio_chunk(text: str, voice: str, rate: str = "+0%", volume: str = "+0%", pitch: str = "+0Hz", output_file: str = None, word_boundaries: Optional[List[Dict]] = None) -> str:
+    """
+    Genera un archivo de audio para un chunk de texto usando Edge TTS.
+    Si se pasa la lista word_boundaries, se rellena con los tiempos de cada palabra
+    (en segundos, relativos al inicio del chunk) mientras se recibe el audio.
+    """
+    communicate = _create_edge_communicate(text, voice, rate, volume, pitch, word_boundaries is not None)
     if not output_file:
         output_file = tempfile.mktemp(suffix=".mp3")
-    await communicate.save(output_file)
+    if word_boundaries is None:
+        await communicate.save(output_file)
+        return output_file
+
+    with open(output_file, "wb") as f:
+        async for message in communicate.stream():
+            if message["type"] == "audio":
+                f.write(message["data"])
+            elif message["type"] == "WordBoundary":
+                # Offsets y duraciones en unidades de 100 ns
+                start = message["offset"] / 10_000_000
+                word_boundaries.append({
+                    "text": message["text"],
+                    "start": start,
+                    "end": start + message["duration"] / 10_000_000
+                })
     return output_file
 
-def generate_edge_tts_audio(text: str, voice: str = "es-ES-AlvaroNeural", rate: str = "+0%", pitch: str = "+0Hz", output_dir: str = "audio") -> str:
+def generate_edge_tts_audio(text: str, voice: str = "es-ES-AlvaroNeural", rate: str = "+0%", pitch: str = "+0Hz", output_dir: str = "audio", word_timings_path: Optional[str] = None) -> str:
     """
     Genera un archivo de audio a partir de texto usando Edge TTS.
     
@@ -306,6 +336,9 @@ def generate_edge_tts_audio(text: str, voice: str = "es-ES-AlvaroNeural", rate:
         rate (str): Velocidad de habla (formato: +X% o -X%)
         pitch (str): Tono de voz (formato: +XHz o -XHz)
         output_dir (str): Directorio donde guardar el audio
+        word_timings_path (str, optional): Si se indica, se capturan los tiempos de
+            palabra durante la síntesis y se guarda ahí una transcripción con el
+            mismo esquema que TranscriptionService (evita el paso de ASR)
     
     Returns:
         str: Ruta al archivo de audio generado
@@ -319,25 +352,34 @@ def generate_edge_tts_audio(text: str, voice: str = "es-ES-AlvaroNeural", rate:
     
     # Generar un nombre de archivo temporal único
     temp_files = []
+    chunk_words: List[List[Dict]] = []
     output_file = os.path.join(output_dir, f"audio_edge_{hash(text)}.mp3")
     
     try:
         # Generar audio para cada chunk
         for i, chunk in enumerate(chunks):
             temp_file = tempfile.mktemp(suffix=f"_chunk_{i}.mp3")
+            words = [] if word_timings_path else None
             asyncio.run(_generate_audio_chunk(
                 chunk,
                 voice,
                 rate=rate,
                 pitch=pitch,
-                output_file=temp_file
+                output_file=temp_file,
+                word_boundaries=words
             ))
             temp_files.append(temp_file)
+            chunk_words.append(words or [])
+        
+        # Desplazamiento de cada chunk dentro del audio final
+        chunk_offsets = [0.0]
         
         # Si hay más de un chunk, concatenarlos
         if len(temp_files) > 1:
             from moviepy.editor import concatenate_audioclips, AudioFileClip
             clips = [AudioFileClip(f) for f in temp_files]
+            for clip in clips[:-1]:
+                chunk_offsets.append(chunk_offsets[-1] + clip.duration)
             final_clip = concatenate_audioclips(clips)
             final_clip.write_audiofile(output_file)
             final_clip.close()
@@ -348,6 +390,9 @@ def generate_edge_tts_audio(text: str, voice: str = "es-ES-AlvaroNeural", rate:
             import shutil
             shutil.move(temp_files[0], output_file)
         
+        if word_timings_path:
+            _save_edge_word_timings(text, voice, chunk_words, chunk_offsets, word_timings_path)
+        
         return output_file
     
     finally:
@@ -359,6 +404,36 @@ def generate_edge_tts_audio(text: str, voice: str = "es-ES-AlvaroNeural", rate:
                 except:
                     pass
 
+def _save_edge_word_timings(text: str, voice: str, chunk_words: List[List[Dict]], chunk_offsets: List[float], output_path: str) -> Optional[str]:
+    """
+    Ajusta los tiempos de palabra de cada chunk a su posición en el audio final
+    y los guarda como transcripción (segmentos + palabras) con la redacción del guion.
+    """
+    timed_words = []
+    for words, offset in zip(chunk_words, chunk_offsets):
+        for word in words:
+            timed_words.append({
+                "text": word["text"],
+                "start": word["start"] + offset,
+                "end": word["end"] + offset
+            })
+
+    if not timed_words:
+        logger.warning("Edge TTS no emitió eventos WordBoundary; se necesitará transcripción ASR.")
+        return None
+
+    words = restore_script_wording(timed_words, text) or timed_words
+    segments = build_segments_from_words(words)
+    metadata = {
+        "source": "edge_tts_word_boundary",
+        "voice": voice,
+        "language": voice.split("-")[0] if voice else "unknown",
+        "num_words": len(words),
+        "num_segments": len(segments)
+    }
+    logger.info(f"Tiempos de palabra capturados desde Edge TTS: {len(words)} palabras, {len(segments)} segmentos.")
+    return save_transcription_json(segments, metadata, output_path)
+
 async def list_edge_voices():
     """Lista todas las voces disponibles en Edge TTS."""
     try:
@@ -590,14 +665,15 @@ def generate_tts_audio(
     fish_format: str = "mp3",
     fish_mp3_bitrate: int = 128,
     fish_normalize: bool = True,
-    fish_latency: str = "normal"
+    fish_latency: str = "normal",
+    word_timings_path: Optional[str] = None
 ) -> str:
     """
     Función unificada para generar audio TTS con diferentes proveedores.
     
     Args:
         text (str): Texto a convertir en audio
-        tts_provider (str): Proveedor TTS ("edge" o "fish")
+        tts_provider (str): Proveedor TTS ("edge", "fish" o "fake" para pruebas sin red)
         voice (str): Voz para Edge TTS
         rate (str): Velocidad para Edge TTS
         pitch (str): Tono para Edge TTS
@@ -609,19 +685,26 @@ def generate_tts_audio(
         fish_mp3_bitrate (int): Bitrate MP3 para Fish Audio
         fish_normalize (bool): Normalizar texto para Fish Audio
         fish_latency (str): Latencia para Fish Audio
+        word_timings_path (str): Ruta donde guardar los tiempos de palabra capturados
+            durante la síntesis (Edge TTS y el TTS simulado; Fish Audio no devuelve tiempos)
     
     Returns:
         str: Ruta al archivo de audio generado
     """
+    record_api_call("tts", tts_provider.lower())
     if tts_provider.lower() == "edge":
-        return generate_edge_tts_audio(text, voice, rate, pitch, output_dir)
+        return generate_edge_tts_audio(text, voice, rate, pitch, output_dir, word_timings_path=word_timings_path)
     elif tts_provider.lower() == "fish":
+        if word_timings_path:
+            logger.info("Fish Audio no proporciona tiempos de palabra; se ignorará word_timings_path.")
         if not fish_api_key:
             raise ValueError("API key de Fish Audio es requerida")
         return generate_fish_audio_audio(
             text, fish_api_key, fish_reference_id, fish_model,
             fish_format, fish_mp3_bitrate, fish_normalize, fish_latency, output_dir
         )
+    elif tts_provider.lower() == FAKE_PROVIDER:
+        return get_fake_providers().tts.synthesize(text, output_dir, word_timings_path=word_timings_path)
     else:
         raise ValueError(f"Proveedor TTS no soportado: {tts_provider}")
 
@@ -0,0 +1,476 @@
+# utils/batch_executor.py
+"""
+Ejecución en paralelo del procesamiento por lotes.
+
+show_batch_processor procesaba la cola proyecto a proyecto aunque config.yaml
+define video_generation.batch_processing.max_parallel_videos. BatchExecutor
+reparte los proyectos entre hasta N procesos de trabajo (cada uno con su propio
+VideoProcessor), reenvía el progreso de cada proyecto al proceso principal y
+aísla los fallos: un proyecto que falla (o un proceso que muere) no detiene a
+los demás.
+
+Los estados del CMS (Publicaciones) los actualiza solo el proceso principal, a
+medida que llegan los eventos, para no tener varios procesos escribiendo en la
+misma base SQLite.
+"""
+
+import json
+import logging
+import multiprocessing
+import queue
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+HISTORICAL_PROMPT_NAME = "Escenas Fotorrealistas Históricamente Precisas"
+
+
+def procesar_proyecto(proyecto: Dict, batch_config: Dict, progress_callback: Callable[[float, str], None],
+                      historical_config: Optional[Dict] = None, services=None) -> Dict:
+    """
+    Procesa un proyecto del lote con la configuración compartida del lote.
+
+    Args:
+        proyecto: Proyecto de la cola (titulo, contexto, script_type, guion_manual, cms_*)
+        batch_config: Configuración común del lote (script, image, video, audio...)
+        progress_callback: Función (progreso 0-1, mensaje)
+        historical_config: Configuración del prompt histórico (modo manual/auto)
+        services: ServiceContainer compartido por los proyectos (None = uno nuevo)
+
+    Returns:
+        Dict: Resultado con 'estado' ('completado' o 'error'), rutas y metadata
+    """
+    proyecto_dir = None
+    try:
+        from utils.video_processing import VideoProcessor
+
+        progress_callback(0.05, "Preparando procesador de video")
+        full_config = preparar_config_proyecto(proyecto, batch_config, progress_callback, historical_config)
+
+        progress_callback(0.1, "Iniciando procesamiento con VideoProcessor...")
+
+        processor = VideoProcessor(config=batch_config, services=services)
+        # La carpeta se crea antes para poder anotarla en el resultado aunque el proyecto falle
+        project_info = processor._setup_single_project(full_config)
+        proyecto_dir = project_info["base_path"]
+        result_path = processor.process_single_video(
+            full_config,
+            existing_project_info=project_info,
+            progress_callback=lambda prog, msg: progress_callback(0.1 + prog * 0.2, msg)
+        )
+
+        progress_callback(1.0, "¡Completado!")
+        return resultado_proyecto(proyecto, full_config, result_path, proyecto_dir)
+
+    except Exception as e:
+        logger.error(f"Error procesando '{proyecto.get('titulo')}': {e}", exc_info=True)
+        return {
+            "titulo": proyecto["titulo"],
+            "estado": "error",
+            "error": str(e),
+            "proyecto_dir": proyecto_dir,
+            "cms_publicacion_id": proyecto.get("cms_publicacion_id")
+        }
+
+
+def preparar_config_proyecto(proyecto: Dict, batch_config: Dict, progress_callback: Callable[[float, str], None],
+                             historical_config: Optional[Dict] = None) -> Dict:
+    """Configuración completa de process_single_video para un proyecto del lote."""
+    image_config = batch_config["image"].copy()
+    prompt_obj = batch_config["image"].get("prompt_obj", {})
+    if prompt_obj and prompt_obj.get("nombre") == HISTORICAL_PROMPT_NAME:
+        progress_callback(0.07, "🏛️ Analizando contexto histórico...")
+        historical_config = historical_config or {}
+        historical_variables = _resolver_contexto_historico(proyecto, historical_config, progress_callback)
+        image_config["prompt_obj"] = prompt_obj
+        image_config["historical_context"] = {
+            **historical_variables,
+            "extraction_mode": historical_config.get("mode", "fallback")
+        }
+        image_config["historical_variables"] = historical_variables
+
+    return {
+        "titulo": proyecto["titulo"],
+        "contexto": proyecto["contexto"],
+        "script": {
+            "mode": "Proporcionar Manualmente" if proyecto.get("script_type") == "✍️ Usar guión manual" else "Generar con IA",
+            "manual_script": proyecto.get("guion_manual"),
+            **batch_config["script"]
+        },
+        "image": image_config,
+        "scenes_config": batch_config["scenes_config"],
+        "video": batch_config["video"],
+        "audio": batch_config["audio"],
+        "subtitles": batch_config["subtitles"],
+        "generate_optimized_content": batch_config.get("generate_optimized_content", False),
+        "use_same_style": batch_config.get("use_same_style", False),
+        "generate_series_tags": batch_config.get("generate_series_tags", False)
+    }
+
+
+def resultado_proyecto(proyecto: Dict, full_config: Dict, result_path, proyecto_dir: Optional[str] = None) -> Dict:
+    """
+    Resultado del proyecto; si hay video, guarda batch_metadata.json en su carpeta.
+    proyecto_dir (la carpeta del proyecto) se anota en el resultado de error para poder reanudarlo.
+    """
+    if not result_path:
+        return {
+            "titulo": proyecto["titulo"],
+            "estado": "error",
+            "error": "No se generó video final",
+            "proyecto_dir": str(proyecto_dir) if proyecto_dir else None,
+            "cms_publicacion_id": proyecto.get("cms_publicacion_id")
+        }
+
+    proyecto_dir = Path(result_path).parent.parent  # video/file.mp4 -> project_dir
+    metadata = {
+        "titulo": proyecto["titulo"],
+        "contexto": proyecto["contexto"],
+        "script_type": proyecto.get("script_type"),
+        "fecha_procesado": datetime.now().isoformat(),
+        "config_used": full_config,
+        "cms_info": {
+            "publicacion_id": proyecto.get("cms_publicacion_id"),
+            "canal": proyecto.get("cms_canal")
+        } if "cms_publicacion_id" in proyecto else None
+    }
+    with open(proyecto_dir / "batch_metadata.json", "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+
+    return {
+        "titulo": proyecto["titulo"],
+        "estado": "completado",
+        "video_path": str(result_path),
+        "proyecto_dir": str(proyecto_dir),
+        "metadata": metadata,
+        "cms_updated": False,
+        "cms_publicacion_id": proyecto.get("cms_publicacion_id")
+    }
+
+
+def _resolver_contexto_historico(proyecto: Dict, historical_config: Dict,
+                                 progress_callback: Callable[[float, str], None]) -> Dict[str, str]:
+    """Periodo, ubicación y contexto cultural para el prompt histórico (manual, IA o por defecto)."""
+    fallback = {
+        "periodo_historico": "Información no especificada",
+        "ubicacion": "Información no especificada",
+        "contexto_cultural": "Información no especificada"
+    }
+    if historical_config.get("mode") == "manual":
+        progress_callback(0.08, "✍️ Usando configuración histórica manual")
+        return {key: historical_config.get(key, "") for key in fallback}
+
+    if historical_config.get("mode") == "auto":
+        try:
+            from utils.ai_services import extract_historical_context
+            from utils.config import load_config
+
+            ai_provider = historical_config.get("ai_provider", "gemini")
+            default_gemini_model = load_config().get('ai', {}).get('default_models', {}).get('gemini', 'models/gemini-1.5-flash-latest')
+            ai_model = historical_config.get("ai_model", default_gemini_model)
+
+            progress_callback(0.08, f"🤖 Extrayendo contexto histórico con {ai_provider}...")
+            historical_data = extract_historical_context(
+                titulo=proyecto["titulo"],
+                contexto=proyecto["contexto"],
+                provider=ai_provider,
+                model=ai_model
+            )
+            progress_callback(0.09, "✅ Contexto histórico extraído exitosamente")
+            return {key: historical_data.get(key, "") for key in fallback}
+        except Exception as e:
+            progress_callback(0.09, f"⚠️ Error extrayendo contexto histórico: {str(e)}")
+
+    return fallback
+
+
+def _run_in_worker(index: int, proyecto: Dict, batch_config: Dict, historical_config: Optional[Dict], events) -> Dict:
+    """Punto de entrada en el proceso de trabajo: procesa el proyecto y publica su progreso en events."""
+    events.put(("start", index, 0.0, "Iniciando"))
+
+    def report(progress: float, message: str):
+        events.put(("progress", index, progress, message))
+
+    # Los proyectos que le tocan a este proceso comparten sus servicios
+    from utils.service_container import get_service_container
+    return procesar_proyecto(proyecto, batch_config, report, historical_config, get_service_container())
+
+
+class BatchExecutor:
+    """
+    Procesa los proyectos de un lote en paralelo.
+
+    Modo 'projects': hasta max_workers proyectos completos a la vez, cada uno en su proceso.
+    Modo 'stages': las etapas de todos los proyectos repartidas por PipelineScheduler
+    entre un pool de red y otro de CPU (stage_limits).
+    """
+
+    def __init__(self, max_workers: int = 1, db_manager=None, poll_interval: float = 0.25,
+                 mode: str = "projects", stage_limits: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            max_workers: Proyectos en paralelo (video_generation.batch_processing.max_parallel_videos)
+            db_manager: DatabaseManager para los estados del CMS (se crea uno si hace falta)
+            poll_interval: Segundos entre lecturas de la cola de progreso
+            mode: 'projects' (un proceso por proyecto) o 'stages' (planificador por etapas)
+            stage_limits: Tareas simultáneas por recurso en modo 'stages' ({'network': 4, 'cpu': 1})
+        """
+        self.max_workers = max(1, int(max_workers or 1))
+        self.poll_interval = poll_interval
+        self.mode = mode
+        self.stage_limits = stage_limits
+        self._db_manager = db_manager
+
+    @classmethod
+    def from_config(cls, app_config: Dict, **kwargs) -> "BatchExecutor":
+        """Crea el ejecutor según video_generation.batch_processing."""
+        batch_config = app_config.get("video_generation", {}).get("batch_processing", {})
+        return cls(
+            max_workers=batch_config.get("max_parallel_videos", 1),
+            mode=batch_config.get("mode", "projects"),
+            stage_limits=batch_config.get("stage_limits"),
+            **kwargs
+        )
+
+    @property
+    def in_process(self) -> bool:
+        """True si los proyectos se procesan en este proceso (sin procesos de trabajo)."""
+        return self.mode == "stages" or self.max_workers == 1
+
+    @property
+    def db_manager(self):
+        if self._db_manager is None:
+            from utils.database_manager import DatabaseManager
+            self._db_manager = DatabaseManager()
+        return self._db_manager
+
+    def run(self, proyectos: List[Dict], batch_config: Dict,
+            progress_callback: Optional[Callable[[float, str], None]] = None,
+            historical_config: Optional[Dict] = None) -> List[Dict]:
+        """
+        Procesa todos los proyectos y devuelve sus resultados en el orden de la cola.
+
+        Args:
+            proyectos: Proyectos de la cola
+            batch_config: Configuración común del lote
+            progress_callback: Función (progreso global 0-1, mensaje), llamada desde este hilo
+            historical_config: Configuración del prompt histórico
+
+        Returns:
+            List[Dict]: Un resultado por proyecto (los fallos se devuelven con estado 'error')
+        """
+        if not proyectos:
+            return []
+        progress_callback = progress_callback or (lambda progress, message: None)
+        progress = [0.0] * len(proyectos)
+
+        def report(index: int, value: float, message: str):
+            progress[index] = max(progress[index], min(max(value, 0.0), 1.0))
+            progress_callback(sum(progress) / len(proyectos), f"🔄 {proyectos[index]['titulo']}: {message}")
+
+        if self.mode == "stages" and len(proyectos) > 1:
+            return self._run_staged(proyectos, batch_config, progress_callback, historical_config)
+        if self.max_workers == 1 or len(proyectos) == 1:
+            return self._run_serial(proyectos, batch_config, report, historical_config)
+        return self._run_parallel(proyectos, batch_config, report, historical_config)
+
+    def _run_serial(self, proyectos, batch_config, report, historical_config) -> List[Dict]:
+        """Un proyecto tras otro en este proceso (comparte servicios y el modelo Whisper precargado)."""
+        from utils.service_container import ServiceContainer
+
+        # Un contenedor por lote: la interfaz aplica los cambios de configuración en el siguiente
+        services = ServiceContainer()
+        resultados = []
+        for index, proyecto in enumerate(proyectos):
+            self.mark_started(proyecto)
+            resultado = procesar_proyecto(
+                proyecto, batch_config,
+                lambda value, message, index=index: report(index, value, message),
+                historical_config, services
+            )
+            report(index, 1.0, "✅ Completado" if resultado["estado"] == "completado" else "❌ Error")
+            resultados.append(self.mark_finished(proyecto, resultado))
+        return resultados
+
+    def _run_parallel(self, proyectos, batch_config, report, historical_config) -> List[Dict]:
+        """
+        Hasta max_workers proyectos a la vez en procesos de trabajo.
+
+        Si un proceso muere (OOM en el render, segfault) el pool queda roto y todos sus
+        futuros fallan: los proyectos que no habían empezado pasan a un pool nuevo y los
+        que estaban en curso se reintentan de uno en uno, así que solo falla el proyecto
+        que vuelve a tumbar su proceso estando solo.
+        """
+        workers = min(self.max_workers, len(proyectos))
+        logger.info(f"Procesando {len(proyectos)} proyectos con {workers} procesos en paralelo")
+        resultados: List[Optional[Dict]] = [None] * len(proyectos)
+        context = multiprocessing.get_context("spawn")
+
+        def crashed(index: int, error: str):
+            report(index, 1.0, "❌ Error")
+            resultados[index] = self.mark_finished(proyectos[index], self._worker_error(proyectos[index], error))
+
+        with context.Manager() as manager:
+            events = manager.Queue()
+            pendientes = list(range(len(proyectos)))
+            while pendientes:
+                interrumpidos, en_curso = self._run_pool(pendientes, min(workers, len(pendientes)), context, events,
+                                                         proyectos, batch_config, report, historical_config, resultados)
+                if interrumpidos and not en_curso:
+                    # El pool se rompió sin llegar a empezar ningún proyecto: no tiene sentido recrearlo
+                    for index in interrumpidos:
+                        crashed(index, "El proceso de trabajo terminó inesperadamente al arrancar")
+                    break
+                for index in en_curso:
+                    logger.warning(f"El pool de procesos se rompió con '{proyectos[index]['titulo']}' en curso; "
+                                   f"se reintenta en un proceso aislado")
+                    if self._run_pool([index], 1, context, events, proyectos, batch_config, report,
+                                      historical_config, resultados)[0]:
+                        crashed(index, "El proceso de trabajo terminó inesperadamente (también al reintentarlo en solitario)")
+                pendientes = [index for index in interrumpidos if index not in en_curso]
+        return resultados
+
+    def _run_pool(self, indices: List[int], workers: int, context, events, proyectos, batch_config, report,
+                  historical_config, resultados: List[Optional[Dict]]):
+        """
+        Procesa los proyectos indicados en un pool de procesos y guarda sus resultados.
+
+        Returns:
+            Tuple[List[int], List[int]]: Proyectos sin resultado porque el pool se rompió y,
+            de ellos, los que ya estaban en curso
+        """
+        started = set()
+        broken = False
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = {
+                executor.submit(_run_in_worker, index, proyectos[index], batch_config, historical_config, events): index
+                for index in indices
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                started.update(self._drain_events(events, proyectos, report))
+                for future in done:
+                    index = futures[future]
+                    try:
+                        resultado = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        continue
+                    except Exception as e:
+                        resultado = self._worker_error(proyectos[index], str(e))
+                    report(index, 1.0, "✅ Completado" if resultado["estado"] == "completado" else "❌ Error")
+                    resultados[index] = self.mark_finished(proyectos[index], resultado)
+        started.update(self._drain_events(events, proyectos, report))
+        if not broken:
+            return [], []
+        interrumpidos = [index for index in indices if resultados[index] is None]
+        return interrumpidos, [index for index in interrumpidos if index in started]
+
+    def _run_staged(self, proyectos, batch_config, progress_callback, historical_config) -> List[Dict]:
+        """Todas las etapas de todos los proyectos en los pools por recurso de PipelineScheduler."""
+        from utils.pipeline_scheduler import PipelineScheduler
+        from utils.service_container import ServiceContainer
+        from utils.video_processing import VideoProcessor
+
+        services = ServiceContainer()
+        scheduler = PipelineScheduler(self.stage_limits,
+                                      processor_factory=lambda: VideoProcessor(config=batch_config, services=services))
+        resultados: List[Optional[Dict]] = [None] * len(proyectos)
+        full_configs: Dict[str, Dict] = {}
+        for index, proyecto in enumerate(proyectos):
+            key = str(index)
+            try:
+                full_configs[key] = preparar_config_proyecto(
+                    proyecto, batch_config, lambda value, message: progress_callback(0.0, f"🔄 {proyecto['titulo']}: {message}"),
+                    historical_config
+                )
+                scheduler.add_project(key, full_configs[key])
+            except Exception as e:
+                resultados[index] = self.mark_finished(proyecto, self._worker_error(proyecto, str(e)))
+
+        def on_stage_start(project, stage):
+            if project.next_stage == 0:
+                self.mark_started(proyectos[int(project.key)], project.project_info.get("base_path"))
+
+        def on_project_done(project):
+            index = int(project.key)
+            proyecto_dir = project.project_info.get("base_path")
+            if project.error:
+                resultado = self._worker_error(proyectos[index], project.error, proyecto_dir)
+            else:
+                resultado = resultado_proyecto(proyectos[index], full_configs[project.key], project.video_path, proyecto_dir)
+            resultados[index] = self.mark_finished(proyectos[index], resultado)
+
+        logger.info(f"Procesando {len(scheduler.projects)} proyectos por etapas (límites: {scheduler.limits})")
+        scheduler.run(
+            progress_callback=lambda value, message: progress_callback(value, f"🔄 {message}"),
+            on_stage_start=on_stage_start,
+            on_project_done=on_project_done
+        )
+        return resultados
+
+    def _drain_events(self, events, proyectos: List[Dict], report) -> List[int]:
+        """Aplica los eventos de progreso publicados por los procesos de trabajo. Devuelve los proyectos que empezaron."""
+        started = []
+        while True:
+            try:
+                kind, index, value, message = events.get_nowait()
+            except queue.Empty:
+                return started
+            if kind == "start":
+                self.mark_started(proyectos[index])
+                started.append(index)
+            report(index, value, message)
+
+    @staticmethod
+    def _worker_error(proyecto: Dict, error: str, proyecto_dir: Optional[str] = None) -> Dict:
+        logger.error(f"Error procesando '{proyecto['titulo']}': {error}")
+        return {
+            "titulo": proyecto["titulo"],
+            "estado": "error",
+            "error": error,
+            "proyecto_dir": proyecto_dir,
+            "cms_publicacion_id": proyecto.get("cms_publicacion_id")
+        }
+
+    def mark_started(self, proyecto: Dict, proyecto_dir: Optional[str] = None):
+        """Marca la publicación del CMS como 'Generando' (con la carpeta del proyecto, si ya existe; si no, se conserva la guardada)."""
+        if "cms_publicacion_id" in proyecto:
+            self._update_cms(proyecto["cms_publicacion_id"], "Generando", proyecto_dir)
+
+    def mark_finished(self, proyecto: Dict, resultado: Dict) -> Dict:
+        """Actualiza el CMS con el resultado ('Generado' o 'Error') y lo anota en la metadata del proyecto."""
+        if "cms_publicacion_id" not in proyecto:
+            return resultado
+        if resultado["estado"] != "completado":
+            # Se conserva la carpeta para poder reanudar el proyecto desde su última etapa
+            # (sin proyecto_dir, update_publicacion_status mantiene la ruta ya guardada)
+            self._update_cms(proyecto["cms_publicacion_id"], "Error", resultado.get("proyecto_dir"))
+            return resultado
+
+        cms_updated = self._update_cms(proyecto["cms_publicacion_id"], "Generado", resultado["proyecto_dir"])
+        resultado["cms_updated"] = cms_updated
+        metadata = resultado.get("metadata", {})
+        metadata["cms_update_result"] = "success" if cms_updated else "error"
+        metadata["cms_update_timestamp"] = datetime.now().isoformat()
+        try:
+            with open(Path(resultado["proyecto_dir"]) / "batch_metadata.json", "w", encoding="utf-8") as f:
+                json.dump(metadata, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"No se pudo actualizar batch_metadata.json de '{proyecto['titulo']}': {e}")
+        return resultado
+
+    def _update_cms(self, publicacion_id: int, status: str, ruta_proyecto: Optional[str] = None) -> bool:
+        try:
+            updated = self.db_manager.update_publicacion_status(publicacion_id, status, ruta_proyecto)
+            if updated:
+                logger.info(f"CMS actualizado: Publicación {publicacion_id} → '{status}'")
+            return updated
+        except Exception as e:
+            logger.error(f"Error actualizando CMS (publicación {publicacion_id} → '{status}'): {e}")
+            return False
@@ -26,6 +26,36 @@ DEFAULT_CONFIG = {
             "image_generation": "black-forest-labs/flux-schnell",
             "image_prompt_generation": "models/gemini-1.5-flash-latest",
             "default_voice": "es-ES-AlvaroNeural"
+        },
+        # Límites de peticiones por proveedor o "proveedor/modelo" (token bucket)
+        "rate_limits": {
+            "gemini": {"requests_per_minute": 120, "burst": 4},
+            "openai": {"requests_per_minute": 300, "burst": 8},
+            "ollama": {"requests_per_minute": 600, "burst": 2}
+        },
+        # API asíncrona (agenerate_content / agenerate_image)
+        "async": {
+            "request_timeout": 180,
+            "max_http_connections": 100
+        },
+        # Descargas HTTP (sesión compartida con keep-alive)
+        "http": {
+            "pool_size": 20,
+            "timeout": 60,
+            "max_retries": 2
+        },
+        # Almacén de imágenes por modelo/prompt/parámetros (reutilización entre proyectos)
+        "image_store": {
+            "enabled": True,
+            "path": "cache/images",
+            "max_size_mb": 5000
+        },
+        # Caché persistente de respuestas de texto (SQLite)
+        "llm_cache": {
+            "enabled": True,
+            "path": "cache/llm_cache.sqlite",
+            "ttl_hours": 720,
+            "max_entries": 20000
         }
     },
     "tts": {
@@ -33,7 +63,8 @@ DEFAULT_CONFIG = {
         "edge": {
             "default_voice": "es-ES-AlvaroNeural",
             "default_rate": "+0%",
-            "default_pitch": "+0Hz"
+            "default_pitch": "+0Hz",
+            "capture_word_timings": True  # Guardar tiempos de palabra y saltar la transcripción
         },
         "fish_audio": {
             "api_key": "",  # Se cargará desde variable de entorno
@@ -75,16 +106,48 @@ DEFAULT_CONFIG = {
         "audio": {
             "default_music_volume": 0.08,
             "normalize_audio": True
+        },
+        "batch_processing": {
+            "max_parallel_videos": 3,  # Proyectos del lote procesados a la vez (procesos independientes)
+            "mode": "projects",  # "projects" (proyectos completos en paralelo) o "stages" (etapas por recurso)
+            "stage_limits": {
+                "network": 4,  # Etapas de red a la vez (guion, voz, escenas/prompts, imágenes)
+                "cpu": 1  # Etapas de CPU a la vez (transcripción, render)
+            },
+            "job_queue": {  # Cola persistente que ejecuta job_worker.py fuera de Streamlit
+                "enabled": True,  # False = procesar el lote dentro de la sesión de Streamlit
+                "poll_interval_seconds": 5,
+                "heartbeat_seconds": 15,
+                "stale_after_seconds": 120,  # Trabajo sin señal de vida -> vuelve a la cola
+                "max_attempts": 3
+            }
         }
     },
     "transcription": {
-        "service_type": "local",  # "local" o "replicate"
+        "service_type": "local",  # "local", "replicate" o "fake" (simulado)
+        "mode": "asr",  # "asr" (Whisper) o "alignment" (alinear el guion conocido con el audio)
+        "cache": {
+            "enabled": True  # Reutilizar transcripciones del mismo audio entre proyectos (cache/transcriptions)
+        },
+        "streaming": {
+            "enabled": True  # Generar escenas y prompts mientras se transcribe (Whisper local)
+        },
         "local": {
             "model_size": "medium",
             "device": "cpu",
             "compute_type": "int8",
             "default_language": "es",
-            "beam_size": 5
+            "beam_size": 5,
+            "cpu_threads": 0,  # 0 = valor por defecto de CTranslate2
+            "num_workers": 1,  # Transcripciones concurrentes sobre el modelo compartido
+            "warmup_on_batch": True,  # Cargar/calentar el modelo al iniciar un lote
+            "evict_after_batch": True,  # Liberar el modelo de memoria al terminar el lote
+            "long_audio": {
+                "enabled": True,
+                "min_duration_seconds": 600,  # A partir de aquí se transcribe por fragmentos
+                "max_chunk_seconds": 120,
+                "max_workers": 2  # Fragmentos en paralelo (eleva num_workers del modelo)
+            }
         },
         "replicate": {
             "default_language": "es",
@@ -94,9 +157,27 @@ DEFAULT_CONFIG = {
             "diarise_audio": False,
             "hf_token": None,
             "temperature": 0.0,
-            "vad_threshold": 0.5
+            "vad_threshold": 0.5,
+            "base_url": None,  # API alternativa (p.ej. servidor local de pruebas)
+            "chunked": {
+                "enabled": True,
+                "min_duration_seconds": 600,  # A partir de aquí se envía por fragmentos
+                "max_chunk_seconds": 300,
+                "max_concurrency": 4,  # Predicciones simultáneas
+                "max_retries": 2,  # Reintentos por fragmento fallido
+                "retry_backoff_seconds": 5,  # Espera antes de reintentar (se duplica en cada intento)
+                "timeout_seconds": 3600  # Tiempo máximo para todos los fragmentos
+            }
         }
     },
+    # Proveedores simulados sin red (provider/tts_provider/service_type "fake") para benchmarks
+    "fake_providers": {
+        "seed": 0,
+        "llm": {"latency_seconds": 0.3, "jitter_seconds": 0.1, "failure_rate": 0.0, "script_words": 600},
+        "image": {"latency_seconds": 2.0, "jitter_seconds": 0.5, "failure_rate": 0.0, "width": 768},
+        "tts": {"latency_seconds": 1.0, "jitter_seconds": 0.0, "failure_rate": 0.0, "words_per_minute": 150},
+        "transcription": {"latency_seconds": 0.5, "jitter_seconds": 0.0, "failure_rate": 0.0}
+    },
     "output_dir": "output",
     "projects_dir": "projects",
     "temp_dir": "temp",
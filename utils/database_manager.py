@@ -24,7 +24,8 @@ class DatabaseManager:
     def _get_connection(self) -> sqlite3.Connection:
         """Crea y devuelve una conexión a la base de datos."""
         try:
-            conn = sqlite3.connect(self.db_path)
+            # timeout: los procesos del lote en paralelo escriben en la misma base (métricas)
+            conn = sqlite3.connect(self.db_path, timeout=30)
             # Usar Row factory para obtener resultados como diccionarios
             conn.row_factory = sqlite3.Row
             return conn
@@ -66,6 +67,26 @@ class DatabaseManager:
                     FOREIGN KEY (id_canal) REFERENCES Canales (id)
                 )
                 ''')
+                
+                # Métricas por etapa de cada proyecto generado (utils/pipeline_metrics.py)
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS MetricasEtapas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    proyecto_id TEXT NOT NULL,
+                    titulo TEXT,
+                    etapa TEXT NOT NULL,
+                    wall_seconds REAL,
+                    cpu_seconds REAL,
+                    peak_rss_mb REAL,
+                    bytes_leidos INTEGER,
+                    bytes_escritos INTEGER,
+                    llamadas_api INTEGER DEFAULT 0,
+                    render_fps REAL,
+                    estado_final TEXT,
+                    fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE (proyecto_id, etapa)
+                )
+                ''')
                 logger.info(f"Base de datos inicializada correctamente en {self.db_path}")
         except sqlite3.Error as e:
             logger.error(f"Error al inicializar las tablas: {e}", exc_info=True)
@@ -172,6 +193,43 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    def get_publicaciones_por_estado(self, estados: List[str], canal: Optional[str] = None,
+                                     ids: Optional[List[int]] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Obtiene las publicaciones en los estados indicados (las más antiguas primero).
+
+        Args:
+            estados: Estados a incluir (p.ej. ['Pendiente'])
+            canal: Nombre o ID del canal (None = todos)
+            ids: Limitar a estas publicaciones
+            limit: Máximo de publicaciones
+        """
+        sql = f'''
+        SELECT p.*, c.nombre as nombre_canal
+        FROM Publicaciones p
+        JOIN Canales c ON p.id_canal = c.id
+        WHERE p.status IN ({','.join('?' * len(estados))})
+        '''
+        params: List[Any] = list(estados)
+        if canal is not None:
+            sql += ' AND (c.nombre = ? OR CAST(c.id AS TEXT) = ?)'
+            params.extend([str(canal), str(canal)])
+        if ids:
+            sql += f' AND p.id IN ({",".join("?" * len(ids))})'
+            params.extend(ids)
+        sql += ' ORDER BY p.fecha_planificacion, p.id'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        conn = self._get_connection()
+        try:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error al obtener publicaciones con estado {estados}: {e}", exc_info=True)
+            return []
+        finally:
+            conn.close()
+
     def update_publicacion(self, publicacion_id: int, titulo: str = None, guion: str = None, contexto: str = None, script_type: str = None) -> bool:
         """Actualiza los datos de una publicación."""
         updates = []
@@ -210,14 +268,17 @@ class DatabaseManager:
         finally:
             conn.close()
             
-    def update_publicacion_status(self, id_publicacion: int, status: str, ruta_proyecto: Optional[str] = None):
-        """Actualiza el estado y opcionalmente la ruta de una publicación."""
+    def update_publicacion_status(self, id_publicacion: int, status: str, ruta_proyecto: Optional[str] = None) -> bool:
+        """
+        Actualiza el estado y opcionalmente la ruta de una publicación. Devuelve True si fue exitoso.
+        Sin ruta_proyecto se conserva la ruta guardada (la necesita la reanudación del lote).
+        """
         # Si el estado es 'Subido', actualizamos también la fecha de subida.
         if status == 'Subido':
             sql = 'UPDATE Publicaciones SET status = ?, fecha_subida = CURRENT_TIMESTAMP WHERE id = ?'
             params = (status, id_publicacion)
         else:
-            sql = 'UPDATE Publicaciones SET status = ?, ruta_proyecto = ? WHERE id = ?'
+            sql = 'UPDATE Publicaciones SET status = ?, ruta_proyecto = COALESCE(?, ruta_proyecto) WHERE id = ?'
             params = (status, ruta_proyecto, id_publicacion)
         
         conn = self._get_connection()
@@ -225,8 +286,10 @@ class DatabaseManager:
             with conn:
                 conn.execute(sql, params)
                 logger.info(f"Estado de la publicación {id_publicacion} actualizado a '{status}'.")
+            return True
         except sqlite3.Error as e:
             logger.error(f"Error al actualizar la publicación {id_publicacion}: {e}", exc_info=True)
+            return False
         finally:
             conn.close()
 
@@ -249,6 +312,76 @@ class DatabaseManager:
         finally:
             conn.close()
 
+    # --- Operaciones para Métricas del pipeline ---
+
+    def save_metricas_proyecto(self, proyecto_id: str, titulo: str, metrics: Dict[str, Any], estado_final: Optional[str] = None) -> bool:
+        """Guarda (o reemplaza) las métricas por etapa de un proyecto."""
+        sql = '''
+        INSERT OR REPLACE INTO MetricasEtapas
+            (proyecto_id, titulo, etapa, wall_seconds, cpu_seconds, peak_rss_mb, bytes_leidos, bytes_escritos,
+             llamadas_api, render_fps, estado_final)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        '''
+        rows = [
+            (proyecto_id, titulo, etapa, m.get("wall_seconds"), m.get("cpu_seconds"), m.get("peak_rss_mb"),
+             m.get("bytes_read"), m.get("bytes_written"), sum((m.get("api_calls") or {}).values()),
+             m.get("render_fps"), estado_final)
+            for etapa, m in (metrics.get("stages") or {}).items()
+        ]
+        conn = self._get_connection()
+        try:
+            with conn:
+                conn.executemany(sql, rows)
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error al guardar las métricas del proyecto {proyecto_id}: {e}", exc_info=True)
+            return False
+        finally:
+            conn.close()
+
+    def get_resumen_metricas(self, dias: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Agregados de las métricas guardadas: por etapa y por proyecto.
+
+        Args:
+            dias: Limitar a los proyectos de los últimos N días (None = todos)
+        """
+        where = "WHERE fecha >= datetime('now', ?)" if dias else ""
+        params = (f"-{int(dias)} days",) if dias else ()
+        sql_etapas = f'''
+        SELECT etapa,
+               COUNT(*) AS proyectos,
+               AVG(wall_seconds) AS wall_medio,
+               MAX(wall_seconds) AS wall_max,
+               AVG(cpu_seconds) AS cpu_medio,
+               MAX(peak_rss_mb) AS rss_max_mb,
+               AVG(bytes_escritos) AS bytes_escritos_medio,
+               SUM(llamadas_api) AS llamadas_api,
+               AVG(render_fps) AS render_fps_medio
+        FROM MetricasEtapas {where}
+        GROUP BY etapa
+        ORDER BY MIN(id)
+        '''
+        sql_proyectos = f'''
+        SELECT proyecto_id, titulo, MAX(estado_final) AS estado_final, MAX(fecha) AS fecha,
+               SUM(wall_seconds) AS wall_total, SUM(cpu_seconds) AS cpu_total,
+               MAX(peak_rss_mb) AS rss_max_mb, SUM(llamadas_api) AS llamadas_api,
+               MAX(render_fps) AS render_fps
+        FROM MetricasEtapas {where}
+        GROUP BY proyecto_id
+        ORDER BY MAX(fecha) DESC
+        '''
+        conn = self._get_connection()
+        try:
+            etapas = [dict(row) for row in conn.execute(sql_etapas, params).fetchall()]
+            proyectos = [dict(row) for row in conn.execute(sql_proyectos, params).fetchall()]
+            return {"etapas": etapas, "proyectos": proyectos}
+        except sqlite3.Error as e:
+            logger.error(f"Error al obtener el resumen de métricas: {e}", exc_info=True)
+            return {"etapas": [], "proyectos": []}
+        finally:
+            conn.close()
+
 # --- Punto de entrada para inicialización manual (opcional) ---
 if __name__ == '__main__':
     logger.info("Inicializando DatabaseManager para una ejecución de script.")
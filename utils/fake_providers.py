@@ -0,0 +1,505 @@
+# utils/fake_providers.py
+"""
+Proveedores simulados, deterministas y sin red, para todo el pipeline.
+
+Se seleccionan con el nombre de proveedor "fake" en los puntos habituales:
+AIServices.generate_content / generate_image (provider="fake"),
+generate_tts_audio (tts_provider="fake") y get_transcription_service("fake")
+(transcription.service_type: fake). Permiten medir el rendimiento y la
+concurrencia de VideoProcessor.process_single_video en una máquina sin claves.
+
+- LLM: respuestas por plantilla (guion, array JSON de prompts por lotes,
+  contexto histórico en JSON y prompt de imagen).
+- Imágenes: archivos webp reales generados proceduralmente a partir del prompt.
+- TTS: WAV con una duración conocida (palabras por minuto) y un archivo
+  auxiliar con los tiempos de cada palabra.
+- Transcripción: segmentos derivados del guion usando esos tiempos.
+
+Cada proveedor tiene latencia y tasa de fallos configurables
+(config.yaml -> fake_providers). Los fallos son deterministas por semilla,
+petición e intento, de modo que los reintentos pueden tener éxito.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import wave
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from utils.transcription_utils import build_segments_from_words, save_transcription_json
+
+logger = logging.getLogger(__name__)
+
+FAKE_PROVIDER = "fake"
+
+WORDS = (
+    "el monje camina por el claustro mientras la campana anuncia la oración y los peregrinos "
+    "llegan desde tierras lejanas buscando consuelo en la antigua abadía de piedra junto al río "
+    "donde el abad escribe crónicas de reyes batallas milagros y cosechas perdidas"
+).split()
+
+
+class FakeProviderError(RuntimeError):
+    """Fallo inyectado por un proveedor simulado."""
+
+
+class FaultInjector:
+    """Latencia y fallos deterministas, con métricas de concurrencia."""
+
+    def __init__(self, name: str, latency_seconds: float = 0.0, jitter_seconds: float = 0.0,
+                 failure_rate: float = 0.0, seed: int = 0):
+        """
+        Args:
+            name: Nombre del proveedor (para logs y métricas)
+            latency_seconds: Latencia media por petición
+            jitter_seconds: Variación máxima (+/-) de la latencia
+            failure_rate: Probabilidad de fallo por intento (0-1)
+            seed: Semilla; misma semilla y misma petición = mismo resultado
+        """
+        self.name = name
+        self.latency_seconds = max(float(latency_seconds), 0.0)
+        self.jitter_seconds = max(float(jitter_seconds), 0.0)
+        self.failure_rate = min(max(float(failure_rate), 0.0), 1.0)
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._attempts: Dict[str, int] = {}
+        self.calls = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self.active = 0
+        self.peak_concurrency = 0
+
+    def _plan(self, key: str) -> Tuple[float, bool]:
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        rng = random.Random(f"{self.seed}|{self.name}|{key}|{attempt}")
+        latency = max(self.latency_seconds + rng.uniform(-self.jitter_seconds, self.jitter_seconds), 0.0)
+        return latency, rng.random() < self.failure_rate
+
+    def _enter(self):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak_concurrency = max(self.peak_concurrency, self.active)
+
+    def _exit(self, latency: float, failed: bool):
+        with self._lock:
+            self.active -= 1
+            self.busy_seconds += latency
+            if failed:
+                self.failures += 1
+
+    def inject(self, key: str):
+        """
+        Simula la petición identificada por key: espera la latencia y, si toca, falla.
+
+        Raises:
+            FakeProviderError: Si el intento está marcado como fallido
+        """
+        latency, failed = self._plan(key)
+        self._enter()
+        try:
+            if latency:
+                time.sleep(latency)
+        finally:
+            self._exit(latency, failed)
+        if failed:
+            raise FakeProviderError(f"Fallo simulado de {self.name} (clave {key[:12]})")
+
+    async def ainject(self, key: str):
+        """Versión asíncrona de inject (no bloquea el bucle de eventos)."""
+        latency, failed = self._plan(key)
+        self._enter()
+        try:
+            if latency:
+                await asyncio.sleep(latency)
+        finally:
+            self._exit(latency, failed)
+        if failed:
+            raise FakeProviderError(f"Fallo simulado de {self.name} (clave {key[:12]})")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "failures": self.failures,
+                "busy_seconds": round(self.busy_seconds, 3),
+                "peak_concurrency": self.peak_concurrency
+            }
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def _rng(seed: int, *parts) -> random.Random:
+    return random.Random(_digest(seed, *parts))
+
+
+class FakeLLM:
+    """LLM por plantillas que reconoce las peticiones del pipeline."""
+
+    def __init__(self, faults: FaultInjector, seed: int = 0, script_words: int = 600,
+                 paragraph_words: int = 60):
+        """
+        Args:
+            faults: Latencia/fallos del proveedor
+            seed: Semilla de las respuestas
+            script_words: Palabras de los guiones generados
+            paragraph_words: Palabras por párrafo del guion
+        """
+        self.faults = faults
+        self.seed = seed
+        self.script_words = script_words
+        self.paragraph_words = max(paragraph_words, 10)
+
+    def _sentence(self, rng: random.Random, num_words: int) -> str:
+        words = [rng.choice(WORDS) for _ in range(max(num_words, 1))]
+        return " ".join(words).capitalize() + "."
+
+    def _script(self, rng: random.Random, title: str, num_words: Optional[int] = None) -> str:
+        paragraphs = []
+        remaining = num_words or self.script_words
+        while remaining > 0:
+            size = min(self.paragraph_words, remaining)
+            sentences = []
+            while size > 0:
+                length = min(rng.randint(8, 16), size)
+                sentences.append(self._sentence(rng, length))
+                size -= length
+            paragraphs.append(" ".join(sentences))
+            remaining -= self.paragraph_words
+        if title:
+            paragraphs[0] = f"{title}. {paragraphs[0]}"
+        return "\n\n".join(paragraphs)
+
+    def _image_prompt(self, rng: random.Random, scene_text: str) -> str:
+        keywords = [w for w in re.findall(r"\w{4,}", scene_text.lower())][:8] or [rng.choice(WORDS)]
+        return (f"Cinematic painting of {' '.join(keywords)}, {rng.choice(['dawn', 'dusk', 'candlelight', 'overcast'])} light, "
+                f"{rng.choice(['wide shot', 'close-up', 'medium shot'])}, historically accurate details")
+
+    def respond(self, system_prompt: str, user_prompt: str, model: str = "") -> str:
+        """Respuesta determinista para la petición (sin latencia ni fallos)."""
+        rng = _rng(self.seed, model, system_prompt, user_prompt)
+        if "ESCENAS:" in user_prompt:
+            scene_lines = re.findall(r"^(\d+)\.\s*(.*)$", user_prompt.split("ESCENAS:", 1)[1], flags=re.MULTILINE)
+            return json.dumps([{"scene": int(n), "prompt": self._image_prompt(rng, text)} for n, text in scene_lines],
+                              ensure_ascii=False)
+        if "periodo_historico" in system_prompt:
+            return json.dumps({
+                "periodo_historico": "Edad Media (siglo XII)",
+                "ubicacion": "Castilla, España",
+                "contexto_cultural": "Monacato benedictino y peregrinaciones",
+                "fecha_nacimiento": "1120",
+                "fecha_muerte": "1190",
+                "edad_personaje": str(rng.randint(30, 70))
+            }, ensure_ascii=False)
+        if re.search(r"\b(guion|guión|script|narraci[oó]n)\b", user_prompt, flags=re.IGNORECASE) \
+                and not re.search(r"\bprompt\b", system_prompt + user_prompt, flags=re.IGNORECASE):
+            title = re.search(r"T[IÍ]TULO:\s*(.+)", user_prompt)
+            return self._script(rng, title.group(1).strip() if title else "")
+        return self._image_prompt(rng, user_prompt[-400:])
+
+    def generate(self, system_prompt: str, user_prompt: str, model: str = "") -> str:
+        self.faults.inject(_digest("llm", model, system_prompt, user_prompt))
+        return self.respond(system_prompt, user_prompt, model)
+
+    async def agenerate(self, system_prompt: str, user_prompt: str, model: str = "") -> str:
+        await self.faults.ainject(_digest("llm", model, system_prompt, user_prompt))
+        return self.respond(system_prompt, user_prompt, model)
+
+
+def synthetic_script(minutes: float, words_per_minute: float = 150, seed: int = 0, title: str = "") -> str:
+    """
+    Guion de prueba cuya narración con FakeTTS dura exactamente minutes minutos.
+
+    Args:
+        minutes: Duración deseada de la narración
+        words_per_minute: Ritmo de FakeTTS con el que se sintetizará
+        seed: Semilla del texto
+        title: Título que encabeza el guion (cuenta como palabras)
+    """
+    num_words = max(int(round(minutes * words_per_minute)), 1)
+    llm = FakeLLM(FaultInjector("script"), seed=seed)
+    script = llm._script(_rng(seed, "script", minutes), "", num_words - len(title.split()))
+    return f"{title}. {script}" if title else script
+
+
+class FakeImageGenerator:
+    """Imágenes procedurales (degradado + formas) derivadas del prompt."""
+
+    def __init__(self, faults: FaultInjector, seed: int = 0, width: int = 768):
+        """
+        Args:
+            faults: Latencia/fallos del proveedor
+            seed: Semilla de las imágenes
+            width: Ancho en píxeles; el alto sale de la relación de aspecto
+        """
+        self.faults = faults
+        self.seed = seed
+        self.width = int(width)
+
+    def _size(self, aspect_ratio: str) -> Tuple[int, int]:
+        try:
+            w, h = (float(x) for x in str(aspect_ratio).split(":"))
+        except ValueError:
+            w, h = 16.0, 9.0
+        return self.width, max(int(round(self.width * h / w / 8.0)) * 8, 8)
+
+    def render(self, prompt: str, aspect_ratio: str = "16:9", output_format: str = "webp",
+               output_quality: int = 85) -> bytes:
+        """Dibuja la imagen del prompt y devuelve los bytes codificados."""
+        from PIL import Image, ImageDraw
+        import io
+
+        rng = _rng(self.seed, "image", prompt)
+        width, height = self._size(aspect_ratio)
+        top, bottom = np.array([rng.randint(0, 255) for _ in range(3)]), np.array([rng.randint(0, 255) for _ in range(3)])
+        ramp = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None, None]
+        pixels = (top * (1 - ramp) + bottom * ramp).astype(np.uint8)
+        image = Image.fromarray(np.repeat(pixels, width, axis=1), "RGB")
+        draw = ImageDraw.Draw(image)
+        for _ in range(rng.randint(3, 7)):
+            x0, y0 = rng.randint(0, width - 1), rng.randint(0, height - 1)
+            radius = rng.randint(height // 12, height // 3)
+            draw.ellipse((x0 - radius, y0 - radius, x0 + radius, y0 + radius),
+                         fill=tuple(rng.randint(0, 255) for _ in range(3)))
+        buffer = io.BytesIO()
+        pil_format = "JPEG" if str(output_format).lower() in ("jpg", "jpeg") else str(output_format).upper()
+        image.save(buffer, format=pil_format, quality=int(output_quality))
+        return buffer.getvalue()
+
+    def _write(self, data: bytes, output_path: Optional[str]) -> Union[str, bytes]:
+        if not output_path:
+            return data
+        dest = Path(output_path)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.", suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, dest)
+        return str(dest)
+
+    def generate(self, prompt: str, output_path: Optional[str] = None, aspect_ratio: str = "16:9",
+                 output_format: str = "webp", output_quality: int = 85, **kwargs) -> Union[str, bytes]:
+        """Misma interfaz que AIServices._generate_image_with_replicate."""
+        self.faults.inject(_digest("image", prompt, aspect_ratio, output_format))
+        return self._write(self.render(prompt, aspect_ratio, output_format, output_quality), output_path)
+
+    async def agenerate(self, prompt: str, output_path: Optional[str] = None, aspect_ratio: str = "16:9",
+                        output_format: str = "webp", output_quality: int = 85, **kwargs) -> Union[str, bytes]:
+        await self.faults.ainject(_digest("image", prompt, aspect_ratio, output_format))
+        data = await asyncio.to_thread(self.render, prompt, aspect_ratio, output_format, output_quality)
+        return await asyncio.to_thread(self._write, data, output_path)
+
+
+def _timings_path(audio_path: Union[str, Path]) -> Path:
+    audio_path = Path(audio_path)
+    return audio_path.with_name(f"{audio_path.stem}.fake_words.json")
+
+
+class FakeTTS:
+    """Voz sintética (WAV) con duración conocida y tiempos de palabra."""
+
+    def __init__(self, faults: FaultInjector, words_per_minute: float = 150, sample_rate: int = 16000,
+                 sentence_pause: float = 0.35):
+        """
+        Args:
+            faults: Latencia/fallos del proveedor
+            words_per_minute: Ritmo de locución; fija la duración del audio
+            sample_rate: Frecuencia de muestreo del WAV
+            sentence_pause: Pausa en segundos tras cada punto
+        """
+        self.faults = faults
+        self.words_per_minute = float(words_per_minute)
+        self.sample_rate = int(sample_rate)
+        self.sentence_pause = float(sentence_pause)
+
+    def duration_for(self, text: str) -> float:
+        """Duración exacta del audio que se generará para text: palabras / palabras por minuto."""
+        return len(text.split()) * 60.0 / self.words_per_minute
+
+    def word_timings(self, text: str) -> List[Dict]:
+        """Tiempos de cada palabra: proporcionales a su longitud, con pausas entre frases."""
+        tokens = text.split()
+        if not tokens:
+            return []
+        pauses = self.sentence_pause * sum(1 for t in tokens[:-1] if t.endswith((".", "!", "?")))
+        speech = max(self.duration_for(text) - pauses, 0.05 * len(tokens))
+        weights = [len(re.sub(r"\W", "", t)) + 2 for t in tokens]
+        scale = speech / sum(weights)
+        words, cursor = [], 0.0
+        for token, weight in zip(tokens, weights):
+            duration = weight * scale
+            words.append({"text": token, "start": round(cursor, 3), "end": round(cursor + duration * 0.9, 3)})
+            cursor += duration
+            if token.endswith((".", "!", "?")) and token is not tokens[-1]:
+                cursor += self.sentence_pause
+        return words
+
+    def _render_wav(self, words: List[Dict], output_path: Path, duration: float):
+        """Un tono breve por palabra sobre silencio (PCM 16 bits mono)."""
+        samples = np.zeros(int(duration * self.sample_rate) + 1, dtype=np.float32)
+        for n, word in enumerate(words):
+            start, end = int(word["start"] * self.sample_rate), int(word["end"] * self.sample_rate)
+            t = np.arange(end - start, dtype=np.float32) / self.sample_rate
+            samples[start:end] = 0.2 * np.sin(2 * np.pi * (180 + 20 * (n % 5)) * t)
+        with wave.open(str(output_path), "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes((samples * 32767).astype("<i2").tobytes())
+
+    def synthesize(self, text: str, output_dir: str = "audio", word_timings_path: Optional[str] = None) -> str:
+        """
+        Genera la narración en output_dir/fake_<hash>.wav.
+
+        Args:
+            text: Texto a sintetizar
+            output_dir: Directorio de salida
+            word_timings_path: Si se indica, guarda también la transcripción (como Edge TTS)
+
+        Returns:
+            str: Ruta al WAV generado
+        """
+        self.faults.inject(_digest("tts", text))
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_path = output_dir / f"fake_{_digest(text)[:12]}.wav"
+        words = self.word_timings(text)
+        duration = max(self.duration_for(text), words[-1]["end"] if words else 0.0)
+        self._render_wav(words, output_path, duration)
+        with open(_timings_path(output_path), "w", encoding="utf-8") as f:
+            json.dump({"text": text, "duration": duration, "words": words}, f, ensure_ascii=False)
+        if word_timings_path:
+            segments = build_segments_from_words(words)
+            save_transcription_json(segments, {"source": "fake_tts", "num_words": len(words),
+                                               "num_segments": len(segments)}, word_timings_path)
+        logger.info(f"Audio simulado generado: {output_path} ({duration:.1f}s, {len(words)} palabras)")
+        return str(output_path)
+
+
+class FakeTranscriptionService:
+    """Transcripción a partir del guion sintetizado por FakeTTS (sin ASR)."""
+
+    def __init__(self, faults: FaultInjector):
+        self.faults = faults
+
+    def cache_descriptor(self) -> Tuple[str, str]:
+        return FAKE_PROVIDER, "script"
+
+    def _load_words(self, audio_path: str) -> List[Dict]:
+        if not Path(audio_path).exists():
+            raise FileNotFoundError(f"No se encontró el archivo de audio: {audio_path}")
+        timings_path = _timings_path(audio_path)
+        if not timings_path.exists():
+            raise FakeProviderError(f"{audio_path} no fue generado por el TTS simulado (falta {timings_path.name})")
+        with open(timings_path, "r", encoding="utf-8") as f:
+            return json.load(f)["words"]
+
+    def transcribe_audio(self, audio_path: str, language: str = "es", **kwargs) -> Tuple[List[Dict], Dict]:
+        """
+        Returns:
+            Tuple[List[Dict], Dict]: Segmentos con palabras y metadata, como TranscriptionService
+        """
+        start = time.time()
+        self.faults.inject(_digest("transcription", audio_path))
+        words = self._load_words(audio_path)
+        segments = build_segments_from_words(words)
+        return segments, {
+            "duration": round(time.time() - start, 3),
+            "language": language,
+            "language_probability": 1.0,
+            "num_words": len(words),
+            "num_segments": len(segments)
+        }
+
+    def transcribe_audio_chunked(self, audio_path: str, language: str = "es", **kwargs) -> Tuple[List[Dict], Dict]:
+        """Acepta los parámetros de ambos servicios reales; el resultado es el mismo."""
+        return self.transcribe_audio(audio_path, language=language)
+
+    def transcribe_audio_stream(self, audio_path: str, language: str = "es", metadata: Optional[Dict] = None,
+                                **kwargs) -> Iterator[Dict]:
+        segments, info = self.transcribe_audio(audio_path, language=language)
+        if metadata is not None:
+            metadata.update({**info, "mode": "streaming"})
+        yield from segments
+
+    def save_transcription(self, segments: List[Dict], metadata: Dict, output_path: str, format: str = "json") -> str:
+        return save_transcription_json(segments, metadata, output_path)
+
+
+class FakeProviders:
+    """Conjunto de proveedores simulados creado desde config.yaml -> fake_providers."""
+
+    def __init__(self, fake_config: Optional[Dict] = None):
+        fake_config = fake_config or {}
+        seed = fake_config.get("seed", 0)
+
+        def faults(name: str) -> FaultInjector:
+            section = fake_config.get(name, {}) or {}
+            return FaultInjector(
+                name,
+                latency_seconds=section.get("latency_seconds", 0.0),
+                jitter_seconds=section.get("jitter_seconds", 0.0),
+                failure_rate=section.get("failure_rate", 0.0),
+                seed=seed
+            )
+
+        llm_config = fake_config.get("llm", {}) or {}
+        image_config = fake_config.get("image", {}) or {}
+        tts_config = fake_config.get("tts", {}) or {}
+        self.llm = FakeLLM(faults("llm"), seed=seed, script_words=llm_config.get("script_words", 600),
+                           paragraph_words=llm_config.get("paragraph_words", 60))
+        self.images = FakeImageGenerator(faults("image"), seed=seed, width=image_config.get("width", 768))
+        self.tts = FakeTTS(faults("tts"), words_per_minute=tts_config.get("words_per_minute", 150),
+                           sample_rate=tts_config.get("sample_rate", 16000))
+        self.transcription = FakeTranscriptionService(faults("transcription"))
+
+    def stats(self) -> Dict:
+        """Llamadas, fallos, tiempo ocupado y concurrencia máxima por proveedor."""
+        return {
+            "llm": self.llm.faults.stats(),
+            "image": self.images.faults.stats(),
+            "tts": self.tts.faults.stats(),
+            "transcription": self.transcription.faults.stats()
+        }
+
+
+# Instancia global de los proveedores simulados
+_fake_providers = None
+_fake_providers_lock = threading.Lock()
+
+def get_fake_providers(fake_config: Optional[Dict] = None) -> FakeProviders:
+    """Obtiene los proveedores simulados (config.yaml -> fake_providers si no se pasa configuración)"""
+    global _fake_providers
+    with _fake_providers_lock:
+        if _fake_providers is None:
+            if fake_config is None:
+                try:
+                    from utils.config import load_config
+                    fake_config = load_config().get("fake_providers", {}) or {}
+                except Exception as e:
+                    logger.warning(f"No se pudo cargar fake_providers de la configuración, usando valores por defecto: {e}")
+                    fake_config = {}
+            _fake_providers = FakeProviders(fake_config)
+    return _fake_providers
+
+
+def reset_fake_providers(fake_config: Optional[Dict] = None) -> FakeProviders:
+    """Descarta la instancia global y crea una nueva (p.ej. entre ejecuciones de un benchmark)."""
+    global _fake_providers
+    with _fake_providers_lock:
+        _fake_providers = None
+    return get_fake_providers(fake_config)
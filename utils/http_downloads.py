@@ -0,0 +1,203 @@
+# utils/http_downloads.py
+"""
+Descargas HTTP con conexiones reutilizadas y escritura en streaming.
+
+Cada imagen generada se descargaba con requests.get sin sesión (un handshake
+TCP+TLS nuevo por imagen) y con el cuerpo completo en memoria antes de
+escribirlo. Este módulo ofrece una sesión compartida con pool de conexiones
+keep-alive, vuelca el cuerpo por bloques a un temporal que se renombra de forma
+atómica al terminar, verifica opcionalmente el SHA-256 y acumula métricas de
+bytes y latencia.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+
+class DownloadError(Exception):
+    """Fallo al descargar o verificar un archivo."""
+
+
+class DownloadMetrics:
+    """Contadores de descargas seguros entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.downloads = 0
+        self.failures = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def record(self, num_bytes: int, seconds: float, ok: bool = True):
+        with self._lock:
+            if ok:
+                self.downloads += 1
+                self.bytes += num_bytes
+                self.seconds += seconds
+            else:
+                self.failures += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "downloads": self.downloads,
+                "failures": self.failures,
+                "bytes": self.bytes,
+                "avg_latency_s": round(self.seconds / self.downloads, 3) if self.downloads else 0.0,
+                "throughput_mb_s": round(self.bytes / self.seconds / 1e6, 2) if self.seconds else 0.0
+            }
+
+
+def _write_atomic_stream(chunks, dest: Path, expected_sha256: Optional[str]) -> Dict:
+    """Vuelca los bloques a un temporal junto a dest, verifica el hash y renombra."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    sha = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                if chunk:
+                    f.write(chunk)
+                    sha.update(chunk)
+                    size += len(chunk)
+        digest = sha.hexdigest()
+        if expected_sha256 and digest != expected_sha256.lower():
+            raise DownloadError(f"Hash SHA-256 no coincide para {dest.name}: {digest} != {expected_sha256}")
+        os.replace(tmp_path, dest)
+        return {"path": str(dest), "bytes": size, "sha256": digest}
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class HTTPDownloader:
+    """Sesión HTTP compartida para descargas (imágenes de Replicate, etc.)."""
+
+    def __init__(self, pool_size: int = 20, timeout: float = 60, max_retries: int = 2):
+        """
+        Args:
+            pool_size: Conexiones keep-alive por host
+            timeout: Timeout de conexión/lectura en segundos
+            max_retries: Reintentos ante errores de conexión y respuestas 429/5xx
+        """
+        self.timeout = timeout
+        self.metrics = DownloadMetrics()
+        self.session = requests.Session()
+        retry = Retry(total=max_retries, backoff_factor=0.5,
+                      status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(["GET"]))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def download_to_file(self, url: str, dest: str, expected_sha256: Optional[str] = None) -> Dict:
+        """
+        Descarga url en dest sin cargar el cuerpo en memoria.
+
+        Args:
+            url: URL a descargar
+            dest: Ruta final (se escribe en un temporal y se renombra)
+            expected_sha256: Hash esperado del contenido (opcional)
+
+        Returns:
+            Dict: path, bytes, sha256 y seconds de la descarga
+        """
+        start = time.monotonic()
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                result = _write_atomic_stream(response.iter_content(CHUNK_SIZE), Path(dest), expected_sha256)
+        except Exception:
+            self.metrics.record(0, time.monotonic() - start, ok=False)
+            raise
+        result["seconds"] = round(time.monotonic() - start, 3)
+        self.metrics.record(result["bytes"], result["seconds"])
+        logger.debug(f"Descargado {url} -> {dest} ({result['bytes']} bytes, {result['seconds']}s)")
+        return result
+
+    def download_bytes(self, url: str) -> bytes:
+        """Descarga url y devuelve el contenido (para archivos pequeños)."""
+        start = time.monotonic()
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except Exception:
+            self.metrics.record(0, time.monotonic() - start, ok=False)
+            raise
+        self.metrics.record(len(response.content), time.monotonic() - start)
+        return response.content
+
+    async def adownload_to_file(self, client, url: str, dest: str, expected_sha256: Optional[str] = None) -> Dict:
+        """
+        Versión asíncrona de download_to_file con un httpx.AsyncClient compartido.
+        Las escrituras en disco se hacen por bloques; el renombrado es atómico.
+        """
+        import asyncio
+
+        start = time.monotonic()
+        dest_path = Path(dest)
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dest_path.parent, prefix=f".{dest_path.name}.", suffix=".part")
+        sha = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        f.write(chunk)
+                        sha.update(chunk)
+                        size += len(chunk)
+            digest = sha.hexdigest()
+            if expected_sha256 and digest != expected_sha256.lower():
+                raise DownloadError(f"Hash SHA-256 no coincide para {dest_path.name}: {digest} != {expected_sha256}")
+            await asyncio.to_thread(os.replace, tmp_path, dest_path)
+        except BaseException:
+            self.metrics.record(0, time.monotonic() - start, ok=False)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        seconds = round(time.monotonic() - start, 3)
+        self.metrics.record(size, seconds)
+        return {"path": str(dest_path), "bytes": size, "sha256": digest, "seconds": seconds}
+
+    def stats(self) -> Dict:
+        """Métricas acumuladas de las descargas de este proceso."""
+        return self.metrics.stats()
+
+
+# Instancia global del descargador
+_http_downloader = None
+_http_downloader_lock = threading.Lock()
+
+def get_http_downloader(http_config: Optional[Dict] = None) -> HTTPDownloader:
+    """Obtiene el descargador global (config.yaml -> ai.http)"""
+    global _http_downloader
+    with _http_downloader_lock:
+        if _http_downloader is None:
+            http_config = http_config or {}
+            _http_downloader = HTTPDownloader(
+                pool_size=http_config.get("pool_size", 20),
+                timeout=http_config.get("timeout", 60),
+                max_retries=http_config.get("max_retries", 2)
+            )
+    return _http_downloader
@@ -0,0 +1,209 @@
+# utils/image_store.py
+"""
+Almacén de imágenes direccionado por contenido.
+
+Las series recurrentes (santos, biografías históricas) repiten prompts
+idénticos entre proyectos y cada repetición costaba una llamada a Replicate.
+El almacén guarda cada imagen generada bajo una clave derivada del modelo, el
+prompt y los parámetros que determinan el resultado, y sirve las repeticiones
+enlazando (hardlink) el archivo en la carpeta del proyecto.
+
+El tamaño total está acotado: al superarlo se eliminan las imágenes usadas hace
+más tiempo (hasta bajar al 90 % del límite). Los proyectos no se ven afectados
+porque tienen su propio enlace. El tamaño se lleva como un total acumulado que
+se calcula recorriendo el almacén una vez al abrirlo; solo se vuelve a recorrer
+al superar el límite, ya que otros procesos también añaden imágenes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = Path("cache") / "images"
+
+# Fracción del límite hasta la que se expulsa, para no recorrer el almacén en cada put() cerca del límite
+EVICT_TARGET_RATIO = 0.9
+
+
+class ImageStore:
+    """Imágenes en cache/images/<xx>/<clave>.<formato>, con expulsión por tamaño (LRU)."""
+
+    def __init__(self, store_dir: Optional[str] = None, max_size_mb: float = 5000):
+        """
+        Args:
+            store_dir: Directorio del almacén (por defecto cache/images)
+            max_size_mb: Tamaño máximo en MB; al superarlo se expulsan las menos usadas
+        """
+        self.store_dir = Path(store_dir) if store_dir else DEFAULT_STORE_DIR
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = sum(size for _, size, _ in self._scan())
+
+    def _scan(self):
+        """(mtime, tamaño, ruta) de cada imagen del almacén."""
+        entries = []
+        for path in self.store_dir.glob("*/*"):
+            if path.name.startswith("."):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # Expulsada por otro proceso mientras se recorría
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    @staticmethod
+    def make_key(model_id: str, prompt: str, aspect_ratio: str = "16:9", megapixels: str = "1",
+                 output_format: str = "webp", output_quality: int = 85, seed: Optional[int] = None) -> str:
+        """Construye la clave a partir de todo lo que determina la imagen."""
+        descriptor = json.dumps(
+            [model_id, prompt.strip(), str(aspect_ratio), str(megapixels), str(output_format).lower(),
+             int(output_quality) if output_quality is not None else None, seed]
+        )
+        return hashlib.sha256(descriptor.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str, output_format: str) -> Path:
+        return self.store_dir / key[:2] / f"{key}.{str(output_format).lower()}"
+
+    def lookup(self, key: str, output_format: str = "webp") -> Optional[str]:
+        """
+        Devuelve la ruta de la imagen almacenada para la clave o None.
+        Marca la entrada como usada recientemente.
+        """
+        entry_path = self._entry_path(key, output_format)
+        with self._lock:
+            if entry_path.exists() and entry_path.stat().st_size > 0:
+                self.hits += 1
+                try:
+                    os.utime(entry_path)
+                except OSError:
+                    pass
+                return str(entry_path)
+            self.misses += 1
+        return None
+
+    def link_into(self, key: str, dest: str, output_format: str = "webp") -> bool:
+        """
+        Coloca la imagen almacenada en dest (hardlink; copia si el sistema de
+        archivos no lo permite).
+
+        Returns:
+            bool: True si había imagen y se colocó en dest
+        """
+        entry_path = self.lookup(key, output_format)
+        if not entry_path:
+            return False
+        try:
+            link_or_copy(Path(entry_path), Path(dest))
+            logger.info(f"Imagen reutilizada del almacén: {Path(dest).name} <- {Path(entry_path).name}")
+            return True
+        except OSError as e:
+            logger.warning(f"No se pudo reutilizar la imagen {entry_path}: {e}")
+            return False
+
+    def put(self, key: str, src: str, output_format: str = "webp") -> Optional[str]:
+        """
+        Añade una imagen recién generada al almacén y aplica el límite de tamaño.
+
+        Returns:
+            Optional[str]: Ruta de la entrada o None si falló
+        """
+        src_path = Path(src)
+        if not src_path.exists() or src_path.stat().st_size == 0:
+            return None
+        entry_path = self._entry_path(key, output_format)
+        try:
+            if not entry_path.exists():
+                link_or_copy(src_path, entry_path)
+                with self._lock:
+                    self._total_bytes += entry_path.stat().st_size
+                    over_limit = self._total_bytes > self.max_bytes
+                if over_limit:
+                    self._evict()
+            return str(entry_path)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar la imagen en el almacén: {e}")
+            return None
+
+    def _evict(self):
+        """Recalcula el tamaño real y elimina las imágenes usadas hace más tiempo hasta bajar del objetivo."""
+        with self._lock:
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            self._total_bytes = total
+            if total <= self.max_bytes:
+                return
+            target = int(self.max_bytes * EVICT_TARGET_RATIO)
+            entries.sort()
+            removed = 0
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                    removed += 1
+                except OSError:
+                    continue
+            self._total_bytes = total
+            logger.info(f"Almacén de imágenes: {removed} imágenes expulsadas por tamaño")
+
+    def stats(self) -> Dict:
+        """Aciertos/fallos de este proceso y tamaño actual del almacén."""
+        sizes = [size for _, size, _ in self._scan()]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(sizes),
+            "size_mb": round(sum(sizes) / (1024 * 1024), 1),
+            "max_size_mb": round(self.max_bytes / (1024 * 1024), 1)
+        }
+
+
+def link_or_copy(src: Path, dest: Path):
+    """Enlaza src en dest de forma atómica (copia si no se puede enlazar)."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.", suffix=".tmp")
+    os.close(fd)
+    os.remove(tmp_path)
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dest)
+
+
+# Instancia global del almacén
+_image_store = None
+_image_store_lock = threading.Lock()
+
+def get_image_store(store_config: Optional[Dict] = None) -> Optional[ImageStore]:
+    """
+    Obtiene el almacén global de imágenes (config.yaml -> ai.image_store).
+
+    Returns:
+        Optional[ImageStore]: El almacén o None si está desactivado
+    """
+    global _image_store
+    store_config = store_config or {}
+    if not store_config.get("enabled", True):
+        return None
+    with _image_store_lock:
+        if _image_store is None:
+            try:
+                _image_store = ImageStore(store_config.get("path"), store_config.get("max_size_mb", 5000))
+            except Exception as e:
+                logger.warning(f"No se pudo abrir el almacén de imágenes, se continúa sin él: {e}")
+                return None
+    return _image_store
@@ -0,0 +1,391 @@
+# utils/job_queue.py
+"""
+Cola persistente de trabajos de video (SQLite).
+
+El procesamiento por lotes se ejecutaba dentro del callback de Streamlit: un
+refresco del navegador o un rerun cortaba (o duplicaba) lotes de horas y el
+hilo de la interfaz quedaba bloqueado. Ahora la página solo encola trabajos en
+la tabla TrabajosVideo y consulta su estado; los ejecuta job_worker.py, un
+proceso aparte que registra su avance en EventosTrabajo.
+
+Los trabajos sobreviven a reinicios: cada uno guarda la ruta de su
+project_info.json y el worker lo reanuda desde la última etapa terminada. Un
+trabajo 'en_curso' cuyo worker dejó de dar señales de vida vuelve a la cola.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from utils.database_manager import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Estados de un trabajo
+PENDIENTE = "pendiente"
+EN_CURSO = "en_curso"
+COMPLETADO = "completado"
+ERROR = "error"
+CANCELADO = "cancelado"
+
+
+class JobQueue:
+    """Trabajos de video, sus eventos de progreso y los workers activos."""
+
+    def __init__(self, db_path: str = str(DB_PATH)):
+        """Inicializa la cola con la ruta a la base de datos (la misma del CMS por defecto)."""
+        self.db_path = db_path
+        self._initialize_database()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _initialize_database(self):
+        conn = self._get_connection()
+        try:
+            with conn:
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS TrabajosVideo (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    lote_id TEXT,
+                    titulo TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    estado TEXT NOT NULL DEFAULT 'pendiente'
+                        CHECK(estado IN ('pendiente', 'en_curso', 'completado', 'error', 'cancelado')),
+                    project_info_path TEXT,
+                    etapa TEXT,
+                    progreso REAL DEFAULT 0,
+                    mensaje TEXT,
+                    intentos INTEGER DEFAULT 0,
+                    worker_id TEXT,
+                    heartbeat TIMESTAMP,
+                    resultado TEXT,
+                    error TEXT,
+                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    fecha_inicio TIMESTAMP,
+                    fecha_fin TIMESTAMP
+                )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON TrabajosVideo (estado, id)')
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS EventosTrabajo (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    trabajo_id INTEGER NOT NULL,
+                    etapa TEXT,
+                    progreso REAL,
+                    mensaje TEXT,
+                    fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (trabajo_id) REFERENCES TrabajosVideo (id) ON DELETE CASCADE
+                )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_eventos_trabajo ON EventosTrabajo (trabajo_id, id)')
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS WorkersCola (
+                    worker_id TEXT PRIMARY KEY,
+                    host TEXT,
+                    pid INTEGER,
+                    trabajo_id INTEGER,
+                    heartbeat TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+                ''')
+        except sqlite3.Error as e:
+            logger.error(f"Error al inicializar la cola de trabajos: {e}", exc_info=True)
+        finally:
+            conn.close()
+
+    # --- Encolar y consultar ---
+
+    def enqueue(self, titulo: str, payload: Dict[str, Any], lote_id: Optional[str] = None,
+                project_info_path: Optional[str] = None) -> Optional[int]:
+        """
+        Añade un trabajo a la cola.
+
+        Args:
+            titulo: Título del proyecto
+            payload: Datos del trabajo (proyecto, batch_config, historical_config); debe ser serializable a JSON
+            lote_id: Identificador del lote al que pertenece
+            project_info_path: project_info.json de un proyecto existente a reanudar
+
+        Returns:
+            Optional[int]: ID del trabajo
+        """
+        sql = 'INSERT INTO TrabajosVideo (lote_id, titulo, payload, project_info_path, mensaje) VALUES (?, ?, ?, ?, ?)'
+        conn = self._get_connection()
+        try:
+            with conn:
+                cursor = conn.execute(sql, (lote_id, titulo, json.dumps(payload, ensure_ascii=False, default=str),
+                                            project_info_path, "En cola"))
+                logger.info(f"Trabajo {cursor.lastrowid} encolado: '{titulo}'")
+                return cursor.lastrowid
+        except sqlite3.Error as e:
+            logger.error(f"Error al encolar el trabajo '{titulo}': {e}", exc_info=True)
+            return None
+        finally:
+            conn.close()
+
+    def get_job(self, trabajo_id: int) -> Optional[Dict[str, Any]]:
+        """Obtiene un trabajo con su payload decodificado."""
+        conn = self._get_connection()
+        try:
+            row = conn.execute('SELECT * FROM TrabajosVideo WHERE id = ?', (trabajo_id,)).fetchone()
+            return self._decode(row) if row else None
+        finally:
+            conn.close()
+
+    def list_jobs(self, estados: Optional[List[str]] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Trabajos más recientes primero (sin payload), opcionalmente filtrados por estado."""
+        where = f"WHERE estado IN ({','.join('?' * len(estados))})" if estados else ""
+        sql = f'''
+        SELECT id, lote_id, titulo, estado, project_info_path, etapa, progreso, mensaje, intentos,
+               worker_id, heartbeat, error, fecha_creacion, fecha_inicio, fecha_fin
+        FROM TrabajosVideo {where} ORDER BY id DESC LIMIT ?
+        '''
+        conn = self._get_connection()
+        try:
+            return [dict(row) for row in conn.execute(sql, (*(estados or []), limit)).fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error al listar los trabajos: {e}", exc_info=True)
+            return []
+        finally:
+            conn.close()
+
+    def get_events(self, trabajo_id: int, limit: int = 50) -> List[Dict[str, Any]]:
+        """Últimos eventos de progreso de un trabajo (más recientes primero)."""
+        sql = 'SELECT etapa, progreso, mensaje, fecha FROM EventosTrabajo WHERE trabajo_id = ? ORDER BY id DESC LIMIT ?'
+        conn = self._get_connection()
+        try:
+            return [dict(row) for row in conn.execute(sql, (trabajo_id, limit)).fetchall()]
+        finally:
+            conn.close()
+
+    def events_after(self, trabajo_ids: List[int], after_id: int = 0) -> List[Dict[str, Any]]:
+        """Eventos de los trabajos indicados posteriores a after_id, en orden (para seguirlos en vivo)."""
+        if not trabajo_ids:
+            return []
+        sql = f'''
+        SELECT id, trabajo_id, etapa, progreso, mensaje, fecha FROM EventosTrabajo
+        WHERE id > ? AND trabajo_id IN ({','.join('?' * len(trabajo_ids))}) ORDER BY id
+        '''
+        conn = self._get_connection()
+        try:
+            return [dict(row) for row in conn.execute(sql, (after_id, *trabajo_ids)).fetchall()]
+        finally:
+            conn.close()
+
+    def active_publicaciones(self) -> Dict[int, int]:
+        """Publicaciones del CMS con un trabajo pendiente o en curso: {publicacion_id: trabajo_id}."""
+        conn = self._get_connection()
+        try:
+            rows = conn.execute('SELECT id, payload FROM TrabajosVideo WHERE estado IN (?, ?)', (PENDIENTE, EN_CURSO)).fetchall()
+        finally:
+            conn.close()
+        activas = {}
+        for row in rows:
+            publicacion_id = (json.loads(row["payload"]).get("proyecto") or {}).get("cms_publicacion_id")
+            if publicacion_id is not None:
+                activas[publicacion_id] = row["id"]
+        return activas
+
+    def last_lote_config(self) -> Optional[Dict[str, Any]]:
+        """batch_config e historical_config del último lote encolado desde la interfaz (para reutilizarlos sin Streamlit)."""
+        conn = self._get_connection()
+        try:
+            for row in conn.execute("SELECT payload FROM TrabajosVideo ORDER BY id DESC LIMIT 50").fetchall():
+                payload = json.loads(row["payload"])
+                if payload.get("batch_config"):
+                    return {"batch_config": payload["batch_config"], "historical_config": payload.get("historical_config") or {}}
+            return None
+        finally:
+            conn.close()
+
+    def counts(self) -> Dict[str, int]:
+        """Número de trabajos por estado."""
+        conn = self._get_connection()
+        try:
+            rows = conn.execute('SELECT estado, COUNT(*) AS n FROM TrabajosVideo GROUP BY estado').fetchall()
+            return {row["estado"]: row["n"] for row in rows}
+        finally:
+            conn.close()
+
+    # --- Operaciones del worker ---
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Toma el trabajo pendiente más antiguo y lo marca 'en_curso' (atómico entre workers).
+
+        Returns:
+            Optional[Dict]: El trabajo con su payload, o None si la cola está vacía
+        """
+        conn = self._get_connection()
+        try:
+            conn.isolation_level = None
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT id FROM TrabajosVideo WHERE estado = ? ORDER BY id LIMIT 1', (PENDIENTE,)).fetchone()
+            if not row:
+                conn.execute('COMMIT')
+                return None
+            conn.execute('''
+            UPDATE TrabajosVideo
+            SET estado = ?, worker_id = ?, intentos = intentos + 1, heartbeat = CURRENT_TIMESTAMP,
+                fecha_inicio = COALESCE(fecha_inicio, CURRENT_TIMESTAMP), error = NULL
+            WHERE id = ?
+            ''', (EN_CURSO, worker_id, row["id"]))
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            logger.error(f"Error al tomar un trabajo de la cola: {e}", exc_info=True)
+            return None
+        finally:
+            conn.close()
+        return self.get_job(row["id"])
+
+    def heartbeat(self, trabajo_id: int):
+        """Señal de vida del trabajo en curso."""
+        self._execute('UPDATE TrabajosVideo SET heartbeat = CURRENT_TIMESTAMP WHERE id = ?', (trabajo_id,))
+
+    def add_event(self, trabajo_id: int, progreso: float, mensaje: str, etapa: Optional[str] = None):
+        """Registra un evento de progreso y actualiza el estado visible del trabajo."""
+        conn = self._get_connection()
+        try:
+            with conn:
+                conn.execute('INSERT INTO EventosTrabajo (trabajo_id, etapa, progreso, mensaje) VALUES (?, ?, ?, ?)',
+                             (trabajo_id, etapa, progreso, mensaje))
+                conn.execute('''
+                UPDATE TrabajosVideo SET progreso = ?, mensaje = ?, etapa = COALESCE(?, etapa), heartbeat = CURRENT_TIMESTAMP
+                WHERE id = ?
+                ''', (progreso, mensaje, etapa, trabajo_id))
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo registrar el progreso del trabajo {trabajo_id}: {e}")
+        finally:
+            conn.close()
+
+    def set_project(self, trabajo_id: int, project_info_path: str):
+        """Guarda la ruta del project_info.json del trabajo (para reanudarlo)."""
+        self._execute('UPDATE TrabajosVideo SET project_info_path = ? WHERE id = ?', (project_info_path, trabajo_id))
+
+    def complete(self, trabajo_id: int, resultado: Dict[str, Any]):
+        """Marca el trabajo como completado con su resultado."""
+        self._execute('''
+        UPDATE TrabajosVideo SET estado = ?, progreso = 1, mensaje = ?, resultado = ?, fecha_fin = CURRENT_TIMESTAMP
+        WHERE id = ?
+        ''', (COMPLETADO, "Completado", json.dumps(resultado, ensure_ascii=False, default=str), trabajo_id))
+
+    def fail(self, trabajo_id: int, error: str, resultado: Optional[Dict[str, Any]] = None):
+        """Marca el trabajo como fallido (se puede reintentar desde la última etapa terminada)."""
+        self._execute('''
+        UPDATE TrabajosVideo SET estado = ?, mensaje = ?, error = ?, resultado = ?, fecha_fin = CURRENT_TIMESTAMP
+        WHERE id = ?
+        ''', (ERROR, "Error", error, json.dumps(resultado, ensure_ascii=False, default=str) if resultado else None, trabajo_id))
+
+    def release(self, trabajo_id: int, mensaje: str = "Devuelto a la cola"):
+        """Devuelve un trabajo en curso a la cola (p.ej. al detener el worker)."""
+        self._execute('UPDATE TrabajosVideo SET estado = ?, worker_id = NULL, mensaje = ? WHERE id = ? AND estado = ?',
+                      (PENDIENTE, mensaje, trabajo_id, EN_CURSO))
+
+    def requeue_stale(self, stale_after_seconds: int = 120, max_attempts: int = 3) -> int:
+        """
+        Devuelve a la cola los trabajos en curso sin señal de vida (worker caído o app reiniciada).
+        Los que ya agotaron sus intentos se marcan como error.
+
+        Returns:
+            int: Trabajos recuperados
+        """
+        stale = "estado = ? AND (heartbeat IS NULL OR heartbeat < datetime('now', ?))"
+        params = (EN_CURSO, f"-{int(stale_after_seconds)} seconds")
+        conn = self._get_connection()
+        try:
+            with conn:
+                conn.execute(f'''
+                UPDATE TrabajosVideo SET estado = ?, error = 'Demasiados intentos interrumpidos', fecha_fin = CURRENT_TIMESTAMP
+                WHERE {stale} AND intentos >= ?
+                ''', (ERROR, *params, max_attempts))
+                cursor = conn.execute(f'''
+                UPDATE TrabajosVideo SET estado = ?, worker_id = NULL, mensaje = 'Reanudando tras interrupción'
+                WHERE {stale}
+                ''', (PENDIENTE, *params))
+                if cursor.rowcount:
+                    logger.info(f"{cursor.rowcount} trabajos interrumpidos devueltos a la cola")
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Error al recuperar trabajos interrumpidos: {e}", exc_info=True)
+            return 0
+        finally:
+            conn.close()
+
+    # --- Acciones desde la interfaz ---
+
+    def retry(self, trabajo_id: int) -> bool:
+        """Vuelve a encolar un trabajo fallido o cancelado (reanuda desde su última etapa terminada)."""
+        return self._execute('''
+        UPDATE TrabajosVideo SET estado = ?, intentos = 0, error = NULL, fecha_fin = NULL, mensaje = 'En cola (reintento)'
+        WHERE id = ? AND estado IN (?, ?)
+        ''', (PENDIENTE, trabajo_id, ERROR, CANCELADO))
+
+    def cancel(self, trabajo_id: int) -> bool:
+        """Cancela un trabajo que aún no ha empezado."""
+        return self._execute('UPDATE TrabajosVideo SET estado = ?, mensaje = ? WHERE id = ? AND estado = ?',
+                             (CANCELADO, "Cancelado", trabajo_id, PENDIENTE))
+
+    def delete_finished(self) -> int:
+        """Elimina los trabajos completados o cancelados y sus eventos."""
+        conn = self._get_connection()
+        try:
+            with conn:
+                conn.execute('''
+                DELETE FROM EventosTrabajo WHERE trabajo_id IN (SELECT id FROM TrabajosVideo WHERE estado IN (?, ?))
+                ''', (COMPLETADO, CANCELADO))
+                return conn.execute('DELETE FROM TrabajosVideo WHERE estado IN (?, ?)', (COMPLETADO, CANCELADO)).rowcount
+        finally:
+            conn.close()
+
+    # --- Workers ---
+
+    @staticmethod
+    def new_worker_id() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def worker_heartbeat(self, worker_id: str, trabajo_id: Optional[int] = None):
+        """Registra que el worker sigue vivo (y en qué trabajo está)."""
+        self._execute('''
+        INSERT INTO WorkersCola (worker_id, host, pid, trabajo_id, heartbeat) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(worker_id) DO UPDATE SET trabajo_id = excluded.trabajo_id, heartbeat = CURRENT_TIMESTAMP
+        ''', (worker_id, socket.gethostname(), os.getpid(), trabajo_id))
+
+    def remove_worker(self, worker_id: str):
+        self._execute('DELETE FROM WorkersCola WHERE worker_id = ?', (worker_id,))
+
+    def active_workers(self, stale_after_seconds: int = 120) -> List[Dict[str, Any]]:
+        """Workers que han dado señal de vida recientemente."""
+        conn = self._get_connection()
+        try:
+            rows = conn.execute("SELECT * FROM WorkersCola WHERE heartbeat >= datetime('now', ?)",
+                                (f"-{int(stale_after_seconds)} seconds",)).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    # --- Internos ---
+
+    def _execute(self, sql: str, params: tuple) -> bool:
+        conn = self._get_connection()
+        try:
+            with conn:
+                return conn.execute(sql, params).rowcount > 0
+        except sqlite3.Error as e:
+            logger.error(f"Error en la cola de trabajos: {e}", exc_info=True)
+            return False
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"]) if job.get("payload") else {}
+        job["resultado"] = json.loads(job["resultado"]) if job.get("resultado") else None
+        return job
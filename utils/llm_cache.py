@@ -0,0 +1,221 @@
+# utils/llm_cache.py
+"""
+Caché persistente de respuestas de LLM.
+
+Reprocesar un proyecto, reanudar tras un fallo o repetir elementos de un lote
+volvía a lanzar exactamente las mismas llamadas (guiones, prompts de imagen,
+contexto histórico, dossier del personaje...). Esta caché guarda la respuesta
+en SQLite indexada por proveedor, modelo, hash del system prompt, hash del
+user prompt y parámetros de generación.
+
+Las respuestas con "[ERROR]" nunca se guardan. Las entradas caducan tras el
+TTL configurado y, al superar el máximo de entradas, se eliminan las usadas
+hace más tiempo.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = Path("cache") / "llm_cache.sqlite"
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Caché de respuestas de texto en SQLite, segura entre hilos y procesos."""
+
+    def __init__(self, db_path: Optional[str] = None, ttl_seconds: Optional[float] = None,
+                 max_entries: int = 20000):
+        """
+        Args:
+            db_path: Ruta de la base de datos (por defecto cache/llm_cache.sqlite)
+            ttl_seconds: Vida de cada entrada en segundos (None = sin caducidad)
+            max_entries: Máximo de entradas; al superarlo se eliminan las menos usadas recientemente
+        """
+        self.db_path = Path(db_path) if db_path else DEFAULT_DB_PATH
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.max_entries = max(int(max_entries or 0), 1)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._initialize_database()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # timeout: varios procesos de un lote pueden escribir a la vez
+        return sqlite3.connect(str(self.db_path), timeout=30)
+
+    def _initialize_database(self):
+        conn = self._get_connection()
+        try:
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0
+                )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)')
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(provider: str, model: str, system_prompt: str, user_prompt: str,
+                 params: Optional[Dict] = None) -> str:
+        """Construye la clave a partir de todo lo que determina la respuesta."""
+        descriptor = json.dumps(
+            [provider.lower(), model, _sha256(system_prompt), _sha256(user_prompt), params or {}],
+            sort_keys=True, default=str
+        )
+        return _sha256(descriptor)
+
+    def get(self, provider: str, model: str, system_prompt: str, user_prompt: str,
+            params: Optional[Dict] = None) -> Optional[str]:
+        """
+        Busca una respuesta previa para la misma petición.
+
+        Returns:
+            Optional[str]: La respuesta guardada o None si no hay entrada válida
+        """
+        key = self.make_key(provider, model, system_prompt, user_prompt, params)
+        now = time.time()
+        try:
+            conn = self._get_connection()
+            try:
+                with conn:
+                    row = conn.execute('SELECT response, created_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+                    if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                        conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                        row = None
+                    if row:
+                        conn.execute('UPDATE llm_cache SET last_used = ?, hit_count = hit_count + 1 WHERE key = ?', (now, key))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Error leyendo la caché de LLM: {e}")
+            row = None
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if row:
+            logger.info(f"Respuesta de {provider} ({model}) recuperada de caché")
+            return row[0]
+        return None
+
+    def put(self, provider: str, model: str, system_prompt: str, user_prompt: str,
+            response: str, params: Optional[Dict] = None) -> bool:
+        """
+        Guarda una respuesta. Las vacías o con "[ERROR]" se descartan.
+
+        Returns:
+            bool: True si se guardó
+        """
+        if not response or not isinstance(response, str) or "[ERROR]" in response:
+            return False
+        key = self.make_key(provider, model, system_prompt, user_prompt, params)
+        now = time.time()
+        try:
+            conn = self._get_connection()
+            try:
+                with conn:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO llm_cache (key, provider, model, response, created_at, last_used, hit_count) '
+                        'VALUES (?, ?, ?, ?, ?, ?, 0)',
+                        (key, provider.lower(), model, response, now, now)
+                    )
+                    self._evict(conn, now)
+            finally:
+                conn.close()
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"Error guardando en la caché de LLM: {e}")
+            return False
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Elimina entradas caducadas y, si se supera el máximo, las usadas hace más tiempo."""
+        if self.ttl_seconds:
+            conn.execute('DELETE FROM llm_cache WHERE created_at < ?', (now - self.ttl_seconds,))
+        count = conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                'DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used ASC LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+    def clear(self):
+        """Vacía la caché."""
+        conn = self._get_connection()
+        try:
+            with conn:
+                conn.execute('DELETE FROM llm_cache')
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict:
+        """Aciertos/fallos de este proceso y tamaño actual de la caché."""
+        try:
+            conn = self._get_connection()
+            try:
+                entries = conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            entries = None
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+# Instancia global de la caché
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache(cache_config: Optional[Dict] = None) -> Optional[LLMResponseCache]:
+    """
+    Obtiene la instancia global de la caché de LLM (config.yaml -> ai.llm_cache).
+
+    Returns:
+        Optional[LLMResponseCache]: La caché o None si está desactivada o no se pudo abrir
+    """
+    global _llm_cache
+    cache_config = cache_config or {}
+    if not cache_config.get("enabled", True):
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            try:
+                ttl_hours = cache_config.get("ttl_hours", 24 * 30)
+                _llm_cache = LLMResponseCache(
+                    db_path=cache_config.get("path"),
+                    ttl_seconds=ttl_hours * 3600 if ttl_hours else None,
+                    max_entries=cache_config.get("max_entries", 20000)
+                )
+            except Exception as e:
+                logger.warning(f"No se pudo abrir la caché de LLM, se continúa sin ella: {e}")
+                return None
+    return _llm_cache
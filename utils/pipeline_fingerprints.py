@@ -0,0 +1,171 @@
+# utils/pipeline_fingerprints.py
+"""
+Huellas de entrada por etapa del pipeline (al estilo de un sistema de build).
+
+La reanudación de process_single_video solo comprobaba si existían
+script.txt, el audio, transcription.json, scenes.json y las imágenes: con una
+configuración distinta (otra voz, otra segmentación, otro modelo de imagen) se
+reutilizaban artefactos obsoletos o había que borrarlos a mano.
+
+Cada etapa declara sus entradas (el hash de los artefactos de las etapas
+anteriores y la parte de la configuración que le afecta) y ArtifactGraph guarda
+su huella junto al artefacto que produjo, en el bloque "fingerprints" de
+project_info.json. Una etapa solo se salta si la huella coincide y el artefacto
+sigue en disco; si se regenera y su salida cambia, cambia también la huella de
+las etapas siguientes y se reconstruyen. Las imágenes llevan huella por escena
+(prompt + ajustes de generación), así que solo se piden las de escenas cuyo
+prompt cambió.
+
+Los proyectos anteriores a este bloque adoptan sus artefactos existentes la
+primera vez que se reanudan.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ajustes de imagen que afectan al archivo generado pero no al prompt
+IMAGE_RENDER_KEYS = ("img_provider", "img_model", "aspect_ratio", "megapixels", "output_format", "output_quality")
+
+# Claves que no forman parte de la huella: credenciales
+_IGNORED_KEYS = {"api_key", "api_token", "token"}
+
+_digest_memo: Dict[Tuple[str, int, int], str] = {}
+_digest_lock = threading.Lock()
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))
+                if str(k) not in _IGNORED_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def fingerprint(*parts: Any) -> str:
+    """Huella (SHA-256) de valores serializables a JSON, independiente del orden de las claves."""
+    payload = json.dumps(_canonical(list(parts)), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_digest(path) -> Optional[str]:
+    """SHA-256 del contenido de un archivo (memorizado por ruta, tamaño y mtime), o None si no existe."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _digest_lock:
+        if key in _digest_memo:
+            return _digest_memo[key]
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _digest_lock:
+        _digest_memo[key] = digest
+    return digest
+
+
+def _exists(path) -> bool:
+    return bool(path) and Path(path).exists() and Path(path).stat().st_size > 0
+
+
+class ArtifactGraph:
+    """
+    Huellas de las etapas de un proyecto, guardadas en project_info["fingerprints"].
+
+    Cada registro de etapa tiene la huella de sus entradas ("inputs"), si terminó
+    ("complete") y el hash de su artefacto ("digest"), que es a su vez entrada de
+    las etapas siguientes. "image_scenes" guarda la huella de cada imagen por escena.
+    """
+
+    def __init__(self, project_info: Dict):
+        # Proyecto creado antes de las huellas: se adoptan los artefactos que ya existen
+        self.legacy = "fingerprints" not in project_info and project_info.get("status") not in (None, "iniciado")
+        self.records: Dict[str, Dict] = project_info.setdefault("fingerprints", {})
+        self.project_id = project_info.get("id", "")
+
+    def is_current(self, stage: str, inputs: Any, artifact, hash_artifact: bool = True) -> bool:
+        """
+        True si la etapa terminó con las mismas entradas y su artefacto sigue en disco.
+
+        Si el artefacto se editó a mano se acepta como nueva salida: su hash se
+        actualiza y las etapas siguientes dejan de estar al día.
+
+        Args:
+            stage: Nombre de la etapa
+            inputs: Entradas declaradas por la etapa
+            artifact: Archivo que produce la etapa
+            hash_artifact: Calcular el hash del artefacto (False para el video final, que no es entrada de nadie)
+        """
+        record = self.records.get(stage)
+        if not _exists(artifact):
+            return False
+        if record is None:
+            if self.legacy:
+                logger.info(f"[{self.project_id}] '{stage}': adoptando el artefacto existente (proyecto sin huellas)")
+                self.done(stage, inputs, artifact, hash_artifact=hash_artifact)
+                return True
+            return False
+        if not record.get("complete") or record.get("inputs") != fingerprint(inputs) or \
+                record.get("artifact", str(artifact)) != str(artifact):
+            logger.info(f"[{self.project_id}] '{stage}': las entradas cambiaron, se regenera")
+            return False
+        if hash_artifact:
+            record["digest"] = file_digest(artifact)
+        return True
+
+    def has_partial(self, stage: str, inputs: Any) -> bool:
+        """True si hay un avance (completo o no) de la etapa con estas mismas entradas."""
+        record = self.records.get(stage)
+        if record is None:
+            return self.legacy
+        return record.get("inputs") == fingerprint(inputs)
+
+    def start(self, stage: str, inputs: Any):
+        """Marca la etapa como en curso con estas entradas (sus checkpoints se pueden reanudar)."""
+        self.records[stage] = {"inputs": fingerprint(inputs), "complete": False, "artifact": None, "digest": None}
+
+    def done(self, stage: str, inputs: Any, artifact=None, digest: Optional[str] = None, hash_artifact: bool = True):
+        """
+        Registra la etapa como terminada.
+
+        Args:
+            stage: Nombre de la etapa
+            inputs: Entradas declaradas por la etapa
+            artifact: Archivo producido (se guarda su ruta y su hash)
+            digest: Hash de la salida si no es un único archivo
+            hash_artifact: Calcular el hash del artefacto
+        """
+        self.records[stage] = {
+            "inputs": fingerprint(inputs),
+            "complete": True,
+            "artifact": str(artifact) if artifact is not None else None,
+            "digest": digest or (file_digest(artifact) if artifact is not None and hash_artifact else None)
+        }
+
+    def digest(self, stage: str) -> Optional[str]:
+        """Hash de la salida de una etapa (entrada de las siguientes)."""
+        return (self.records.get(stage) or {}).get("digest")
+
+    def scene_image_current(self, index: int, image_fp: str, image_path: Path) -> bool:
+        """True si la imagen de la escena existe y se generó con el mismo prompt y ajustes."""
+        if not _exists(image_path):
+            return False
+        recorded = self.records.get("image_scenes", {}).get(str(index))
+        if recorded is None:
+            return self.legacy
+        return recorded == image_fp
+
+    def record_scene_image(self, index: int, image_fp: str):
+        """Registra la huella de la imagen generada para una escena."""
+        self.records.setdefault("image_scenes", {})[str(index)] = image_fp
@@ -0,0 +1,266 @@
+# utils/pipeline_metrics.py
+"""
+Instrumentación por etapa del pipeline de video.
+
+process_single_video solo dejaba el último estado alcanzado en
+project_info.json. PipelineMetrics mide cada etapa (guion, audio,
+transcripción, escenas, imágenes, montaje, postproceso y render): tiempo de
+reloj y de CPU, pico de memoria residente durante la etapa, bytes
+leídos/escritos en disco, llamadas a APIs externas y, en el render,
+fotogramas por segundo.
+
+El pico de memoria de la etapa se obtiene muestreando VmRSS del proceso y de
+sus hijos directos (ffmpeg) en /proc mientras dura la etapa: ru_maxrss es el
+pico de toda la vida del proceso y solo puede crecer, así que repetiría el de
+la etapa más pesada en todas las siguientes. Fuera de Linux el pico por etapa
+queda en None.
+
+El resultado se guarda en el bloque "metrics" de project_info y en la tabla
+global MetricasEtapas (DatabaseManager), de donde salen los agregados del
+dashboard de métricas.
+
+Las llamadas a APIs se cuentan con record_api_call desde los servicios
+(AIServices, TTS, transcripción). Los contadores, la CPU y la E/S son del
+proceso: con varios proyectos en paralelo en el mismo proceso, cada etapa
+incluye también la actividad simultánea de los demás.
+"""
+
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Estado de project_info con el que termina cada etapa (las que se reanudan ya hechas no se vuelven a medir)
+STAGE_STATUS = [("script", "script_ok"), ("audio", "audio_ok"), ("transcription", "transcription_ok"),
+                ("scenes", "scenes_ok"), ("images", "images_ok")]
+
+_api_calls: Dict[str, int] = {}
+_api_calls_lock = threading.Lock()
+
+
+def record_api_call(kind: str, provider: str, count: int = 1):
+    """
+    Cuenta una llamada a un servicio externo.
+
+    Args:
+        kind: Tipo de llamada ('llm', 'image', 'tts', 'transcription')
+        provider: Proveedor ('gemini', 'replicate', 'fish'...)
+        count: Número de llamadas
+    """
+    key = f"{kind}:{provider}"
+    with _api_calls_lock:
+        _api_calls[key] = _api_calls.get(key, 0) + count
+
+
+def api_call_counts() -> Dict[str, int]:
+    """Llamadas acumuladas en este proceso por 'tipo:proveedor'."""
+    with _api_calls_lock:
+        return dict(_api_calls)
+
+
+def process_peak_rss_mb() -> float:
+    """
+    Pico de memoria residente de toda la vida del proceso (o de un hijo ya
+    terminado, como ffmpeg, si fue mayor) en MB. Solo es el pico de una
+    ejecución concreta si el proceso se creó para ella.
+    """
+    usage = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(usage / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _vm_rss_kb(pid: str) -> int:
+    """VmRSS actual de un proceso en KB (0 si ya no existe)."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def _current_rss_kb() -> Optional[int]:
+    """Memoria residente actual del proceso más la de sus hijos directos en KB (None sin /proc)."""
+    own = _vm_rss_kb("self")
+    if not own:
+        return None
+    children = set()
+    try:
+        for tid in os.listdir("/proc/self/task"):
+            with open(f"/proc/self/task/{tid}/children", "r") as f:
+                children.update(f.read().split())
+    except OSError:
+        pass
+    return own + sum(_vm_rss_kb(pid) for pid in children)
+
+
+class _RssSampler:
+    """Hilo que muestrea la memoria residente mientras dura una etapa y guarda el máximo."""
+
+    INTERVAL_SECONDS = 0.2
+
+    def __init__(self):
+        self._peak_kb = _current_rss_kb()
+        self._stop = threading.Event()
+        self._thread = None
+        if self._peak_kb is not None:
+            self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.INTERVAL_SECONDS):
+            self._sample()
+
+    def _sample(self):
+        current = _current_rss_kb()
+        if current is not None and current > (self._peak_kb or 0):
+            self._peak_kb = current
+
+    def stop(self) -> Optional[float]:
+        """Detiene el muestreo y devuelve el pico de la etapa en MB (None si no se pudo medir)."""
+        if self._thread is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return round(self._peak_kb / 1024, 1)
+
+
+def _io_counters() -> Optional[Dict[str, int]]:
+    """Bytes leídos/escritos en disco por el proceso (Linux: /proc/self/io)."""
+    try:
+        with open("/proc/self/io", "r") as f:
+            values = dict(line.split(":", 1) for line in f.read().splitlines() if ":" in line)
+        return {"read": int(values["read_bytes"]), "write": int(values["write_bytes"])}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class _Snapshot:
+    def __init__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.io = _io_counters()
+        self.api_calls = api_call_counts()
+        self.rss: Optional[_RssSampler] = None
+
+
+class PipelineMetrics:
+    """Métricas por etapa de un proyecto. Las etapas se abren con begin() y se cierran con la siguiente."""
+
+    def __init__(self, project_id: str, previous: Optional[Dict] = None, resume_status: Optional[str] = None):
+        """
+        Args:
+            project_id: ID del proyecto
+            previous: Bloque "metrics" de una ejecución anterior. Al reanudar (o al ejecutar
+                el proyecto etapa a etapa) lo medido se suma a lo ya registrado de cada etapa
+            resume_status: Estado de project_info al reanudar; las etapas ya terminadas
+                (que solo se cargan de disco) no se miden
+        """
+        self.project_id = project_id
+        self.stages: Dict[str, Dict] = dict((previous or {}).get("stages", {}))
+        self._skip = set()
+        status = (resume_status or "").replace("error_en_", "")
+        statuses = [s for _, s in STAGE_STATUS]
+        if status in statuses:
+            self._skip = {stage for stage, _ in STAGE_STATUS[:statuses.index(status) + 1]}
+        self._current: Optional[str] = None
+        self._start: Optional[_Snapshot] = None
+        self._frames: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def begin(self, stage: str):
+        """Cierra la etapa en curso (si la hay) y empieza a medir stage (salvo que ya estuviera terminada)."""
+        with self._lock:
+            self._close()
+            if stage in self._skip:
+                return
+            self._current = stage
+            self._start = _Snapshot()
+            self._start.rss = _RssSampler()
+            self._frames = None
+
+    def finish(self):
+        """Cierra la etapa en curso."""
+        with self._lock:
+            self._close()
+
+    def set_frames(self, frames: int):
+        """Fotogramas renderizados en la etapa en curso (para calcular render_fps)."""
+        self._frames = int(frames)
+
+    def _close(self):
+        if not self._current or not self._start:
+            return
+        end = _Snapshot()
+        start = self._start
+        peak_rss_mb = start.rss.stop() if start.rss else None
+        wall = end.wall - start.wall
+        api_calls = {k: v - start.api_calls.get(k, 0) for k, v in end.api_calls.items() if v - start.api_calls.get(k, 0) > 0}
+        stage = {
+            "wall_seconds": round(wall, 3),
+            "cpu_seconds": round(end.cpu - start.cpu, 3),
+            "peak_rss_mb": peak_rss_mb,
+            "bytes_read": end.io["read"] - start.io["read"] if end.io and start.io else None,
+            "bytes_written": end.io["write"] - start.io["write"] if end.io and start.io else None,
+            "api_calls": api_calls,
+            "render_fps": round(self._frames / wall, 2) if self._frames and wall > 0 else None,
+            "finished_at": datetime.now().isoformat()
+        }
+        previous = self.stages.get(self._current)
+        if previous:
+            stage = self._accumulate(previous, stage)
+        self.stages[self._current] = stage
+        logger.info(f"[{self.project_id}] Etapa '{self._current}': {stage['wall_seconds']:.1f}s reloj, "
+                    f"{stage['cpu_seconds']:.1f}s CPU, {sum(api_calls.values())} llamadas API")
+        self._current = None
+        self._start = None
+        self._frames = None
+
+    @staticmethod
+    def _accumulate(previous: Dict, current: Dict) -> Dict:
+        """Suma una nueva medición de la etapa a la registrada en ejecuciones anteriores."""
+        def add(key):
+            if previous.get(key) is None or current.get(key) is None:
+                return current.get(key) if previous.get(key) is None else previous.get(key)
+            return round(previous[key] + current[key], 3)
+
+        api_calls = dict(previous.get("api_calls", {}))
+        for key, value in current["api_calls"].items():
+            api_calls[key] = api_calls.get(key, 0) + value
+        return {
+            "wall_seconds": add("wall_seconds"),
+            "cpu_seconds": add("cpu_seconds"),
+            "peak_rss_mb": max((v for v in (previous.get("peak_rss_mb"), current["peak_rss_mb"]) if v is not None),
+                               default=None),
+            "bytes_read": add("bytes_read"),
+            "bytes_written": add("bytes_written"),
+            "api_calls": api_calls,
+            "render_fps": current["render_fps"] or previous.get("render_fps"),
+            "runs": previous.get("runs", 1) + 1,
+            "finished_at": current["finished_at"]
+        }
+
+    def as_dict(self) -> Dict:
+        """Bloque "metrics" de project_info: etapas y totales."""
+        stages = dict(self.stages)
+        return {
+            "stages": stages,
+            "totals": {
+                "wall_seconds": round(sum(s["wall_seconds"] for s in stages.values()), 3),
+                "cpu_seconds": round(sum(s["cpu_seconds"] for s in stages.values()), 3),
+                "peak_rss_mb": max((s["peak_rss_mb"] for s in stages.values() if s.get("peak_rss_mb") is not None),
+                                   default=None),
+                "bytes_read": sum(s["bytes_read"] or 0 for s in stages.values()),
+                "bytes_written": sum(s["bytes_written"] or 0 for s in stages.values()),
+                "api_calls": sum(sum(s["api_calls"].values()) for s in stages.values())
+            }
+        }
@@ -0,0 +1,210 @@
+# utils/pipeline_scheduler.py
+"""
+Planificador por etapas del pipeline para lotes de proyectos.
+
+Las etapas tienen perfiles muy distintos: guion, voz, escenas/prompts e
+imágenes esperan a APIs externas (red), mientras que la transcripción con
+Whisper y el render son de CPU. Procesar proyectos completos en paralelo
+satura la CPU (varios renders a la vez) o la deja ociosa (todos esperando a
+Replicate).
+
+PipelineScheduler descompone cada proyecto en tareas de etapa con su
+dependencia (la etapa anterior del mismo proyecto) y las ejecuta en un pool por
+clase de recurso, cada uno con su límite de concurrencia: mientras el proyecto
+A renderiza, el B genera imágenes y el C escribe su guion.
+
+Cada tarea es una llamada a VideoProcessor.process_single_video con stop_after:
+el estado de cada proyecto vive en su project_info.json, así que una tarea
+retoma exactamente donde terminó la anterior. El render agrupa montaje,
+postproceso, codificación y mezcla final con FFmpeg, porque comparten los clips
+de MoviePy en memoria. Transcripción, escenas/prompts e imágenes forman una sola
+tarea: dentro de una llamada se solapan (prompts mientras se transcribe,
+imágenes a medida que sale cada prompt) y separarlas las serializaría. Va al
+pool de red porque casi todo su tiempo es espera a APIs; la transcripción local
+ya la limita el modelo Whisper compartido (num_workers).
+"""
+
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+NETWORK = "network"
+CPU = "cpu"
+
+
+@dataclass(frozen=True)
+class Stage:
+    """Etapa del pipeline: recurso que consume y punto de parada en process_single_video."""
+    name: str
+    resource: str
+    stop_after: Optional[str]  # None = hasta el final (video completado)
+
+
+# Orden de ejecución; cada etapa depende de la anterior del mismo proyecto
+STAGES = [
+    Stage("script", NETWORK, "script"),
+    Stage("tts", NETWORK, "audio"),
+    Stage("scenes", NETWORK, "images"),  # Transcripción, escenas/prompts e imágenes (solapadas)
+    Stage("render", CPU, None)  # Montaje, postproceso, render y mezcla de audio
+]
+
+# Estado de project_info al terminar cada etapa (para reanudar proyectos existentes)
+STAGE_STATUS = {stage.name: f"{stage.stop_after}_ok" if stage.stop_after else "completado" for stage in STAGES}
+
+DEFAULT_LIMITS = {NETWORK: 4, CPU: 1}
+
+
+# Estados que escribe process_single_video, en orden (los de montaje y postproceso son parte del render)
+PIPELINE_STATUSES = ["iniciado", "script_ok", "audio_ok", "transcription_ok", "scenes_ok", "images_ok",
+                     "base_video_ok", "post_audio_ok", "post_effects_ok", "post_subtitles_ok", "completado"]
+
+# Fallos al guardar el video final con FFmpeg: las etapas anteriores al render siguen hechas
+RENDER_ERROR_STATUSES = ("error_guardado", "error_guardado_inesperado")
+
+
+def next_stage_index(status: Optional[str]) -> int:
+    """Índice en STAGES de la primera etapa pendiente según el estado de project_info."""
+    status = (status or "").replace("error_en_", "")
+    if status in RENDER_ERROR_STATUSES:
+        status = "images_ok"
+    if status not in PIPELINE_STATUSES:
+        return 0
+    position = PIPELINE_STATUSES.index(status)
+    index = 0
+    for stage_index, stage in enumerate(STAGES):
+        if PIPELINE_STATUSES.index(STAGE_STATUS[stage.name]) <= position:
+            index = stage_index + 1
+    return index
+
+
+@dataclass
+class ScheduledProject:
+    """Un proyecto del lote y su avance por las etapas."""
+    key: str
+    full_config: Dict
+    processor: object
+    project_info: Dict
+    next_stage: int = 0
+    error: Optional[str] = None
+    video_path: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.error is not None or self.next_stage >= len(STAGES)
+
+
+class PipelineScheduler:
+    """Ejecuta las etapas de varios proyectos con un pool y un límite por clase de recurso."""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, processor_factory: Optional[Callable] = None):
+        """
+        Args:
+            limits: Tareas simultáneas por recurso ({'network': 4, 'cpu': 1})
+            processor_factory: Crea el VideoProcessor de cada proyecto (por defecto uno con los
+                servicios del proceso)
+        """
+        self.limits = {**DEFAULT_LIMITS, **{k: max(1, int(v)) for k, v in (limits or {}).items()}}
+        self.processor_factory = processor_factory or self._default_processor
+        self.projects: List[ScheduledProject] = []
+
+    @staticmethod
+    def _default_processor():
+        from utils.service_container import get_service_container
+        from utils.video_processing import VideoProcessor
+        return VideoProcessor(services=get_service_container())
+
+    def add_project(self, key: str, full_config: Dict, project_info: Optional[Dict] = None) -> ScheduledProject:
+        """
+        Añade un proyecto al lote.
+
+        Args:
+            key: Identificador del proyecto dentro del lote
+            full_config: Configuración completa para process_single_video
+            project_info: project_info de un proyecto existente (se salta lo ya terminado)
+        """
+        processor = self.processor_factory()
+        if project_info is None:
+            project_info = processor._setup_single_project(full_config)
+        project = ScheduledProject(key=key, full_config=full_config, processor=processor, project_info=project_info,
+                                   next_stage=next_stage_index(project_info.get("status")))
+        self.projects.append(project)
+        return project
+
+    def run(self, progress_callback: Optional[Callable[[float, str], None]] = None,
+            on_stage_start: Optional[Callable[[ScheduledProject, Stage], None]] = None,
+            on_project_done: Optional[Callable[[ScheduledProject], None]] = None) -> List[ScheduledProject]:
+        """
+        Ejecuta todas las etapas pendientes y devuelve los proyectos en el orden en que se añadieron.
+
+        Los callbacks se invocan desde el hilo que llama a run().
+
+        Args:
+            progress_callback: Función (progreso global 0-1, mensaje)
+            on_stage_start: Se llama al encolar cada etapa
+            on_project_done: Se llama cuando un proyecto termina (completado o con error)
+        """
+        progress_callback = progress_callback or (lambda progress, message: None)
+        total = len(self.projects) * len(STAGES)
+        pools = {resource: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"stage-{resource}")
+                 for resource, limit in self.limits.items()}
+        running: Dict[Future, ScheduledProject] = {}
+
+        def submit(project: ScheduledProject):
+            stage = STAGES[project.next_stage]
+            if on_stage_start:
+                on_stage_start(project, stage)
+            running[pools[stage.resource].submit(self._run_stage, project, stage)] = project
+
+        try:
+            for project in self.projects:
+                if project.done:
+                    if on_project_done:
+                        on_project_done(project)
+                else:
+                    submit(project)
+            while running:
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    project = running.pop(future)
+                    stage = STAGES[project.next_stage]
+                    try:
+                        ok, result = future.result()
+                        if not ok:
+                            project.error = project.project_info.get("error_message") or \
+                                f"La etapa '{stage.name}' terminó con estado '{project.project_info.get('status')}'"
+                    except Exception as e:
+                        logger.error(f"[{project.key}] Error en la etapa '{stage.name}': {e}", exc_info=True)
+                        project.error = str(e)
+                        result = None
+
+                    if project.error is None:
+                        project.next_stage += 1
+                        if project.done:
+                            project.video_path = str(result) if result else None
+                    completed = sum(min(p.next_stage, len(STAGES)) if p.error is None else len(STAGES) for p in self.projects)
+                    progress_callback(completed / total if total else 1.0,
+                                      f"{project.project_info.get('titulo', project.key)}: "
+                                      f"{'❌ ' + stage.name if project.error else '✅ ' + stage.name}")
+
+                    if project.done:
+                        if on_project_done:
+                            on_project_done(project)
+                    else:
+                        submit(project)
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+        return self.projects
+
+    def _run_stage(self, project: ScheduledProject, stage: Stage):
+        """Ejecuta una etapa del proyecto (en el pool de su recurso)."""
+        logger.info(f"[{project.key}] Etapa '{stage.name}' ({stage.resource})")
+        result = project.processor.process_single_video(
+            project.full_config,
+            existing_project_info=project.project_info,
+            stop_after=stage.stop_after
+        )
+        return project.project_info.get("status") == STAGE_STATUS[stage.name], result
@@ -0,0 +1,324 @@
+# utils/prompt_similarity.py
+"""
+Índice de similitud entre prompts de imagen para reutilizar imágenes.
+
+En las biografías muchas escenas describen casi la misma imagen ("el santo
+orando en la capilla") y cada una generaba una imagen nueva. Este índice guarda
+los prompts ya generados junto a su imagen y, antes de generar, busca uno
+suficientemente parecido (similitud coseno sobre vectores TF-IDF) en el mismo
+proyecto o en todos.
+
+Los vectores se calculan en NumPy con hashing de unigramas y bigramas (crc32,
+estable entre procesos) y se guardan dispersos, sin servicios externos. Los términos comunes a todos
+los prompts (prefijo de estilo, contexto histórico) pesan poco por el IDF.
+
+Las entradas se guardan en SQLite (como la caché de LLM): varios procesos del
+lote añaden prompts a la vez sin pisarse y cada uno incorpora en flush() los que
+añadieron los demás. En memoria las filas se acumulan en búferes que crecen por
+duplicación y las frecuencias de documento se actualizan al añadir, así que
+indexar una imagen no reconstruye la matriz.
+"""
+
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = Path("cache") / "prompt_index.sqlite"
+
+# Palabras vacías (español e inglés) que no aportan contenido visual
+STOPWORDS = {
+    "the", "and", "with", "for", "from", "that", "this", "his", "her", "its", "their", "into", "are", "was",
+    "los", "las", "del", "con", "por", "para", "una", "uno", "unos", "unas", "que", "sus", "como", "est",
+    "high", "detail", "detailed", "realistic", "photorealistic", "cinematic", "style", "lighting", "image"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Normaliza (minúsculas, sin tildes) y devuelve las palabras con contenido."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [t for t in re.findall(r"[a-z0-9]+", text) if len(t) > 2 and t not in STOPWORDS]
+
+
+def hashed_features(text: str, dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Unigramas y bigramas proyectados en dim posiciones.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Posiciones (únicas) y frecuencias
+    """
+    tokens = tokenize(text)
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if not features:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+    positions = np.array([zlib.crc32(f.encode("utf-8")) % dim for f in features], dtype=np.int32)
+    indices, counts = np.unique(positions, return_counts=True)
+    return indices.astype(np.int32), counts.astype(np.float32)
+
+
+class PromptSimilarityIndex:
+    """Prompts de imagen ya generados con su imagen, consultables por similitud."""
+
+    def __init__(self, index_path: Optional[str] = None, dim: int = 1 << 18, max_entries: int = 20000):
+        """
+        Args:
+            index_path: Base de datos SQLite del índice (por defecto cache/prompt_index.sqlite); si
+                está vacía se importa el antiguo índice JSON con el mismo nombre
+            dim: Dimensión de los vectores (hashing); se guardan dispersos
+            max_entries: Máximo de prompts indexados; se descartan los más antiguos
+        """
+        self.index_path = Path(index_path) if index_path else DEFAULT_INDEX_PATH
+        if self.index_path.suffix == ".json":
+            # Rutas configuradas para el índice en JSON: se usa la base de datos al lado
+            self.index_path = self.index_path.with_suffix(".sqlite")
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.max_entries = max(int(max_entries or 0), 1)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._entries: List[Dict] = []
+        # Filas dispersas concatenadas: posición, frecuencia y fila de cada término
+        self._indices = np.zeros(4096, dtype=np.int32)
+        self._counts = np.zeros(4096, dtype=np.float32)
+        self._row_ids = np.zeros(4096, dtype=np.int32)
+        self._nnz = 0
+        self._offsets: List[int] = [0]  # Inicio de cada fila en los búferes (y fin de la última)
+        self._doc_freq = np.zeros(dim, dtype=np.int32)
+        self._first = 0  # Filas descartadas al principio (se compactan por bloques)
+        self._pending: List[Dict] = []
+        self._last_id = 0
+        self._initialize_database()
+        self._load()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # timeout: varios procesos de un lote pueden escribir a la vez
+        return sqlite3.connect(str(self.index_path), timeout=30)
+
+    def _initialize_database(self):
+        conn = self._get_connection()
+        try:
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS prompt_index (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    prompt TEXT NOT NULL,
+                    image_path TEXT NOT NULL,
+                    project_id TEXT,
+                    model TEXT,
+                    aspect_ratio TEXT,
+                    created_at REAL NOT NULL
+                )
+                ''')
+                legacy_path = self.index_path.with_suffix(".json")
+                if legacy_path.exists() and not conn.execute('SELECT 1 FROM prompt_index LIMIT 1').fetchone():
+                    with open(legacy_path, "r", encoding="utf-8") as f:
+                        entries = json.load(f)
+                    self._insert(conn, entries[-self.max_entries:])
+                    logger.info(f"Índice de prompts importado desde {legacy_path}: {len(entries)} entradas")
+        except Exception as e:
+            logger.warning(f"No se pudo inicializar el índice de prompts ({self.index_path}): {e}")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, entries: List[Dict]) -> List[int]:
+        ids = []
+        now = time.time()
+        for e in entries:
+            cursor = conn.execute(
+                'INSERT INTO prompt_index (prompt, image_path, project_id, model, aspect_ratio, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (e["prompt"], e["image_path"], e.get("project_id"), e.get("model"), e.get("aspect_ratio"), now)
+            )
+            ids.append(cursor.lastrowid)
+        return ids
+
+    @staticmethod
+    def _row_entry(row) -> Dict:
+        return {"prompt": row[1], "image_path": row[2], "project_id": row[3], "model": row[4], "aspect_ratio": row[5]}
+
+    def _load(self):
+        try:
+            conn = self._get_connection()
+            try:
+                rows = conn.execute(
+                    'SELECT * FROM (SELECT id, prompt, image_path, project_id, model, aspect_ratio FROM prompt_index '
+                    'ORDER BY id DESC LIMIT ?) ORDER BY id', (self.max_entries,)
+                ).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo cargar el índice de prompts ({self.index_path}): {e}")
+            return
+        with self._lock:
+            for row in rows:
+                self._append(self._row_entry(row), hashed_features(row[1], self.dim))
+                self._last_id = row[0]
+        if rows:
+            logger.info(f"Índice de prompts cargado: {len(rows)} entradas")
+
+    def _append(self, entry: Dict, features: Tuple[np.ndarray, np.ndarray]):
+        """Añade una fila a los búferes y a las frecuencias de documento (con el lock tomado)."""
+        indices, counts = features
+        end = self._nnz + len(indices)
+        if end > len(self._indices):
+            capacity = max(end, 2 * len(self._indices))
+            self._indices = np.resize(self._indices, capacity)
+            self._counts = np.resize(self._counts, capacity)
+            self._row_ids = np.resize(self._row_ids, capacity)
+        self._indices[self._nnz:end] = indices
+        self._counts[self._nnz:end] = counts
+        self._row_ids[self._nnz:end] = len(self._entries)
+        self._nnz = end
+        self._offsets.append(end)
+        self._entries.append(entry)
+        self._doc_freq[indices] += 1  # Las posiciones de una fila son únicas
+        self._trim()
+
+    def _trim(self):
+        """Descarta las filas más antiguas por encima de max_entries (con el lock tomado)."""
+        while len(self._entries) - self._first > self.max_entries:
+            self._doc_freq[self._indices[self._offsets[self._first]:self._offsets[self._first + 1]]] -= 1
+            self._first += 1
+        if self._first and self._first >= max(self.max_entries // 10, len(self._entries) // 2):
+            start = self._offsets[self._first]
+            keep = self._nnz - start
+            self._indices[:keep] = self._indices[start:self._nnz].copy()
+            self._counts[:keep] = self._counts[start:self._nnz].copy()
+            self._row_ids[:keep] = self._row_ids[start:self._nnz] - self._first
+            self._offsets = [offset - start for offset in self._offsets[self._first:]]
+            self._entries = self._entries[self._first:]
+            self._nnz = keep
+            self._first = 0
+
+    def find_similar(self, prompt: str, threshold: float, model: Optional[str] = None,
+                     aspect_ratio: Optional[str] = None, project_id: Optional[str] = None,
+                     exclude_path: Optional[str] = None) -> Optional[Dict]:
+        """
+        Busca el prompt indexado más parecido que supere el umbral.
+
+        Args:
+            prompt: Prompt de la nueva imagen
+            threshold: Similitud coseno mínima (0-1)
+            model: Solo imágenes del mismo modelo (si se indica)
+            aspect_ratio: Solo imágenes con la misma relación de aspecto (si se indica)
+            project_id: Limitar la búsqueda a un proyecto (None = todos)
+            exclude_path: Imagen que no debe devolverse (p.ej. el propio destino)
+
+        Returns:
+            Optional[Dict]: Entrada encontrada con su 'similarity', o None
+        """
+        query_idx, query_counts = hashed_features(prompt, self.dim)
+        if not len(query_idx):
+            return None
+        with self._lock:
+            num_docs = len(self._entries) - self._first
+            if not num_docs:
+                return None
+            # TF-IDF con las frecuencias de documento actuales, solo sobre las filas vigentes
+            start = self._offsets[self._first]
+            indices = self._indices[start:self._nnz]
+            row_ids = self._row_ids[start:self._nnz]
+            idf = np.log((1 + num_docs) / (1 + self._doc_freq[indices])) + 1.0
+            weights = self._counts[start:self._nnz] * idf
+            norms = np.sqrt(np.bincount(row_ids, weights=weights ** 2, minlength=len(self._entries)))
+            query = np.zeros(self.dim, dtype=np.float32)
+            query[query_idx] = query_counts * (np.log((1 + num_docs) / (1 + self._doc_freq[query_idx])) + 1.0)
+            query /= max(float(np.linalg.norm(query)), 1e-9)
+            scores = np.bincount(row_ids, weights=weights * query[indices],
+                                 minlength=len(self._entries)) / np.maximum(norms, 1e-9)
+            scores[:self._first] = -1.0
+            for idx in np.argsort(-scores):
+                score = float(scores[idx])
+                if score < threshold:
+                    return None
+                entry = self._entries[idx]
+                if model and entry.get("model") != model:
+                    continue
+                if aspect_ratio and entry.get("aspect_ratio") != aspect_ratio:
+                    continue
+                if project_id and entry.get("project_id") != project_id:
+                    continue
+                if entry["image_path"] == exclude_path or not Path(entry["image_path"]).exists():
+                    continue
+                return {**entry, "similarity": round(score, 4)}
+        return None
+
+    def add(self, prompt: str, image_path: str, project_id: Optional[str] = None,
+            model: Optional[str] = None, aspect_ratio: Optional[str] = None):
+        """Indexa el prompt de una imagen recién generada (se persiste en flush)."""
+        features = hashed_features(prompt, self.dim)
+        if not len(features[0]):
+            return
+        entry = {"prompt": prompt, "image_path": str(image_path), "project_id": project_id,
+                 "model": model, "aspect_ratio": aspect_ratio}
+        with self._lock:
+            self._append(entry, features)
+            self._pending.append(entry)
+
+    def flush(self):
+        """Guarda los prompts añadidos desde el último flush e incorpora los de otros procesos."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                last_id = self._last_id
+            try:
+                conn = self._get_connection()
+                try:
+                    with conn:
+                        own_ids = set(self._insert(conn, pending))
+                        conn.execute('DELETE FROM prompt_index WHERE id <= (SELECT MAX(id) FROM prompt_index) - ?',
+                                     (self.max_entries,))
+                        rows = conn.execute(
+                            'SELECT id, prompt, image_path, project_id, model, aspect_ratio FROM prompt_index '
+                            'WHERE id > ? ORDER BY id', (last_id,)
+                        ).fetchall()
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo guardar el índice de prompts: {e}")
+                with self._lock:
+                    self._pending = pending + self._pending
+                return
+            with self._lock:
+                for row in rows:
+                    if row[0] not in own_ids:
+                        self._append(self._row_entry(row), hashed_features(row[1], self.dim))
+                if rows:
+                    self._last_id = rows[-1][0]
+
+    def __len__(self) -> int:
+        return len(self._entries) - self._first
+
+
+# Instancias globales del índice (una por base de datos)
+_prompt_indexes: Dict[Path, PromptSimilarityIndex] = {}
+_prompt_index_lock = threading.Lock()
+
+def get_prompt_similarity_index(index_config: Optional[Dict] = None) -> PromptSimilarityIndex:
+    """Obtiene el índice de prompts de video_generation.image_generation.similarity_reuse"""
+    index_config = index_config or {}
+    index_path = Path(index_config.get("index_path") or DEFAULT_INDEX_PATH)
+    max_entries = index_config.get("max_entries", 20000)
+    with _prompt_index_lock:
+        index = _prompt_indexes.get(index_path)
+        if index is None:
+            index = PromptSimilarityIndex(index_path=str(index_path), max_entries=max_entries)
+            _prompt_indexes[index_path] = index
+        elif index.max_entries != max(int(max_entries or 0), 1):
+            with index._lock:
+                index.max_entries = max(int(max_entries or 0), 1)
+                index._trim()
+    return index
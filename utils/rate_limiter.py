@@ -0,0 +1,135 @@
+# utils/rate_limiter.py
+"""
+Limitación de peticiones por proveedor/modelo con token bucket.
+
+Sustituye a las pausas fijas entre llamadas (p.ej. 0.5 s entre peticiones a
+Gemini): cada proveedor/modelo tiene un cubo con una tasa sostenida y una
+ráfaga máxima, compartido por todos los hilos del proceso. Así varios workers
+pueden generar prompts en paralelo sin superar los límites de la API.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Límites por defecto (peticiones por minuto y ráfaga). Se pueden sobrescribir
+# en config.yaml -> ai.rate_limits, por proveedor o por "proveedor/modelo".
+DEFAULT_RATE_LIMITS = {
+    "gemini": {"requests_per_minute": 120, "burst": 4},
+    "openai": {"requests_per_minute": 300, "burst": 8},
+    "ollama": {"requests_per_minute": 600, "burst": 2},
+    "replicate": {"requests_per_minute": 300, "burst": 4},
+    "fake": {"requests_per_minute": 60000, "burst": 64},  # Proveedores simulados (utils/fake_providers.py)
+    "default": {"requests_per_minute": 60, "burst": 2}
+}
+
+
+class TokenBucket:
+    """Cubo de tokens seguro entre hilos."""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        """
+        Args:
+            rate_per_second: Tokens que se reponen por segundo
+            capacity: Máximo de tokens acumulables (tamaño de ráfaga)
+        """
+        self.rate = max(rate_per_second, 1e-6)
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        Bloquea hasta disponer de los tokens pedidos.
+
+        Args:
+            tokens: Tokens a consumir
+            timeout: Espera máxima en segundos (None = sin límite)
+
+        Returns:
+            bool: True si se consumieron los tokens, False si venció el timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """Registro de cubos por proveedor/modelo."""
+
+    def __init__(self, limits: Optional[Dict] = None):
+        """
+        Args:
+            limits: Límites por clave ('gemini', 'gemini/models/gemini-2.5-flash'...);
+                    se combinan con DEFAULT_RATE_LIMITS
+        """
+        self.limits = {**DEFAULT_RATE_LIMITS, **(limits or {})}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.total_wait = 0.0
+
+    def _limit_for(self, provider: str, model: Optional[str]) -> Dict:
+        if model and f"{provider}/{model}" in self.limits:
+            return self.limits[f"{provider}/{model}"]
+        return self.limits.get(provider, self.limits["default"])
+
+    def bucket(self, provider: str, model: Optional[str] = None) -> TokenBucket:
+        """Devuelve (creándolo si hace falta) el cubo del proveedor/modelo."""
+        key = f"{provider}/{model}" if model else provider
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                limit = self._limit_for(provider, model)
+                bucket = TokenBucket(limit.get("requests_per_minute", 60) / 60.0, limit.get("burst", 1))
+                self._buckets[key] = bucket
+            return bucket
+
+    def acquire(self, provider: str, model: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """Espera turno para una petición al proveedor/modelo indicado."""
+        start = time.monotonic()
+        acquired = self.bucket(provider, model).acquire(timeout=timeout)
+        waited = time.monotonic() - start
+        if waited > 0.05:
+            logger.debug(f"⏱️ Rate limit {provider}/{model}: esperados {waited:.2f}s")
+        with self._lock:
+            self.total_wait += waited
+        return acquired
+
+
+# Instancia global del limitador
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """Obtiene la instancia global del limitador, con los límites de config.yaml (ai.rate_limits)"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            limits = {}
+            try:
+                from utils.config import load_config
+                limits = load_config().get("ai", {}).get("rate_limits", {}) or {}
+            except Exception as e:
+                logger.warning(f"No se pudieron cargar los límites de peticiones, usando valores por defecto: {e}")
+            _rate_limiter = RateLimiter(limits)
+    return _rate_limiter
@@ -1,13 +1,15 @@
 # utils/scene_generator.py
 import json
 from pathlib import Path
-from typing import List, Dict, Optional, Callable
+from typing import List, Dict, Optional, Callable, Tuple
 import logging
 import math
 import os
 import yaml
 import datetime # Added for save_scenes
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Importar AIServices desde el módulo correcto
 try:
@@ -21,6 +23,12 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Serializa las escrituras en debug_prompts.txt cuando varios hilos generan prompts
+_debug_prompts_lock = threading.Lock()
+
+# Sustituye a {scene_text} en la plantilla cuando varias escenas comparten petición
+BATCH_SCENE_PLACEHOLDER = "(cada una de las escenas numeradas de la lista ESCENAS)"
+
 # --- NUEVA CONSTANTE ---
 # Si una escena dura más que esto (en segundos), se subdividirá para mantener el dinamismo.
 
@@ -33,6 +41,10 @@ class SceneGenerator:
         self.use_auto_duration = use_auto_duration
         self.duration_per_image_manual = duration_per_image_manual
         self.duration_per_image = self.video_gen_config.get('timing', {}).get('default_duration_per_image', 10.0)
+        # Workers para generar prompts de imagen en paralelo (el ritmo lo marca el rate limiter)
+        self.prompt_workers = self.video_gen_config.get('prompt_generation', {}).get('max_workers', 4)
+        # Escenas por petición al LLM (1 = una petición por escena)
+        self.prompt_batch_size = self.video_gen_config.get('prompt_generation', {}).get('batch_size', 1)
         logger.info(f"SceneGenerator inicializado con duración/imagen base: {self.duration_per_image:.2f}s, max_scene_duration: {self.max_scene_duration}s, use_auto_duration: {self.use_auto_duration}, duration_per_image_manual: {self.duration_per_image_manual}")
 
     def _load_void_config(self) -> Dict:
@@ -214,45 +226,59 @@ class SceneGenerator:
         final_scenes = []
         
         for unit_idx, unit in enumerate(narrative_units):
-            unit_duration = unit['duration']
-            unit_text = unit['text']
-            
-            logger.info(f"Unidad {unit_idx+1}: {unit_duration:.1f}s - {unit_text[:60]}...")
+            final_scenes.extend(self._scenes_from_narrative_unit(unit, unit_idx, len(final_scenes)))
+        
+        logger.info(f"Resultado final: {len(final_scenes)} escenas visuales de {len(narrative_units)} unidades narrativas")
+        return final_scenes
+
+    def _scenes_from_narrative_unit(self, unit: Dict, unit_idx: int, first_index: int) -> List[Dict]:
+        """
+        Convierte una unidad narrativa cerrada en escenas visuales (una escena o
+        varios momentos si supera la duración máxima por imagen).
+        """
+        MAX_IMAGE_DURATION = self.max_scene_duration
+        TARGET_IMAGE_DURATION = MAX_IMAGE_DURATION * 0.8
+        MIN_NARRATIVE_DURATION = MAX_IMAGE_DURATION * 0.5
+        final_scenes = []
+        
+        unit_duration = unit['duration']
+        unit_text = unit['text']
+        
+        logger.info(f"Unidad {unit_idx+1}: {unit_duration:.1f}s - {unit_text[:60]}...")
+        
+        # Verificar si la unidad necesita subdivisión
+        if unit_duration <= MAX_IMAGE_DURATION:
+            # Unidad corta: usar como una sola escena
+            final_scenes.append({
+                "index": first_index + len(final_scenes),
+                "text": unit_text,
+                "start": unit['start'],
+                "end": unit['end'],
+                "duration": unit_duration,
+                "narrative_unit": unit_idx + 1,
+                "visual_moment": 1,
+                "scene_type": "single_unit"
+            })
+            logger.info(f"  → Escena única ({unit_duration:.1f}s)")
+        
+        else:
+            # Unidad larga: subdividir en momentos visuales dinámicos
+            logger.info(f"  → Subdividiendo unidad larga ({unit_duration:.1f}s)")
+            visual_moments = self._create_dynamic_visual_moments(unit, TARGET_IMAGE_DURATION, MAX_IMAGE_DURATION, MIN_NARRATIVE_DURATION)
             
-            # Verificar si la unidad necesita subdivisión
-            if unit_duration <= MAX_IMAGE_DURATION:
-                # Unidad corta: usar como una sola escena
+            for moment_idx, moment in enumerate(visual_moments):
                 final_scenes.append({
-                    "index": len(final_scenes),
-                    "text": unit_text,
-                    "start": unit['start'],
-                    "end": unit['end'],
-                    "duration": unit_duration,
+                    "index": first_index + len(final_scenes),
+                    "text": moment['text'],
+                    "start": moment['start'],
+                    "end": moment['end'],
+                    "duration": moment['duration'],
                     "narrative_unit": unit_idx + 1,
-                    "visual_moment": 1,
-                    "scene_type": "single_unit"
+                    "visual_moment": moment_idx + 1,
+                    "scene_type": "subdivided_moment"
                 })
-                logger.info(f"  → Escena única ({unit_duration:.1f}s)")
-            
-            else:
-                # Unidad larga: subdividir en momentos visuales dinámicos
-                logger.info(f"  → Subdividiendo unidad larga ({unit_duration:.1f}s)")
-                visual_moments = self._create_dynamic_visual_moments(unit, TARGET_IMAGE_DURATION, MAX_IMAGE_DURATION, MIN_NARRATIVE_DURATION)
-                
-                for moment_idx, moment in enumerate(visual_moments):
-                    final_scenes.append({
-                        "index": len(final_scenes),
-                        "text": moment['text'],
-                        "start": moment['start'],
-                        "end": moment['end'],
-                        "duration": moment['duration'],
-                        "narrative_unit": unit_idx + 1,
-                        "visual_moment": moment_idx + 1,
-                        "scene_type": "subdivided_moment"
-                    })
-                    logger.info(f"    • Momento {moment_idx+1}: {moment['duration']:.1f}s - {moment['text'][:50]}...")
+                logger.info(f"    • Momento {moment_idx+1}: {moment['duration']:.1f}s - {moment['text'][:50]}...")
         
-        logger.info(f"Resultado final: {len(final_scenes)} escenas visuales de {len(narrative_units)} unidades narrativas")
         return final_scenes
 
     def _detect_narrative_units(self, transcription_segments: List[Dict], max_unit_duration: float) -> List[Dict]:
@@ -279,22 +305,14 @@ class SceneGenerator:
             current_unit_duration = segment['end'] - current_unit_start
             
             # Determinar si es momento de cerrar la unidad narrativa
-            is_narrative_break = self._is_strong_narrative_break(segment_text, current_unit_text)
-            is_too_long = current_unit_duration >= max_unit_duration
             is_last_segment = i == len(transcription_segments) - 1
             
-            should_close_unit = False
-            close_reason = ""
-            
             if is_last_segment:
                 should_close_unit = True
                 close_reason = "último segmento"
-            elif is_too_long:
-                should_close_unit = True  
-                close_reason = f"duración máxima ({current_unit_duration:.1f}s)"
-            elif is_narrative_break and current_unit_duration >= 8.0:  # Solo si ya tiene contenido suficiente
-                should_close_unit = True
-                close_reason = "ruptura narrativa fuerte"
+            else:
+                close_reason = self._narrative_unit_close_reason(segment_text, current_unit_text, current_unit_duration, max_unit_duration)
+                should_close_unit = close_reason is not None
             
             if should_close_unit:
                 unit_text = " ".join(current_unit_text).strip()
@@ -317,6 +335,14 @@ class SceneGenerator:
         logger.info(f"Detectadas {len(units)} unidades narrativas")
         return units
 
+    def _narrative_unit_close_reason(self, segment_text: str, unit_text_so_far: List[str], unit_duration: float, max_unit_duration: float) -> Optional[str]:
+        """Devuelve el motivo para cerrar la unidad narrativa tras este segmento, o None si continúa."""
+        if unit_duration >= max_unit_duration:
+            return f"duración máxima ({unit_duration:.1f}s)"
+        if self._is_strong_narrative_break(segment_text, unit_text_so_far) and unit_duration >= 8.0:  # Solo si ya tiene contenido suficiente
+            return "ruptura narrativa fuerte"
+        return None
+
     def _is_strong_narrative_break(self, current_segment: str, unit_text_so_far: List[str]) -> bool:
         """
         Detecta rupturas narrativas FUERTES que justifican cerrar una unidad narrativa completa.
@@ -767,7 +793,8 @@ class SceneGenerator:
         # Crear escenas semánticas
         return self._create_semantic_scenes(transcription_segments, target_duration)
     
-    def generate_scenes_from_script(self, script_content: str, transcription_segments: List[Dict], mode: str, project_info: Dict, image_prompt_config: Dict, ai_service: AIServices) -> List[Dict]:
+    def generate_scenes_from_script(self, script_content: str, transcription_segments: List[Dict], mode: str, project_info: Dict, image_prompt_config: Dict, ai_service: AIServices,
+                                    progress_callback: Optional[Callable] = None, on_scene_ready: Optional[Callable] = None) -> List[Dict]:
         """Genera escenas con el nuevo modo híbrido por párrafos y una subdivisión robusta."""
         logger.info(f"Generando escenas con modo: '{mode}'...")
         
@@ -778,57 +805,14 @@ class SceneGenerator:
             
             final_scenes_base = []
             for scene in timed_scenes:
-                if scene['duration'] > self.max_scene_duration:
-                    logger.info(f"Scene {scene['index']} is too long ({scene['duration']:.1f}s > {self.max_scene_duration}s). Subdividing robustly.")
-                    
-                    # Robust subdivision logic
-                    scene_segments = [
-                        seg for seg in transcription_segments 
-                        if seg['start'] < scene['end'] and seg['end'] > scene['start']
-                    ]
-                    
-                    if not scene_segments:
-                        logger.warning(f"No segments found for long scene {scene['index']}. Using as is.")
-                        scene_copy = scene.copy()
-                        scene_copy["index"] = len(final_scenes_base)
-                        final_scenes_base.append(scene_copy)
-                        continue
-
-                    target_sub_duration = self.max_scene_duration * 0.9
-                    num_sub_scenes = max(2, round(scene['duration'] / target_sub_duration))
-                    
-                    k, m = divmod(len(scene_segments), num_sub_scenes)
-                    segment_groups = [
-                        scene_segments[i*k+min(i, m):(i+1)*k+min(i+1, m)] 
-                        for i in range(num_sub_scenes)
-                    ]
-                    
-                    for group in segment_groups:
-                        if not group: continue
-                        
-                        sub_scene_text = " ".join(s['text'].strip() for s in group)
-                        sub_start_time = group[0]['start']
-                        sub_end_time = group[-1]['end']
-                        sub_duration = sub_end_time - sub_start_time
-                        
-                        if sub_duration > 0:
-                            final_scenes_base.append({
-                                "index": len(final_scenes_base),
-                                "text": sub_scene_text,
-                                "start": sub_start_time,
-                                "end": sub_end_time,
-                                "duration": sub_duration
-                            })
-                else:
-                    scene_copy = scene.copy()
-                    scene_copy["index"] = len(final_scenes_base)
-                    final_scenes_base.append(scene_copy)
+                final_scenes_base.extend(self._subdivide_long_scene(scene, transcription_segments, len(final_scenes_base)))
             
             logger.info(f"Segmentación por párrafos resultó en {len(final_scenes_base)} escenas base.")
             
             # Generar prompts para estas escenas finales.
             final_scenes_with_prompts = self.generate_prompts_for_scenes(
-                final_scenes_base, project_info, image_prompt_config, ai_service
+                final_scenes_base, project_info, image_prompt_config, ai_service,
+                progress_callback=progress_callback, on_scene_ready=on_scene_ready
             )
             logger.info(f"Se generaron prompts para {len(final_scenes_with_prompts)} escenas.")
 
@@ -838,6 +822,59 @@ class SceneGenerator:
             # Fallback a métodos anteriores (sin cambios)
             return self._generate_scenes_legacy(script_content, transcription_segments, mode)
 
+    def _subdivide_long_scene(self, scene: Dict, transcription_segments: List[Dict], first_index: int) -> List[Dict]:
+        """
+        Devuelve la escena tal cual (reindexada) o, si supera max_scene_duration,
+        la subdivide repartiendo sus segmentos de audio en sub-escenas.
+        Solo necesita los segmentos que solapan con la escena.
+        """
+        if scene['duration'] <= self.max_scene_duration:
+            scene_copy = scene.copy()
+            scene_copy["index"] = first_index
+            return [scene_copy]
+        
+        logger.info(f"Scene {scene['index']} is too long ({scene['duration']:.1f}s > {self.max_scene_duration}s). Subdividing robustly.")
+        
+        # Robust subdivision logic
+        scene_segments = [
+            seg for seg in transcription_segments 
+            if seg['start'] < scene['end'] and seg['end'] > scene['start']
+        ]
+        
+        if not scene_segments:
+            logger.warning(f"No segments found for long scene {scene['index']}. Using as is.")
+            scene_copy = scene.copy()
+            scene_copy["index"] = first_index
+            return [scene_copy]
+
+        target_sub_duration = self.max_scene_duration * 0.9
+        num_sub_scenes = max(2, round(scene['duration'] / target_sub_duration))
+        
+        k, m = divmod(len(scene_segments), num_sub_scenes)
+        segment_groups = [
+            scene_segments[i*k+min(i, m):(i+1)*k+min(i+1, m)] 
+            for i in range(num_sub_scenes)
+        ]
+        
+        sub_scenes = []
+        for group in segment_groups:
+            if not group: continue
+            
+            sub_scene_text = " ".join(s['text'].strip() for s in group)
+            sub_start_time = group[0]['start']
+            sub_end_time = group[-1]['end']
+            sub_duration = sub_end_time - sub_start_time
+            
+            if sub_duration > 0:
+                sub_scenes.append({
+                    "index": first_index + len(sub_scenes),
+                    "text": sub_scene_text,
+                    "start": sub_start_time,
+                    "end": sub_end_time,
+                    "duration": sub_duration
+                })
+        return sub_scenes
+
     def _generate_scenes_legacy(self, script_content: str, transcription_segments: List[Dict], mode: str) -> List[Dict]:
         """Métodos de segmentación anteriores para compatibilidad."""
         if mode == "Por Duración (Basado en Audio)":
@@ -869,15 +906,101 @@ class SceneGenerator:
                     })
             return scenes
 
-    def generate_prompts_for_scenes(self, scenes: List[Dict], project_info: Dict, image_prompt_config: Dict, ai_service: AIServices) -> List[Dict]:
-        """Genera prompts para las escenas con sistema de fallback robusto."""
+    def generate_prompts_for_scenes(self, scenes: List[Dict], project_info: Dict, image_prompt_config: Dict, ai_service: AIServices,
+                                    progress_callback: Optional[Callable] = None, max_workers: Optional[int] = None,
+                                    only_missing: bool = False, on_scene_ready: Optional[Callable] = None) -> List[Dict]:
+        """
+        Genera prompts para las escenas con sistema de fallback robusto.
+        Las escenas se procesan en un pool de hilos acotado; el ritmo de
+        peticiones lo controla el limitador por proveedor/modelo y los
+        resultados se asignan a cada escena en su orden original.
+        
+        Args:
+            only_missing: Solo generar las escenas sin 'image_prompt' (reanudación)
+            on_scene_ready: Llamada on_scene_ready(scenes, índice) en cuanto una escena
+                            tiene prompt, desde el hilo que llama (p.ej. para lanzar su imagen)
+        """
+        logger.info(f"📊 Total de escenas: {len(scenes)}")
+        todo = [i for i in range(len(scenes)) if not (only_missing and scenes[i].get('image_prompt'))]
+        if not todo:
+            return scenes
+        prompt_context = self.prepare_prompt_context(project_info, image_prompt_config, ai_service)
+        
+        workers = max_workers or image_prompt_config.get('prompt_workers') or self.prompt_workers
+        workers = max(1, min(int(workers), len(todo)))
+        logger.info(f"⚙️ Generando {len(todo)} prompts con {workers} workers")
+        
+        def _scene_done(i: int):
+            if on_scene_ready:
+                try:
+                    on_scene_ready(scenes, i)
+                except Exception as e:
+                    logger.error(f"[Escena {i+1}] Error en on_scene_ready: {e}")
+        
+        batch_size = int(image_prompt_config.get('prompt_batch_size') or self.prompt_batch_size or 1)
+        pending = todo
+        completed = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Modo por lotes: K escenas por petición; las que falten se reintentan una a una
+            if batch_size > 1 and prompt_context.get("fallback") is None:
+                logger.info(f"📦 Modo por lotes: {batch_size} escenas por petición")
+                batches = [todo[start:start + batch_size] for start in range(0, len(todo), batch_size)]
+                batch_futures = {
+                    executor.submit(
+                        self.generate_prompts_for_scene_batch,
+                        [(i, scenes[i]) for i in batch_indices],
+                        prompt_context, project_info, ai_service
+                    ): batch_indices
+                    for batch_indices in batches
+                }
+                pending = []
+                for future in as_completed(batch_futures):
+                    batch_indices = batch_futures[future]
+                    try:
+                        missing = future.result()
+                    except Exception as e:
+                        logger.error(f"[Lote escenas {batch_indices[0]+1}-{batch_indices[-1]+1}] Error inesperado: {e}")
+                        missing = batch_indices
+                    pending.extend(missing)
+                    for i in batch_indices:
+                        if i not in missing:
+                            _scene_done(i)
+                    completed += len(batch_indices) - len(missing)
+                    if progress_callback:
+                        progress_callback(completed / len(todo), f"🎨 Prompts de imagen: {completed}/{len(todo)}")
+                pending.sort()
+            
+            futures = {
+                executor.submit(self.generate_prompt_for_scene, scenes[i], i, prompt_context, project_info, ai_service): i
+                for i in pending
+            }
+            # El progreso se reporta desde el hilo que llama (Streamlit no admite hilos secundarios)
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"[Escena {i+1}] Error inesperado generando prompt: {e}")
+                    scenes[i]['image_prompt'] = f"Photorealistic, cinematic, high detail: {scenes[i].get('text', '')[:350]}"
+                _scene_done(i)
+                completed += 1
+                if progress_callback:
+                    progress_callback(completed / len(todo), f"🎨 Prompts de imagen: {completed}/{len(todo)}")
+        return scenes
+
+    def prepare_prompt_context(self, project_info: Dict, image_prompt_config: Dict, ai_service: AIServices) -> Dict:
+        """
+        Prepara todo lo que comparten los prompts de un proyecto (detección histórica,
+        dossier del personaje, plantilla y proveedores). Se ejecuta una vez por
+        proyecto, antes de generar el prompt de cada escena, lo que permite generar
+        prompts a medida que van llegando escenas (transcripción en streaming).
+        """
         
         # 🔍 DEBUG INICIAL - CONFIGURACIÓN RECIBIDA
         logger.info("=" * 100)
         logger.info("🔍 DEBUG COMPLETO - INICIANDO GENERACIÓN DE PROMPTS")
         logger.info("=" * 100)
         logger.info(f"📊 Proyecto: {project_info.get('titulo', 'Sin título')}")
-        logger.info(f"📊 Total de escenas: {len(scenes)}")
         logger.info(f"📊 Configuración inicial recibida:")
         prompt_obj_name = "No definido"
         if image_prompt_config.get('prompt_obj') and hasattr(image_prompt_config['prompt_obj'], 'get'):
@@ -902,9 +1025,7 @@ class SceneGenerator:
         # VERIFICACIÓN CRÍTICA DEL AI_SERVICE
         if not ai_service:
             logger.error("🚨 ai_service es None! No se pueden generar prompts de imagen.")
-            for scene in scenes:
-                scene['image_prompt'] = f"[ERROR] AIServices no disponible. Prompt básico: {scene.get('text', '')[:350]}"
-            return scenes
+            return {"fallback": "no_ai_service", "image_prompt_config": image_prompt_config}
         
         prompt_obj = image_prompt_config.get('prompt_obj')
         provider_priority_list = image_prompt_config.get('img_prompt_providers_priority', ['gemini'])
@@ -918,9 +1039,7 @@ class SceneGenerator:
         
         if not prompt_obj:
             logger.warning("No se proporcionó plantilla de prompt. Usando fallback simple.")
-            for scene in scenes:
-                scene['image_prompt'] = f"Photorealistic, cinematic: {scene.get('text', '')[:350]}"
-            return scenes
+            return {"fallback": "no_template", "image_prompt_config": image_prompt_config}
 
         # 🎭 GENERACIÓN DE DOSSIER DE PERSONAJE PARA COHERENCIA VISUAL (FASE 2)
         character_dossier = None
@@ -933,244 +1052,416 @@ class SceneGenerator:
             else:
                 logger.warning("⚠️ No se pudo generar el dossier, continuando sin coherencia de personaje")
 
-        system_prompt = prompt_obj.get("system_prompt", "")
-        user_prompt_template = prompt_obj.get("user_prompt", "Generate an image for: {scene_text}")
+        return {
+            "fallback": None,
+            "image_prompt_config": image_prompt_config,
+            "prompt_obj": prompt_obj,
+            "provider_priority_list": provider_priority_list,
+            "character_dossier": character_dossier,
+            "system_prompt": prompt_obj.get("system_prompt", ""),
+            "user_prompt_template": prompt_obj.get("user_prompt", "Generate an image for: {scene_text}")
+        }
 
-        for i, scene in enumerate(scenes):
-            # Preparar todas las variables disponibles para el template
-            template_variables = {
-                'scene_text': scene['text'],
-                'titulo': project_info.get("titulo", ""),
-                'contexto': project_info.get("contexto", ""),
-                'style': image_prompt_config.get('style', '')  # Variable de estilo
-            }
-            
-            # 🏛️ AÑADIR VARIABLES HISTÓRICAS SI ESTÁN DISPONIBLES
-            historical_variables = image_prompt_config.get('historical_variables', {})
-            if historical_variables:
-                # 🔧 VALIDAR VARIABLES HISTÓRICAS - detectar si están vacías y usar detección automática como fallback
-                valid_historical_vars = {}
-                empty_vars = []
+    def generate_prompt_for_scene(self, scene: Dict, i: int, prompt_context: Dict, project_info: Dict, ai_service: AIServices) -> Dict:
+        """
+        Genera el prompt de imagen de una escena usando el contexto de
+        prepare_prompt_context. Modifica la escena (clave 'image_prompt') y la devuelve.
+        """
+        fallback = prompt_context.get("fallback")
+        if fallback == "no_ai_service":
+            scene['image_prompt'] = f"[ERROR] AIServices no disponible. Prompt básico: {scene.get('text', '')[:350]}"
+            return scene
+        if fallback == "no_template":
+            scene['image_prompt'] = f"Photorealistic, cinematic: {scene.get('text', '')[:350]}"
+            return scene
+
+        image_prompt_config = prompt_context["image_prompt_config"]
+        prompt_obj = prompt_context["prompt_obj"]
+        provider_priority_list = prompt_context["provider_priority_list"]
+        system_prompt = prompt_context["system_prompt"]
+        user_prompt_template = prompt_context["user_prompt_template"]
+
+        filtered_variables = self._build_scene_template_variables(scene, i, prompt_context, project_info)
+        template_vars_required = prompt_obj.get('variables', [])
+        historical_variables = image_prompt_config.get('historical_variables', {})
+
+        try:
+            user_prompt = user_prompt_template.format(**filtered_variables)
+        except KeyError as e:
+            logger.warning(f"[Escena {i+1}] Variable faltante en template: {e}. Usando template básico.")
+            user_prompt = f"Generate an image for: {scene['text']}"
+        
+        generated_prompt = None
+        
+        # 🔍 DEBUG COMPLETO DEL PROMPT
+        logger.info(f"[Escena {i+1}] =" * 80)
+        logger.info(f"[Escena {i+1}] 🔍 DEBUG COMPLETO - GENERACIÓN DE PROMPT")
+        logger.info(f"[Escena {i+1}] =" * 80)
+        logger.info(f"[Escena {i+1}] 📋 Prompt template: {prompt_obj.get('nombre', 'Sin nombre')}")
+        logger.info(f"[Escena {i+1}] 🔧 Proveedores disponibles: {provider_priority_list}")
+        logger.info(f"[Escena {i+1}] 📊 Variables del template requeridas: {template_vars_required}")
+        logger.info(f"[Escena {i+1}] ✅ Variables filtradas disponibles: {list(filtered_variables.keys())}")
+        logger.info(f"[Escena {i+1}] 🏛️ Variables históricas pasadas: {historical_variables}")
+        
+        # DEBUG: Mostrar cada variable y su valor
+        logger.info(f"[Escena {i+1}] 📝 VALORES DE VARIABLES:")
+        for var_name, var_value in filtered_variables.items():
+            logger.info(f"[Escena {i+1}]   • {var_name}: '{var_value[:100]}{'...' if len(str(var_value)) > 100 else ''}'")
+        
+        # DEBUG: Mostrar el system prompt completo
+        logger.info(f"[Escena {i+1}] 🤖 SYSTEM PROMPT ENVIADO A GEMINI:")
+        logger.info(f"[Escena {i+1}] {'-' * 60}")
+        logger.info(f"[Escena {i+1}] {system_prompt}")
+        logger.info(f"[Escena {i+1}] {'-' * 60}")
+        
+        # DEBUG: Mostrar el user prompt completo
+        logger.info(f"[Escena {i+1}] 👤 USER PROMPT ENVIADO A GEMINI:")
+        logger.info(f"[Escena {i+1}] {'-' * 60}")
+        logger.info(f"[Escena {i+1}] {user_prompt}")
+        logger.info(f"[Escena {i+1}] {'-' * 60}")
+        
+        for provider in provider_priority_list:
+            try:
+                logger.info(f"[Escena {i+1}] Intentando generar prompt con: {provider.upper()}")
                 
-                for key, value in historical_variables.items():
-                    if value and str(value).strip():  # Variable tiene contenido
-                        valid_historical_vars[key] = value
-                    else:  # Variable vacía
-                        empty_vars.append(key)
+                # Usar modelos específicos si están disponibles, sino usar por defecto
+                model = self._resolve_prompt_model(provider, image_prompt_config)
                 
-                if valid_historical_vars:
-                    template_variables.update(valid_historical_vars)
-                    logger.info(f"[Escena {i+1}] 🏛️ Variables históricas válidas añadidas: {list(valid_historical_vars.keys())}")
+                logger.info(f"[Escena {i+1}] 🔍 DEBUG - Usando modelo: {model}")
+                logger.info(f"[Escena {i+1}] 🔍 DEBUG - Llamando ai_service.generate_content...")
                 
-                if empty_vars:
-                    logger.warning(f"[Escena {i+1}] ⚠️ Variables históricas vacías detectadas: {empty_vars}")
-                    logger.info(f"[Escena {i+1}] 🤖 Aplicando detección automática para variables faltantes...")
-                    
-                    # Detectar contexto automáticamente para variables faltantes
-                    titulo = project_info.get("titulo", "")
-                    auto_context = self._detect_historical_context_from_title(titulo)
-                    
-                    # Solo usar las variables automáticas que estaban vacías
-                    filled_vars = []
-                    for var in empty_vars:
-                        if var in auto_context and auto_context[var]:
-                            template_variables[var] = auto_context[var]
-                            filled_vars.append(var)
-                            logger.info(f"[Escena {i+1}] 🤖 Variable '{var}' completada automáticamente")
-                    
-                    if filled_vars:
-                        logger.info(f"[Escena {i+1}] ✅ Variables completadas automáticamente: {filled_vars}")
-                    else:
-                        logger.warning(f"[Escena {i+1}] ❌ No se pudieron completar automáticamente las variables vacías")
-            else:
-                logger.debug(f"[Escena {i+1}] No hay variables históricas disponibles")
-            
-            # Obtener las variables requeridas por la plantilla
-            template_vars_required = prompt_obj.get('variables', [])
-            
-            # 🎭 INTEGRACIÓN CON DOSSIER DE PERSONAJE (FASE 2)
-            if character_dossier:
-                logger.info(f"[Escena {i+1}] 🎭 APLICANDO COHERENCIA VISUAL DEL PERSONAJE")
-                
-                # Detectar edad del personaje en esta escena
-                scene_text = scene.get('text', '')
-                project_context = project_info.get('contexto', '')
-                detected_age_stage = self._detect_character_age_stage(scene_text, project_context)
+                generated_text = ai_service.generate_content(
+                    provider=provider, 
+                    model=model, 
+                    system_prompt=system_prompt, 
+                    user_prompt=user_prompt
+                )
                 
-                # Extraer descripción específica del dossier
-                character_description = self._extract_character_description_from_dossier(character_dossier, detected_age_stage)
+                # 🔍 DEBUG COMPLETO DE LA RESPUESTA
+                logger.info(f"[Escena {i+1}] 🤖 RESPUESTA COMPLETA DE {provider.upper()}:")
+                logger.info(f"[Escena {i+1}] {'=' * 60}")
+                logger.info(f"[Escena {i+1}] Tipo: {type(generated_text)}")
+                logger.info(f"[Escena {i+1}] Longitud: {len(str(generated_text)) if generated_text else 0} caracteres")
+                logger.info(f"[Escena {i+1}] Contenido completo:")
+                logger.info(f"[Escena {i+1}] {'-' * 40}")
+                if generated_text:
+                    # Mostrar respuesta completa con numeración de líneas
+                    lines = str(generated_text).split('\n')
+                    for line_num, line in enumerate(lines, 1):
+                        logger.info(f"[Escena {i+1}] {line_num:3d}: {line}")
+                else:
+                    logger.info(f"[Escena {i+1}] [RESPUESTA VACÍA O NULA]")
+                logger.info(f"[Escena {i+1}] {'-' * 40}")
+                logger.info(f"[Escena {i+1}] {'=' * 60}")
                 
-                if character_description:
-                    # Añadir la descripción del personaje como variable separada
-                    template_variables['character_description'] = character_description
-                    
-                    logger.info(f"[Escena {i+1}] ✅ Descripción del personaje aplicada")
-                    logger.info(f"[Escena {i+1}] 🎯 Edad detectada: {detected_age_stage.upper()}")
-                    logger.info(f"[Escena {i+1}] 📝 Descripción: {character_description[:100]}...")
+                if generated_text and "[ERROR]" not in generated_text:
+                    logger.info(f"[Escena {i+1}] ✅ ÉXITO con {provider.upper()}")
+                    generated_prompt = generated_text.strip()
+                    break
                 else:
-                    # Si no hay descripción específica, usar string vacío para evitar errores
-                    template_variables['character_description'] = ""
-                    logger.warning(f"[Escena {i+1}] ⚠️ No se pudo extraer descripción para edad: {detected_age_stage}")
-            else:
-                # Si no hay dossier, usar string vacío para la descripción del personaje
-                template_variables['character_description'] = ""
+                    logger.warning(f"[Escena {i+1}] ❌ FALLO con {provider.upper()}")
+                    logger.warning(f"[Escena {i+1}] Motivo: {'Texto vacío o nulo' if not generated_text else 'Contiene [ERROR]'}")
+            except Exception as e:
+                logger.error(f"[Escena {i+1}] ❌ Fallo grave con {provider.upper()}: {e}. Intentando siguiente proveedor.")
+        
+        if not generated_prompt:
+            logger.error(f"[Escena {i+1}] 🚨 Todos los proveedores fallaron. Usando prompt de emergencia. Texto de escena: {scene['text'][:100]}...")
+            generated_prompt = f"Photorealistic, cinematic, high detail: {scene['text'][:350]}"
+        
+        self._finalize_scene_prompt(scene, i, generated_prompt, prompt_context, project_info, user_prompt)
+        
+        return scene
+
+    @staticmethod
+    def _resolve_prompt_model(provider: str, image_prompt_config: Dict) -> str:
+        """Modelo a usar para un proveedor de prompts: el configurado o el de por defecto."""
+        provided_models = image_prompt_config.get('img_prompt_models', {})
+        if provider in provided_models:
+            return provided_models[provider]
+        # Fallback a modelos por defecto
+        model_map = {
+            'gemini': 'models/gemini-2.5-flash-lite-preview-06-17',
+            'openai': 'gpt-3.5-turbo',
+            'ollama': 'llama3.2'
+        }
+        return model_map.get(provider, 'default')
+
+    def generate_prompts_for_scene_batch(self, batch: List[Tuple[int, Dict]], prompt_context: Dict, project_info: Dict, ai_service: AIServices) -> List[int]:
+        """
+        Genera los prompts de varias escenas con una sola petición al LLM.
+        
+        El system prompt y las variables comunes (título, contexto histórico,
+        descripción del personaje) se envían una vez; la respuesta debe ser un
+        array JSON con un prompt por escena. Se respeta la cadena de proveedores.
+        
+        Args:
+            batch: Lista de (índice de la escena, escena)
+            prompt_context: Contexto de prepare_prompt_context
+            project_info: Información del proyecto
+            ai_service: Servicio de IA
             
-            # Filtrar solo las variables que realmente necesita la plantilla
-            filtered_variables = {
-                var: template_variables.get(var, '') 
-                for var in template_vars_required 
-                if var in template_variables
-            }
+        Returns:
+            List[int]: Índices de las escenas que no obtuvieron prompt (reintentar individualmente)
+        """
+        image_prompt_config = prompt_context["image_prompt_config"]
+        user_prompt_template = prompt_context["user_prompt_template"]
+        
+        # Las escenas solo pueden compartir petición si el resto de variables coincide
+        # (p.ej. la descripción del personaje cambia con la edad detectada)
+        groups: List[Tuple[Dict, List[Tuple[int, Dict]]]] = []
+        for i, scene in batch:
+            variables = self._build_scene_template_variables(scene, i, prompt_context, project_info)
+            shared = {k: v for k, v in variables.items() if k != 'scene_text'}
+            if groups and groups[-1][0] == shared:
+                groups[-1][1].append((i, scene))
+            else:
+                groups.append((shared, [(i, scene)]))
+        
+        missing = []
+        for shared, group in groups:
+            try:
+                shared_prompt = user_prompt_template.format(**shared, scene_text=BATCH_SCENE_PLACEHOLDER) \
+                    if 'scene_text' in prompt_context["prompt_obj"].get('variables', []) else user_prompt_template.format(**shared)
+            except (KeyError, IndexError) as e:
+                logger.warning(f"[Lote escenas {group[0][0]+1}-{group[-1][0]+1}] Plantilla no apta para lotes ({e}); se generan individualmente.")
+                missing.extend(i for i, _ in group)
+                continue
             
-            # 🏛️ LOGGING ESPECIAL PARA PROMPT HISTÓRICO
-            if prompt_obj.get('nombre') == "Escenas Fotorrealistas Históricamente Precisas":
-                logger.info(f"[Escena {i+1}] 🏛️ PROMPT HISTÓRICO DETECTADO")
-                logger.info(f"[Escena {i+1}] 🏛️ Variables históricas: {historical_variables}")
-                logger.info(f"[Escena {i+1}] 🏛️ Variables filtradas: {filtered_variables}")
-                
-                # 🎭 LOGGING ESPECIAL PARA COHERENCIA DE PERSONAJE
-                if character_dossier:
-                    logger.info(f"[Escena {i+1}] 🎭 COHERENCIA DE PERSONAJE ACTIVA")
-                    if 'character_description' in template_variables:
-                        logger.info(f"[Escena {i+1}] 🎭 Descripción integrada en prompt histórico")
+            scene_list = "\n".join(f"{n}. {scene['text'].strip()}" for n, (_, scene) in enumerate(group, start=1))
+            user_prompt = (
+                f"{shared_prompt}\n\n"
+                f"Genera un prompt de imagen independiente para CADA una de las {len(group)} escenas siguientes, "
+                f"aplicando las instrucciones anteriores a cada escena por separado.\n"
+                f"Responde ÚNICAMENTE con un array JSON de {len(group)} objetos con la forma "
+                f'{{"scene": <número de escena>, "prompt": "<prompt>"}}, en el mismo orden y sin texto adicional.\n\n'
+                f"ESCENAS:\n{scene_list}"
+            )
             
-            # DEBUG: Mostrar las variables filtradas antes de formatear el user_prompt
-            logger.debug(f"[Escena {i+1}] DEBUG - filtered_variables antes de formatear user_prompt: {filtered_variables}")
-
-            try:
-                user_prompt = user_prompt_template.format(**filtered_variables)
-            except KeyError as e:
-                logger.warning(f"[Escena {i+1}] Variable faltante en template: {e}. Usando template básico.")
-                user_prompt = f"Generate an image for: {scene['text']}"
-            
-            generated_prompt = None
-            
-            # 🔍 DEBUG COMPLETO DEL PROMPT
-            logger.info(f"[Escena {i+1}] =" * 80)
-            logger.info(f"[Escena {i+1}] 🔍 DEBUG COMPLETO - GENERACIÓN DE PROMPT")
-            logger.info(f"[Escena {i+1}] =" * 80)
-            logger.info(f"[Escena {i+1}] 📋 Prompt template: {prompt_obj.get('nombre', 'Sin nombre')}")
-            logger.info(f"[Escena {i+1}] 🔧 Proveedores disponibles: {provider_priority_list}")
-            logger.info(f"[Escena {i+1}] 📊 Variables del template requeridas: {template_vars_required}")
-            logger.info(f"[Escena {i+1}] ✅ Variables filtradas disponibles: {list(filtered_variables.keys())}")
-            logger.info(f"[Escena {i+1}] 🏛️ Variables históricas pasadas: {historical_variables}")
-            
-            # DEBUG: Mostrar cada variable y su valor
-            logger.info(f"[Escena {i+1}] 📝 VALORES DE VARIABLES:")
-            for var_name, var_value in filtered_variables.items():
-                logger.info(f"[Escena {i+1}]   • {var_name}: '{var_value[:100]}{'...' if len(str(var_value)) > 100 else ''}'")
-            
-            # DEBUG: Mostrar el system prompt completo
-            logger.info(f"[Escena {i+1}] 🤖 SYSTEM PROMPT ENVIADO A GEMINI:")
-            logger.info(f"[Escena {i+1}] {'-' * 60}")
-            logger.info(f"[Escena {i+1}] {system_prompt}")
-            logger.info(f"[Escena {i+1}] {'-' * 60}")
-            
-            # DEBUG: Mostrar el user prompt completo
-            logger.info(f"[Escena {i+1}] 👤 USER PROMPT ENVIADO A GEMINI:")
-            logger.info(f"[Escena {i+1}] {'-' * 60}")
-            logger.info(f"[Escena {i+1}] {user_prompt}")
-            logger.info(f"[Escena {i+1}] {'-' * 60}")
-            
-            for provider in provider_priority_list:
+            parsed = {}
+            for provider in prompt_context["provider_priority_list"]:
+                model = self._resolve_prompt_model(provider, image_prompt_config)
                 try:
-                    logger.info(f"[Escena {i+1}] Intentando generar prompt con: {provider.upper()}")
-                    
-                    # Usar modelos específicos si están disponibles, sino usar por defecto
-                    provided_models = image_prompt_config.get('img_prompt_models', {})
-                    if provider in provided_models:
-                        model = provided_models[provider]
-                    else:
-                        # Fallback a modelos por defecto
-                        model_map = {
-                            'gemini': 'models/gemini-2.5-flash-lite-preview-06-17',
-                            'openai': 'gpt-3.5-turbo',
-                            'ollama': 'llama3.2'
-                        }
-                        model = model_map.get(provider, 'default')
-                    
-                    logger.info(f"[Escena {i+1}] 🔍 DEBUG - Usando modelo: {model}")
-                    logger.info(f"[Escena {i+1}] 🔍 DEBUG - Llamando ai_service.generate_content...")
-                    
-                    # Añadir delay entre requests para evitar rate limits
-                    if i > 0 and provider == "gemini":
-                        delay = 0.5  # 500ms entre requests de Gemini
-                        logger.info(f"[Escena {i+1}] ⏱️ Delay de {delay}s para evitar rate limits...")
-                        import time
-                        time.sleep(delay)
-                    
                     generated_text = ai_service.generate_content(
-                        provider=provider, 
-                        model=model, 
-                        system_prompt=system_prompt, 
+                        provider=provider,
+                        model=model,
+                        system_prompt=prompt_context["system_prompt"],
                         user_prompt=user_prompt
                     )
-                    
-                    # 🔍 DEBUG COMPLETO DE LA RESPUESTA
-                    logger.info(f"[Escena {i+1}] 🤖 RESPUESTA COMPLETA DE {provider.upper()}:")
-                    logger.info(f"[Escena {i+1}] {'=' * 60}")
-                    logger.info(f"[Escena {i+1}] Tipo: {type(generated_text)}")
-                    logger.info(f"[Escena {i+1}] Longitud: {len(str(generated_text)) if generated_text else 0} caracteres")
-                    logger.info(f"[Escena {i+1}] Contenido completo:")
-                    logger.info(f"[Escena {i+1}] {'-' * 40}")
-                    if generated_text:
-                        # Mostrar respuesta completa con numeración de líneas
-                        lines = str(generated_text).split('\n')
-                        for line_num, line in enumerate(lines, 1):
-                            logger.info(f"[Escena {i+1}] {line_num:3d}: {line}")
-                    else:
-                        logger.info(f"[Escena {i+1}] [RESPUESTA VACÍA O NULA]")
-                    logger.info(f"[Escena {i+1}] {'-' * 40}")
-                    logger.info(f"[Escena {i+1}] {'=' * 60}")
-                    
-                    if generated_text and "[ERROR]" not in generated_text:
-                        logger.info(f"[Escena {i+1}] ✅ ÉXITO con {provider.upper()}")
-                        generated_prompt = generated_text.strip()
+                    if not generated_text or "[ERROR]" in generated_text:
+                        logger.warning(f"[Lote escenas {group[0][0]+1}-{group[-1][0]+1}] ❌ FALLO con {provider.upper()}")
+                        continue
+                    parsed = self._parse_batch_prompts(generated_text, len(group))
+                    if parsed:
+                        logger.info(f"[Lote escenas {group[0][0]+1}-{group[-1][0]+1}] ✅ {len(parsed)}/{len(group)} prompts con {provider.upper()}")
                         break
-                    else:
-                        logger.warning(f"[Escena {i+1}] ❌ FALLO con {provider.upper()}")
-                        logger.warning(f"[Escena {i+1}] Motivo: {'Texto vacío o nulo' if not generated_text else 'Contiene [ERROR]'}")
+                    logger.warning(f"[Lote escenas {group[0][0]+1}-{group[-1][0]+1}] Respuesta de {provider.upper()} sin JSON válido")
                 except Exception as e:
-                    logger.error(f"[Escena {i+1}] ❌ Fallo grave con {provider.upper()}: {e}. Intentando siguiente proveedor.")
+                    logger.error(f"[Lote escenas {group[0][0]+1}-{group[-1][0]+1}] ❌ Fallo grave con {provider.upper()}: {e}. Intentando siguiente proveedor.")
             
-            if not generated_prompt:
-                logger.error(f"[Escena {i+1}] 🚨 Todos los proveedores fallaron. Usando prompt de emergencia. Texto de escena: {scene['text'][:100]}...")
-                generated_prompt = f"Photorealistic, cinematic, high detail: {scene['text'][:350]}"
+            for n, (i, scene) in enumerate(group, start=1):
+                if n in parsed:
+                    self._finalize_scene_prompt(scene, i, parsed[n], prompt_context, project_info, user_prompt)
+                else:
+                    missing.append(i)
+        
+        if missing:
+            logger.info(f"⚠️ {len(missing)} escenas sin prompt en el lote; se reintentarán individualmente")
+        return missing
+
+    @staticmethod
+    def _parse_batch_prompts(text: str, expected: int) -> Dict[int, str]:
+        """
+        Extrae los prompts de la respuesta de un lote. Acepta el array JSON pedido,
+        envuelto o no en bloques ```json, arrays de cadenas y, como último recurso,
+        objetos sueltos con clave "prompt".
+        
+        Returns:
+            Dict[int, str]: Número de escena (1..expected) -> prompt
+        """
+        cleaned = re.sub(r'```(?:json)?', '', text).strip()
+        items = None
+        start, end = cleaned.find('['), cleaned.rfind(']')
+        if start != -1 and end > start:
+            try:
+                items = json.loads(cleaned[start:end + 1])
+            except json.JSONDecodeError:
+                items = None
+        
+        prompts: Dict[int, str] = {}
+        if isinstance(items, list):
+            for position, item in enumerate(items, start=1):
+                if isinstance(item, str):
+                    number, prompt = position, item
+                elif isinstance(item, dict):
+                    prompt = item.get('prompt') or item.get('image_prompt') or ''
+                    number = item.get('scene', item.get('index', position))
+                else:
+                    continue
+                try:
+                    number = int(number)
+                except (TypeError, ValueError):
+                    number = position
+                if 1 <= number <= expected and isinstance(prompt, str) and prompt.strip():
+                    prompts.setdefault(number, prompt.strip())
+            return prompts
+        
+        # JSON inválido: recuperar objetos individuales
+        pattern = r'"scene"\s*:\s*(\d+)\s*,\s*"prompt"\s*:\s*"((?:[^"\\]|\\.)*)"'
+        for number, raw_prompt in re.findall(pattern, cleaned):
+            try:
+                prompt = json.loads(f'"{raw_prompt}"')
+            except json.JSONDecodeError:
+                prompt = raw_prompt
+            number = int(number)
+            if 1 <= number <= expected and prompt.strip():
+                prompts.setdefault(number, prompt.strip())
+        return prompts
+
+    def _build_scene_template_variables(self, scene: Dict, i: int, prompt_context: Dict, project_info: Dict) -> Dict:
+        """Calcula las variables de la plantilla para una escena (históricas, personaje...) filtradas a las requeridas."""
+        image_prompt_config = prompt_context["image_prompt_config"]
+        prompt_obj = prompt_context["prompt_obj"]
+        character_dossier = prompt_context["character_dossier"]
+
+        # Preparar todas las variables disponibles para el template
+        template_variables = {
+            'scene_text': scene['text'],
+            'titulo': project_info.get("titulo", ""),
+            'contexto': project_info.get("contexto", ""),
+            'style': image_prompt_config.get('style', '')  # Variable de estilo
+        }
+        
+        # 🏛️ AÑADIR VARIABLES HISTÓRICAS SI ESTÁN DISPONIBLES
+        historical_variables = image_prompt_config.get('historical_variables', {})
+        if historical_variables:
+            # 🔧 VALIDAR VARIABLES HISTÓRICAS - detectar si están vacías y usar detección automática como fallback
+            valid_historical_vars = {}
+            empty_vars = []
+            
+            for key, value in historical_variables.items():
+                if value and str(value).strip():  # Variable tiene contenido
+                    valid_historical_vars[key] = value
+                else:  # Variable vacía
+                    empty_vars.append(key)
+            
+            if valid_historical_vars:
+                template_variables.update(valid_historical_vars)
+                logger.info(f"[Escena {i+1}] 🏛️ Variables históricas válidas añadidas: {list(valid_historical_vars.keys())}")
+            
+            if empty_vars:
+                logger.warning(f"[Escena {i+1}] ⚠️ Variables históricas vacías detectadas: {empty_vars}")
+                logger.info(f"[Escena {i+1}] 🤖 Aplicando detección automática para variables faltantes...")
+                
+                # Detectar contexto automáticamente para variables faltantes
+                titulo = project_info.get("titulo", "")
+                auto_context = self._detect_historical_context_from_title(titulo)
+                
+                # Solo usar las variables automáticas que estaban vacías
+                filled_vars = []
+                for var in empty_vars:
+                    if var in auto_context and auto_context[var]:
+                        template_variables[var] = auto_context[var]
+                        filled_vars.append(var)
+                        logger.info(f"[Escena {i+1}] 🤖 Variable '{var}' completada automáticamente")
+                
+                if filled_vars:
+                    logger.info(f"[Escena {i+1}] ✅ Variables completadas automáticamente: {filled_vars}")
+                else:
+                    logger.warning(f"[Escena {i+1}] ❌ No se pudieron completar automáticamente las variables vacías")
+        else:
+            logger.debug(f"[Escena {i+1}] No hay variables históricas disponibles")
+        
+        # Obtener las variables requeridas por la plantilla
+        template_vars_required = prompt_obj.get('variables', [])
+        
+        # 🎭 INTEGRACIÓN CON DOSSIER DE PERSONAJE (FASE 2)
+        if character_dossier:
+            logger.info(f"[Escena {i+1}] 🎭 APLICANDO COHERENCIA VISUAL DEL PERSONAJE")
             
-            # Asegurar que el estilo se pre-añade al prompt final
-            final_style = image_prompt_config.get('style', '').strip()
-            if not final_style:
-                final_style = "realistic, high detail" # Estilo por defecto si no se especifica
+            # Detectar edad del personaje en esta escena
+            scene_text = scene.get('text', '')
+            project_context = project_info.get('contexto', '')
+            detected_age_stage = self._detect_character_age_stage(scene_text, project_context)
             
-            scene['image_prompt'] = f"{final_style}, {generated_prompt}"
+            # Extraer descripción específica del dossier
+            character_description = self._extract_character_description_from_dossier(character_dossier, detected_age_stage)
             
-            # Limpiar posibles comas dobles o espacios extra
-            scene['image_prompt'] = scene['image_prompt'].replace(", ,", ",").replace("  ", " ").strip()
-            if scene['image_prompt'].endswith(','):
-                scene['image_prompt'] = scene['image_prompt'][:-1].strip()
-            logger.info(f"[Escena {i+1}] Prompt final asignado: {scene['image_prompt'][:100]}...")
-
-            # --- DEBUG: Guardar prompt en archivo ---
-            project_id = project_info.get('id', 'unknown_project')
-            project_dir = Path("projects") / project_id
-            debug_file_path = project_dir / "debug_prompts.txt"
+            if character_description:
+                # Añadir la descripción del personaje como variable separada
+                template_variables['character_description'] = character_description
+                
+                logger.info(f"[Escena {i+1}] ✅ Descripción del personaje aplicada")
+                logger.info(f"[Escena {i+1}] 🎯 Edad detectada: {detected_age_stage.upper()}")
+                logger.info(f"[Escena {i+1}] 📝 Descripción: {character_description[:100]}...")
+            else:
+                # Si no hay descripción específica, usar string vacío para evitar errores
+                template_variables['character_description'] = ""
+                logger.warning(f"[Escena {i+1}] ⚠️ No se pudo extraer descripción para edad: {detected_age_stage}")
+        else:
+            # Si no hay dossier, usar string vacío para la descripción del personaje
+            template_variables['character_description'] = ""
+        
+        # Filtrar solo las variables que realmente necesita la plantilla
+        filtered_variables = {
+            var: template_variables.get(var, '') 
+            for var in template_vars_required 
+            if var in template_variables
+        }
+        
+        # 🏛️ LOGGING ESPECIAL PARA PROMPT HISTÓRICO
+        if prompt_obj.get('nombre') == "Escenas Fotorrealistas Históricamente Precisas":
+            logger.info(f"[Escena {i+1}] 🏛️ PROMPT HISTÓRICO DETECTADO")
+            logger.info(f"[Escena {i+1}] 🏛️ Variables históricas: {historical_variables}")
+            logger.info(f"[Escena {i+1}] 🏛️ Variables filtradas: {filtered_variables}")
             
-            try:
-                project_dir.mkdir(parents=True, exist_ok=True)
-                with open(debug_file_path, 'a', encoding='utf-8') as f:
-                    f.write(f"--- Escena {i+1} ---\n")
-                    f.write(f"### System Prompt (LLM) ###\n")
-                    f.write(f"""{system_prompt}\n""")
-                    f.write(f"### User Prompt (LLM) ###\n")
-                    f.write(f"""{user_prompt}\n""")
-                    f.write(f"### Final Image Prompt ###\n")
-                    f.write(f"{scene['image_prompt']}\n\n")
-                logger.info(f"[Escena {i+1}] Prompts de depuración guardados en {debug_file_path}")
-            except Exception as e:
-                logger.error(f"[Escena {i+1}] Error al guardar prompts de depuración en debug_prompts.txt: {e}")
-            # --- FIN DEBUG ---
+            # 🎭 LOGGING ESPECIAL PARA COHERENCIA DE PERSONAJE
+            if character_dossier:
+                logger.info(f"[Escena {i+1}] 🎭 COHERENCIA DE PERSONAJE ACTIVA")
+                if 'character_description' in template_variables:
+                    logger.info(f"[Escena {i+1}] 🎭 Descripción integrada en prompt histórico")
         
-        return scenes
+        # DEBUG: Mostrar las variables filtradas antes de formatear el user_prompt
+        logger.debug(f"[Escena {i+1}] DEBUG - filtered_variables antes de formatear user_prompt: {filtered_variables}")
+        
+        return filtered_variables
+
+    def _finalize_scene_prompt(self, scene: Dict, i: int, generated_prompt: str, prompt_context: Dict, project_info: Dict, user_prompt: str):
+        """Antepone el estilo, limpia el prompt final, lo asigna a la escena y lo guarda en debug_prompts.txt."""
+        image_prompt_config = prompt_context["image_prompt_config"]
+        system_prompt = prompt_context["system_prompt"]
+
+        # Asegurar que el estilo se pre-añade al prompt final
+        final_style = image_prompt_config.get('style', '').strip()
+        if not final_style:
+            final_style = "realistic, high detail" # Estilo por defecto si no se especifica
+        
+        scene['image_prompt'] = f"{final_style}, {generated_prompt}"
+        
+        # Limpiar posibles comas dobles o espacios extra
+        scene['image_prompt'] = scene['image_prompt'].replace(", ,", ",").replace("  ", " ").strip()
+        if scene['image_prompt'].endswith(','):
+            scene['image_prompt'] = scene['image_prompt'][:-1].strip()
+        logger.info(f"[Escena {i+1}] Prompt final asignado: {scene['image_prompt'][:100]}...")
+
+        # --- DEBUG: Guardar prompt en archivo ---
+        project_id = project_info.get('id', 'unknown_project')
+        project_dir = Path("projects") / project_id
+        debug_file_path = project_dir / "debug_prompts.txt"
+        
+        try:
+            project_dir.mkdir(parents=True, exist_ok=True)
+            with _debug_prompts_lock, open(debug_file_path, 'a', encoding='utf-8') as f:
+                f.write(f"--- Escena {i+1} ---\n")
+                f.write(f"### System Prompt (LLM) ###\n")
+                f.write(f"""{system_prompt}\n""")
+                f.write(f"### User Prompt (LLM) ###\n")
+                f.write(f"""{user_prompt}\n""")
+                f.write(f"### Final Image Prompt ###\n")
+                f.write(f"{scene['image_prompt']}\n\n")
+            logger.info(f"[Escena {i+1}] Prompts de depuración guardados en {debug_file_path}")
+        except Exception as e:
+            logger.error(f"[Escena {i+1}] Error al guardar prompts de depuración en debug_prompts.txt: {e}")
+        # --- FIN DEBUG ---
 
     # --- FUNCIÓN HEREDADA PARA COMPATIBILIDAD ---
     def _generate_prompts_for_scenes(self, scenes: List[Dict], project_info: Dict, img_prompt_config: Dict, ai_service: AIServices) -> List[Dict]:
@@ -1990,3 +2281,79 @@ class SceneGenerator:
             return True
         
         return False
+
+
+class IncrementalSceneSegmenter:
+    """
+    Segmentador de escenas incremental para el modo "Por Párrafos (Híbrido)".
+
+    Recibe los segmentos de la transcripción a medida que se producen y emite
+    las escenas definitivas en cuanto se cierra su unidad narrativa, aplicando
+    las mismas reglas que generate_scenes_from_script. Así la generación de
+    prompts de las primeras escenas puede empezar mientras se sigue
+    transcribiendo el resto del audio.
+    """
+
+    def __init__(self, scene_generator: "SceneGenerator"):
+        self.scene_generator = scene_generator
+        self.max_unit_duration = scene_generator.max_scene_duration * 1.25
+        self.segments: List[Dict] = []
+        self.scenes: List[Dict] = []
+        self._unit_segments: List[Dict] = []
+        self._unit_texts: List[str] = []
+        self._unit_start: Optional[float] = None
+        self._unit_count = 0
+
+    def add_segment(self, segment: Dict) -> List[Dict]:
+        """
+        Añade un segmento de transcripción.
+
+        Returns:
+            List[Dict]: Escenas finalizadas por este segmento (puede estar vacía)
+        """
+        self.segments.append(segment)
+        segment = self.scene_generator._fix_encoding_in_segments([segment])[0]
+        if self._unit_start is None:
+            # La primera unidad empieza en el primer segmento; las siguientes donde acabó la anterior
+            self._unit_start = segment['start']
+        self._unit_segments.append(segment)
+        self._unit_texts.append(segment['text'].strip())
+
+        unit_duration = segment['end'] - self._unit_start
+        close_reason = self.scene_generator._narrative_unit_close_reason(
+            segment['text'].strip(), self._unit_texts, unit_duration, self.max_unit_duration
+        )
+        if close_reason is None:
+            return []
+        logger.debug(f"  Unidad {self._unit_count + 1}: {unit_duration:.1f}s ({close_reason})")
+        return self._close_unit(next_start=segment['end'])
+
+    def finish(self) -> List[Dict]:
+        """Cierra la última unidad narrativa al terminar la transcripción."""
+        if not self._unit_segments:
+            return []
+        return self._close_unit(next_start=None)
+
+    def _close_unit(self, next_start: Optional[float]) -> List[Dict]:
+        last_segment = self._unit_segments[-1]
+        unit_text = " ".join(self._unit_texts).strip()
+        unit = {
+            "text": unit_text,
+            "start": self._unit_start,
+            "end": last_segment['end'],
+            "duration": last_segment['end'] - self._unit_start,
+            "segments_count": len(self._unit_texts)
+        }
+        self._unit_segments = []
+        self._unit_texts = []
+        self._unit_start = next_start
+        if not unit_text:
+            return []
+
+        new_scenes = []
+        for scene in self.scene_generator._scenes_from_narrative_unit(unit, self._unit_count, len(self.scenes)):
+            for final_scene in self.scene_generator._subdivide_long_scene(scene, self.segments, len(self.scenes) + len(new_scenes)):
+                new_scenes.append(final_scene)
+        self._unit_count += 1
+        self.scenes.extend(new_scenes)
+        return new_scenes
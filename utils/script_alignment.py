@@ -0,0 +1,258 @@
+# utils/script_alignment.py
+"""
+Alineación forzada guion → audio basada en energía (VAD simple).
+
+Cuando conocemos el texto exacto que se sintetizó (p.ej. Fish Audio, que no
+devuelve tiempos), no hace falta reconocer el habla: basta con localizar los
+tramos de voz y las pausas del audio y repartir las palabras del guion sobre
+ellos. Las pausas se anclan a la puntuación del guion para evitar la deriva.
+Es órdenes de magnitud más rápido que pasar el modelo Whisper 'medium'.
+"""
+
+import logging
+import re
+import subprocess
+import time
+from typing import List, Dict, Tuple, Optional, Callable
+
+import numpy as np
+
+from utils.transcription_utils import tokenize_script, build_segments_from_words
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.02  # 20 ms por frame de energía
+
+# Puntuación tras la que se espera una pausa (más tolerancia en fin de frase)
+STRONG_BREAK_CHARS = ('.', '!', '?', '…', ';', ':')
+WEAK_BREAK_CHARS = (',', ')', '»', '"')
+
+
+def load_audio_mono(audio_path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decodifica el audio a float32 mono. Usa faster-whisper si está disponible, si no FFmpeg."""
+    try:
+        from faster_whisper.audio import decode_audio
+        return decode_audio(audio_path, sampling_rate=sample_rate)
+    except ImportError:
+        pass
+
+    cmd = [
+        'ffmpeg', '-nostdin', '-i', str(audio_path),
+        '-f', 's16le', '-ac', '1', '-ar', str(sample_rate), '-'
+    ]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def detect_speech_frames(samples: np.ndarray, sample_rate: int = SAMPLE_RATE, min_gap: float = 0.1) -> np.ndarray:
+    """
+    Devuelve una máscara booleana (un valor por frame de 20 ms) que indica voz.
+    El umbral se adapta al suelo de ruido y al nivel de voz del propio audio.
+    """
+    frame_len = int(sample_rate * FRAME_SECONDS)
+    num_frames = len(samples) // frame_len
+    if num_frames == 0:
+        return np.zeros(0, dtype=bool)
+
+    frames = samples[:num_frames * frame_len].reshape(num_frames, frame_len)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1) + 1e-12)
+    energy_db = 20 * np.log10(rms)
+
+    noise_floor = np.percentile(energy_db, 10)
+    speech_level = np.percentile(energy_db, 90)
+    threshold = max(noise_floor + 6.0, noise_floor + 0.3 * (speech_level - noise_floor))
+    mask = energy_db > threshold
+
+    # Rellenar huecos muy cortos (oclusivas, respiraciones) dentro de la voz
+    max_gap_frames = int(min_gap / FRAME_SECONDS)
+    gap_start = None
+    for idx, is_speech in enumerate(mask):
+        if not is_speech and gap_start is None:
+            gap_start = idx
+        elif is_speech and gap_start is not None:
+            if gap_start > 0 and idx - gap_start <= max_gap_frames:
+                mask[gap_start:idx] = True
+            gap_start = None
+    return mask
+
+
+def find_pauses(speech_mask: np.ndarray, min_silence: float = 0.25) -> List[Tuple[float, float]]:
+    """Devuelve las pausas internas (inicio, fin) en segundos de al menos min_silence."""
+    pauses = []
+    speech_idx = np.flatnonzero(speech_mask)
+    if speech_idx.size == 0:
+        return pauses
+    first, last = speech_idx[0], speech_idx[-1]
+    min_frames = int(min_silence / FRAME_SECONDS)
+
+    run_start = None
+    for idx in range(first, last + 1):
+        if not speech_mask[idx] and run_start is None:
+            run_start = idx
+        elif speech_mask[idx] and run_start is not None:
+            if idx - run_start >= min_frames:
+                pauses.append((float(run_start * FRAME_SECONDS), float(idx * FRAME_SECONDS)))
+            run_start = None
+    return pauses
+
+
+def _token_weight(token: str) -> float:
+    """Peso aproximado de pronunciación: grupos vocálicos (≈ sílabas) y dígitos."""
+    lowered = token.lower()
+    syllables = len(re.findall(r'[aeiouáéíóúüy]+', lowered))
+    digits = len(re.findall(r'\d', lowered))
+    return float(max(syllables + digits * 2, 1))
+
+
+class _SpeechTimeline:
+    """Convierte entre tiempo absoluto y 'tiempo de voz' (sin contar silencios)."""
+
+    def __init__(self, speech_mask: np.ndarray):
+        self.cumulative = np.concatenate(([0], np.cumsum(speech_mask.astype(np.int64))))
+
+    def _frame(self, t: float) -> int:
+        return int(min(max(round(t / FRAME_SECONDS), 0), len(self.cumulative) - 1))
+
+    def speech_between(self, t_start: float, t_end: float) -> float:
+        return float(self.cumulative[self._frame(t_end)] - self.cumulative[self._frame(t_start)]) * FRAME_SECONDS
+
+    def advance(self, t_start: float, speech_seconds: float) -> float:
+        """Tiempo absoluto tras consumir speech_seconds de voz desde t_start."""
+        target = self.cumulative[self._frame(t_start)] + speech_seconds / FRAME_SECONDS
+        frame = int(np.searchsorted(self.cumulative, target, side='left'))
+        return min(frame, len(self.cumulative) - 1) * FRAME_SECONDS
+
+
+def _anchor_breaks(tokens: List[str], weights: List[float], timeline: _SpeechTimeline,
+                   pauses: List[Tuple[float, float]], speech_start: float, speech_end: float) -> List[Tuple[int, float, float]]:
+    """
+    Asocia la puntuación del guion a las pausas detectadas.
+
+    Returns:
+        Lista de anclas (índice del primer token del tramo, inicio del tramo, fin del tramo anterior)
+    """
+    cumulative_weight = np.concatenate(([0.0], np.cumsum(weights)))
+    total_weight = cumulative_weight[-1]
+    anchors = [(0, speech_start, speech_start)]
+    pause_idx = 0
+
+    for token_idx, token in enumerate(tokens[:-1]):
+        stripped = token.rstrip()
+        is_strong = stripped.endswith(STRONG_BREAK_CHARS)
+        if not (is_strong or stripped.endswith(WEAK_BREAK_CHARS)):
+            continue
+
+        last_token, last_time, _ = anchors[-1]
+        remaining_weight = total_weight - cumulative_weight[last_token]
+        remaining_speech = timeline.speech_between(last_time, speech_end)
+        if remaining_weight <= 0 or remaining_speech <= 0:
+            break
+
+        span_weight = cumulative_weight[token_idx + 1] - cumulative_weight[last_token]
+        expected_time = timeline.advance(last_time, span_weight / remaining_weight * remaining_speech)
+        span_seconds = expected_time - last_time
+        tolerance = max(0.75 if is_strong else 0.4, (0.25 if is_strong else 0.12) * span_seconds)
+
+        best = None
+        for candidate_idx in range(pause_idx, len(pauses)):
+            p_start, p_end = pauses[candidate_idx]
+            if p_start <= last_time:
+                continue
+            if p_start - expected_time > tolerance:
+                break
+            distance = abs((p_start + p_end) / 2 - expected_time)
+            if distance <= tolerance and (best is None or distance < best[0]):
+                best = (distance, candidate_idx)
+
+        if best is not None:
+            p_start, p_end = pauses[best[1]]
+            anchors.append((token_idx + 1, p_end, p_start))
+            pause_idx = best[1] + 1
+
+    return anchors
+
+
+def align_script_to_audio(
+    audio_path: str,
+    script_text: str,
+    language: str = "es",
+    min_silence: float = 0.25,
+    progress_callback: Optional[Callable] = None
+) -> Tuple[List[Dict], Dict]:
+    """
+    Alinea el guion conocido con el audio y devuelve segmentos/palabras con el
+    mismo formato que TranscriptionService.transcribe_audio.
+
+    Args:
+        audio_path: Ruta al audio sintetizado
+        script_text: Texto exacto que se locutó
+        language: Código de idioma (solo informativo en los metadatos)
+        min_silence: Silencio mínimo (s) para considerar una pausa anclable
+        progress_callback: Función para reportar el progreso
+
+    Returns:
+        Tuple[List[Dict], Dict]: Segmentos con timestamps y metadata
+    """
+    start_time = time.time()
+    tokens = tokenize_script(script_text)
+    if not tokens:
+        raise ValueError("El guion está vacío; no se puede alinear.")
+
+    if progress_callback:
+        progress_callback(0.1, "🎯 Decodificando audio para alineación...")
+    samples = load_audio_mono(audio_path)
+    audio_duration = len(samples) / SAMPLE_RATE
+
+    if progress_callback:
+        progress_callback(0.4, "🔊 Detectando voz y pausas...")
+    speech_mask = detect_speech_frames(samples)
+    speech_idx = np.flatnonzero(speech_mask)
+    if speech_idx.size == 0:
+        raise RuntimeError(f"No se detectó voz en el audio: {audio_path}")
+    speech_start = float(speech_idx[0] * FRAME_SECONDS)
+    speech_end = float((speech_idx[-1] + 1) * FRAME_SECONDS)
+    pauses = find_pauses(speech_mask, min_silence=min_silence)
+    timeline = _SpeechTimeline(speech_mask)
+
+    if progress_callback:
+        progress_callback(0.7, "📝 Alineando guion con el audio...")
+    weights = [_token_weight(t) for t in tokens]
+    anchors = _anchor_breaks(tokens, weights, timeline, pauses, speech_start, speech_end)
+
+    words = []
+    for anchor_idx, (first_token, span_start, _) in enumerate(anchors):
+        if anchor_idx + 1 < len(anchors):
+            last_token, _, span_end = anchors[anchor_idx + 1]
+        else:
+            last_token, span_end = len(tokens), speech_end
+
+        span_weights = weights[first_token:last_token]
+        span_speech = timeline.speech_between(span_start, span_end)
+        total = sum(span_weights) or 1.0
+        cursor = span_start
+        for token, weight in zip(tokens[first_token:last_token], span_weights):
+            word_end = timeline.advance(cursor, weight / total * span_speech) if span_speech > 0 else cursor
+            word_end = min(max(word_end, cursor), span_end)
+            words.append({"text": f" {token}", "start": round(cursor, 2), "end": round(word_end, 2)})
+            # La siguiente palabra empieza donde vuelve a haber voz
+            cursor = word_end
+
+    segments = build_segments_from_words(words)
+    metadata = {
+        "duration": time.time() - start_time,
+        "language": language,
+        "language_probability": 1.0,
+        "num_words": len(words),
+        "num_segments": len(segments),
+        "mode": "script_alignment",
+        "audio_duration": audio_duration,
+        "anchored_pauses": len(anchors) - 1,
+        "detected_pauses": len(pauses)
+    }
+
+    if progress_callback:
+        progress_callback(1.0, "✅ Alineación completada")
+    logger.info(f"Guion alineado con el audio en {metadata['duration']:.2f}s "
+                f"({len(words)} palabras, {len(anchors) - 1}/{len(pauses)} pausas ancladas)")
+    return segments, metadata
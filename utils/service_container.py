@@ -0,0 +1,150 @@
+# utils/service_container.py
+"""
+Servicios compartidos por los VideoProcessor de un proceso.
+
+Cada VideoProcessor() leía config.yaml tres veces (TTS, transcripción y
+overlays), creaba un AIServices nuevo (genai.configure, clientes de OpenAI y
+Replicate y una consulta en vivo a Ollama con list()) y reconstruía
+SceneGenerator, VideoServices y ContentOptimizer. En los workers del lote eso
+se repetía en cada proyecto.
+
+ServiceContainer construye todo una sola vez y los VideoProcessor solo lo
+enlazan, de modo que crear uno por proyecto (con su configuración de video) es
+prácticamente gratis y todos comparten clientes y pools de conexiones.
+Los SceneGenerator se memorizan por configuración de video.
+
+Los workers usan el contenedor global del proceso (get_service_container).
+La interfaz crea uno por VideoProcessor para que los cambios hechos en
+Configuración se apliquen sin reiniciar.
+"""
+
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import yaml
+
+from utils.ai_services import AIServices
+from utils.audio_services import AudioServices
+from utils.content_optimizer import ContentOptimizer
+from utils.pipeline_fingerprints import fingerprint
+from utils.scene_generator import SceneGenerator
+from utils.transcription_services import get_transcription_service, local_model_options
+from utils.video_services import VideoServices
+
+logger = logging.getLogger(__name__)
+
+VOIDRULES_PATH = Path(__file__).resolve().parent.parent / ".voidrules"
+
+
+def load_void_config() -> Dict:
+    """Configuración de video de .voidrules (o valores por defecto si no existe)."""
+    try:
+        with open(VOIDRULES_PATH, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+            logger.info(f"Configuración cargada desde {VOIDRULES_PATH}")
+            return config
+    except FileNotFoundError:
+        logger.warning(".voidrules no encontrado, usando defaults.")
+        return {
+            'video_generation': {
+                'quality': {'resolution': '1920x1080', 'bitrate': '5000k', 'audio_bitrate': '192k'},
+                'paths': {'projects_dir': 'projects', 'assets': 'overlays', 'output_dir': 'output', 'background_music_dir': 'background_music'},
+                'audio': {'default_voice': 'es-ES-AlvaroNeural'},
+                'subtitles': {'font': 'Arial', 'font_size': 24, 'color': '#FFFFFF'}
+            }
+        }
+    except Exception as e:
+        logger.error(f"Error cargando .voidrules: {e}", exc_info=True)
+        return {}
+
+
+class ServiceContainer:
+    """Configuración y servicios de larga vida compartidos por los VideoProcessor."""
+
+    def __init__(self, app_config: Optional[Dict] = None):
+        """
+        Args:
+            app_config: Configuración de config.yaml (se carga una vez si no se indica)
+        """
+        if app_config is None:
+            from utils.config import load_config
+            app_config = load_config()
+        self.app_config = app_config
+        self.void_config = load_void_config()
+        self.tts_config = app_config.get('tts', {})
+        self.transcription_config = app_config.get('transcription', {}) or {}
+        self.overlay_config = self._overlay_config(app_config)
+        logger.info(f"Configuración TTS: {self.tts_config.get('default_provider', 'edge')}, "
+                    f"transcripción: {self.transcription_config.get('service_type', 'local')}, "
+                    f"opacidad de overlays por defecto {self.overlay_config['default_opacity']}")
+
+        self.ai_service = AIServices()
+        logger.info(f"AIServices inicializado - Cliente Replicate: {self.ai_service.replicate_client is not None}")
+        self.audio_service = AudioServices()
+        self.video_service = VideoServices()
+        self.transcription_service = self._create_transcription_service()
+        # ContentOptimizer se inicializa con valores por defecto, se configurará dinámicamente
+        self.content_optimizer = ContentOptimizer(self.ai_service)
+        self._scene_generators: Dict[str, SceneGenerator] = {}
+        self._lock = threading.Lock()
+        logger.info("Servicios inicializados.")
+
+    @staticmethod
+    def _overlay_config(app_config: Dict) -> Dict:
+        overlays_config = app_config.get('video_generation', {}).get('effects', {}).get('overlays', [{}])
+        return {'default_opacity': overlays_config[0].get('opacity', 0.3) if overlays_config else 0.3}
+
+    def _create_transcription_service(self):
+        """Servicio de transcripción según transcription.service_type."""
+        transcription_type = self.transcription_config.get('service_type', 'local')
+        logger.info(f"Configurando servicio de transcripción: {transcription_type}")
+
+        if transcription_type == 'replicate':
+            # Usar Replicate para transcripción
+            replicate_token = self.ai_service.replicate_token
+            if not replicate_token:
+                logger.warning("No se encontró token de Replicate, usando transcripción local")
+                return get_transcription_service('local', **local_model_options(self.transcription_config.get('local', {})))
+            replicate_config = self.transcription_config.get('replicate', {})
+            logger.info(f"TranscriptionService con Replicate - Idioma: {replicate_config.get('default_language', 'es')}")
+            return get_transcription_service('replicate', api_token=replicate_token, base_url=replicate_config.get('base_url'))
+
+        if transcription_type == 'fake':
+            # Segmentos derivados del guion del TTS simulado (sin ASR)
+            logger.info("TranscriptionService simulado inicializado")
+            return get_transcription_service('fake')
+
+        # Usar transcripción local
+        options = local_model_options(self.transcription_config.get('local', {}))
+        logger.info(f"TranscriptionService con Whisper local - Modelo: {options['model_size']}")
+        return get_transcription_service('local', **options)
+
+    def scene_generator(self, void_config: Dict) -> SceneGenerator:
+        """SceneGenerator para una configuración de video (uno por configuración distinta)."""
+        key = fingerprint(void_config)
+        with self._lock:
+            generator = self._scene_generators.get(key)
+            if generator is None:
+                generator = SceneGenerator(config=void_config)
+                self._scene_generators[key] = generator
+            return generator
+
+
+# Instancia global del proceso (workers del lote)
+_service_container = None
+_service_container_lock = threading.Lock()
+
+def get_service_container(app_config: Optional[Dict] = None) -> ServiceContainer:
+    """
+    Obtiene el contenedor de servicios del proceso, creándolo la primera vez.
+
+    Args:
+        app_config: Configuración de config.yaml para crearlo (solo se usa la primera vez)
+    """
+    global _service_container
+    with _service_container_lock:
+        if _service_container is None:
+            _service_container = ServiceContainer(app_config)
+        return _service_container
@@ -0,0 +1,137 @@
+# utils/transcription_cache.py
+"""
+Caché de transcripciones compartida entre proyectos.
+
+La reanudación por proyecto solo mira si existe su transcription.json; copiar
+un proyecto o regenerar con el mismo audio volvía a pasar Whisper/Replicate.
+Esta caché indexa el resultado por el contenido del audio (SHA-256) y por la
+configuración que afecta al resultado: motor, modelo, idioma y si se pidieron
+tiempos por palabra.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path("cache") / "transcriptions"
+
+
+class TranscriptionCache:
+    """Almacena transcripciones como JSON en disco, una por clave."""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        """
+        Args:
+            cache_dir: Directorio de la caché (por defecto cache/transcriptions)
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Evita recalcular el hash de un mismo archivo (ruta, tamaño, mtime)
+        self._hash_memo: Dict[Tuple[str, int, float], str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def hash_audio(self, audio_path: str) -> str:
+        """Calcula el SHA-256 del contenido del audio."""
+        path = Path(audio_path)
+        stat = path.stat()
+        memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime)
+        with self._lock:
+            cached = self._hash_memo.get(memo_key)
+        if cached:
+            return cached
+
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(block)
+        digest = sha.hexdigest()
+        with self._lock:
+            self._hash_memo[memo_key] = digest
+        return digest
+
+    @staticmethod
+    def make_key(audio_hash: str, engine: str, model: str, language: str, word_timestamps: bool = True) -> str:
+        """Construye la clave de caché a partir de todo lo que determina el resultado."""
+        descriptor = json.dumps([audio_hash, engine, model, language, bool(word_timestamps)])
+        return hashlib.sha256(descriptor.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, audio_path: str, engine: str, model: str, language: str,
+            word_timestamps: bool = True) -> Optional[Tuple[List[Dict], Dict]]:
+        """
+        Busca una transcripción previa del mismo audio con la misma configuración.
+
+        Returns:
+            Optional[Tuple[List[Dict], Dict]]: (segmentos, metadata) o None si no hay entrada
+        """
+        try:
+            key = self.make_key(self.hash_audio(audio_path), engine, model, language, word_timestamps)
+            entry_path = self._entry_path(key)
+            if not entry_path.exists():
+                self.misses += 1
+                return None
+            with open(entry_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.hits += 1
+            logger.info(f"Transcripción recuperada de caché ({engine}/{model}, {language}): {entry_path.name}")
+            return data.get("segments", []), data.get("metadata", {})
+        except Exception as e:
+            logger.warning(f"Error leyendo la caché de transcripciones: {e}")
+            self.misses += 1
+            return None
+
+    def put(self, audio_path: str, engine: str, model: str, language: str,
+            segments: List[Dict], metadata: Dict, word_timestamps: bool = True) -> Optional[str]:
+        """
+        Guarda una transcripción en la caché (escritura atómica).
+
+        Returns:
+            Optional[str]: Ruta de la entrada guardada o None si falló
+        """
+        if not segments:
+            return None
+        try:
+            key = self.make_key(self.hash_audio(audio_path), engine, model, language, word_timestamps)
+            entry_path = self._entry_path(key)
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            data = {
+                "engine": engine,
+                "model": model,
+                "language": language,
+                "word_timestamps": bool(word_timestamps),
+                "created_at": datetime.now().isoformat(),
+                "metadata": metadata,
+                "segments": segments
+            }
+            fd, tmp_path = tempfile.mkstemp(dir=entry_path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, entry_path)
+            logger.info(f"Transcripción guardada en caché: {entry_path.name}")
+            return str(entry_path)
+        except Exception as e:
+            logger.warning(f"Error guardando en la caché de transcripciones: {e}")
+            return None
+
+
+# Instancia global de la caché
+_transcription_cache = None
+
+def get_transcription_cache(cache_dir: Optional[str] = None) -> TranscriptionCache:
+    """Obtiene la instancia global de la caché de transcripciones"""
+    global _transcription_cache
+    if _transcription_cache is None:
+        _transcription_cache = TranscriptionCache(cache_dir)
+    return _transcription_cache
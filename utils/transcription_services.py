@@ -1,16 +1,194 @@
 from faster_whisper import WhisperModel
 import time
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterator
 from pathlib import Path
 import logging
 import replicate
 import os
 import requests
+import threading
+from contextlib import contextmanager
+from utils.fake_providers import get_fake_providers
 
 logger = logging.getLogger(__name__)
 
+
+class WhisperModelRegistry:
+    """
+    Registro de modelos Whisper a nivel de proceso.
+
+    Cada VideoProcessor crea su propio TranscriptionService; sin este registro
+    los pesos de faster-whisper se recargaban en cada proyecto del lote. Los
+    modelos se indexan por (model_size, device, compute_type, cpu_threads,
+    num_workers), se cargan una sola vez y se comparten entre transcripciones
+    concurrentes. cpu_threads y num_workers solo se aplican al cargar el modelo
+    (CTranslate2 admite llamadas en paralelo hasta 'num_workers'), así que forman
+    parte de la clave: un modelo cargado con num_workers=1 serializaría los
+    fragmentos de la transcripción en paralelo.
+    """
+
+    def __init__(self):
+        self._models: Dict[Tuple, WhisperModel] = {}
+        self._active: Dict[Tuple, int] = {}
+        self._last_used: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Tuple, threading.Lock] = {}
+
+    @staticmethod
+    def _key(model_size: str, device: str, compute_type: str, **model_kwargs) -> Tuple:
+        return (model_size, device, compute_type, tuple(sorted(model_kwargs.items())))
+
+    def get_model(self, model_size: str = "medium", device: str = "cpu", compute_type: str = "int8", **model_kwargs) -> WhisperModel:
+        """
+        Devuelve el modelo compartido, cargándolo si es la primera vez.
+        
+        Args:
+            model_size: Tamaño del modelo
+            device: Dispositivo de cómputo
+            compute_type: Tipo de cómputo
+            **model_kwargs: Argumentos extra para WhisperModel (cpu_threads, num_workers...)
+            
+        Returns:
+            WhisperModel: Instancia compartida
+        """
+        key = self._key(model_size, device, compute_type, **model_kwargs)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._last_used[key] = time.time()
+                return model
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Solo un hilo carga cada modelo; los demás esperan y reutilizan el resultado
+        with load_lock:
+            with self._lock:
+                model = self._models.get(key)
+            if model is None:
+                logger.info(f"Cargando modelo Whisper {model_size} ({device}/{compute_type}) en el registro compartido...")
+                start_time = time.time()
+                model = WhisperModel(model_size, device=device, compute_type=compute_type, **model_kwargs)
+                logger.info(f"Modelo Whisper {model_size} cargado en {time.time() - start_time:.2f}s")
+                with self._lock:
+                    self._models[key] = model
+            with self._lock:
+                self._last_used[key] = time.time()
+            return model
+
+    @contextmanager
+    def lease(self, model_size: str = "medium", device: str = "cpu", compute_type: str = "int8", **model_kwargs):
+        """
+        Presta el modelo durante una transcripción. Mientras haya préstamos
+        activos el modelo no se expulsa en evict_idle.
+        """
+        key = self._key(model_size, device, compute_type, **model_kwargs)
+        model = self.get_model(model_size, device, compute_type, **model_kwargs)
+        with self._lock:
+            self._active[key] = self._active.get(key, 0) + 1
+        try:
+            yield model
+        finally:
+            with self._lock:
+                self._active[key] = max(self._active.get(key, 1) - 1, 0)
+                self._last_used[key] = time.time()
+
+    def warmup(self, model_size: str = "medium", device: str = "cpu", compute_type: str = "int8", **model_kwargs) -> float:
+        """
+        Carga el modelo y ejecuta una transcripción corta de silencio para que la
+        primera transcripción real no pague la inicialización.
+        
+        Returns:
+            float: Segundos empleados en el calentamiento
+        """
+        start_time = time.time()
+        try:
+            import numpy as np
+            with self.lease(model_size, device, compute_type, **model_kwargs) as model:
+                segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32), beam_size=1, language="es")
+                list(segments)
+        except Exception as e:
+            logger.warning(f"Error calentando el modelo Whisper {model_size}: {e}")
+        elapsed = time.time() - start_time
+        logger.info(f"Modelo Whisper {model_size} calentado en {elapsed:.2f}s")
+        return elapsed
+
+    def evict_idle(self, max_idle_seconds: float = 0.0) -> int:
+        """
+        Libera los modelos sin préstamos activos que lleven inactivos al menos
+        max_idle_seconds.
+        
+        Returns:
+            int: Número de modelos liberados
+        """
+        now = time.time()
+        evicted = 0
+        with self._lock:
+            for key in list(self._models.keys()):
+                if self._active.get(key, 0) > 0:
+                    continue
+                if now - self._last_used.get(key, 0) < max_idle_seconds:
+                    continue
+                del self._models[key]
+                self._last_used.pop(key, None)
+                self._active.pop(key, None)
+                evicted += 1
+                logger.info(f"Modelo Whisper {key[0]} ({key[1]}/{key[2]}) liberado por inactividad")
+        if evicted:
+            import gc
+            gc.collect()
+        return evicted
+
+    def stats(self) -> Dict:
+        """Devuelve el estado de los modelos cargados."""
+        now = time.time()
+        with self._lock:
+            return {
+                f"{k[0]}/{k[1]}/{k[2]}" + "".join(f"/{name}={value}" for name, value in k[3]): {
+                    "active": self._active.get(k, 0),
+                    "idle_seconds": round(now - self._last_used.get(k, now), 1)
+                }
+                for k in self._models
+            }
+
+
+# Instancia global del registro de modelos
+_whisper_model_registry = None
+_whisper_registry_lock = threading.Lock()
+
+def get_whisper_model_registry() -> WhisperModelRegistry:
+    """Obtiene la instancia global del registro de modelos Whisper"""
+    global _whisper_model_registry
+    with _whisper_registry_lock:
+        if _whisper_model_registry is None:
+            _whisper_model_registry = WhisperModelRegistry()
+    return _whisper_model_registry
+
+def local_model_options(local_config: Dict) -> Dict:
+    """
+    Argumentos de TranscriptionService (y de la clave del registro de modelos) para
+    transcription.local. Con long_audio activo num_workers sube hasta long_audio.max_workers
+    para que los fragmentos de un audio largo se transcriban en paralelo.
+    
+    Args:
+        local_config: Sección transcription.local de config.yaml
+        
+    Returns:
+        Dict: model_size, device, compute_type, cpu_threads y num_workers
+    """
+    long_audio_config = local_config.get('long_audio', {})
+    num_workers = local_config.get('num_workers', 1)
+    if long_audio_config.get('enabled', True):
+        num_workers = max(num_workers, long_audio_config.get('max_workers', 2))
+    return {
+        "model_size": local_config.get('model_size', 'medium'),
+        "device": local_config.get('device', 'cpu'),
+        "compute_type": local_config.get('compute_type', 'int8'),
+        "cpu_threads": local_config.get('cpu_threads', 0),
+        "num_workers": num_workers
+    }
+
 class TranscriptionService:
-    def __init__(self, model_size: str = "medium", device: str = "cpu", compute_type: str = "int8"):
+    def __init__(self, model_size: str = "medium", device: str = "cpu", compute_type: str = "int8",
+                 cpu_threads: int = 0, num_workers: int = 1):
         """
         Inicializa el servicio de transcripción.
         
@@ -18,25 +196,24 @@ class TranscriptionService:
             model_size: Tamaño del modelo ('tiny', 'base', 'small', 'medium', 'large-v2', 'large-v3')
             device: Dispositivo de cómputo ('cpu' o 'cuda')
             compute_type: Tipo de cómputo ('int8', 'float16', 'int8_float16', 'float32')
+            cpu_threads: Hilos de CPU por transcripción (0 = valor por defecto de CTranslate2)
+            num_workers: Transcripciones concurrentes admitidas por el modelo compartido
         """
         self.model_size = model_size
         self.device = device
         self.compute_type = compute_type
-        self._model = None
+        self.model_kwargs = {"cpu_threads": cpu_threads, "num_workers": num_workers}
+        self.registry = get_whisper_model_registry()
         logger.info(f"Inicializando TranscriptionService con modelo {model_size} en {device}")
     
     @property
     def model(self) -> WhisperModel:
-        """Carga el modelo de manera lazy cuando se necesita por primera vez."""
-        if self._model is None:
-            logger.info("Cargando modelo Whisper...")
-            self._model = WhisperModel(
-                self.model_size,
-                device=self.device,
-                compute_type=self.compute_type
-            )
-            logger.info("Modelo Whisper cargado exitosamente")
-        return self._model
+        """Obtiene el modelo del registro compartido (se carga una sola vez por proceso)."""
+        return self.registry.get_model(self.model_size, self.device, self.compute_type, **self.model_kwargs)
+    
+    def cache_descriptor(self) -> Tuple[str, str]:
+        """Motor y modelo que identifican sus resultados en la caché de transcripciones."""
+        return "faster-whisper", f"{self.model_size}/{self.compute_type}"
     
     def transcribe_audio(
         self,
@@ -67,41 +244,24 @@ class TranscriptionService:
             if progress_callback:
                 progress_callback(0.1, "🎯 Iniciando transcripción...")
             
-            # Realizar la transcripción
-            segments, info = self.model.transcribe(
-                audio_path,
-                beam_size=beam_size,
-                language=language,
-                word_timestamps=True
-            )
-            
-            if progress_callback:
-                progress_callback(0.5, "📝 Procesando resultados...")
-            
-            # Procesar los segmentos
-            all_words = []
-            all_segments = []
-            
-            for segment in segments:
-                # Guardar información del segmento
-                segment_info = {
-                    "text": segment.text,
-                    "start": round(segment.start, 2),
-                    "end": round(segment.end, 2),
-                    "words": []
-                }
+            with self.registry.lease(self.model_size, self.device, self.compute_type, **self.model_kwargs) as model:
+                # Realizar la transcripción (los segmentos se generan de forma perezosa,
+                # por eso se consumen dentro del préstamo)
+                segments, info = model.transcribe(
+                    audio_path,
+                    beam_size=beam_size,
+                    language=language,
+                    word_timestamps=True
+                )
                 
-                # Procesar palabras del segmento
-                for word in segment.words:
-                    word_info = {
-                        "text": word.word,
-                        "start": round(word.start, 2),
-                        "end": round(word.end, 2)
-                    }
-                    all_words.append(word_info)
-                    segment_info["words"].append(word_info)
+                if progress_callback:
+                    progress_callback(0.5, "📝 Procesando resultados...")
                 
-                all_segments.append(segment_info)
+                segments = list(segments)
+            
+            # Procesar los segmentos
+            all_segments = self._segments_to_dicts(segments)
+            num_words = sum(len(seg["words"]) for seg in all_segments)
             
             end_time = time.time()
             duration = end_time - start_time
@@ -110,7 +270,7 @@ class TranscriptionService:
                 "duration": duration,
                 "language": info.language,
                 "language_probability": info.language_probability,
-                "num_words": len(all_words),
+                "num_words": num_words,
                 "num_segments": len(all_segments)
             }
             
@@ -124,6 +284,167 @@ class TranscriptionService:
             logger.error(f"Error durante la transcripción: {str(e)}")
             raise
     
+    def transcribe_audio_stream(
+        self,
+        audio_path: str,
+        beam_size: int = 5,
+        language: str = "es",
+        metadata: Optional[Dict] = None
+    ) -> Iterator[Dict]:
+        """
+        Transcribe el audio publicando cada segmento en cuanto faster-whisper lo
+        produce, para que las etapas siguientes (escenas, prompts) puedan empezar
+        antes de terminar la transcripción completa.
+        
+        Args:
+            audio_path: Ruta al archivo de audio
+            beam_size: Tamaño del beam search
+            language: Código del idioma (es, en, etc.)
+            metadata: Diccionario opcional que se rellena con la metadata al terminar
+            
+        Yields:
+            Dict: Segmento con 'text', 'start', 'end' y 'words'
+        """
+        if not Path(audio_path).exists():
+            raise FileNotFoundError(f"No se encontró el archivo de audio: {audio_path}")
+        
+        logger.info(f"Iniciando transcripción en streaming de {audio_path}")
+        start_time = time.time()
+        num_segments = 0
+        num_words = 0
+        with self.registry.lease(self.model_size, self.device, self.compute_type, **self.model_kwargs) as model:
+            segments, info = model.transcribe(
+                audio_path,
+                beam_size=beam_size,
+                language=language,
+                word_timestamps=True
+            )
+            for segment in segments:
+                segment_info = self._segments_to_dicts([segment])[0]
+                num_segments += 1
+                num_words += len(segment_info["words"])
+                yield segment_info
+        
+        duration = time.time() - start_time
+        if metadata is not None:
+            metadata.update({
+                "duration": duration,
+                "language": info.language,
+                "language_probability": info.language_probability,
+                "num_words": num_words,
+                "num_segments": num_segments,
+                "mode": "streaming"
+            })
+        logger.info(f"Transcripción en streaming completada en {duration:.2f} segundos")
+    
+    @staticmethod
+    def _segments_to_dicts(segments, offset: float = 0.0) -> List[Dict]:
+        """Convierte los segmentos de faster-whisper al esquema JSON, desplazando los tiempos."""
+        all_segments = []
+        for segment in segments:
+            # Guardar información del segmento
+            segment_info = {
+                "text": segment.text,
+                "start": round(segment.start + offset, 2),
+                "end": round(segment.end + offset, 2),
+                "words": []
+            }
+            
+            # Procesar palabras del segmento
+            for word in segment.words or []:
+                segment_info["words"].append({
+                    "text": word.word,
+                    "start": round(word.start + offset, 2),
+                    "end": round(word.end + offset, 2)
+                })
+            
+            all_segments.append(segment_info)
+        return all_segments
+    
+    def transcribe_audio_chunked(
+        self,
+        audio_path: str,
+        beam_size: int = 5,
+        language: str = "es",
+        max_chunk_seconds: float = 120.0,
+        max_workers: Optional[int] = None,
+        progress_callback: Optional[callable] = None
+    ) -> Tuple[List[Dict], Dict]:
+        """
+        Transcripción para narraciones largas: divide el audio en silencios en
+        fragmentos de duración acotada y los transcribe en paralelo sobre el
+        modelo compartido (CTranslate2 libera el GIL y atiende hasta
+        'num_workers' llamadas simultáneas). Los tiempos se recomponen con el
+        desplazamiento global de cada fragmento.
+        
+        Args:
+            audio_path: Ruta al archivo de audio
+            beam_size: Tamaño del beam search
+            language: Código del idioma (es, en, etc.)
+            max_chunk_seconds: Duración máxima de cada fragmento
+            max_workers: Fragmentos en paralelo (por defecto, num_workers del modelo)
+            progress_callback: Función para reportar el progreso
+            
+        Returns:
+            Tuple[List[Dict], Dict]: Segmentos con timestamps globales y metadata
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        from utils.script_alignment import load_audio_mono, SAMPLE_RATE
+        from utils.audio_chunking import detect_speech_intervals, plan_chunks_at_silences
+        
+        if not Path(audio_path).exists():
+            raise FileNotFoundError(f"No se encontró el archivo de audio: {audio_path}")
+        
+        start_time = time.time()
+        if progress_callback:
+            progress_callback(0.05, "🎯 Dividiendo el audio en silencios...")
+        
+        samples = load_audio_mono(audio_path)
+        audio_duration = len(samples) / SAMPLE_RATE
+        chunks = plan_chunks_at_silences(detect_speech_intervals(samples), audio_duration, max_chunk_seconds)
+        workers = max(1, min(max_workers or self.model_kwargs.get("num_workers", 1), len(chunks)))
+        logger.info(f"Transcribiendo {audio_duration:.0f}s de audio en {len(chunks)} fragmentos con {workers} workers")
+        
+        results: Dict[int, Tuple[List[Dict], str, float]] = {}
+        with self.registry.lease(self.model_size, self.device, self.compute_type, **self.model_kwargs) as model:
+            
+            def _transcribe_chunk(index: int, chunk_start: float, chunk_end: float):
+                chunk_samples = samples[int(chunk_start * SAMPLE_RATE):int(chunk_end * SAMPLE_RATE)]
+                segments, info = model.transcribe(
+                    chunk_samples,
+                    beam_size=beam_size,
+                    language=language,
+                    word_timestamps=True
+                )
+                return index, self._segments_to_dicts(segments, offset=chunk_start), info.language, info.language_probability
+            
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_transcribe_chunk, i, s, e) for i, (s, e) in enumerate(chunks)]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    index, chunk_segments, chunk_language, chunk_probability = future.result()
+                    results[index] = (chunk_segments, chunk_language, chunk_probability)
+                    if progress_callback:
+                        progress_callback(0.1 + 0.85 * done / len(chunks), f"📝 Fragmento {done}/{len(chunks)} transcrito")
+        
+        all_segments = [seg for i in range(len(chunks)) for seg in results[i][0]]
+        duration = time.time() - start_time
+        metadata = {
+            "duration": duration,
+            "language": results[0][1] if results else language,
+            "language_probability": min((r[2] for r in results.values()), default=0.0),
+            "num_words": sum(len(seg["words"]) for seg in all_segments),
+            "num_segments": len(all_segments),
+            "mode": "chunked",
+            "num_chunks": len(chunks),
+            "workers": workers,
+            "audio_duration": audio_duration
+        }
+        
+        if progress_callback:
+            progress_callback(1.0, "✅ Transcripción completada")
+        logger.info(f"Transcripción por fragmentos completada en {duration:.2f}s ({audio_duration / max(duration, 1e-6):.1f}x tiempo real)")
+        return all_segments, metadata
+    
     def save_transcription(
         self,
         segments: List[Dict],
@@ -168,19 +489,30 @@ class ReplicateTranscriptionService:
     Mucho más rápido que el Whisper tradicional y con excelente soporte multiidioma.
     """
     
-    def __init__(self, api_token: Optional[str] = None):
+    def __init__(self, api_token: Optional[str] = None, client=None, base_url: Optional[str] = None):
         """
         Inicializa el servicio de transcripción de Replicate.
         
         Args:
             api_token: Token de API de Replicate (opcional, se puede usar variable de entorno)
+            client: Cliente compatible con replicate.Client (run, predictions.create); permite
+                    sustituirlo por un doble de pruebas
+            base_url: URL base alternativa de la API (p.ej. un servidor HTTP local de pruebas)
         """
         self.api_token = api_token or os.getenv("REPLICATE_API_TOKEN")
-        if not self.api_token:
+        if not self.api_token and client is None:
             raise ValueError("Se requiere REPLICATE_API_TOKEN para usar ReplicateTranscriptionService")
         
         # Configurar Replicate
-        os.environ["REPLICATE_API_TOKEN"] = self.api_token
+        if self.api_token:
+            os.environ["REPLICATE_API_TOKEN"] = self.api_token
+        if client is not None:
+            self.client = client
+        else:
+            client_kwargs = {"api_token": self.api_token}
+            if base_url:
+                client_kwargs["base_url"] = base_url
+            self.client = replicate.Client(**client_kwargs)
         
         # Modelo específico de Incredibly Fast Whisper
         self.model_id = "vaibhavs10/incredibly-fast-whisper:3ab86df6c8f54c11309d4d1f930ac292bad43ace52d10c80d87eb258b3c9f79c"
@@ -197,6 +529,10 @@ class ReplicateTranscriptionService:
         
         logger.info("ReplicateTranscriptionService inicializado")
     
+    def cache_descriptor(self) -> Tuple[str, str]:
+        """Motor y modelo que identifican sus resultados en la caché de transcripciones."""
+        return "replicate", self.model_id
+    
     def transcribe_audio(
         self,
         audio_path: str,
@@ -266,7 +602,7 @@ class ReplicateTranscriptionService:
                     progress_callback(0.3, "📡 Enviando audio a Replicate...")
                 
                 # Ejecutar transcripción usando el método correcto
-                output = replicate.run(self.model_id, input=input_params)
+                output = self.client.run(self.model_id, input=input_params)
                 
                 if progress_callback:
                     progress_callback(0.7, "📝 Procesando resultados...")
@@ -292,6 +628,231 @@ class ReplicateTranscriptionService:
             logger.error(f"Error durante la transcripción con Replicate: {str(e)}")
             raise
     
+    def transcribe_audio_chunked(
+        self,
+        audio_path: str,
+        language: str = "es",
+        task: str = "transcribe",
+        timestamp: str = "chunk",
+        batch_size: int = 24,
+        max_chunk_seconds: float = 300.0,
+        max_concurrency: int = 4,
+        max_retries: int = 2,
+        poll_interval: float = 2.0,
+        retry_backoff_seconds: float = 5.0,
+        timeout_seconds: float = 3600.0,
+        progress_callback: Optional[callable] = None
+    ) -> Tuple[List[Dict], Dict]:
+        """
+        Transcribe audios largos dividiéndolos en silencios y enviando cada
+        fragmento como una predicción independiente. Las predicciones se crean y
+        consultan en paralelo (hasta max_concurrency a la vez, con la subida de cada
+        fragmento en un hilo propio para no frenar el sondeo); si un fragmento
+        falla solo se reintenta ese fragmento, tras una espera que se duplica en
+        cada intento. Si el conjunto no termina en timeout_seconds se cancelan
+        las predicciones en curso y se lanza TimeoutError. Los segmentos se
+        fusionan desplazando sus tiempos con el inicio de cada fragmento.
+        
+        Args:
+            audio_path: Ruta al archivo de audio
+            language: Código de idioma (ej: 'es', 'en', 'fr')
+            task: Tarea ('transcribe' o 'translate')
+            timestamp: Tipo de timestamp ('chunk' o 'word')
+            batch_size: Tamaño del batch para procesamiento
+            max_chunk_seconds: Duración máxima de cada fragmento
+            max_concurrency: Predicciones simultáneas como máximo
+            max_retries: Reintentos por fragmento fallido
+            poll_interval: Segundos entre consultas de estado
+            retry_backoff_seconds: Espera antes del primer reintento de un fragmento
+            timeout_seconds: Tiempo máximo para el conjunto de fragmentos
+            progress_callback: Función de callback para progreso
+            
+        Returns:
+            Tuple[List[Dict], Dict]: Segmentos con timestamps globales y metadata
+        """
+        import tempfile
+        from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+        from utils.audio_chunking import (
+            detect_silences_ffmpeg, speech_intervals_from_silences,
+            plan_chunks_at_silences, cut_audio_chunks
+        )
+        
+        if not Path(audio_path).exists():
+            raise FileNotFoundError(f"Archivo de audio no encontrado: {audio_path}")
+        
+        start_time = time.time()
+        deadline = start_time + timeout_seconds
+        max_concurrency = max(1, int(max_concurrency))
+        if progress_callback:
+            progress_callback(0.05, "✂️ Dividiendo el audio en silencios...")
+        
+        silences, audio_duration = detect_silences_ffmpeg(audio_path)
+        chunks = plan_chunks_at_silences(
+            speech_intervals_from_silences(silences, audio_duration), audio_duration, max_chunk_seconds
+        )
+        version = self.model_id.split(":", 1)[1] if ":" in self.model_id else self.model_id
+        language_name = self.supported_languages.get(language, language)
+        logger.info(f"🚀 Replicate por fragmentos: {len(chunks)} fragmentos de {audio_path} ({audio_duration:.0f}s)")
+        
+        with tempfile.TemporaryDirectory(prefix="replicate_chunks_") as tmp_dir:
+            chunk_paths = cut_audio_chunks(audio_path, chunks, tmp_dir)
+            
+            def _create(index: int):
+                with open(chunk_paths[index], "rb") as chunk_file:
+                    return self.client.predictions.create(
+                        version=version,
+                        input={
+                            "audio": chunk_file,
+                            "task": task,
+                            "language": language_name,
+                            "timestamp": timestamp,
+                            "batch_size": batch_size,
+                            "diarise_audio": False
+                        }
+                    )
+            
+            pending = list(range(len(chunks)))
+            creating: Dict[int, Future] = {}
+            in_flight: Dict[int, object] = {}
+            attempts = {i: 0 for i in pending}
+            retry_at: Dict[int, float] = {}
+            results: Dict[int, List[Dict]] = {}
+            failures: Dict[int, str] = {}
+            last_poll = 0.0
+            
+            def _fail(index: int, error: str):
+                if self._handle_chunk_failure(index, error, attempts, max_retries, pending, failures):
+                    retry_at[index] = time.time() + retry_backoff_seconds * 2 ** (attempts[index] - 1)
+            
+            def _cancel_all():
+                # Las subidas ya empezadas terminan de crear su predicción; después se cancela
+                for index, future in creating.items():
+                    if not future.cancel():
+                        try:
+                            in_flight[index] = future.result()
+                        except Exception:
+                            pass
+                for prediction in in_flight.values():
+                    try:
+                        prediction.cancel()
+                    except Exception as e:
+                        logger.warning(f"No se pudo cancelar la predicción {getattr(prediction, 'id', '')}: {e}")
+            
+            # Cada create sube su fragmento: las subidas van en paralelo para no serializarlas ni bloquear el sondeo
+            with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="replicate-upload") as uploads:
+                while pending or creating or in_flight:
+                    if time.time() > deadline:
+                        _cancel_all()
+                        raise TimeoutError(
+                            f"Transcripción por fragmentos sin terminar tras {timeout_seconds:.0f}s: "
+                            f"{len(results)}/{len(chunks)} fragmentos completados"
+                        )
+                    
+                    # Lanzar nuevas predicciones hasta llenar la concurrencia (los reintentos, pasada su espera)
+                    now = time.time()
+                    for index in [i for i in pending if retry_at.get(i, 0) <= now]:
+                        if len(creating) + len(in_flight) >= max_concurrency:
+                            break
+                        pending.remove(index)
+                        attempts[index] += 1
+                        creating[index] = uploads.submit(_create, index)
+                    
+                    if not creating and not in_flight:
+                        if pending:
+                            delay = min(retry_at.get(i, 0) for i in pending) - time.time()
+                            time.sleep(max(0.0, min(delay, deadline - time.time())))
+                        continue
+                    
+                    # Esperar a la siguiente consulta de estado o a que termine alguna subida
+                    next_poll = max(0.0, last_poll + poll_interval - time.time()) if in_flight else poll_interval
+                    if creating:
+                        wait(list(creating.values()), timeout=next_poll, return_when=FIRST_COMPLETED)
+                    else:
+                        time.sleep(next_poll)
+                    
+                    for index, future in list(creating.items()):
+                        if not future.done():
+                            continue
+                        del creating[index]
+                        try:
+                            in_flight[index] = future.result()
+                        except Exception as e:
+                            _fail(index, str(e))
+                    
+                    if not in_flight or time.time() - last_poll < poll_interval:
+                        continue
+                    last_poll = time.time()
+                    for index, prediction in list(in_flight.items()):
+                        try:
+                            prediction.reload()
+                        except Exception as e:
+                            logger.warning(f"Error consultando el fragmento {index + 1}: {e}")
+                            continue
+                        if prediction.status == "succeeded":
+                            del in_flight[index]
+                            output = prediction.output
+                            if isinstance(output, dict) and "chunks" in output and not output["chunks"]:
+                                # Fragmento sin voz (p.ej. solo silencio o música): no hay segmentos, no es un fallo
+                                chunk_segments, chunk_meta = [], {}
+                            else:
+                                chunk_segments, chunk_meta = self._process_replicate_output(output, chunk_paths[index])
+                            if chunk_meta.get("error"):
+                                _fail(index, chunk_meta["error"])
+                                continue
+                            results[index] = self._offset_segments(chunk_segments, chunks[index][0])
+                            if progress_callback:
+                                progress_callback(0.1 + 0.85 * len(results) / len(chunks), f"📝 Fragmento {len(results)}/{len(chunks)} transcrito")
+                        elif prediction.status in ("failed", "canceled"):
+                            del in_flight[index]
+                            _fail(index, str(prediction.error))
+        
+        if failures:
+            raise RuntimeError(f"Fallaron {len(failures)} fragmentos tras {max_retries} reintentos: {failures}")
+        
+        segments = [seg for i in range(len(chunks)) for seg in results[i]]
+        duration = time.time() - start_time
+        metadata = {
+            "language": language,
+            "language_probability": 0.0,
+            "num_words": sum(len(seg["words"]) for seg in segments),
+            "num_segments": len(segments),
+            "audio_path": audio_path,
+            "model_id": self.model_id,
+            "processing_duration": duration,
+            "model": "incredibly-fast-whisper",
+            "provider": "replicate",
+            "mode": "chunked",
+            "num_chunks": len(chunks),
+            "retries": sum(a - 1 for a in attempts.values())
+        }
+        if progress_callback:
+            progress_callback(1.0, "✅ Transcripción completada")
+        logger.info(f"Transcripción Replicate por fragmentos completada en {duration:.2f} segundos")
+        return segments, metadata
+    
+    @staticmethod
+    def _handle_chunk_failure(index: int, error: str, attempts: Dict[int, int], max_retries: int,
+                              pending: List[int], failures: Dict[int, str]) -> bool:
+        """Reencola un fragmento fallido (devuelve True) o lo marca como fallo definitivo (False)."""
+        if attempts[index] <= max_retries:
+            logger.warning(f"Fragmento {index + 1} falló (intento {attempts[index]}): {error}. Reintentando...")
+            pending.append(index)
+            return True
+        logger.error(f"Fragmento {index + 1} falló definitivamente: {error}")
+        failures[index] = error
+        return False
+    
+    @staticmethod
+    def _offset_segments(segments: List[Dict], offset: float) -> List[Dict]:
+        """Desplaza los tiempos de segmentos y palabras al tiempo global del audio."""
+        for segment in segments:
+            segment["start"] = round(segment["start"] + offset, 2)
+            segment["end"] = round(segment["end"] + offset, 2)
+            for word in segment.get("words", []):
+                word["start"] = round(word["start"] + offset, 2)
+                word["end"] = round(word["end"] + offset, 2)
+        return segments
+    
     def _process_replicate_output(self, output: Dict, audio_path: str) -> Tuple[List[Dict], Dict]:
         """
         Procesa la salida de Replicate y la convierte al formato estándar.
@@ -320,7 +881,7 @@ class ReplicateTranscriptionService:
 
                 timestamp = chunk.get("timestamp", [0, 0])
                 start_time = timestamp[0] if len(timestamp) > 0 else 0
-                end_time = timestamp[1] if len(timestamp) > 1 else 0
+                end_time = timestamp[1] if len(timestamp) > 1 and timestamp[1] is not None else start_time
                 text = chunk.get("text", "").strip()
                 
                 if not text:
@@ -453,7 +1014,8 @@ def get_transcription_service(service_type: str = "local", **kwargs) -> Transcri
     Obtiene el servicio de transcripción apropiado.
     
     Args:
-        service_type: Tipo de servicio ('local' para Whisper local, 'replicate' para Replicate)
+        service_type: Tipo de servicio ('local' para Whisper local, 'replicate' para Replicate,
+            'fake' para la transcripción simulada a partir del guion)
         **kwargs: Argumentos adicionales para el servicio
         
     Returns:
@@ -461,5 +1023,7 @@ def get_transcription_service(service_type: str = "local", **kwargs) -> Transcri
     """
     if service_type.lower() == "replicate":
         return ReplicateTranscriptionService(**kwargs)
+    elif service_type.lower() == "fake":
+        return get_fake_providers().transcription
     else:
         return TranscriptionService(**kwargs) 
\ No newline at end of file
@@ -0,0 +1,164 @@
+# utils/transcription_utils.py
+"""
+Utilidades compartidas para construir transcripciones con el mismo esquema que
+produce TranscriptionService (segmentos con 'text', 'start', 'end' y 'words').
+Se usan cuando los tiempos de palabra no vienen de un ASR (p.ej. eventos
+WordBoundary de Edge TTS) y hay que reconstruir los segmentos a partir del guion.
+"""
+
+import json
+import re
+import difflib
+import logging
+from pathlib import Path
+from typing import List, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Puntuación que cierra un segmento (fin de frase)
+SENTENCE_END_CHARS = ('.', '!', '?', ';', ':', '…', '»', '"')
+
+
+def _normalize_token(token: str) -> str:
+    """Normaliza una palabra para compararla (minúsculas, sin puntuación)."""
+    return re.sub(r'[\W_]+', '', token.lower())
+
+
+def tokenize_script(script_text: str) -> List[str]:
+    """Divide el guion en palabras conservando la puntuación pegada a cada una."""
+    return [t for t in script_text.split() if t.strip()]
+
+
+def restore_script_wording(timed_words: List[Dict], script_text: str) -> List[Dict]:
+    """
+    Alinea palabras con tiempos contra el guion original para recuperar la
+    redacción exacta (mayúsculas, puntuación) manteniendo los tiempos.
+
+    Las palabras del guion sin correspondencia reciben tiempos interpolados
+    entre sus vecinas, proporcionalmente a su longitud.
+
+    Args:
+        timed_words: Lista de palabras [{'text', 'start', 'end'}, ...] en orden
+        script_text: Texto exacto que se sintetizó
+
+    Returns:
+        List[Dict]: Palabras del guion con 'text', 'start' y 'end'
+    """
+    script_tokens = tokenize_script(script_text)
+    if not script_tokens or not timed_words:
+        return []
+
+    script_norm = [_normalize_token(t) for t in script_tokens]
+    timed_norm = [_normalize_token(w.get('text', '')) for w in timed_words]
+
+    starts: List[Optional[float]] = [None] * len(script_tokens)
+    ends: List[Optional[float]] = [None] * len(script_tokens)
+
+    matcher = difflib.SequenceMatcher(None, script_norm, timed_norm, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            for offset in range(i2 - i1):
+                starts[i1 + offset] = timed_words[j1 + offset]['start']
+                ends[i1 + offset] = timed_words[j1 + offset]['end']
+        elif tag == 'replace':
+            # Repartir el intervalo de las palabras temporizadas entre las del guion
+            span_start = timed_words[j1]['start']
+            span_end = timed_words[j2 - 1]['end']
+            _distribute_span(script_tokens, starts, ends, i1, i2, span_start, span_end)
+        # 'delete' se interpola después; 'insert' (palabras fuera del guion) se descarta
+
+    _interpolate_missing(script_tokens, starts, ends)
+
+    return [
+        {"text": f" {token}", "start": round(starts[i], 2), "end": round(ends[i], 2)}
+        for i, token in enumerate(script_tokens)
+    ]
+
+
+def _distribute_span(tokens: List[str], starts: List, ends: List, i1: int, i2: int, span_start: float, span_end: float):
+    """Reparte [span_start, span_end] entre tokens[i1:i2] según su longitud."""
+    weights = [max(len(_normalize_token(t)), 1) for t in tokens[i1:i2]]
+    total_weight = sum(weights)
+    span = max(span_end - span_start, 0.0)
+    cursor = span_start
+    for offset, weight in enumerate(weights):
+        duration = span * weight / total_weight
+        starts[i1 + offset] = cursor
+        ends[i1 + offset] = cursor + duration
+        cursor += duration
+
+
+def _interpolate_missing(tokens: List[str], starts: List, ends: List):
+    """Rellena tiempos ausentes usando los extremos conocidos más cercanos."""
+    i = 0
+    n = len(tokens)
+    while i < n:
+        if starts[i] is not None:
+            i += 1
+            continue
+        j = i
+        while j < n and starts[j] is None:
+            j += 1
+        gap_start = ends[i - 1] if i > 0 else (starts[j] if j < n else 0.0)
+        gap_end = starts[j] if j < n else gap_start
+        _distribute_span(tokens, starts, ends, i, j, gap_start, max(gap_end, gap_start))
+        i = j
+
+
+def build_segments_from_words(
+    words: List[Dict],
+    max_segment_duration: float = 10.0,
+    pause_threshold: float = 0.6
+) -> List[Dict]:
+    """
+    Agrupa palabras con tiempos en segmentos tipo Whisper.
+
+    Un segmento se cierra al final de una frase, ante una pausa larga o al
+    superar la duración máxima.
+
+    Args:
+        words: Palabras [{'text', 'start', 'end'}, ...] ordenadas por tiempo
+        max_segment_duration: Duración máxima de un segmento en segundos
+        pause_threshold: Silencio entre palabras que fuerza un corte
+
+    Returns:
+        List[Dict]: Segmentos con 'text', 'start', 'end' y 'words'
+    """
+    segments = []
+    current: List[Dict] = []
+
+    def _close():
+        if not current:
+            return
+        segments.append({
+            "text": " " + " ".join(w['text'].strip() for w in current),
+            "start": round(current[0]['start'], 2),
+            "end": round(current[-1]['end'], 2),
+            "words": list(current)
+        })
+
+    for idx, word in enumerate(words):
+        current.append(word)
+        word_text = word['text'].strip()
+        next_word = words[idx + 1] if idx + 1 < len(words) else None
+
+        ends_sentence = word_text.endswith(SENTENCE_END_CHARS)
+        long_pause = next_word is not None and next_word['start'] - word['end'] >= pause_threshold
+        too_long = word['end'] - current[0]['start'] >= max_segment_duration
+
+        if ends_sentence or long_pause or too_long:
+            _close()
+            current = []
+
+    _close()
+    return segments
+
+
+def save_transcription_json(segments: List[Dict], metadata: Dict, output_path: str) -> str:
+    """Guarda la transcripción con el mismo formato que TranscriptionService.save_transcription."""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"metadata": metadata, "segments": segments}, f, ensure_ascii=False, indent=2)
+    logger.info(f"Transcripción guardada en {output_path}")
+    return str(output_path)
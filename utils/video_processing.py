@@ -14,11 +14,14 @@ import random
 import string
 import shutil
 import uuid
+import hashlib
 import logging
 from datetime import datetime
-import yaml
 import json
-from typing import Dict, List, Optional
+import time
+import threading
+from typing import Dict, List, Optional, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
 
 # --- AÑADIR PROJECT_ROOT ---
 # Definir la ruta raíz del proyecto para construir rutas absolutas y robustas
@@ -27,13 +30,17 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 
 # --- Importaciones Directas de Servicios ---
 try:
-    from utils.ai_services import AIServices
-    from utils.audio_services import AudioServices
-    from utils.scene_generator import SceneGenerator
-    from utils.video_services import VideoServices
+    from utils.scene_generator import SceneGenerator, IncrementalSceneSegmenter
     from utils.subtitle_utils import split_subtitle_segments
-    from utils.transcription_services import TranscriptionService, get_transcription_service
-    from utils.content_optimizer import ContentOptimizer
+    from utils.transcription_services import TranscriptionService
+    from utils.script_alignment import align_script_to_audio
+    from utils.transcription_cache import get_transcription_cache
+    from utils.image_store import link_or_copy
+    from utils.prompt_similarity import get_prompt_similarity_index
+    from utils.pipeline_metrics import PipelineMetrics, record_api_call
+    from utils.pipeline_fingerprints import ArtifactGraph, IMAGE_RENDER_KEYS, fingerprint
+    from utils.database_manager import DatabaseManager
+    from utils.service_container import ServiceContainer
 except ImportError as e:
     logging.critical(f"FALLO CRÍTICO AL IMPORTAR SERVICIOS: {e}. La aplicación no puede continuar.", exc_info=True)
     raise RuntimeError(f"Error importando módulo necesario: {e}") from e
@@ -42,13 +49,66 @@ except ImportError as e:
 # Configuración logging
 logger = logging.getLogger(__name__)
 
+class SceneImagePipeline:
+    """
+    Cola de generación de imágenes alimentada por la etapa de prompts.
+    
+    En cuanto una escena tiene prompt se encola su imagen, de modo que el LLM
+    y el proveedor de imágenes trabajan a la vez en lugar de uno detrás de otro.
+    Las imágenes que ya existen en disco no se vuelven a pedir.
+    """
+
+    def __init__(self, processor: "VideoProcessor", project_id: str, image_prompt_config: Dict,
+                 images_path: Path, max_concurrency: int = 4, graph: Optional[ArtifactGraph] = None):
+        self.processor = processor
+        self.graph = graph
+        self.project_id = project_id
+        self.image_prompt_config = image_prompt_config
+        self.images_path = images_path
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+        self._futures: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, index: int, scene: Dict):
+        """Encola la imagen de la escena si tiene prompt y no está ya al día (seguro entre hilos)."""
+        if not scene.get("image_prompt"):
+            return
+        image_path = self.processor._scene_image_path(self.images_path, index, self.image_prompt_config)
+        if self.processor._scene_image_current(self.graph, index, scene, image_path, self.image_prompt_config):
+            return
+        with self._lock:
+            if index in self._futures:
+                return
+            self._futures[index] = self._executor.submit(
+                self.processor._generate_scene_image, self.project_id, index, scene, image_path, self.image_prompt_config
+            )
+        logger.info(f"[{self.project_id}] Imagen de la escena {index+1} encolada")
+
+    def futures(self) -> Dict[int, Future]:
+        """Imágenes encoladas por índice de escena."""
+        with self._lock:
+            return dict(self._futures)
+
+    def shutdown(self, cancel_pending: bool = False):
+        self._executor.shutdown(wait=not cancel_pending, cancel_futures=cancel_pending)
+
+
 class VideoProcessor:
-    def __init__(self, config: Optional[Dict] = None):
-        """Inicializa el procesador de video con configuración opcional."""
-        self.void_config = config or self._load_void_config()
-        self.tts_config = self._load_tts_config()
-        self.transcription_config = self._load_transcription_config()
-        self.overlay_config = self._load_overlay_config()
+    def __init__(self, config: Optional[Dict] = None, services: Optional[ServiceContainer] = None):
+        """
+        Inicializa el procesador de video con configuración opcional.
+        
+        Args:
+            config: Configuración de video (por defecto la de .voidrules)
+            services: Servicios compartidos (utils/service_container.py). Los workers del lote
+                pasan el del proceso para no reinicializar clientes en cada proyecto; sin él
+                se crea uno propio, que vuelve a leer la configuración
+        """
+        self.services = services or ServiceContainer()
+        self.void_config = config or self.services.void_config
+        self.tts_config = self.services.tts_config
+        self.transcription_config = self.services.transcription_config
+        self.overlay_config = self.services.overlay_config
         self.video_gen_config = self.void_config.get('video_generation', {})
         
         # Configurar directorios
@@ -57,125 +117,21 @@ class VideoProcessor:
         self.background_music_path = Path(self.video_gen_config.get('paths', {}).get('background_music_dir', 'background_music'))
         
         self._setup_directories()
-        self._initialize_services()
-    
-    def _load_void_config(self) -> Dict:
-        try:
-            root_dir = Path(__file__).resolve().parent.parent 
-            voidrules_path = root_dir / ".voidrules"
-            with open(voidrules_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-                logger.info(f"Configuración cargada desde {voidrules_path}")
-                return config
-        except FileNotFoundError:
-            logger.warning(".voidrules no encontrado, usando defaults.")
-            return {
-                'video_generation': {
-                    'quality': {'resolution': '1920x1080', 'bitrate': '5000k', 'audio_bitrate': '192k'},
-                    'paths': {'projects_dir': 'projects', 'assets': 'overlays', 'output_dir': 'output', 'background_music_dir': 'background_music'},
-                    'audio': {'default_voice': 'es-ES-AlvaroNeural'},
-                    'subtitles': {'font': 'Arial', 'font_size': 24, 'color': '#FFFFFF'}
-                }
-            }
-        except Exception as e:
-            logger.error(f"Error cargando .voidrules: {e}", exc_info=True)
-            return {}
-    
-    def _load_tts_config(self) -> Dict:
-        """Carga la configuración de TTS desde config.yaml"""
-        try:
-            from utils.config import load_config
-            config = load_config()
-            tts_config = config.get('tts', {})
-            logger.info(f"Configuración TTS cargada: {tts_config.get('default_provider', 'edge')}")
-            return tts_config
-        except Exception as e:
-            logger.warning(f"Error cargando configuración TTS: {e}")
-            return {
-                'default_provider': 'fish',
-                'edge': {
-                    'default_voice': 'es-ES-AlvaroNeural',
-                    'default_rate': '+0%',
-                    'default_pitch': '+0Hz'
-                },
-                'fish_audio': {
-                    'api_key': None,
-                    'default_model': 'speech-1.6',
-                    'default_format': 'mp3',
-                    'default_mp3_bitrate': 128,
-                    'default_normalize': True,
-                    'default_latency': 'normal',
-                    'reference_id': None
-                }
-            }
-    
-    def _load_transcription_config(self) -> Dict:
-        """Carga la configuración de transcripción desde config.yaml"""
-        try:
-            from utils.config import load_config
-            config = load_config()
-            transcription_config = config.get('transcription', {})
-            logger.info(f"Configuración de transcripción cargada: {transcription_config.get('service_type', 'local')}")
-            return transcription_config
-        except Exception as e:
-            logger.warning(f"Error cargando configuración de transcripción: {e}")
-    
-    def _load_overlay_config(self) -> Dict:
-        """Carga la configuración de overlays desde config.yaml"""
-        try:
-            from utils.config import load_config
-            config = load_config()
-            overlays_config = config.get('video_generation', {}).get('effects', {}).get('overlays', [{}])
-            default_opacity = overlays_config[0].get('opacity', 0.3) if overlays_config else 0.3
-            logger.info(f"Configuración de overlays cargada: opacidad por defecto {default_opacity}")
-            return {'default_opacity': default_opacity}
-        except Exception as e:
-            logger.warning(f"Error cargando configuración de overlays: {e}")
-            return {'default_opacity': 0.3}
+        self._bind_services()
     
     def _setup_directories(self):
         self.projects_path.mkdir(exist_ok=True)
         self.output_dir.mkdir(exist_ok=True)
         self.background_music_path.mkdir(exist_ok=True)
     
-    def _initialize_services(self):
-        self.ai_service = AIServices() 
-        logger.info(f"AIServices inicializado - Cliente Replicate: {self.ai_service.replicate_client is not None}")
-        logger.info(f"AIServices token: {self.ai_service.replicate_token[:10] if self.ai_service.replicate_token else 'None'}...")
-        self.audio_service = AudioServices() 
-        self.scene_generator = SceneGenerator(config=self.void_config)
-        logger.info(f"SceneGenerator inicializado: {self.scene_generator is not None}") 
-        self.video_service = VideoServices() 
-        
-        # Inicializar servicio de transcripción según configuración
-        transcription_type = self.transcription_config.get('service_type', 'local')
-        logger.info(f"Configurando servicio de transcripción: {transcription_type}")
-        
-        if transcription_type == 'replicate':
-            # Usar Replicate para transcripción
-            replicate_token = self.ai_service.replicate_token
-            if not replicate_token:
-                logger.warning("No se encontró token de Replicate, usando transcripción local")
-                self.transcription_service = get_transcription_service('local')
-            else:
-                # Obtener configuración específica de Replicate
-                replicate_config = self.transcription_config.get('replicate', {})
-                self.transcription_service = get_transcription_service('replicate', api_token=replicate_token)
-                logger.info(f"TranscriptionService inicializado con Replicate - Idioma: {replicate_config.get('default_language', 'es')}")
-        else:
-            # Usar transcripción local
-            local_config = self.transcription_config.get('local', {})
-            self.transcription_service = get_transcription_service(
-                'local',
-                model_size=local_config.get('model_size', 'medium'),
-                device=local_config.get('device', 'cpu'),
-                compute_type=local_config.get('compute_type', 'int8')
-            )
-            logger.info(f"TranscriptionService inicializado con Whisper local - Modelo: {local_config.get('model_size', 'medium')}")
-        
-        # ContentOptimizer se inicializa con valores por defecto, se configurará dinámicamente
-        self.content_optimizer = ContentOptimizer(self.ai_service)
-        logger.info("Servicios inicializados.")
+    def _bind_services(self):
+        """Toma los servicios del contenedor (se construyen una vez por contenedor, no por proyecto)."""
+        self.ai_service = self.services.ai_service
+        self.audio_service = self.services.audio_service
+        self.scene_generator = self.services.scene_generator(self.void_config)
+        self.video_service = self.services.video_service
+        self.transcription_service = self.services.transcription_service
+        self.content_optimizer = self.services.content_optimizer
 
     def _save_project_info(self, folder: Path, project_info: Dict):
         try:
@@ -212,11 +168,53 @@ class VideoProcessor:
         logger.info(f"Directorio proyecto configurado: {project_folder}")
         return project_info
 
-    def process_single_video(self, full_config: Dict, existing_project_info: Optional[Dict] = None) -> Optional[Path]:
+    def process_single_video(self, full_config: Dict, existing_project_info: Optional[Dict] = None,
+                             progress_callback: Optional[Callable] = None,
+                             stop_after: Optional[str] = None,
+                             should_pause: Optional[Callable[[str], bool]] = None) -> Optional[Path]:
+        """
+        Genera (o reanuda) un video completo: guion, audio, transcripción, escenas,
+        imágenes, montaje, postproceso y render.
+        
+        Args:
+            full_config: Configuración del proyecto (titulo, contexto, script, image, video, audio...)
+            existing_project_info: project_info de un proyecto existente para reanudarlo
+            progress_callback: Función de progreso para la generación de escenas
+            stop_after: Detenerse al terminar esa etapa ('script', 'audio', 'transcription',
+                'scenes' o 'images'); el estado queda en project_info como '<etapa>_ok' y la
+                siguiente llamada con el mismo project_info continúa desde ahí
+            should_pause: Se llama al terminar el guion, el audio y las imágenes con el estado
+                alcanzado ('script_ok', 'audio_ok', 'images_ok'); si devuelve True el proceso se
+                detiene ahí como con stop_after. No se consulta entre transcripción, escenas e
+                imágenes, que se solapan
+        
+        La transcripción en streaming (escenas y prompts mientras se transcribe) y la cola
+        prompt→imagen solo se activan si la llamada llega hasta las etapas que solapan:
+        ejecutar la transcripción, las escenas y las imágenes en llamadas separadas las
+        serializa.
+        
+        Cada etapa se salta solo si su huella de entradas (utils/pipeline_fingerprints.py)
+        coincide con la registrada y su artefacto sigue en disco; si la configuración o un
+        artefacto anterior cambiaron, se regenera y con ella las etapas que dependen de él.
+        
+        Returns:
+            Optional[Path]: Ruta del video final, o None si falló o se detuvo antes del render
+        """
         project_info = {} 
         base_video_clip_obj = None
         final_video_clip = None
+        image_pipeline = None
+        metrics = None
+        graph = None
         script_content = "" 
+
+        def stop_here(stage: str) -> bool:
+            nonlocal stop_after
+            if stop_after is None and should_pause and stage in ("script", "audio", "images") and \
+                    should_pause(f"{stage}_ok"):
+                logger.info(f"[{project_info.get('id')}] Pausa solicitada al terminar '{stage}'")
+                stop_after = stage
+            return stop_after == stage
         
         try:
             if existing_project_info:
@@ -230,14 +228,18 @@ class VideoProcessor:
                 project_id = project_info["id"]
                 logger.info(f"[{project_id}] Iniciando nuevo proyecto: {project_info['titulo']}")
             logger.info(f"[{project_id}] Iniciando: {project_info['titulo']}")
+            metrics = PipelineMetrics(project_id, project_info.get("metrics"), project_info.get("status"))
+            graph = ArtifactGraph(project_info)
 
             # --- 1. Script --- 
+            metrics.begin("script")
             script_config_ui = full_config.get("script", {})
             script_mode = script_config_ui.get("mode", "Generar con IA")
             logger.info(f"[{project_id}] Guion (Modo: {script_mode})...")
             
+            script_inputs = self._stage_inputs("script", full_config, project_info, graph)
             script_path_str = project_info.get("script_path")
-            if script_path_str and Path(script_path_str).exists():
+            if graph.is_current("script", script_inputs, script_path_str):
                 script_content = Path(script_path_str).read_text(encoding='utf-8')
                 logger.info(f"[{project_id}] Guion cargado desde archivo existente: {script_path_str}")
             else:
@@ -266,15 +268,19 @@ class VideoProcessor:
                     script_path.write_text(script_content, encoding='utf-8')
                     project_info["script_path"] = str(script_path)
                     project_info["script_source"] = "ia"
+                graph.done("script", script_inputs, project_info["script_path"])
             project_info["status"] = "script_ok"; self._save_project_info(base_path, project_info)
+            if stop_here("script"): return None
 
             # --- 2. Audio (TTS) --- 
+            metrics.begin("audio")
             logger.info(f"[{project_id}] Audio TTS...")
             audio_config_ui = full_config.get("audio", {}) # Necesario para _apply_audio después
             tts_settings = {k: v for k, v in audio_config_ui.items() if k.startswith('tts_')}
             
+            audio_inputs = self._stage_inputs("audio", full_config, project_info, graph)
             audio_path_generated = project_info.get("audio_path")
-            if audio_path_generated and Path(audio_path_generated).exists():
+            if graph.is_current("audio", audio_inputs, audio_path_generated):
                 try:
                     with AudioFileClip(audio_path_generated) as temp_audio_clip:
                         project_info["audio_duration"] = temp_audio_clip.duration
@@ -285,11 +291,24 @@ class VideoProcessor:
                     logger.error(f"[{project_id}] Error cargando duración del audio TTS {audio_path_generated}: {e_adur}")
                     raise RuntimeError(f"Fallo crítico al cargar audio TTS: {e_adur}")
             else:
+                # Los tiempos de palabra de un audio anterior ya no valen (Edge los vuelve a capturar)
+                project_info.pop("transcription_source", None)
                 # Obtener configuración de TTS
                 tts_provider = tts_settings.get('tts_provider', 'fish')
                 from utils.audio_services import generate_tts_audio
                 
                 if tts_provider == 'edge':
+                    # Edge TTS emite los tiempos de cada palabra durante la síntesis:
+                    # si se capturan, la transcripción ASR del paso 3 no es necesaria.
+                    capture_word_timings = tts_settings.get(
+                        'tts_capture_word_timings',
+                        self.tts_config.get('edge', {}).get('capture_word_timings', True)
+                    )
+                    word_timings_path = base_path / "transcription.json" if capture_word_timings else None
+                    if word_timings_path:
+                        # Si Edge no emite tiempos no se escribe nada: un transcription.json de otra
+                        # voz, otro guion o de ASR no debe tomarse por el de esta síntesis
+                        word_timings_path.unlink(missing_ok=True)
                     # Configuración para Edge TTS
                     audio_path_generated = generate_tts_audio(
                         text=script_content,
@@ -297,8 +316,13 @@ class VideoProcessor:
                         voice=tts_settings.get('tts_voice', self.video_gen_config.get('audio',{}).get('default_voice','es-ES-AlvaroNeural')),
                         rate=f"{tts_settings.get('tts_speed_percent', 0):+d}%",
                         pitch=f"{tts_settings.get('tts_pitch_hz', 0):+d}Hz",
-                        output_dir=str(base_path / "audio")
+                        output_dir=str(base_path / "audio"),
+                        word_timings_path=str(word_timings_path) if word_timings_path else None
                     )
+                    if word_timings_path and word_timings_path.exists():
+                        project_info["transcription_path"] = str(word_timings_path)
+                        project_info["transcription_source"] = "edge_tts"
+                        logger.info(f"[{project_id}] Tiempos de palabra capturados desde Edge TTS: {word_timings_path}")
                 elif tts_provider == 'fish':
                     # Configuración para Fish Audio
                     fish_config = self.tts_config.get('fish_audio', {})
@@ -314,6 +338,13 @@ class VideoProcessor:
                         fish_normalize=tts_settings.get('tts_fish_normalize', fish_config.get('default_normalize', True)),
                         fish_latency=tts_settings.get('tts_fish_latency', fish_config.get('default_latency', 'normal'))
                     )
+                elif tts_provider == 'fake':
+                    # Voz sintética sin red (utils/fake_providers.py) para benchmarks y pruebas
+                    audio_path_generated = generate_tts_audio(
+                        text=script_content,
+                        tts_provider='fake',
+                        output_dir=str(base_path / "audio")
+                    )
                 else:
                     raise ValueError(f"Proveedor TTS no soportado: {tts_provider}")
                     
@@ -330,28 +361,49 @@ class VideoProcessor:
                     raise RuntimeError(f"Fallo crítico al procesar duración de audio TTS: {e_adur}")
 
                 logger.info(f"[{project_id}] Audio generado: {audio_path_generated} ({project_info['audio_duration']:.2f}s)")
+                graph.done("audio", audio_inputs, audio_path_generated)
+                if project_info.get("transcription_source") == "edge_tts":
+                    graph.done("transcription", self._stage_inputs("transcription", full_config, project_info, graph),
+                               project_info["transcription_path"])
             project_info["status"] = "audio_ok"; self._save_project_info(base_path, project_info)
+            if stop_here("audio"): return None
+
+            # Las imágenes se encolan a medida que cada escena obtiene su prompt (pasos 3-5)
+            image_prompt_config = full_config.get("image", {})
+            images_path = base_path / "images"
+            images_path.mkdir(exist_ok=True)
+            if stop_after in (None, "images"):
+                image_pipeline = self._create_image_pipeline(project_id, image_prompt_config, images_path, graph)
 
             # --- 3. Transcripción (SIEMPRE la generamos ahora si no existe, para segmentar por tiempo) ---
+            metrics.begin("transcription")
             logger.info(f"[{project_id}] Preparando transcripción...")
+            transcription_inputs = self._stage_inputs("transcription", full_config, project_info, graph)
             transcription_path_str = project_info.get("transcription_path")
             segments = [] 
-            if not transcription_path_str or not Path(transcription_path_str).exists():
+            streamed_scenes = None
+            if not graph.is_current("transcription", transcription_inputs, transcription_path_str):
                 logger.info(f"[{project_id}] Generando transcripción...")
                 try:
                     if not project_info.get("audio_path"): raise RuntimeError("Audio no encontrado para transcripción.")
-                    trans_result = self.transcription_service.transcribe_audio(project_info["audio_path"])
-                    if not trans_result: raise RuntimeError("Transcripción falló o devolvió None.")
-                    segments, _ = trans_result 
+                    if stop_after in (None, "scenes", "images") and self._can_stream_transcription(project_info, full_config, base_path):
+                        # Escenas y prompts se generan mientras se transcribe el resto del audio
+                        segments, streamed_scenes = self._stream_transcription_and_scenes(project_info, full_config, image_pipeline)
+                    else:
+                        trans_result = self._transcribe_project_audio(project_info, script_content)
+                        if not trans_result: raise RuntimeError("Transcripción falló o devolvió None.")
+                        segments, _ = trans_result 
                     if segments is None: segments = [] # Asegurar que es una lista
                     trans_path = base_path / "transcription.json"
                     self.transcription_service.save_transcription(segments, {}, str(trans_path))
                     project_info["transcription_path"] = str(trans_path)
+                    graph.done("transcription", transcription_inputs, trans_path)
                     logger.info(f"[{project_id}] Transcripción guardada: {trans_path}")
                     self._save_project_info(base_path, project_info) 
                 except Exception as trans_e: 
                     logger.error(f"[{project_id}] Fallo transcripción: {trans_e}", exc_info=True)
                     segments = [] 
+                    streamed_scenes = None
             else:
                 try: 
                     with open(transcription_path_str, 'r', encoding='utf-8') as f_trans:
@@ -364,17 +416,23 @@ class VideoProcessor:
                     segments = []
             
             project_info["status"] = "transcription_ok"; self._save_project_info(base_path, project_info)
+            if stop_here("transcription"): return None
 
             # --- 4. Scenes & Image Prompts (Lógica condicional) --- 
+            metrics.begin("scenes")
             logger.info(f"[{project_id}] Generando escenas y prompts...")
             if self.scene_generator is None: self.scene_generator = SceneGenerator(config=self.void_config) 
 
             scenes_config = full_config.get("scenes_config", {})
-            image_prompt_config = full_config.get("image", {})
 
             # Lógica para reanudar la generación de escenas
             scenes_path = base_path / "scenes.json"
-            if scenes_path.exists():
+            scenes_inputs = self._stage_inputs("scenes", full_config, project_info, graph)
+            on_scene_ready = self._scene_ready_callback(image_pipeline, scenes_path, project_info)
+            if streamed_scenes:
+                scenes_data = streamed_scenes
+                logger.info(f"[{project_id}] {len(scenes_data)} escenas generadas durante la transcripción en streaming.")
+            elif scenes_path.exists() and graph.has_partial("scenes", scenes_inputs):
                 try:
                     with open(scenes_path, 'r', encoding='utf-8') as f:
                         scenes_json = json.load(f)
@@ -385,7 +443,12 @@ class VideoProcessor:
                     logger.warning(f"[{project_id}] No se pudo leer scenes.json ({e}), se regenerarán todas las escenas.")
                     scenes_data = []
             else:
+                if scenes_path.exists():
+                    logger.info(f"[{project_id}] scenes.json se generó con otras entradas, se regeneran las escenas.")
+                    scenes_path.unlink()
                 scenes_data = []
+            # Los checkpoints de scenes.json quedan asociados a estas entradas
+            graph.start("scenes", scenes_inputs); self._save_project_info(base_path, project_info)
 
             # Si no hay escenas, generarlas desde el principio
             if not scenes_data:
@@ -395,67 +458,71 @@ class VideoProcessor:
                     mode=scenes_config.get("segmentation_mode", "Por Párrafos (Híbrido)"),
                     project_info=project_info,
                     image_prompt_config=image_prompt_config,
-                    ai_service=self.ai_service
+                    ai_service=self.ai_service,
+                    progress_callback=progress_callback,
+                    on_scene_ready=on_scene_ready
                 )
 
+            # Escenas que ya tenían prompt (reanudación, streaming o modos sin callback)
+            if image_pipeline:
+                for i, scene in enumerate(scenes_data):
+                    image_pipeline.submit(i, scene)
+
             # Lógica para reanudar la generación de prompts
             if not all(s.get('image_prompt') for s in scenes_data):
                 logger.info(f"[{project_id}] Faltan prompts de imagen, generando...")
-                scenes_data = self.scene_generator.generate_image_prompts_for_scenes(
+                scenes_data = self.scene_generator.generate_prompts_for_scenes(
                     scenes=scenes_data,
                     project_info=project_info,
                     image_prompt_config=image_prompt_config,
-                    ai_service=self.ai_service
+                    ai_service=self.ai_service,
+                    only_missing=True,
+                    on_scene_ready=on_scene_ready
                 )
         
             scenes_path = self.scene_generator.save_scenes(scenes_data, str(scenes_path), project_info)
             #self._save_scenes(base_path, scenes_data)
             project_info["scenes_path"] = str(scenes_path)
             project_info["image_prompts"] = [s.get('image_prompt', '[PROMPT FALTANTE]') for s in scenes_data]
+            # scenes.json incluye la fecha de guardado: la huella de salida es la de las escenas
+            graph.done("scenes", scenes_inputs, scenes_path, digest=fingerprint(scenes_data))
             project_info["status"] = "scenes_ok"; self._save_project_info(base_path, project_info)
+            if stop_here("scenes"): return None
 
             # --- 5. Images --- 
+            metrics.begin("images")
             logger.info(f"[{project_id}] Iniciando generación de imágenes...")
-            # Lógica para reanudar la generación de imágenes
-            images_path = base_path / "images"
-            images_path.mkdir(exist_ok=True)
-            existing_images = [f.stem for f in images_path.glob("scene_*.webp")]
-
-            image_paths = []
-            for i, scene in enumerate(scenes_data):
-                scene_name = f"scene_{i:03d}"
-                image_path = images_path / f"{scene_name}.webp"
-                
-                if scene_name in existing_images and image_path.exists():
-                    logger.info(f"[{project_id}] La imagen para la escena {i+1} ya existe. Saltando.")
-                    image_paths.append(str(image_path))
-                    continue
-
-                logger.info(f"[{project_id}] Generando imagen para la escena {i+1}/{len(scenes_data)}...")
-                try:
-                    generated_path = self.image_generator.generate_image(
-                        prompt=scene.get("image_prompt"),
-                        output_path=str(image_path),
-                        config=image_prompt_config
-                    )
-                    if generated_path:
-                        image_paths.append(generated_path)
-                        scene["image_path"] = generated_path
-                    else:
-                        logger.error(f"[{project_id}] Falló la generación de imagen para la escena {i+1}. Prompt: {scene.get('image_prompt')}")
-                        # Opcional: añadir una imagen placeholder para no detener el proceso
-                        # image_paths.append(str(self.assets_dir / "placeholder.webp"))
-
-                except Exception as img_e:
-                    logger.error(f"[{project_id}] Excepción al generar imagen para la escena {i+1}: {img_e}")
-            
+            image_paths, failed_scenes = self._generate_scene_images(
+                project_info, scenes_data, image_prompt_config, base_path,
+                in_flight=image_pipeline.futures() if image_pipeline else None, graph=graph
+            )
+            if image_pipeline:
+                image_pipeline.shutdown()
+                image_pipeline = None
+            # Las escenas fallidas quedan en la lista de reintentos; al reanudar se vuelven a generar
+            project_info["image_retry_list"] = failed_scenes
             project_info["image_paths"] = image_paths
-            if len(image_paths) != len(scenes_data):
-                 raise ValueError("No se generaron imágenes válidas para todas las escenas.")
-            logger.info(f"[{project_id}] {len(project_info['image_paths'])} imágenes generadas y válidas.")
+            graph.done("images", {"scenes": graph.digest("scenes")}, digest=fingerprint(
+                image_paths, [self._scene_image_fingerprint(scene, image_prompt_config) for scene in scenes_data]))
+            if failed_scenes:
+                logger.warning(f"[{project_id}] {len(failed_scenes)} escenas sin imagen propia (se usa imagen de sustitución): {[f['scene'] + 1 for f in failed_scenes]}")
+            logger.info(f"[{project_id}] {len(image_paths) - len(failed_scenes)}/{len(scenes_data)} imágenes generadas y válidas.")
             project_info["status"] = "images_ok"; self._save_project_info(base_path, project_info)
+            if stop_here("images"): return None
+
+            # Render ya hecho con las mismas entradas: se devuelve el video existente
+            render_inputs = self._stage_inputs("render", full_config, project_info, graph)
+            existing_video = project_info.get("subtitled_video_path") or project_info.get("final_video_path")
+            if graph.is_current("render", render_inputs, existing_video, hash_artifact=False):
+                logger.info(f"[{project_id}] El video final está al día, no se vuelve a renderizar: {existing_video}")
+                project_info["status"] = "completado"; self._save_project_info(base_path, project_info)
+                final_video_path = Path(existing_video)
+                # El contenido optimizado no forma parte del render: se genera si se activó después o falló
+                self._generate_optimized_content(project_info, full_config, base_path, metrics, only_if_missing=True)
+                return final_video_path
 
             # --- 6. Video Assembly con Sincronización por Transcripción --- 
+            metrics.begin("assembly")
             logger.info(f"[{project_id}] Ensamblando video base con sincronización de audio...")
             video_config_ui = full_config.get("video", {})
             
@@ -677,6 +744,7 @@ class VideoProcessor:
             project_info["status"] = "base_video_ok"; self._save_project_info(base_path, project_info)
 
             # --- 7. Post-processing (Audio, Effects, Subs) --- 
+            metrics.begin("postprocess")
             base_video_clip_obj = VideoFileClip(base_video_path) # Cargar el video SIN audio
             final_video_clip = base_video_clip_obj # Iniciar con el clip base
             
@@ -740,6 +808,7 @@ class VideoProcessor:
 
 
             # --- 8. Final Save ---
+            metrics.begin("render")
             logger.info(f"[{project_id}] Guardando video final...")
             output_filename = f"{project_id}_final{'_subtitled' if project_info.get('subtitled_video_generated') else ''}.mp4"
             final_video_path = base_path / "video" / output_filename
@@ -765,6 +834,7 @@ class VideoProcessor:
                     logger=None,  # Usar None para evitar barras de progreso en los logs
                     threads=os.cpu_count() or 2
                 )
+                metrics.set_frames(int(final_video_clip.duration * 24))
                 
                 # 3. Construir el comando FFmpeg para combinar todo
                 ffmpeg_cmd = ['ffmpeg', '-y']  # -y para sobrescribir el archivo de salida si existe
@@ -826,6 +896,7 @@ class VideoProcessor:
                     project_info["subtitled_video_path"] = str(final_video_path)
                 else: 
                     project_info["final_video_path"] = str(final_video_path)
+                graph.done("render", render_inputs, final_video_path, hash_artifact=False)
                 project_info["status"] = "completado"
                 self._save_project_info(base_path, project_info)
 
@@ -852,23 +923,7 @@ class VideoProcessor:
                 logger.info(f"[{project_id}] Limpieza de archivos temporales finalizada.") 
             
             # --- GENERAR CONTENIDO OPTIMIZADO (OPCIONAL) ---
-            if full_config.get('generate_optimized_content', False):
-                logger.info(f"[{project_id}] Generando contenido optimizado para YouTube...")
-                try:
-                    optimized_content = self.content_optimizer.generate_optimized_content(project_info, full_config)
-                    if optimized_content:
-                        txt_path, json_path = self.content_optimizer.save_optimized_content(optimized_content, base_path)
-                        if txt_path and json_path:
-                            project_info["content_optimization_txt"] = str(txt_path)
-                            project_info["content_optimization_json"] = str(json_path)
-                            logger.info(f"[{project_id}] Contenido optimizado generado exitosamente")
-                        else:
-                            logger.warning(f"[{project_id}] Error guardando contenido optimizado")
-                    else:
-                        logger.warning(f"[{project_id}] No se pudo generar contenido optimizado")
-                except Exception as opt_error:
-                    logger.error(f"[{project_id}] Error generando contenido optimizado: {opt_error}")
-                    # Continuar sin contenido optimizado, no es crítico
+            self._generate_optimized_content(project_info, full_config, base_path, metrics)
             
             return final_video_path
 
@@ -882,6 +937,13 @@ class VideoProcessor:
             # raise # Comentado para permitir que la UI muestre el error
             return None # Devolver None en caso de error para que la UI sepa
         finally:
+            # Si el proceso se interrumpió antes del paso 5, no lanzar más imágenes
+            if image_pipeline:
+                image_pipeline.shutdown(cancel_pending=True)
+            
+            if metrics:
+                self._store_pipeline_metrics(metrics, project_info)
+            
             # Cerrar clips de MoviePy para liberar recursos
             if base_video_clip_obj: 
                 try: base_video_clip_obj.close()
@@ -897,6 +959,8 @@ class VideoProcessor:
 
 
             if project_info.get("status") != "completado": 
+                if stop_after and project_info.get("status") == f"{stop_after}_ok":
+                    return None # Detenido al final de la etapa pedida
                 logger.warning(f"[{project_info.get('id', 'UNKNOWN')}] Proceso no completado, estado: {project_info.get('status')}")
                 return None # Devuelve None si no se completó
         
@@ -904,6 +968,529 @@ class VideoProcessor:
 
     # --- Métodos Auxiliares --- 
 
+    def _generate_optimized_content(self, project_info: Dict, full_config: Dict, base_path: Path,
+                                    metrics: PipelineMetrics, only_if_missing: bool = False):
+        """
+        Genera el título, la descripción y las etiquetas optimizadas para YouTube si
+        generate_optimized_content está activado. No es crítico: los errores solo se registran.
+
+        Args:
+            project_info: Información del proyecto (recibe las rutas del contenido generado)
+            full_config: Configuración completa del proyecto
+            base_path: Carpeta del proyecto
+            metrics: Métricas del pipeline (etapa "optimized_content")
+            only_if_missing: Solo generarlo si no existe ya (p.ej. al saltar un render al día)
+        """
+        if not full_config.get('generate_optimized_content', False):
+            return
+        project_id = project_info.get("id")
+        existing = project_info.get("content_optimization_json")
+        if only_if_missing and existing and Path(existing).exists():
+            return
+        metrics.begin("optimized_content")
+        logger.info(f"[{project_id}] Generando contenido optimizado para YouTube...")
+        try:
+            optimized_content = self.content_optimizer.generate_optimized_content(project_info, full_config)
+            if optimized_content:
+                txt_path, json_path = self.content_optimizer.save_optimized_content(optimized_content, base_path)
+                if txt_path and json_path:
+                    project_info["content_optimization_txt"] = str(txt_path)
+                    project_info["content_optimization_json"] = str(json_path)
+                    logger.info(f"[{project_id}] Contenido optimizado generado exitosamente")
+                else:
+                    logger.warning(f"[{project_id}] Error guardando contenido optimizado")
+            else:
+                logger.warning(f"[{project_id}] No se pudo generar contenido optimizado")
+        except Exception as opt_error:
+            logger.error(f"[{project_id}] Error generando contenido optimizado: {opt_error}")
+            # Continuar sin contenido optimizado, no es crítico
+
+    def _store_pipeline_metrics(self, metrics: PipelineMetrics, project_info: Dict):
+        """Guarda las métricas por etapa en project_info["metrics"] y en la tabla global de métricas."""
+        try:
+            metrics.finish()
+            project_info["metrics"] = metrics.as_dict()
+            if project_info.get("base_path"):
+                self._save_project_info(Path(project_info["base_path"]), project_info)
+            DatabaseManager().save_metricas_proyecto(
+                project_info.get("id"), project_info.get("titulo"), project_info["metrics"], project_info.get("status")
+            )
+        except Exception as e:
+            logger.warning(f"[{project_info.get('id')}] No se pudieron guardar las métricas del pipeline: {e}")
+
+    def _stage_inputs(self, stage: str, full_config: Dict, project_info: Dict, graph: ArtifactGraph) -> Dict:
+        """
+        Entradas declaradas de cada etapa: hash de los artefactos de las que dependen
+        y la parte de la configuración que cambia su resultado.
+        """
+        if stage == "script":
+            return {"titulo": project_info.get("titulo"), "contexto": project_info.get("contexto"),
+                    "script": full_config.get("script", {})}
+
+        if stage == "audio":
+            tts_settings = {k: v for k, v in full_config.get("audio", {}).items() if k.startswith('tts_')}
+            provider = tts_settings.get('tts_provider', 'fish')
+            return {"script": graph.digest("script"), "tts": tts_settings,
+                    "provider_defaults": (self.tts_config or {}).get('fish_audio' if provider == 'fish' else provider, {}),
+                    "default_voice": self.video_gen_config.get('audio', {}).get('default_voice')}
+
+        if stage == "transcription":
+            if project_info.get("transcription_source") == "edge_tts":
+                return {"audio": graph.digest("audio"), "source": "edge_tts"}
+            transcription_config = self.transcription_config or {}
+            mode = transcription_config.get('mode', 'asr')
+            service_config = transcription_config.get(
+                'local' if isinstance(self.transcription_service, TranscriptionService) else 'replicate', {})
+            return {"audio": graph.digest("audio"), "mode": mode,
+                    "script": graph.digest("script") if mode == 'alignment' else None,
+                    "engine": list(self.transcription_service.cache_descriptor()),
+                    "language": service_config.get('default_language', 'es')}
+
+        if stage == "scenes":
+            image_config = full_config.get("image", {})
+            image_prompt = {k: v for k, v in image_config.items() if k not in IMAGE_RENDER_KEYS and k != "fresh_images"}
+            historical_context = image_config.get("historical_context") or {}
+            if historical_context.get("extraction_mode") == "auto":
+                # La IA vuelve a extraer el contexto histórico en cada ejecución: sus valores cambiarían
+                # la huella sin cambiar la configuración, así que solo cuenta el modo de extracción
+                image_prompt.pop("historical_variables", None)
+                image_prompt["historical_context"] = {"extraction_mode": "auto"}
+            return {"script": graph.digest("script"), "transcription": graph.digest("transcription"),
+                    "scenes": full_config.get("scenes_config", {}),
+                    "image_prompt": image_prompt,
+                    "timing": self.video_gen_config.get('timing', {})}
+
+        if stage == "render":
+            return {"audio": graph.digest("audio"), "transcription": graph.digest("transcription"),
+                    "scenes": graph.digest("scenes"), "images": graph.digest("images"),
+                    "video": full_config.get("video", {}), "subtitles": full_config.get("subtitles", {}),
+                    "audio_mix": {k: v for k, v in full_config.get("audio", {}).items() if not k.startswith('tts_')},
+                    "quality": self.video_gen_config.get('quality', {}),
+                    "subtitles_defaults": self.video_gen_config.get('subtitles', {})}
+
+        raise ValueError(f"Etapa desconocida: {stage}")
+
+    def _transcribe_project_audio(self, project_info: Dict, script_content: str):
+        """
+        Obtiene segmentos con tiempos para el audio del proyecto.
+        Con transcription.mode = 'alignment' se alinea el guion conocido con el
+        audio (mucho más rápido que Whisper); si falla, se recurre al ASR configurado.
+        Los resultados se comparten entre proyectos a través de la caché de
+        transcripciones (mismo audio + misma configuración).
+        """
+        project_id = project_info.get('id', 'TRANSCRIPCION')
+        audio_path = project_info["audio_path"]
+        mode = self.transcription_config.get('mode', 'asr')
+        cache = get_transcription_cache() if self.transcription_config.get('cache', {}).get('enabled', True) else None
+
+        if mode == 'alignment' and script_content and script_content.strip():
+            language = self.transcription_config.get('local', {}).get('default_language', 'es')
+            # El resultado depende del guion, así que su hash forma parte de la clave
+            script_hash = hashlib.sha256(script_content.encode('utf-8')).hexdigest()[:16]
+            cached = cache.get(audio_path, "script_alignment", script_hash, language) if cache else None
+            if cached:
+                project_info["transcription_source"] = "cache"
+                return cached
+            try:
+                logger.info(f"[{project_id}] Alineando guion con el audio (sin ASR)...")
+                result = align_script_to_audio(audio_path, script_content, language=language)
+                project_info["transcription_source"] = "script_alignment"
+                if cache: cache.put(audio_path, "script_alignment", script_hash, language, *result)
+                return result
+            except Exception as align_e:
+                logger.warning(f"[{project_id}] Falló la alineación del guion ({align_e}); usando transcripción ASR.")
+
+        is_local = isinstance(self.transcription_service, TranscriptionService)
+        service_config = self.transcription_config.get('local' if is_local else 'replicate', {})
+        language = service_config.get('default_language', 'es')
+        engine, model_name = self.transcription_service.cache_descriptor()
+        # Replicate se invoca con timestamp='chunk' (sin tiempos por palabra)
+        cached = cache.get(audio_path, engine, model_name, language, word_timestamps=is_local) if cache else None
+        if cached:
+            logger.info(f"[{project_id}] Transcripción reutilizada desde la caché ({engine}/{model_name})")
+            project_info["transcription_source"] = "cache"
+            return cached
+
+        project_info["transcription_source"] = "asr"
+        result = None
+        chunked_config = service_config.get('long_audio' if is_local else 'chunked', {})
+        if chunked_config.get('enabled', True):
+            audio_duration = project_info.get("audio_duration")
+            if not audio_duration:
+                with AudioFileClip(audio_path) as temp_audio_clip:
+                    audio_duration = temp_audio_clip.duration
+            if audio_duration >= chunked_config.get('min_duration_seconds', 600):
+                logger.info(f"[{project_id}] Audio largo ({audio_duration:.0f}s): transcripción por fragmentos en paralelo")
+                if is_local:
+                    result = self.transcription_service.transcribe_audio_chunked(
+                        audio_path,
+                        language=language,
+                        max_chunk_seconds=chunked_config.get('max_chunk_seconds', 120),
+                        max_workers=chunked_config.get('max_workers', 2)
+                    )
+                else:
+                    result = self.transcription_service.transcribe_audio_chunked(
+                        audio_path,
+                        language=language,
+                        max_chunk_seconds=chunked_config.get('max_chunk_seconds', 300),
+                        max_concurrency=chunked_config.get('max_concurrency', 4),
+                        max_retries=chunked_config.get('max_retries', 2),
+                        retry_backoff_seconds=chunked_config.get('retry_backoff_seconds', 5),
+                        timeout_seconds=chunked_config.get('timeout_seconds', 3600)
+                    )
+        if result is None:
+            result = self.transcription_service.transcribe_audio(audio_path, language=language)
+        record_api_call("transcription", engine)
+
+        if cache and result and result[0]:
+            cache.put(audio_path, engine, model_name, language, result[0], result[1], word_timestamps=is_local)
+        return result
+
+    def _can_stream_transcription(self, project_info: Dict, full_config: Dict, base_path: Path) -> bool:
+        """
+        La transcripción en streaming solo aplica a Whisper local en modo ASR,
+        con segmentación híbrida, sin escenas previas y sin resultado en caché.
+        Los audios largos van por la transcripción por fragmentos en paralelo.
+        """
+        if not self.transcription_config.get('streaming', {}).get('enabled', True):
+            return False
+        if self.transcription_config.get('mode', 'asr') != 'asr':
+            return False
+        if not isinstance(self.transcription_service, TranscriptionService):
+            return False
+        if full_config.get("scenes_config", {}).get("segmentation_mode", "Por Párrafos (Híbrido)") != "Por Párrafos (Híbrido)":
+            return False
+        if (base_path / "scenes.json").exists():
+            return False
+
+        local_config = self.transcription_config.get('local', {})
+        long_audio_config = local_config.get('long_audio', {})
+        if long_audio_config.get('enabled', True) and \
+                (project_info.get("audio_duration") or 0) >= long_audio_config.get('min_duration_seconds', 600):
+            return False
+
+        if self.transcription_config.get('cache', {}).get('enabled', True):
+            engine, model_name = self.transcription_service.cache_descriptor()
+            if get_transcription_cache().get(project_info["audio_path"], engine, model_name,
+                                             local_config.get('default_language', 'es')):
+                return False
+        return True
+
+    def _stream_transcription_and_scenes(self, project_info: Dict, full_config: Dict,
+                                         image_pipeline: Optional[SceneImagePipeline] = None):
+        """
+        Transcribe en streaming y, a medida que se cierran unidades narrativas,
+        genera sus escenas y prompts de imagen en un hilo aparte. Cada prompt
+        terminado encola su imagen en image_pipeline.
+        
+        Returns:
+            Tuple[List[Dict], List[Dict]]: Segmentos de la transcripción y escenas con prompts
+        """
+        project_id = project_info.get('id', 'TRANSCRIPCION')
+        audio_path = project_info["audio_path"]
+        image_prompt_config = full_config.get("image", {})
+        language = self.transcription_config.get('local', {}).get('default_language', 'es')
+        segmenter = IncrementalSceneSegmenter(self.scene_generator)
+        segments = []
+        metadata = {}
+        prompt_futures = []
+
+        logger.info(f"[{project_id}] Transcripción en streaming con generación de escenas solapada...")
+        with ThreadPoolExecutor(max_workers=self.scene_generator.prompt_workers) as executor:
+            # El contexto (dossier, plantilla...) se prepara mientras arranca la transcripción
+            context_future = executor.submit(
+                self.scene_generator.prepare_prompt_context, project_info, image_prompt_config, self.ai_service
+            )
+
+            def _prompt_and_queue_image(scene: Dict):
+                self.scene_generator.generate_prompt_for_scene(
+                    scene, scene['index'], context_future.result(), project_info, self.ai_service
+                )
+                if image_pipeline:
+                    image_pipeline.submit(scene['index'], scene)
+
+            def _submit_scenes(new_scenes: List[Dict]):
+                for scene in new_scenes:
+                    logger.info(f"[{project_id}] Escena {scene['index'] + 1} lista ({scene['start']:.1f}s-{scene['end']:.1f}s), generando prompt...")
+                    prompt_futures.append(executor.submit(_prompt_and_queue_image, scene))
+
+            record_api_call("transcription", self.transcription_service.cache_descriptor()[0])
+            for segment in self.transcription_service.transcribe_audio_stream(audio_path, language=language, metadata=metadata):
+                segments.append(segment)
+                _submit_scenes(segmenter.add_segment(segment))
+            _submit_scenes(segmenter.finish())
+
+            for future in prompt_futures:
+                future.result()
+
+        if segments and self.transcription_config.get('cache', {}).get('enabled', True):
+            engine, model_name = self.transcription_service.cache_descriptor()
+            get_transcription_cache().put(audio_path, engine, model_name, language, segments, metadata)
+        project_info["transcription_source"] = "asr_streaming"
+        logger.info(f"[{project_id}] Streaming completado: {len(segments)} segmentos, {len(segmenter.scenes)} escenas")
+        return segments, segmenter.scenes
+
+    def _generate_scene_images(self, project_info: Dict, scenes_data: List[Dict], image_prompt_config: Dict,
+                               base_path: Path, in_flight: Optional[Dict[int, Future]] = None,
+                               graph: Optional[ArtifactGraph] = None) -> Tuple[List[str], List[Dict]]:
+        """
+        Genera en paralelo las imágenes que faltan en images/ (scene_NNN.<formato>)
+        o cuyo prompt o ajustes cambiaron desde que se generaron (huella en graph).
+        Las que ya están en curso en la cola de la etapa de prompts (in_flight)
+        no se vuelven a pedir: se espera su resultado.
+        
+        Cada escena se reintenta con backoff exponencial; las que siguen fallando
+        reciben la imagen vecina más cercana o un placeholder para que el montaje
+        pueda continuar, y se devuelven en la lista de reintentos.
+        
+        Returns:
+            Tuple[List[str], List[Dict]]: Ruta de imagen por escena (en orden) y escenas fallidas
+        """
+        project_id = project_info.get('id', 'IMAGENES')
+        images_config = self.video_gen_config.get('image_generation', {})
+        max_concurrency = max(1, int(images_config.get('max_concurrency', 4)))
+        images_path = base_path / "images"
+        images_path.mkdir(exist_ok=True)
+        
+        image_paths: List[Optional[str]] = [None] * len(scenes_data)
+        errors: Dict[int, str] = {}
+        reused: List[Dict] = []
+        in_flight = in_flight or {}
+        pending = []
+        for i, scene in enumerate(scenes_data):
+            image_path = self._scene_image_path(images_path, i, image_prompt_config)
+            if i in in_flight:
+                continue
+            if self._scene_image_current(graph, i, scene, image_path, image_prompt_config):
+                logger.info(f"[{project_id}] La imagen para la escena {i+1} ya existe. Saltando.")
+                image_paths[i] = str(image_path)
+                scene["image_path"] = str(image_path)
+                if graph:
+                    graph.record_scene_image(i, self._scene_image_fingerprint(scene, image_prompt_config))
+            elif not scene.get("image_prompt"):
+                errors[i] = "Escena sin prompt de imagen"
+            else:
+                pending.append(i)
+        
+        if pending or in_flight:
+            logger.info(f"[{project_id}] Generando {len(pending)} imágenes (hasta {max_concurrency} en paralelo), {len(in_flight)} ya en cola...")
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(pending)))) as executor:
+                futures = {future: i for i, future in in_flight.items() if i < len(scenes_data)}
+                futures.update({
+                    executor.submit(
+                        self._generate_scene_image, project_id, i, scenes_data[i],
+                        self._scene_image_path(images_path, i, image_prompt_config), image_prompt_config
+                    ): i
+                    for i in pending
+                })
+                for done, future in enumerate(as_completed(futures), start=1):
+                    i = futures[future]
+                    try:
+                        image_paths[i], reused_from = future.result()
+                        scenes_data[i]["image_path"] = image_paths[i]
+                        if graph:
+                            graph.record_scene_image(i, self._scene_image_fingerprint(scenes_data[i], image_prompt_config))
+                        if reused_from:
+                            scenes_data[i]["image_reused_from"] = reused_from
+                            reused.append({"scene": i, **reused_from})
+                    except Exception as img_e:
+                        errors[i] = str(img_e)
+                        logger.error(f"[{project_id}] Escena {i+1}: sin imagen tras los reintentos: {img_e}")
+                    logger.info(f"[{project_id}] Imágenes: {done}/{len(futures)} procesadas")
+            self._write_image_reuse_report(project_info, images_path, reused, generated=len(futures))
+        
+        if not errors:
+            return image_paths, []
+        if not any(image_paths):
+            raise ValueError("No se generaron imágenes válidas para ninguna escena.")
+        
+        failed_scenes = []
+        fallback_mode = images_config.get('fallback', 'neighbour')
+        for i in sorted(errors):
+            if fallback_mode == 'placeholder':
+                substitute = self._placeholder_image(images_path, image_prompt_config)
+            else:
+                # La imagen generada más cercana (preferiblemente la anterior)
+                candidates = [j for j in range(len(image_paths)) if j not in errors and image_paths[j]]
+                nearest = min(candidates, key=lambda j: (abs(j - i), j > i))
+                substitute = image_paths[nearest]
+            image_paths[i] = substitute
+            failed_scenes.append({
+                "scene": i,
+                "prompt": scenes_data[i].get("image_prompt"),
+                "error": errors[i],
+                "substitute": substitute
+            })
+        return image_paths, failed_scenes
+
+    def _create_image_pipeline(self, project_id: str, image_prompt_config: Dict, images_path: Path,
+                               graph: Optional[ArtifactGraph] = None) -> Optional[SceneImagePipeline]:
+        """Crea la cola prompt→imagen si está activada (video_generation.image_generation.pipeline)."""
+        images_config = self.video_gen_config.get('image_generation', {})
+        if not images_config.get('pipeline', True):
+            return None
+        return SceneImagePipeline(self, project_id, image_prompt_config, images_path,
+                                  max_concurrency=int(images_config.get('max_concurrency', 4)), graph=graph)
+
+    def _scene_ready_callback(self, image_pipeline: Optional[SceneImagePipeline], scenes_path: Path,
+                              project_info: Dict) -> Callable:
+        """
+        Devuelve el callback on_scene_ready de la etapa de prompts: encola la
+        imagen de la escena y guarda scenes.json periódicamente para que una
+        interrupción no pierda los prompts ya generados.
+        """
+        checkpoint_seconds = self.video_gen_config.get('image_generation', {}).get('checkpoint_seconds', 10)
+        last_checkpoint = [time.monotonic()]
+
+        def on_scene_ready(scenes: List[Dict], index: int):
+            if image_pipeline:
+                image_pipeline.submit(index, scenes[index])
+            if time.monotonic() - last_checkpoint[0] >= checkpoint_seconds:
+                self.scene_generator.save_scenes(scenes, str(scenes_path), project_info)
+                last_checkpoint[0] = time.monotonic()
+
+        return on_scene_ready
+
+    @staticmethod
+    def _scene_image_fingerprint(scene: Dict, image_prompt_config: Dict) -> str:
+        """Huella de la imagen de una escena: su prompt y los ajustes de generación."""
+        return fingerprint(scene.get("image_prompt"), {key: image_prompt_config.get(key) for key in IMAGE_RENDER_KEYS})
+
+    def _scene_image_current(self, graph: Optional[ArtifactGraph], index: int, scene: Dict, image_path: Path,
+                             image_prompt_config: Dict) -> bool:
+        """True si la imagen de la escena existe y (con huellas) corresponde a su prompt actual."""
+        if graph is None:
+            return image_path.exists() and image_path.stat().st_size > 0
+        return graph.scene_image_current(index, self._scene_image_fingerprint(scene, image_prompt_config), image_path)
+
+    @staticmethod
+    def _scene_image_path(images_path: Path, index: int, image_prompt_config: Dict) -> Path:
+        """Ruta de la imagen de una escena; el nombre determina la reanudación."""
+        output_format = str(image_prompt_config.get("output_format", "webp") or "webp").lower()
+        return images_path / f"scene_{index:03d}.{output_format}"
+
+    def _generate_scene_image(self, project_id: str, index: int, scene: Dict, image_path: Path,
+                              image_prompt_config: Dict) -> Tuple[str, Optional[Dict]]:
+        """
+        Genera la imagen de una escena con reintentos y backoff exponencial,
+        salvo que el índice de prompts tenga una imagen previa equivalente.
+        
+        Returns:
+            Tuple[str, Optional[Dict]]: Ruta de la imagen y, si se reutilizó, su origen
+            
+        Raises:
+            RuntimeError: Si todos los intentos fallan
+        """
+        reused_from = self._reuse_similar_image(project_id, index, scene, image_path, image_prompt_config)
+        if reused_from:
+            return str(image_path), reused_from
+        
+        images_config = self.video_gen_config.get('image_generation', {})
+        max_retries = int(images_config.get('max_retries', 3))
+        backoff = float(images_config.get('retry_backoff', 2.0))
+        provider = image_prompt_config.get("img_provider", "replicate")
+        model = image_prompt_config.get("img_model", "black-forest-labs/flux-schnell")
+        last_error = None
+        
+        for attempt in range(max_retries + 1):
+            if attempt:
+                delay = backoff * (2 ** (attempt - 1))
+                logger.warning(f"[{project_id}] Escena {index+1}: reintento {attempt}/{max_retries} en {delay:.1f}s ({last_error})")
+                time.sleep(delay)
+            try:
+                # Se escribe en un temporal para que una descarga cortada no cuente como imagen existente
+                tmp_path = image_path.with_name(f".{image_path.name}.part")
+                self.ai_service.generate_image(
+                    prompt=scene["image_prompt"],
+                    model=model,
+                    provider=provider,
+                    output_path=str(tmp_path),
+                    aspect_ratio=image_prompt_config.get("aspect_ratio", "16:9"),
+                    output_format=image_path.suffix.lstrip('.'),
+                    output_quality=image_prompt_config.get("output_quality", 85),
+                    megapixels=image_prompt_config.get("megapixels", "1"),
+                    # fresh_images: pedir variaciones nuevas aunque el prompt ya se haya generado
+                    use_image_store=not image_prompt_config.get("fresh_images", False)
+                )
+                if not tmp_path.exists() or tmp_path.stat().st_size == 0:
+                    raise RuntimeError("El proveedor no devolvió ninguna imagen")
+                os.replace(tmp_path, image_path)
+                logger.info(f"[{project_id}] Imagen de la escena {index+1} guardada: {image_path.name}")
+                get_prompt_similarity_index(
+                    self.video_gen_config.get('image_generation', {}).get('similarity_reuse', {})
+                ).add(
+                    scene["image_prompt"], str(image_path), project_id,
+                    model=model, aspect_ratio=image_prompt_config.get("aspect_ratio", "16:9")
+                )
+                return str(image_path), None
+            except Exception as e:
+                last_error = e
+        raise RuntimeError(f"{max_retries + 1} intentos fallidos: {last_error}")
+
+    def _reuse_similar_image(self, project_id: str, index: int, scene: Dict, image_path: Path,
+                             image_prompt_config: Dict) -> Optional[Dict]:
+        """
+        Busca en el índice de prompts una imagen previa suficientemente parecida
+        (video_generation.image_generation.similarity_reuse) y la coloca en image_path.
+        
+        Returns:
+            Optional[Dict]: Origen de la imagen reutilizada o None si no hay coincidencia
+        """
+        reuse_config = self.video_gen_config.get('image_generation', {}).get('similarity_reuse', {})
+        if not reuse_config.get('enabled', True) or image_prompt_config.get("fresh_images", False):
+            return None
+        match = get_prompt_similarity_index(reuse_config).find_similar(
+            scene["image_prompt"],
+            threshold=float(reuse_config.get('threshold', 0.85)),
+            model=image_prompt_config.get("img_model", "black-forest-labs/flux-schnell"),
+            aspect_ratio=image_prompt_config.get("aspect_ratio", "16:9"),
+            project_id=project_id if reuse_config.get('scope', 'global') == 'project' else None,
+            exclude_path=str(image_path)
+        )
+        if not match:
+            return None
+        try:
+            link_or_copy(Path(match["image_path"]), image_path)
+        except OSError as e:
+            logger.warning(f"[{project_id}] No se pudo reutilizar {match['image_path']}: {e}")
+            return None
+        logger.info(f"[{project_id}] Escena {index+1}: imagen reutilizada (similitud {match['similarity']:.2f}) de {match['image_path']}")
+        return {
+            "image_path": match["image_path"],
+            "prompt": match["prompt"],
+            "project_id": match.get("project_id"),
+            "similarity": match["similarity"]
+        }
+
+    def _write_image_reuse_report(self, project_info: Dict, images_path: Path, reused: List[Dict], generated: int):
+        """Guarda en images/reuse_report.json las imágenes reutilizadas y las llamadas evitadas."""
+        get_prompt_similarity_index(self.video_gen_config.get('image_generation', {}).get('similarity_reuse', {})).flush()
+        report = {
+            "images_requested": generated,
+            "api_calls_avoided": len(reused),
+            "reused": sorted(reused, key=lambda r: r["scene"])
+        }
+        project_info["image_reuse"] = {"images_requested": generated, "api_calls_avoided": len(reused)}
+        if reused:
+            logger.info(f"[{project_info.get('id')}] Reutilización por similitud: {len(reused)}/{generated} llamadas a la API evitadas")
+        try:
+            with open(images_path / "reuse_report.json", "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar el informe de reutilización: {e}")
+
+    @staticmethod
+    def _placeholder_image(images_path: Path, image_prompt_config: Dict) -> str:
+        """Crea (una vez por proyecto) una imagen negra con la relación de aspecto configurada."""
+        from PIL import Image
+        width_ratio, height_ratio = (int(v) for v in str(image_prompt_config.get("aspect_ratio", "16:9")).split(":"))
+        width = 1280
+        height = int(width * height_ratio / width_ratio)
+        placeholder_path = images_path / f"placeholder_{width}x{height}.png"
+        if not placeholder_path.exists():
+            Image.new("RGB", (width, height), (0, 0, 0)).save(placeholder_path)
+        return str(placeholder_path)
+
     def _apply_audio(self, video_clip: VideoFileClip, project_info: Dict, audio_config_ui: Dict) -> VideoFileClip:
         """
         Aplica el audio TTS y prepara la música de fondo para el guardado final.